@@ -37,7 +37,12 @@ from database.settings_db import init_db as ensure_settings_tables_exists
 from database.chartink_db import init_db as ensure_chartink_tables_exists
 from database.traffic_db import init_logs_db as ensure_traffic_logs_exists
 from database.latency_db import init_latency_db as ensure_latency_tables_exists
+from database.history_db import init_history_db as ensure_history_tables_exists
 from database.strategy_db import init_db as ensure_strategy_tables_exists
+from database.order_queue_db import init_db as ensure_order_queue_tables_exists
+from services.webhook_order_scheduler import webhook_order_scheduler, ORDER_QUEUE_DURABLE
+from services.scheduler_service import scheduler_service
+from services.scheduled_jobs import register_default_jobs
 
 from utils.plugin_loader import load_broker_auth_functions
 
@@ -120,7 +125,17 @@ def setup_environment(app):
         ensure_chartink_tables_exists()
         ensure_traffic_logs_exists()
         ensure_latency_tables_exists()
+        ensure_history_tables_exists()
         ensure_strategy_tables_exists()
+        ensure_order_queue_tables_exists()
+
+    # Place webhook orders left in the durable queue by a restart
+    if ORDER_QUEUE_DURABLE:
+        webhook_order_scheduler.start()
+
+    # One scheduler for all timed jobs; only the leader process runs them
+    register_default_jobs()
+    scheduler_service.start()
 
     # Conditionally setup ngrok in development environment
     if os.getenv('NGROK_ALLOW') == 'TRUE':
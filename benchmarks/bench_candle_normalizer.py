@@ -0,0 +1,110 @@
+"""
+Benchmark: per-candle dict building vs utils.candle_normalizer on a
+100k-candle payload in each broker payload shape.
+
+Run from the repository root:
+    python -m benchmarks.bench_candle_normalizer
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.candle_normalizer import from_columns, from_rows, from_delimited
+
+CANDLES = 100_000
+ROUNDS = 5
+
+
+def make_payloads(count):
+    rng = np.random.default_rng(7)
+    timestamps = 1704080700 + np.arange(count, dtype=np.int64) * 60
+    close = 20000 + rng.standard_normal(count).cumsum()
+    columns = {
+        'timestamp': timestamps.tolist(),
+        'open': (close + rng.random(count)).round(2).tolist(),
+        'high': (close + 2).round(2).tolist(),
+        'low': (close - 2).round(2).tolist(),
+        'close': close.round(2).tolist(),
+        'volume': rng.integers(0, 100000, count).tolist()
+    }
+    rows = [list(values) for values in zip(*(columns[key] for key in ['timestamp', 'open', 'high', 'low', 'close', 'volume']))]
+    delimited = ','.join('|'.join(str(value) for value in row) + '|0|' for row in rows)
+    return columns, rows, delimited
+
+
+def legacy_columns(response):
+    """Dhan's previous per-candle path"""
+    def to_ist(timestamp):
+        return int((datetime.utcfromtimestamp(timestamp) + timedelta(hours=5, minutes=30)).timestamp())
+
+    candles = []
+    for i in range(len(response['timestamp'])):
+        candles.append({
+            'timestamp': to_ist(response['timestamp'][i]),
+            'open': float(response['open'][i]) if response['open'][i] else 0,
+            'high': float(response['high'][i]) if response['high'][i] else 0,
+            'low': float(response['low'][i]) if response['low'][i] else 0,
+            'close': float(response['close'][i]) if response['close'][i] else 0,
+            'volume': int(float(response['volume'][i])) if response['volume'][i] else 0
+        })
+    df = pd.DataFrame(candles)
+    return df.sort_values('timestamp').drop_duplicates(subset=['timestamp']).reset_index(drop=True)
+
+
+def legacy_rows(rows):
+    """Angel/Fyers previous path"""
+    df = pd.DataFrame(rows, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df[['open', 'high', 'low', 'close', 'volume']] = df[['open', 'high', 'low', 'close', 'volume']].apply(pd.to_numeric)
+    return df.sort_values('timestamp').drop_duplicates(subset=['timestamp']).reset_index(drop=True)
+
+
+def legacy_delimited(raw):
+    """XTS previous path"""
+    data = []
+    for row in raw.strip().split(','):
+        fields = row.split('|')
+        if len(fields) < 6:
+            continue
+        data.append({
+            'timestamp': int(fields[0]),
+            'open': float(fields[1]),
+            'high': float(fields[2]),
+            'low': float(fields[3]),
+            'close': float(fields[4]),
+            'volume': int(fields[5])
+        })
+    df = pd.DataFrame(data)
+    return df.sort_values('timestamp').drop_duplicates('timestamp').reset_index(drop=True)
+
+
+def best_of(func, payload):
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = func(payload)
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, result
+
+
+def main():
+    columns, rows, delimited = make_payloads(CANDLES)
+    ist_shift = 19800 - int(datetime.now().astimezone().utcoffset().total_seconds())
+    cases = [
+        ('columnar (Dhan)', legacy_columns, lambda p: from_columns(p, tz_shift_seconds=ist_shift), columns),
+        ('rows (Angel/Fyers)', legacy_rows, from_rows, rows),
+        ('delimited (XTS)', legacy_delimited, from_delimited, delimited),
+    ]
+    print(f"{CANDLES:,} candles, best of {ROUNDS}")
+    print(f"{'payload':<20}{'legacy ms':>12}{'vectorized ms':>16}{'speedup':>10}")
+    for name, legacy, vectorized, payload in cases:
+        legacy_ms, expected = best_of(legacy, payload)
+        vector_ms, actual = best_of(vectorized, payload)
+        assert np.array_equal(expected['timestamp'].to_numpy(), actual['timestamp'].to_numpy()), name
+        assert np.allclose(expected['close'].to_numpy(dtype=float), actual['close'].to_numpy()), name
+        print(f"{name:<20}{legacy_ms:>12.1f}{vector_ms:>16.1f}{legacy_ms / vector_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
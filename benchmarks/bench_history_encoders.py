@@ -0,0 +1,73 @@
+"""
+Benchmark: serialization throughput of each /api/v1/history response format
+on a 1-year 1-minute series (~90k bars).
+
+Run from the repository root:
+    python -m benchmarks.bench_history_encoders
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.history_encoders import (encode_columnar, iter_csv, encode_arrow, encode_npy,
+                                    UnsupportedFormatError, orjson)
+
+BARS = 90_000
+ROUNDS = 5
+
+
+def make_frame(count):
+    rng = np.random.default_rng(7)
+    close = 20000 + rng.standard_normal(count).cumsum()
+    return pd.DataFrame({
+        'timestamp': 1704080700 + np.arange(count, dtype=np.int64) * 60,
+        'open': (close + rng.random(count)).round(2),
+        'high': (close + 2).round(2),
+        'low': (close - 2).round(2),
+        'close': close.round(2),
+        'volume': rng.integers(0, 100000, count)
+    })
+
+
+def encode_records(df):
+    """Current default: one dict per candle through the stdlib encoder (as jsonify does)"""
+    return json.dumps({'status': 'success', 'data': df.to_dict(orient='records')}).encode('utf-8')
+
+
+def encode_csv(df):
+    return ''.join(iter_csv(df)).encode('utf-8')
+
+
+def best_of(func, df):
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        body = func(df)
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(body)
+
+
+def main():
+    df = make_frame(BARS)
+    cases = [
+        ('json (records)', encode_records),
+        ('columnar (orjson)' if orjson is not None else 'columnar (json)', encode_columnar),
+        ('csv', encode_csv),
+        ('arrow', encode_arrow),
+        ('npy', encode_npy),
+    ]
+    print(f"{BARS:,} bars, best of {ROUNDS}")
+    print(f"{'format':<20}{'ms':>10}{'bytes':>12}{'bars/s':>14}{'MB/s':>10}")
+    for name, encoder in cases:
+        try:
+            seconds, size = best_of(encoder, df)
+        except UnsupportedFormatError as e:
+            print(f"{name:<20}{'skipped':>10}  ({e})")
+            continue
+        print(f"{name:<20}{seconds * 1000:>10.1f}{size:>12,}{BARS / seconds:>14,.0f}{size / seconds / 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark: HSWrapper.parseData vs the memoryview/struct HSDecoder on a
+recorded stream of Kotak HSM data frames (snapshots for a few hundred scrips,
+depth and index topics, followed by incremental updates).
+
+The frames are produced by `record_frames`, which writes the same binary
+layout the HSM server sends. test/test_kotak_hs_decoder.py checks that both
+implementations decode them identically.
+
+Run from the repository root (requires websocket-client, like the broker):
+    python -m benchmarks.bench_kotak_decoder
+"""
+import contextlib
+import io
+import random
+import struct
+import time
+
+from broker.kotak.api import HSWebSocketLib as hs
+from broker.kotak.api.hs_decoder import HSDecoder
+
+SCRIPS = 300
+DEPTHS = 30
+INDICES = 10
+UPDATE_FRAMES = 2000
+RECORDS_PER_UPDATE = 40
+ROUNDS = 5
+
+SCRIP_FIELDS = 28   # long fields 0..27 (turnover is the last)
+INDEX_FIELDS = 11   # long fields 0..10
+DEPTH_FIELDS = 34   # long fields 0..33 (multiplier 32, precision 33)
+PRECISION = 2
+EPOCH = 1718000000
+
+
+def _frame(records, frame_type=hs.BinRespTypes["DATA_TYPE"]):
+    body = struct.pack('>H', len(records)) + b''.join(records)
+    return struct.pack('>HB', 1, frame_type) + body
+
+
+def _snapshot(topic_id, name, longs, strings):
+    record = struct.pack('>BI', hs.ResponseTypes["SNAP"], topic_id)
+    record += struct.pack('>B', len(name)) + name.encode('latin-1')
+    record += struct.pack('>B', len(longs)) + struct.pack(f'>{len(longs)}I', *longs)
+    record += struct.pack('>B', len(strings))
+    for field_id, value in strings:
+        record += struct.pack('>BB', field_id, len(value)) + value.encode('latin-1')
+    return struct.pack('>H', len(record)) + record
+
+
+def _update(topic_id, longs):
+    record = struct.pack('>BI', hs.ResponseTypes["UPDATE"], topic_id)
+    record += struct.pack('>B', len(longs)) + struct.pack(f'>{len(longs)}I', *longs)
+    return struct.pack('>H', len(record)) + record
+
+
+def _scaled(rng, low, high):
+    return int(rng.uniform(low, high) * 10 ** PRECISION)
+
+
+def _scrip_longs(rng):
+    longs = [0] * SCRIP_FIELDS
+    longs[0:4] = [EPOCH + rng.randint(0, 3600) for _ in range(4)]
+    longs[4] = rng.randint(1000, 10_000_000)        # volume
+    for index in (5, 9, 10, 13, 14, 15, 16, 17, 18, 19, 20, 21):
+        longs[index] = _scaled(rng, 100, 5000)       # prices
+    for index in (6, 7, 8, 11, 12, 22):
+        longs[index] = rng.randint(1, 500_000)       # quantities, oi
+    longs[hs.SCRIP_INDEX["MULTIPLIER"]] = 1
+    longs[hs.SCRIP_INDEX["PRECISION"]] = PRECISION
+    return longs
+
+
+def _index_longs(rng):
+    longs = [0] * INDEX_FIELDS
+    longs[0:2] = [EPOCH, EPOCH + rng.randint(0, 3600)]
+    for index in (2, 3, 5, 6, 7):
+        longs[index] = _scaled(rng, 10_000, 60_000)
+    longs[4] = EPOCH
+    longs[hs.INDEX_INDEX["MULTIPLIER"]] = 1
+    longs[hs.INDEX_INDEX["PRECISION"]] = PRECISION
+    return longs
+
+
+def _depth_longs(rng):
+    longs = [0] * DEPTH_FIELDS
+    longs[0:2] = [EPOCH, EPOCH + rng.randint(0, 3600)]
+    for index in range(2, 12):
+        longs[index] = _scaled(rng, 100, 5000)
+    for index in range(12, 32):
+        longs[index] = rng.randint(1, 100_000)
+    longs[hs.DEPTH_INDEX["MULTIPLIER"]] = 1
+    longs[hs.DEPTH_INDEX["PRECISION"]] = PRECISION
+    return longs
+
+
+def record_frames(seed=7, update_frames=UPDATE_FRAMES):
+    """Snapshot frames for every topic followed by update frames touching a few fields each"""
+    rng = random.Random(seed)
+    topics = {}
+    records = []
+    topic_id = 1
+    for kind, count, prefix, make in (('sf', SCRIPS, 'sf|nse_cm|', _scrip_longs),
+                                      ('dp', DEPTHS, 'dp|nse_cm|', _depth_longs),
+                                      ('if', INDICES, 'if|nse_cm|', _index_longs)):
+        for n in range(count):
+            longs = make(rng)
+            token = str(1000 + n)
+            strings = [(hs.STRING_INDEX["SYMBOL"], token), (hs.STRING_INDEX["EXCHG"], 'nse_cm'),
+                       (hs.STRING_INDEX["TSYMBOL"], f'SYM{n}-EQ')]
+            records.append(_snapshot(topic_id, prefix + token, longs, strings))
+            topics[topic_id] = (kind, longs)
+            topic_id += 1
+
+    frames = [_frame(records[start:start + 50]) for start in range(0, len(records), 50)]
+    topic_ids = list(topics)
+    for _ in range(update_frames):
+        batch = []
+        for tid in rng.sample(topic_ids, RECORDS_PER_UPDATE):
+            kind, longs = topics[tid]
+            longs = list(longs)
+            longs[1] = longs[1] + rng.randint(1, 5)
+            movable = {'sf': (4, 5, 9, 10, 11, 12, 13), 'dp': tuple(range(2, 32)), 'if': (2,)}[kind]
+            for index in rng.sample(movable, min(3, len(movable))):
+                longs[index] = max(1, longs[index] + rng.randint(-50, 50))
+            topics[tid] = (kind, longs)
+            batch.append(_update(tid, longs))
+        frames.append(_frame(batch))
+
+    # A topic id re-snapshotted mid-stream replaces its previous state
+    kind, longs = topics[1]
+    frames.append(_frame([_snapshot(1, 'sf|nse_cm|1000', _scrip_longs(rng),
+                                    [(hs.STRING_INDEX["SYMBOL"], '1000'), (hs.STRING_INDEX["EXCHG"], 'nse_cm')])]))
+    frames.append(_frame([_update(1, _scrip_longs(rng))]))
+    return frames
+
+
+def decode_all(parser, frames):
+    with contextlib.redirect_stdout(io.StringIO()):  # HSWrapper prints on every update
+        return [parser.parseData(frame) for frame in frames]
+
+
+def best_of(make_parser, frames):
+    timings = []
+    for _ in range(ROUNDS):
+        hs.topic_list.clear()
+        parser = make_parser()
+        started = time.perf_counter()
+        decode_all(parser, frames)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    frames = record_frames()
+    records = SCRIPS + DEPTHS + INDICES + UPDATE_FRAMES * RECORDS_PER_UPDATE
+    legacy = best_of(hs.HSWrapper, frames)
+    fast = best_of(HSDecoder, frames)
+    print(f"{len(frames):,} frames / {records:,} records, best of {ROUNDS}")
+    print(f"{'decoder':<12}{'ms':>10}{'records/s':>14}")
+    print(f"{'HSWrapper':<12}{legacy * 1000:>10.1f}{records / legacy:>14,.0f}")
+    print(f"{'HSDecoder':<12}{fast * 1000:>10.1f}{records / fast:>14,.0f}")
+    print(f"speedup: {legacy / fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
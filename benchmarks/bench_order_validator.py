@@ -0,0 +1,139 @@
+"""
+Benchmark and conformance check: validation overhead per order of the
+previous /api/v1/placeorder path (deepcopy, missing-field scan, list
+membership checks, marshmallow OrderSchema.load) vs the precompiled
+OrderValidator.
+
+Valid payloads must produce the same order dict through both paths and
+invalid payloads the same error message before any timing is reported.
+
+Run from the repository root (requires marshmallow, like the API):
+    python -m benchmarks.bench_order_validator
+"""
+import copy
+import importlib.util
+import os
+import time
+
+from marshmallow import ValidationError
+
+from utils.constants import (VALID_EXCHANGES, VALID_ACTIONS, VALID_PRICE_TYPES,
+                             VALID_PRODUCT_TYPES, REQUIRED_ORDER_FIELDS)
+from utils.order_validator import order_validator, OrderValidationError
+
+ORDERS = 20_000
+ROUNDS = 5
+
+# Load the schemas by path: importing the restx_api package registers every
+# namespace and needs the database configured
+_spec = importlib.util.spec_from_file_location(
+    'order_schemas', os.path.join(os.path.dirname(__file__), '..', 'restx_api', 'schemas.py'))
+_schemas = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_schemas)
+order_schema = _schemas.OrderSchema()
+
+
+def legacy_validate(data):
+    """The checks place_order.py ran before OrderValidator, minus logging"""
+    order_request_data = copy.deepcopy(data)
+    order_request_data.pop('apikey', None)
+    missing_fields = [field for field in REQUIRED_ORDER_FIELDS if field not in data]
+    if missing_fields:
+        raise OrderValidationError(f'Missing mandatory field(s): {", ".join(missing_fields)}')
+    if 'exchange' in data and data['exchange'] not in VALID_EXCHANGES:
+        raise OrderValidationError(f'Invalid exchange. Must be one of: {", ".join(VALID_EXCHANGES)}')
+    if 'action' in data:
+        data['action'] = data['action'].upper()
+        if data['action'] not in VALID_ACTIONS:
+            raise OrderValidationError(f'Invalid action. Must be one of: {", ".join(VALID_ACTIONS)} (case insensitive)')
+    if 'price_type' in data and data['price_type'] not in VALID_PRICE_TYPES:
+        raise OrderValidationError(f'Invalid price type. Must be one of: {", ".join(VALID_PRICE_TYPES)}')
+    if 'product_type' in data and data['product_type'] not in VALID_PRODUCT_TYPES:
+        raise OrderValidationError(f'Invalid product type. Must be one of: {", ".join(VALID_PRODUCT_TYPES)}')
+    try:
+        return order_schema.load(data)
+    except ValidationError as err:
+        raise OrderValidationError(str(err.messages))
+
+
+def fast_validate(data):
+    # The endpoint keeps a copy of the request without the apikey for logging
+    order_request_data = {key: value for key, value in data.items() if key != 'apikey'}
+    return order_validator.validate(data).to_dict()
+
+
+def make_orders(count):
+    symbols = ['SBIN', 'RELIANCE', 'INFY', 'TCS', 'HDFCBANK']
+    orders = []
+    for n in range(count):
+        order = {
+            'apikey': 'a' * 64,
+            'strategy': 'bench',
+            'symbol': symbols[n % len(symbols)],
+            'exchange': 'NSE',
+            'action': 'buy' if n % 2 else 'SELL',
+            'quantity': str(1 + n % 50)
+        }
+        if n % 3 == 0:
+            order.update({'pricetype': 'LIMIT', 'product': 'CNC', 'price': '100.5'})
+        orders.append(order)
+    return orders
+
+
+def check_conformance():
+    for order in make_orders(50):
+        assert legacy_validate(dict(order)) == fast_validate(dict(order)), order
+
+    base = make_orders(1)[0]
+    invalid = [
+        {key: value for key, value in base.items() if key not in ('symbol', 'quantity')},
+        {**base, 'exchange': 'NYSE'},
+        {**base, 'action': 'HOLD'},
+        {**base, 'quantity': 10},
+        {**base, 'quantity': 10, 'comment': 'x'},
+    ]
+    for payload in invalid:
+        messages = []
+        for validate in (legacy_validate, fast_validate):
+            try:
+                validate(dict(payload))
+                messages.append(None)
+            except OrderValidationError as error:
+                messages.append(str(error))
+        assert messages[0] is not None and messages[0] == messages[1], messages
+
+    # Previously unchecked (the legacy path tested 'price_type'/'product_type')
+    for payload in ({**base, 'pricetype': 'STOP'}, {**base, 'product': 'BO'}):
+        try:
+            fast_validate(payload)
+            raise AssertionError(f"accepted {payload}")
+        except OrderValidationError:
+            pass
+    print(f"conformance: ok ({50 + len(invalid)} payloads)")
+
+
+def best_of(validate, orders):
+    timings = []
+    for _ in range(ROUNDS):
+        payloads = [dict(order) for order in orders]
+        started = time.perf_counter()
+        for payload in payloads:
+            validate(payload)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    check_conformance()
+    orders = make_orders(ORDERS)
+    legacy = best_of(legacy_validate, orders)
+    fast = best_of(fast_validate, orders)
+    print(f"{ORDERS:,} orders, best of {ROUNDS}")
+    print(f"{'path':<16}{'overhead_ms':>14}{'orders/s':>14}")
+    print(f"{'legacy':<16}{legacy * 1000 / ORDERS:>14.4f}{ORDERS / legacy:>14,.0f}")
+    print(f"{'OrderValidator':<16}{fast * 1000 / ORDERS:>14.4f}{ORDERS / fast:>14,.0f}")
+    print(f"speedup: {legacy / fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ import logging
 import secrets
 from argon2 import PasswordHasher
 from database.auth_db import upsert_api_key, get_api_key, verify_api_key, get_api_key_for_tradingview
+from database.strategy_db import invalidate_strategy_snapshot
 from utils.session import check_session_validity
 
 logger = logging.getLogger(__name__)
@@ -44,6 +45,8 @@ def manage_api_key():
         key_id = upsert_api_key(user_id, api_key)
         
         if key_id is not None:
+            # Webhooks must stop using the old key
+            invalidate_strategy_snapshot(user_id=user_id)
             logger.info(f"API key updated successfully for user: {user_id}")
             return jsonify({
                 'message': 'API key updated successfully.',
@@ -6,6 +6,7 @@ from database.auth_db import upsert_auth
 from database.user_db import authenticate_user, User, db_session, find_user_by_username, find_user_by_email  # Import the function
 import re
 from utils.session import check_session_validity
+from utils.broker_registry import invalidate_data_handler
 import secrets
 
 # Access environment variables
@@ -188,6 +189,8 @@ def logout():
             print(f'Auth Revoked in the Database')
         else:
             print("Failed to upsert auth token")
+        # Drop the cached data handler built with the revoked token
+        invalidate_data_handler(session.get('broker'))
         # Remove tokens and user information from session
         session.pop('user', None)  # Remove 'user' from session if exists
         session.pop('broker', None)  # Remove 'user' from session if exists
@@ -8,129 +8,28 @@ from database.chartink_db import (
 )
 from database.symbol import enhanced_search_symbols
 from database.auth_db import get_api_key_for_tradingview
+from services.webhook_order_scheduler import webhook_order_scheduler
+from services.squareoff_engine import squareoff_engine
+from services.scheduler_service import scheduler_service
 from utils.session import check_session_validity
 import json
 from datetime import datetime, time
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
 import logging
-import requests
 import os
 import uuid
-import time as time_module
-import queue
-import threading
-from collections import deque
-from time import time
 
 logger = logging.getLogger(__name__)
 
 chartink_bp = Blueprint('chartink_bp', __name__, url_prefix='/chartink')
 
-# Initialize scheduler for time-based controls
-scheduler = BackgroundScheduler(timezone=pytz.timezone('Asia/Kolkata'))
-scheduler.start()
-
-# Get base URL from environment or default to localhost
-BASE_URL = os.getenv('HOST_SERVER', 'http://127.0.0.1:5000')
 
 # Valid exchanges
 VALID_EXCHANGES = ['NSE', 'BSE']
 
-# Separate queues for different order types
-regular_order_queue = queue.Queue()  # For placeorder (up to 10/sec)
-smart_order_queue = queue.Queue()    # For placesmartorder (1/sec)
-
-# Order processor state
-order_processor_running = False
-order_processor_lock = threading.Lock()
-
-# Rate limiting state for regular orders
-last_regular_orders = deque(maxlen=10)  # Track last 10 regular order timestamps
-
-def process_orders():
-    """Background task to process orders from both queues with rate limiting"""
-    global order_processor_running
-    
-    while True:
-        try:
-            # Process smart orders first (1 per second)
-            try:
-                smart_order = smart_order_queue.get_nowait()
-                if smart_order is None:  # Poison pill
-                    break
-                
-                try:
-                    response = requests.post(f'{BASE_URL}/api/v1/placesmartorder', json=smart_order['payload'])
-                    if response.ok:
-                        logger.info(f'Smart order placed for {smart_order["payload"]["symbol"]} in strategy {smart_order["payload"]["strategy"]}')
-                    else:
-                        logger.error(f'Error placing smart order for {smart_order["payload"]["symbol"]}: {response.text}')
-                except Exception as e:
-                    logger.error(f'Error placing smart order: {str(e)}')
-                
-                # Always wait 1 second after smart order
-                time_module.sleep(1)
-                continue  # Start next iteration
-                
-            except queue.Empty:
-                pass  # No smart orders, continue to regular orders
-            
-            # Process regular orders (up to 10 per second)
-            now = time()
-            
-            # Clean up old timestamps
-            while last_regular_orders and now - last_regular_orders[0] > 1:
-                last_regular_orders.popleft()
-            
-            # Process regular orders if under rate limit
-            if len(last_regular_orders) < 10:
-                try:
-                    regular_order = regular_order_queue.get_nowait()
-                    if regular_order is None:  # Poison pill
-                        break
-                    
-                    try:
-                        response = requests.post(f'{BASE_URL}/api/v1/placeorder', json=regular_order['payload'])
-                        if response.ok:
-                            logger.info(f'Regular order placed for {regular_order["payload"]["symbol"]} in strategy {regular_order["payload"]["strategy"]}')
-                            last_regular_orders.append(now)
-                        else:
-                            logger.error(f'Error placing regular order for {regular_order["payload"]["symbol"]}: {response.text}')
-                    except Exception as e:
-                        logger.error(f'Error placing regular order: {str(e)}')
-                        
-                except queue.Empty:
-                    time_module.sleep(0.1)  # No orders to process
-            else:
-                # Rate limit hit, wait until next second
-                time_module.sleep(0.1)
-                
-        except Exception as e:
-            logger.error(f'Error in order processor: {str(e)}')
-            time_module.sleep(0.1)  # Prevent tight loop on error
-    
-    with order_processor_lock:
-        order_processor_running = False
-
-def ensure_order_processor():
-    """Ensure order processor is running"""
-    global order_processor_running
-    
-    with order_processor_lock:
-        if not order_processor_running:
-            order_processor_running = True
-            thread = threading.Thread(target=process_orders, daemon=True)
-            thread.start()
-
 def queue_order(endpoint, payload):
-    """Add order to appropriate processing queue"""
-    ensure_order_processor()
-    
-    if endpoint == 'placesmartorder':
-        smart_order_queue.put({'endpoint': endpoint, 'payload': payload})
-    else:  # placeorder
-        regular_order_queue.put({'endpoint': endpoint, 'payload': payload})
+    """Hand the order to the shared webhook order scheduler"""
+    webhook_order_scheduler.submit(endpoint, payload)
 
 def validate_strategy_times(start_time, end_time, squareoff_time):
     """Validate strategy time settings"""
@@ -163,6 +62,9 @@ def validate_strategy_name(name):
     
     return True, name
 
+def squareoff_job_id(strategy_id):
+    return f'chartink_squareoff_{strategy_id}'
+
 def schedule_squareoff(strategy_id):
     """Schedule squareoff for intraday strategy"""
     strategy = get_strategy(strategy_id)
@@ -171,21 +73,15 @@ def schedule_squareoff(strategy_id):
     
     try:
         hours, minutes = map(int, strategy.squareoff_time.split(':'))
-        job_id = f'squareoff_{strategy_id}'
         
-        # Remove existing job if any
-        if scheduler.get_job(job_id):
-            scheduler.remove_job(job_id)
-        
-        # Add new job
-        scheduler.add_job(
+        # Replaces the existing job, if any, in the shared scheduler
+        scheduler_service.add_job(
             squareoff_positions,
             'cron',
+            squareoff_job_id(strategy_id),
             hour=hours,
             minute=minutes,
-            args=[strategy_id],
-            id=job_id,
-            timezone=pytz.timezone('Asia/Kolkata')
+            args=[strategy_id]
         )
         logger.info(f'Scheduled squareoff for strategy {strategy_id} at {hours}:{minutes}')
     except Exception as e:
@@ -195,7 +91,7 @@ def squareoff_positions(strategy_id):
     """Square off all positions for intraday strategy"""
     try:
         strategy = get_strategy(strategy_id)
-        if not strategy or not strategy.is_intraday:
+        if not strategy or not strategy.is_active or not strategy.is_intraday:
             return
         
         # Get API key for authentication
@@ -207,29 +103,32 @@ def squareoff_positions(strategy_id):
         # Get all symbol mappings
         mappings = get_symbol_mappings(strategy_id)
         
-        for mapping in mappings:
-            # Use placesmartorder with quantity=0 and position_size=0 for squareoff
-            payload = {
-                'apikey': api_key,
-                'strategy': strategy.name,
-                'symbol': mapping.chartink_symbol,
-                'exchange': mapping.exchange,
-                'action': 'SELL',  # Direction doesn't matter for closing
-                'product': mapping.product_type,
-                'pricetype': 'MARKET',
-                'quantity': '0',
-                'position_size': '0',  # This will close the position
-                'price': '0',
-                'trigger_price': '0',
-                'disclosed_quantity': '0'
-            }
-            
-            # Queue the order instead of executing directly
-            queue_order('placesmartorder', payload)
+        # One positionbook fetch, then all closing orders at once
+        squareoff_engine.square_off(
+            strategy.name, api_key,
+            [(mapping.chartink_symbol, mapping.exchange, mapping.product_type) for mapping in mappings]
+        )
             
     except Exception as e:
         logger.error(f'Error in squareoff_positions for strategy {strategy_id}: {str(e)}')
 
+def restore_squareoff_jobs():
+    """
+    Schedule square-off for every active intraday strategy and drop stored
+    jobs of inactive or deleted ones (run by the scheduler leader)
+    """
+    scheduled = set()
+    for strategy in get_all_strategies():
+        if strategy.is_active and strategy.is_intraday and strategy.squareoff_time:
+            schedule_squareoff(strategy.id)
+            scheduled.add(squareoff_job_id(strategy.id))
+    for job_id in scheduler_service.job_ids(squareoff_job_id('')):
+        if job_id not in scheduled:
+            scheduler_service.remove_job(job_id)
+            logger.info(f'Removed stale squareoff job {job_id}')
+
+scheduler_service.on_leader(restore_squareoff_jobs)
+
 @chartink_bp.route('/')
 @check_session_validity
 def index():
@@ -348,9 +247,7 @@ def delete_strategy_route(strategy_id):
     
     try:
         # Remove squareoff job if exists
-        job_id = f'squareoff_{strategy_id}'
-        if scheduler.get_job(job_id):
-            scheduler.remove_job(job_id)
+        scheduler_service.remove_job(squareoff_job_id(strategy_id))
         
         # Delete strategy and its mappings
         if delete_strategy(strategy_id):
@@ -503,6 +400,10 @@ def toggle_strategy_route(strategy_id):
     try:
         strategy = toggle_strategy(strategy_id)
         if strategy:
+            if strategy.is_active:
+                schedule_squareoff(strategy_id)
+            else:
+                scheduler_service.remove_job(squareoff_job_id(strategy_id))
             status = 'activated' if strategy.is_active else 'deactivated'
             flash(f'Strategy {status} successfully', 'success')
         else:
@@ -634,6 +535,7 @@ def webhook(webhook_id):
         
         # Process each symbol
         processed_symbols = []
+        legs = []
         for symbol in symbols:
             symbol = symbol.strip()
             if not symbol:
@@ -675,11 +577,12 @@ def webhook(webhook_id):
             
             logger.info(f'Queueing {endpoint} with payload: {payload}')
             
-            # Queue the order instead of executing directly
-            queue_order(endpoint, payload)
+            legs.append({'endpoint': endpoint, 'payload': payload})
             processed_symbols.append(symbol)
         
         if processed_symbols:
+            # The whole alert is placed as one basket, its legs concurrently
+            queue_order('basketorder', {'strategy': strategy.name, 'orders': legs})
             return jsonify({
                 'status': 'success',
                 'message': f'Orders queued for symbols: {", ".join(processed_symbols)}'
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, session, redirect, url_for, g, jsonify, request
 from database.auth_db import get_auth_token
-from importlib import import_module
+from utils.broker_registry import get_broker_functions, FUNDS_API
 from utils.session import check_session_validity
 import multiprocessing
 import sys
@@ -9,14 +9,8 @@ import logging
 logger = logging.getLogger(__name__)
 
 def dynamic_import(broker):
-    try:
-        module_path = f'broker.{broker}.api.funds'
-        module = import_module(module_path)
-        get_margin_data = getattr(module, 'get_margin_data')
-        return get_margin_data
-    except ImportError as e:
-        logger.error(f"Error importing module: {e}")
-        return None
+    functions = get_broker_functions(broker, FUNDS_API, ['get_margin_data'])
+    return functions['get_margin_data'] if functions else None
 
 dashboard_bp = Blueprint('dashboard_bp', __name__, url_prefix='/')
 scalper_process = None
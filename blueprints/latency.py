@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, render_template, request, session, Response
 from database.latency_db import OrderLatency, latency_session
 from utils.session import check_session_validity
+from utils.circuit_breaker import get_circuit_states
+from utils.request_coalescer import market_data_coalescer
+from services.scheduler_service import scheduler_service
 from limiter import limiter
 import logging
 from sqlalchemy import func
@@ -137,7 +140,8 @@ def latency_dashboard():
     return render_template('latency/dashboard.html',
                          stats=stats,
                          logs=recent_logs,
-                         broker_histograms=broker_histograms)
+                         broker_histograms=broker_histograms,
+                         circuits=get_circuit_states())
 
 @latency_bp.route('/api/logs', methods=['GET'])
 @check_session_validity
@@ -203,6 +207,39 @@ def get_broker_stats(broker):
         logger.error(f"Error fetching broker stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+@latency_bp.route('/api/circuits', methods=['GET'])
+@check_session_validity
+@limiter.limit("60/minute")
+def get_circuits():
+    """API endpoint to get circuit breaker state of each broker endpoint"""
+    try:
+        return jsonify(get_circuit_states())
+    except Exception as e:
+        logger.error(f"Error fetching circuit breaker states: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@latency_bp.route('/api/coalescer', methods=['GET'])
+@check_session_validity
+@limiter.limit("60/minute")
+def get_coalescer_stats():
+    """API endpoint to get quote/depth request coalescing counters"""
+    try:
+        return jsonify(market_data_coalescer.stats())
+    except Exception as e:
+        logger.error(f"Error fetching coalescer stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@latency_bp.route('/api/scheduler', methods=['GET'])
+@check_session_validity
+@limiter.limit("60/minute")
+def get_scheduler_stats():
+    """API endpoint to get scheduled jobs with their runtime and misfire counters"""
+    try:
+        return jsonify(scheduler_service.metrics())
+    except Exception as e:
+        logger.error(f"Error fetching scheduler stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @latency_bp.route('/export', methods=['GET'])
 @check_session_validity
 @limiter.limit("10/minute")
@@ -1,5 +1,5 @@
 from flask import Blueprint, jsonify, request, render_template, session, redirect, url_for, Response
-from importlib import import_module
+from utils.broker_registry import get_broker_functions
 from database.auth_db import get_auth_token
 from utils.session import check_session_validity
 import logging
@@ -12,17 +12,9 @@ logger = logging.getLogger(__name__)
 orders_bp = Blueprint('orders_bp', __name__, url_prefix='/')
 
 def dynamic_import(broker, module_name, function_names):
-    module_functions = {}
-    try:
-        # Import the module based on the broker name
-        module = import_module(f'broker.{broker}.{module_name}')
-        for name in function_names:
-            module_functions[name] = getattr(module, name)
-        return module_functions
-    except (ImportError, AttributeError) as e:
-        logger.error(f"Error importing functions {function_names} from {module_name} for broker {broker}: {e}")
-
-        return None
+    # Modules and functions are resolved once per broker by the registry
+    return get_broker_functions(broker, module_name, function_names)
+
 def generate_orderbook_csv(order_data):
     """Generate CSV file from orderbook data"""
     output = io.StringIO()
@@ -4,44 +4,26 @@ from database.strategy_db import (
     create_strategy, add_symbol_mapping, get_strategy_by_webhook_id,
     get_symbol_mappings, get_all_strategies, delete_strategy,
     update_strategy_times, delete_symbol_mapping, bulk_add_symbol_mappings,
-    toggle_strategy, get_strategy, get_user_strategies
+    toggle_strategy, get_strategy, get_user_strategies, get_strategy_snapshot
 )
 from database.symbol import enhanced_search_symbols
 from database.auth_db import get_api_key_for_tradingview
+from services.webhook_order_scheduler import webhook_order_scheduler
+from services.squareoff_engine import squareoff_engine
+from services.scheduler_service import scheduler_service
 from utils.session import check_session_validity, is_session_valid
 import json
 from datetime import datetime, time
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
 import logging
-import requests
 import os
 import uuid
-import time as time_module
-import queue
-import threading
-from collections import deque
-from time import time
 import re
 
 logger = logging.getLogger(__name__)
 
 strategy_bp = Blueprint('strategy_bp', __name__, url_prefix='/strategy')
 
-# Initialize scheduler for time-based controls
-scheduler = BackgroundScheduler(
-    timezone=pytz.timezone('Asia/Kolkata'),
-    job_defaults={
-        'coalesce': True,
-        'misfire_grace_time': 300,
-        'max_instances': 1
-    }
-)
-scheduler.start()
-
-# Get base URL from environment or default to localhost
-BASE_URL = os.getenv('HOST_SERVER', 'http://127.0.0.1:5000')
-
 # Valid exchanges
 VALID_EXCHANGES = ['NSE', 'BSE', 'NFO', 'CDS', 'BFO', 'BCD', 'MCX', 'NCDEX']
 
@@ -61,94 +43,9 @@ EXCHANGE_PRODUCTS = {
 DEFAULT_EXCHANGE = 'NSE'
 DEFAULT_PRODUCT = 'MIS'
 
-# Separate queues for different order types
-regular_order_queue = queue.Queue()  # For placeorder (up to 10/sec)
-smart_order_queue = queue.Queue()    # For placesmartorder (1/sec)
-
-# Order processor state
-order_processor_running = False
-order_processor_lock = threading.Lock()
-
-# Rate limiting state for regular orders
-last_regular_orders = deque(maxlen=10)  # Track last 10 regular order timestamps
-
-def process_orders():
-    """Background task to process orders from both queues with rate limiting"""
-    global order_processor_running
-    
-    while True:
-        try:
-            # Process smart orders first (1 per second)
-            try:
-                smart_order = smart_order_queue.get_nowait()
-                if smart_order is None:  # Poison pill
-                    break
-                
-                try:
-                    response = requests.post(f'{BASE_URL}/api/v1/placesmartorder', json=smart_order['payload'])
-                    if response.ok:
-                        logger.info(f'Smart order placed for {smart_order["payload"]["symbol"]} in strategy {smart_order["payload"]["strategy"]}')
-                    else:
-                        logger.error(f'Error placing smart order for {smart_order["payload"]["symbol"]}: {response.text}')
-                except Exception as e:
-                    logger.error(f'Error placing smart order: {str(e)}')
-                
-                # Always wait 1 second after smart order
-                time_module.sleep(1)
-                continue  # Start next iteration
-                
-            except queue.Empty:
-                pass  # No smart orders, continue to regular orders
-            
-            # Process regular orders (up to 10 per second)
-            now = time()
-            
-            # Clean up old timestamps
-            while last_regular_orders and now - last_regular_orders[0] > 1:
-                last_regular_orders.popleft()
-            
-            # Process regular orders if under rate limit
-            if len(last_regular_orders) < 10:
-                try:
-                    regular_order = regular_order_queue.get_nowait()
-                    if regular_order is None:  # Poison pill
-                        break
-                    
-                    try:
-                        response = requests.post(f'{BASE_URL}/api/v1/placeorder', json=regular_order['payload'])
-                        if response.ok:
-                            logger.info(f'Regular order placed for {regular_order["payload"]["symbol"]} in strategy {regular_order["payload"]["strategy"]}')
-                            last_regular_orders.append(now)
-                        else:
-                            logger.error(f'Error placing regular order for {regular_order["payload"]["symbol"]}: {response.text}')
-                    except Exception as e:
-                        logger.error(f'Error placing regular order: {str(e)}')
-                    
-                except queue.Empty:
-                    pass  # No regular orders
-            
-            # Small sleep to prevent CPU spinning
-            time_module.sleep(0.1)
-            
-        except Exception as e:
-            logger.error(f'Error in order processor: {str(e)}')
-            time_module.sleep(1)  # Sleep on error to prevent rapid retries
-
-def ensure_order_processor():
-    """Ensure the order processor is running"""
-    global order_processor_running
-    with order_processor_lock:
-        if not order_processor_running:
-            threading.Thread(target=process_orders, daemon=True).start()
-            order_processor_running = True
-
 def queue_order(endpoint, payload):
-    """Add order to appropriate queue"""
-    ensure_order_processor()
-    if endpoint == 'placesmartorder':
-        smart_order_queue.put({'payload': payload})
-    else:
-        regular_order_queue.put({'payload': payload})
+    """Hand the order to the shared webhook order scheduler"""
+    webhook_order_scheduler.submit(endpoint, payload)
 
 def validate_strategy_times(start_time, end_time, squareoff_time):
     """Validate strategy time settings"""
@@ -198,6 +95,9 @@ def validate_strategy_name(name):
     
     return True, None
 
+def squareoff_job_id(strategy_id):
+    return f'strategy_squareoff_{strategy_id}'
+
 def schedule_squareoff(strategy_id):
     """Schedule squareoff for intraday strategy"""
     strategy = get_strategy(strategy_id)
@@ -206,21 +106,15 @@ def schedule_squareoff(strategy_id):
     
     try:
         hours, minutes = map(int, strategy.squareoff_time.split(':'))
-        job_id = f'squareoff_{strategy_id}'
-        
-        # Remove existing job if any
-        if scheduler.get_job(job_id):
-            scheduler.remove_job(job_id)
         
-        # Add new job
-        scheduler.add_job(
+        # Replaces the existing job, if any, in the shared scheduler
+        scheduler_service.add_job(
             squareoff_positions,
             'cron',
+            squareoff_job_id(strategy_id),
             hour=hours,
             minute=minutes,
-            args=[strategy_id],
-            id=job_id,
-            timezone=pytz.timezone('Asia/Kolkata')
+            args=[strategy_id]
         )
         logger.info(f'Scheduled squareoff for strategy {strategy_id} at {hours}:{minutes}')
     except Exception as e:
@@ -230,7 +124,7 @@ def squareoff_positions(strategy_id):
     """Square off all positions for intraday strategy"""
     try:
         strategy = get_strategy(strategy_id)
-        if not strategy or not strategy.is_intraday:
+        if not strategy or not strategy.is_active or not strategy.is_intraday:
             return
         
         # Get API key for authentication
@@ -242,29 +136,32 @@ def squareoff_positions(strategy_id):
         # Get all symbol mappings
         mappings = get_symbol_mappings(strategy_id)
         
-        for mapping in mappings:
-            # Use placesmartorder with quantity=0 and position_size=0 for squareoff
-            payload = {
-                'apikey': api_key,
-                'symbol': mapping.symbol,
-                'exchange': mapping.exchange,
-                'product': mapping.product_type,
-                'strategy': strategy.name,
-                'action': 'SELL',  # Direction doesn't matter for closing
-                'pricetype': 'MARKET',
-                'quantity': '0',
-                'position_size': '0',  # This will close the position
-                'price': '0',
-                'trigger_price': '0',
-                'disclosed_quantity': '0'
-            }
-            
-            # Queue the order instead of executing directly
-            queue_order('placesmartorder', payload)
+        # One positionbook fetch, then all closing orders at once
+        squareoff_engine.square_off(
+            strategy.name, api_key,
+            [(mapping.symbol, mapping.exchange, mapping.product_type) for mapping in mappings]
+        )
             
     except Exception as e:
         logger.error(f'Error in squareoff_positions for strategy {strategy_id}: {str(e)}')
 
+def restore_squareoff_jobs():
+    """
+    Schedule square-off for every active intraday strategy and drop stored
+    jobs of inactive or deleted ones (run by the scheduler leader)
+    """
+    scheduled = set()
+    for strategy in get_all_strategies():
+        if strategy.is_active and strategy.is_intraday and strategy.squareoff_time:
+            schedule_squareoff(strategy.id)
+            scheduled.add(squareoff_job_id(strategy.id))
+    for job_id in scheduler_service.job_ids(squareoff_job_id('')):
+        if job_id not in scheduled:
+            scheduler_service.remove_job(job_id)
+            logger.info(f'Removed stale squareoff job {job_id}')
+
+scheduler_service.on_leader(restore_squareoff_jobs)
+
 @strategy_bp.route('/')
 def index():
     """List all strategies"""
@@ -394,16 +291,16 @@ def toggle_strategy_route(strategy_id):
         
     try:
         strategy = toggle_strategy(strategy_id)
+        if not strategy:
+            flash('Error toggling strategy', 'error')
+            return redirect(url_for('strategy_bp.index'))
         if strategy.is_active:
             # Schedule squareoff if being activated
             schedule_squareoff(strategy_id)
             flash('Strategy activated successfully', 'success')
         else:
             # Remove squareoff job if being deactivated
-            try:
-                scheduler.remove_job(f'squareoff_{strategy_id}')
-            except Exception:
-                pass
+            scheduler_service.remove_job(squareoff_job_id(strategy_id))
             flash('Strategy deactivated successfully', 'success')
             
         return redirect(url_for('strategy_bp.view_strategy', strategy_id=strategy_id))
@@ -419,10 +316,7 @@ def delete_strategy_route(strategy_id):
     
     try:
         # Remove squareoff job if exists
-        try:
-            scheduler.remove_job(f'squareoff_{strategy_id}')
-        except Exception:
-            pass
+        scheduler_service.remove_job(squareoff_job_id(strategy_id))
             
         if delete_strategy(strategy_id):
             flash('Strategy deleted successfully', 'success')
@@ -580,11 +474,24 @@ def search_symbols():
         } for result in results]
     })
 
+@strategy_bp.route('/queue/metrics')
+@check_session_validity
+def queue_metrics():
+    """Webhook order queue depth, wait times and throughput (TradingView and Chartink)"""
+    return jsonify(webhook_order_scheduler.metrics())
+
+@strategy_bp.route('/squareoff/reports')
+@check_session_validity
+def squareoff_reports():
+    """Completion time and per-symbol results of the last square-off per strategy"""
+    return jsonify(squareoff_engine.reports())
+
 @strategy_bp.route('/webhook/<webhook_id>', methods=['POST'])
 def webhook(webhook_id):
     """Handle webhook from trading platform"""
     try:
-        strategy = get_strategy_by_webhook_id(webhook_id)
+        # Cached strategy, symbol mappings and API key; no database access on a hit
+        strategy = get_strategy_snapshot(webhook_id)
         if not strategy:
             return jsonify({'error': 'Invalid webhook ID'}), 404
         
@@ -594,7 +501,7 @@ def webhook(webhook_id):
         # Check trading hours for intraday strategies
         if strategy.is_intraday:
             now = datetime.now(pytz.timezone('Asia/Kolkata'))
-            current_time = now.strftime('%H:%M')
+            current_minute = now.hour * 60 + now.minute
             
             # Determine if this is an entry or exit order
             data = request.get_json()
@@ -614,18 +521,18 @@ def webhook(webhook_id):
             
             # For entry orders, check if within entry time window
             if not is_exit_order:
-                if strategy.start_time and current_time < strategy.start_time:
+                if strategy.start_minute is not None and current_minute < strategy.start_minute:
                     return jsonify({'error': 'Entry orders not allowed before start time'}), 400
                 
-                if strategy.end_time and current_time > strategy.end_time:
+                if strategy.end_minute is not None and current_minute > strategy.end_minute:
                     return jsonify({'error': 'Entry orders not allowed after end time'}), 400
             
             # For exit orders, check if within exit time window (up to square off time)
             else:
-                if strategy.start_time and current_time < strategy.start_time:
+                if strategy.start_minute is not None and current_minute < strategy.start_minute:
                     return jsonify({'error': 'Exit orders not allowed before start time'}), 400
                 
-                if strategy.squareoff_time and current_time > strategy.squareoff_time:
+                if strategy.squareoff_minute is not None and current_minute > strategy.squareoff_minute:
                     return jsonify({'error': 'Exit orders not allowed after square off time'}), 400
         
         # Parse webhook data
@@ -670,12 +577,11 @@ def webhook(webhook_id):
             use_smart_order = position_size == 0
             
         # Get symbol mapping
-        mapping = next((m for m in get_symbol_mappings(strategy.id) if m.symbol == data['symbol']), None)
+        mapping = strategy.mappings.get(data['symbol'])
         if not mapping:
             return jsonify({'error': f'No mapping found for symbol {data["symbol"]}'}), 400
             
-        # Get API key from database
-        api_key = get_api_key_for_tradingview(strategy.user_id)
+        api_key = strategy.api_key
         if not api_key:
             logger.error(f'No API key found for user {strategy.user_id}')
             return jsonify({'error': 'No API key found'}), 401
@@ -2,12 +2,13 @@
 
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 
 
 def get_margin_data(auth_token):
     """Fetch margin data from Alice Blue's API using the provided auth token."""
-    conn = http.client.HTTPSConnection("ant.aliceblueonline.com")
+    conn = GuardedHTTPSConnection("ant.aliceblueonline.com")
     payload = ""
     headers = {
         'Authorization': f'Bearer {auth_token}',
@@ -1,8 +1,10 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 import urllib.parse
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_br_symbol, get_oa_symbol
 from broker.aliceblue.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data
 from utils.config import get_broker_api_key , get_broker_api_secret
@@ -11,7 +13,7 @@ from utils.config import get_broker_api_key , get_broker_api_secret
 def get_api_response(endpoint, auth, method="GET", payload=''):
     
     AUTH_TOKEN = auth
-    conn = http.client.HTTPSConnection("ant.aliceblueonline.com")
+    conn = GuardedHTTPSConnection("ant.aliceblueonline.com")
     headers = {
     'Authorization': f'Bearer {get_broker_api_key()} {AUTH_TOKEN}',
     'Content-Type': 'application/json'
@@ -86,7 +88,7 @@ def place_order_api(data,auth):
 
     print(payload)
 
-    conn = http.client.HTTPSConnection("ant.aliceblueonline.com")
+    conn = GuardedHTTPSConnection("ant.aliceblueonline.com")
     conn.request("POST", "/rest/AliceBlueAPIService/api/placeOrder/executePlaceOrder", payload, headers)
     res = conn.getresponse()
     response_data = json.loads(res.read().decode("utf-8"))
@@ -216,6 +218,7 @@ def close_all_positions(current_api_key,auth):
 
 
     if positions_response:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response:
             # Skip if net quantity is zero
@@ -242,12 +245,10 @@ def close_all_positions(current_api_key,auth):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            _, api_response, _ =   place_order_api(place_order_payload,AUTH_TOKEN)
+            place_order_payloads.append(place_order_payload)
 
-            print(api_response)
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('aliceblue', place_order_payloads, lambda payload: place_order_api(payload, AUTH_TOKEN))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -277,7 +278,7 @@ def cancel_order(orderid,auth):
     })
     
     # Establish the connection and send the request
-    conn = http.client.HTTPSConnection("ant.aliceblueonline.com")
+    conn = GuardedHTTPSConnection("ant.aliceblueonline.com")
     conn.request("POST", "/rest/AliceBlueAPIService/api/placeOrder/cancelOrder", payload, headers)
     res = conn.getresponse()
     response_data = json.loads(res.read().decode("utf-8"))
@@ -306,7 +307,7 @@ def modify_order(data,auth):
 
     print(payload)
 
-    conn = http.client.HTTPSConnection("ant.aliceblueonline.com")
+    conn = GuardedHTTPSConnection("ant.aliceblueonline.com")
     conn.request("POST", "/rest/AliceBlueAPIService/api/placeOrder/modifyOrder", payload, headers)
     res = conn.getresponse()
     response_data = json.loads(res.read().decode("utf-8"))
@@ -332,17 +333,7 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response
                         if order['Status'] in ['open', 'trigger pending']]
     print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['Nstordno']
-        cancel_response, status_code = cancel_order(orderid,AUTH_TOKEN)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['Nstordno'] for order in orders_to_cancel]
+    return cancel_orders('aliceblue', order_ids, lambda orderid: cancel_order(orderid, AUTH_TOKEN))
 
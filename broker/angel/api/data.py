@@ -6,6 +6,10 @@ from datetime import datetime, timedelta
 import urllib.parse
 from database.token_db import get_br_symbol, get_token, get_oa_symbol
 from utils.httpx_client import get_httpx_client
+from utils.concurrency import chunked, map_concurrent
+from utils.history_chunks import plan_windows, fetch_windows
+from utils.token_bucket import get_bucket
+from utils.candle_normalizer import from_rows, concat_candles, IST_OFFSET_SECONDS
 
 def get_api_response(endpoint, auth, method="GET", payload=''):
     """Helper function to make API calls to Angel One"""
@@ -55,6 +59,12 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
         raise Exception(f"Failed to parse API response (status {response.status_code})")
 
 class BrokerData:  
+    # Angel's market quote API accepts up to 50 tokens per call (10 requests/second)
+    MAX_QUOTE_INSTRUMENTS = 50
+    MAX_QUOTE_CONCURRENCY = 4
+    # getCandleData allows 3 requests/second
+    HISTORY_RATE_LIMIT = 3
+
     def __init__(self, auth_token):
         """Initialize Angel data handler with authentication token"""
         self.auth_token = auth_token
@@ -118,24 +128,99 @@ class BrokerData:
             quote = fetched_data[0]
             
             # Return quote in common format
-            depth = quote.get('depth', {})
-            bids = depth.get('buy', [])
-            asks = depth.get('sell', [])
-            
-            return {
-                'bid': float(bids[0].get('price', 0)) if bids else 0,
-                'ask': float(asks[0].get('price', 0)) if asks else 0,
-                'open': float(quote.get('open', 0)),
-                'high': float(quote.get('high', 0)),
-                'low': float(quote.get('low', 0)),
-                'ltp': float(quote.get('ltp', 0)),
-                'prev_close': float(quote.get('close', 0)),
-                'volume': int(quote.get('tradeVolume', 0))
-            }
+            return self._format_quote(quote)
             
         except Exception as e:
             raise Exception(f"Error fetching quotes: {str(e)}")
 
+    @staticmethod
+    def _format_quote(quote: dict) -> dict:
+        """Convert an Angel FULL mode quote to the common quote format"""
+        depth = quote.get('depth', {})
+        bids = depth.get('buy', [])
+        asks = depth.get('sell', [])
+        
+        return {
+            'bid': float(bids[0].get('price', 0)) if bids else 0,
+            'ask': float(asks[0].get('price', 0)) if asks else 0,
+            'open': float(quote.get('open', 0)),
+            'high': float(quote.get('high', 0)),
+            'low': float(quote.get('low', 0)),
+            'ltp': float(quote.get('ltp', 0)),
+            'prev_close': float(quote.get('close', 0)),
+            'volume': int(quote.get('tradeVolume', 0))
+        }
+
+    def get_multi_quotes(self, symbols: list) -> list:
+        """
+        Get real-time quotes for many symbols using Angel's batch quote API
+        Args:
+            symbols: List of dicts with 'symbol' and 'exchange' keys
+        Returns:
+            list: One entry per requested symbol (same order) with 'symbol',
+                  'exchange' and either 'data' or 'error'
+        """
+        # Resolve every symbol to its (exchange, token) pair
+        instruments = []
+        for item in symbols:
+            token = get_token(item['symbol'], item['exchange'])
+            if not token:
+                instruments.append(None)
+                continue
+            exchange = item['exchange']
+            if exchange == 'NSE_INDEX':
+                exchange = 'NSE'
+            elif exchange == 'BSE_INDEX':
+                exchange = 'BSE'
+            elif exchange == 'MCX_INDEX':
+                exchange = 'MCX'
+            instruments.append((exchange, str(token)))
+
+        unique_instruments = list(dict.fromkeys(inst for inst in instruments if inst))
+
+        def fetch_chunk(chunk):
+            exchange_tokens = {}
+            for exchange, token in chunk:
+                exchange_tokens.setdefault(exchange, []).append(token)
+            payload = {
+                "mode": "FULL",
+                "exchangeTokens": exchange_tokens
+            }
+            response = get_api_response("/rest/secure/angelbroking/market/v1/quote/",
+                                      self.auth_token,
+                                      "POST",
+                                      payload)
+            if not response.get('status'):
+                raise Exception(f"Error from Angel API: {response.get('message', 'Unknown error')}")
+            fetched = (response.get('data') or {}).get('fetched', [])
+            return {(quote.get('exchange'), str(quote.get('symbolToken'))): quote for quote in fetched}
+
+        chunks = chunked(unique_instruments, self.MAX_QUOTE_INSTRUMENTS)
+        chunk_results = map_concurrent(fetch_chunk, chunks,
+                                       max_workers=self.MAX_QUOTE_CONCURRENCY,
+                                       return_exceptions=True)
+
+        # Merge chunk responses, remembering the error for instruments of failed chunks
+        quotes = {}
+        errors = {}
+        for chunk, result in zip(chunks, chunk_results):
+            if isinstance(result, Exception):
+                errors.update({inst: str(result) for inst in chunk})
+            else:
+                quotes.update(result)
+
+        results = []
+        for item, inst in zip(symbols, instruments):
+            entry = {'symbol': item['symbol'], 'exchange': item['exchange']}
+            if inst is None:
+                entry['error'] = 'Symbol not found'
+            elif inst in quotes:
+                entry['data'] = self._format_quote(quotes[inst])
+            else:
+                entry['error'] = errors.get(inst, 'No quote data found')
+            results.append(entry)
+        return results
+
     def get_history(self, symbol: str, exchange: str, interval: str, 
                    start_date: str, end_date: str) -> pd.DataFrame:
         """
@@ -186,9 +271,6 @@ class BrokerData:
                 # For past dates, set end time to 23:59
                 to_date = to_date.replace(hour=23, minute=59)
             
-            # Initialize empty list to store DataFrames
-            dfs = []
-            
             # Set chunk size based on interval as per Angel API documentation
             interval_limits = {
                 '1m': 30,    # ONE_MINUTE
@@ -206,12 +288,10 @@ class BrokerData:
                 supported = list(interval_limits.keys())
                 raise Exception(f"Interval '{interval}' not supported. Supported intervals: {', '.join(supported)}")
             
-            # Process data in chunks
-            current_start = from_date
-            while current_start <= to_date:
-                # Calculate chunk end date
-                current_end = min(current_start + timedelta(days=chunk_days-1), to_date)
-                
+            def fetch_chunk(current_start, current_end):
+                # A window covers whole days, the last one stops at to_date
+                current_end = min(current_end.replace(hour=23, minute=59), to_date)
+
                 # Prepare payload for historical data API
                 payload = {
                     "exchange": exchange,
@@ -223,28 +303,14 @@ class BrokerData:
                 print(f"Debug - Fetching chunk from {current_start} to {current_end}")
                 print(f"Debug - API Payload: {payload}")
                 
-                try:
-                    response = get_api_response("/rest/secure/angelbroking/historical/v1/getCandleData",
-                                              self.auth_token,
-                                              "POST",
-                                              payload)
-                    print(f"Debug - API Response Status: {response.get('status')}")
-                    
-                    # Check if response is empty or invalid
-                    if not response:
-                        print(f"Debug - Empty response for chunk {current_start} to {current_end}")
-                        current_start = current_end + timedelta(days=1)
-                        continue
-                    
-                    if not response.get('status'):
-                        print(f"Debug - Error response: {response.get('message', 'Unknown error')}")
-                        current_start = current_end + timedelta(days=1)
-                        continue
-                        
-                except Exception as chunk_error:
-                    print(f"Debug - Error fetching chunk {current_start} to {current_end}: {str(chunk_error)}")
-                    current_start = current_end + timedelta(days=1)
-                    continue
+                response = get_api_response("/rest/secure/angelbroking/historical/v1/getCandleData",
+                                          self.auth_token,
+                                          "POST",
+                                          payload)
+                
+                # Empty or failed responses are retried by fetch_windows
+                if not response:
+                    raise Exception(f"Empty response for chunk {current_start} to {current_end}")
                 
                 if not response.get('status'):
                     raise Exception(f"Error from Angel API: {response.get('message', 'Unknown error')}")
@@ -252,39 +318,25 @@ class BrokerData:
                 # Extract candle data and create DataFrame
                 data = response.get('data', [])
                 if data:
-                    chunk_df = pd.DataFrame(data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                    dfs.append(chunk_df)
                     print(f"Debug - Received {len(data)} candles for chunk")
-                else:
-                    print(f"Debug - No data received for chunk")
-                
-                # Move to next chunk
-                current_start = current_end + timedelta(days=1)
+                    # For daily timeframe, convert UTC to IST by adding 5 hours and 30 minutes
+                    return from_rows(data, tz_shift_seconds=IST_OFFSET_SECONDS if interval == 'D' else 0, dedupe=False)
+                print(f"Debug - No data received for chunk")
+                return None
+
+            # Process data in chunks, fetched concurrently under the rate limit
+            windows = plan_windows(from_date, to_date, chunk_days)
+            results = fetch_windows(fetch_chunk, windows,
+                                    rate_limiter=get_bucket('angel:history', self.HISTORY_RATE_LIMIT))
+            dfs = [chunk_df for chunk_df in results if chunk_df is not None]
                 
             # If no data was found, return empty DataFrame
             if not dfs:
                 print("Debug - No data received from API")
                 return pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             
-            # Combine all chunks
-            df = pd.concat(dfs, ignore_index=True)
-            
-            # Convert timestamp to datetime
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            # For daily timeframe, convert UTC to IST by adding 5 hours and 30 minutes
-            if interval == 'D':
-                df['timestamp'] = df['timestamp'] + pd.Timedelta(hours=5, minutes=30)
-            
-            # Convert timestamp to Unix epoch
-            df['timestamp'] = df['timestamp'].astype('int64') // 10**9  # Convert to Unix epoch
-            
-            # Ensure numeric columns and proper order
-            numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-            df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric)
-            
-            # Sort by timestamp and remove duplicates
-            df = df.sort_values('timestamp').drop_duplicates(subset=['timestamp']).reset_index(drop=True)
+            # Combine all chunks, sorted by timestamp (Unix epoch) without duplicates
+            df = concat_candles(dfs)
             
             # Reorder columns to match REST API format
             df = df[['close', 'high', 'low', 'open', 'timestamp', 'volume']]
@@ -2,6 +2,7 @@ import json
 import os
 import httpx
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token , get_br_symbol, get_symbol
 from broker.angel.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data
 from utils.httpx_client import get_httpx_client
@@ -225,6 +226,7 @@ def close_all_positions(current_api_key,auth):
         return {"message": "No Open Positions Found"}, 200
 
     if positions_response['status']:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response['data']:
             # Skip if net quantity is zero
@@ -254,16 +256,10 @@ def close_all_positions(current_api_key,auth):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            res, response, orderid =   place_order_api(place_order_payload,auth)
+            place_order_payloads.append(place_order_payload)
 
-            # print(res)
-            # print(response)
-            # print(orderid)
-
-
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('angel', place_order_payloads, lambda payload: place_order_api(payload, auth))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -376,16 +372,6 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response.get('data', [])
                         if order['status'] in ['open', 'trigger pending']]
     #print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['orderid']
-        cancel_response, status_code = cancel_order(orderid,auth)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['orderid'] for order in orders_to_cancel]
+    return cancel_orders('angel', order_ids, lambda orderid: cancel_order(orderid, auth))
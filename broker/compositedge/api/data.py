@@ -8,6 +8,9 @@ import logging
 import pandas as pd
 from datetime import datetime, timedelta
 from utils.httpx_client import get_httpx_client
+from utils.history_chunks import plan_windows, fetch_windows
+from utils.token_bucket import get_bucket
+from utils.candle_normalizer import from_delimited, concat_candles, align_timestamps, IST_OFFSET_SECONDS
 from database.auth_db import get_feed_token
 from broker.compositedge.baseurl import MARKET_DATA_URL
 import pytz
@@ -75,6 +78,10 @@ def get_api_response(endpoint, auth, method="GET", payload='', feed_token=None,
         raise
 
 class BrokerData:
+    # XTS OHLC requests span at most 7 days; keep history fetches to 3 requests/second
+    HISTORY_CHUNK_DAYS = 7
+    HISTORY_RATE_LIMIT = 3
+
     def __init__(self, auth_token, feed_token=None, user_id=None):
         """Initialize CompositEdge data handler with authentication token"""
         self.auth_token = auth_token
@@ -225,11 +232,9 @@ class BrokerData:
             # Set end time to market close (3:30 PM IST)
             to_date = end_date.replace(hour=15, minute=30, second=0, microsecond=0)
 
-            dfs = []
-            current_start = from_date
-
-            while current_start <= to_date:
-                current_end = min(current_start + timedelta(days=6), to_date)
+            def fetch_chunk(current_start, current_end):
+                # A window covers whole sessions, the last one stops at to_date
+                current_end = min(current_end.replace(hour=15, minute=30), to_date)
 
                 # CompositEdge expects MMM DD YYYY HHMMSS in IST
                 from_str = current_start.strftime('%b %d %Y %H%M%S')
@@ -256,37 +261,19 @@ class BrokerData:
                     logger.error(f"API Response: {response}")
                     raise Exception(f"Error from CompositEdge API: {response.get('description', 'Unknown error')}")
 
-                # Parse dataResponse (pipe-delimited string)
                 raw_data = response.get('result', {}).get('dataReponse', '')
                 if not raw_data:
                     logger.warning(f"No data returned for period {from_str} to {to_str}")
-                    current_start = current_end + timedelta(days=1)
-                    continue
-
-                rows = raw_data.strip().split(',')
-                data = []
-                for row in rows:
-                    fields = row.split('|')
-                    if len(fields) < 6:
-                        continue
-                    try:
-                        data.append({
-                            "timestamp": int(fields[0]),
-                            "open": float(fields[1]),
-                            "high": float(fields[2]),
-                            "low": float(fields[3]),
-                            "close": float(fields[4]),
-                            "volume": int(fields[5])
-                        })
-                    except (ValueError, IndexError) as e:
-                        logger.warning(f"Error parsing row {row}: {e}")
-                        continue
-
-                if data:
-                    df = pd.DataFrame(data)
-                    dfs.append(df)
-
-                current_start = current_end + timedelta(days=1)
+                    return None
+
+                # Parse dataResponse (pipe-delimited rows) straight into typed columns
+                return from_delimited(raw_data, dedupe=False)
+
+            # Fetch 7-day windows concurrently under the rate limit
+            windows = plan_windows(from_date, to_date, self.HISTORY_CHUNK_DAYS)
+            results = fetch_windows(fetch_chunk, windows,
+                                    rate_limiter=get_bucket('compositedge:history', self.HISTORY_RATE_LIMIT))
+            dfs = [df for df in results if df is not None]
             
             if not dfs:
                 if compression_value == 'D' and to_date.date() == datetime.now().date():
@@ -351,36 +338,23 @@ class BrokerData:
                         return pd.DataFrame([today_candle], columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
                     else:
                         raise Exception("No Touchline data in quote")
-            final_df = pd.concat(dfs, ignore_index=True)
-
             # Sort by timestamp and remove duplicates
-            final_df = final_df.sort_values('timestamp').drop_duplicates('timestamp').reset_index(drop=True)
-            
-            # Convert timestamps to datetime for manipulation
-            final_df['timestamp'] = pd.to_datetime(final_df['timestamp'], unit='s')
+            final_df = concat_candles(dfs)
             
             if compression_value == 'D':
                 # For daily data, set to midnight (00:00:00)
-                final_df['timestamp'] = final_df['timestamp'].apply(
-                    lambda x: x.replace(hour=0, minute=0, second=0)
-                )
+                final_df['timestamp'] = align_timestamps(final_df['timestamp'], 86400)
             else:
                 # For intraday data
                 # First subtract 5:30 hours to get to IST
-                final_df['timestamp'] = final_df['timestamp'] - pd.Timedelta(hours=5, minutes=30)
+                timestamps = final_df['timestamp'].to_numpy() - IST_OFFSET_SECONDS
                 
                 # Round to the proper interval based on market open (9:15 AM)
-                interval_minutes = int(compression_value) // 60 if compression_value != 'D' else 0
+                interval_minutes = int(compression_value) // 60
                 if interval_minutes > 0:
-                    # Shift by 15 minutes to align with market open, round, then shift back
-                    final_df['timestamp'] = (final_df['timestamp'] - pd.Timedelta(minutes=15)).dt.ceil(f'{interval_minutes}min') + pd.Timedelta(minutes=15)
-            
-            # Convert back to Unix timestamp
-            final_df['timestamp'] = final_df['timestamp'].astype('int64') // 10**9
-            
-            # Ensure numeric columns are properly typed
-            numeric_columns = ['open', 'high', 'low', 'close', 'volume']
-            final_df[numeric_columns] = final_df[numeric_columns].apply(pd.to_numeric)
+                    # Shift by 15 minutes to align with market open, round up, then shift back
+                    timestamps = align_timestamps(timestamps, interval_minutes * 60, offset_seconds=15 * 60, mode='ceil')
+                final_df['timestamp'] = timestamps
             
             # Log sample timestamps for verification
             sample_time = pd.to_datetime(final_df['timestamp'].iloc[0], unit='s')
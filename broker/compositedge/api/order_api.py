@@ -3,6 +3,7 @@ import os
 from tokenize import Token
 import httpx
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token , get_br_symbol, get_symbol
 from broker.compositedge.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data
 from utils.httpx_client import get_httpx_client
@@ -206,6 +207,7 @@ def close_all_positions(current_api_key,auth):
     if not positions_list:
         return {"message": "No Open Positions Found"}, 200
 
+    place_order_payloads = []
     # If response has positions
     for position in positions_list:
         # Skip if net quantity is zero
@@ -237,16 +239,10 @@ def close_all_positions(current_api_key,auth):
             "orderUniqueIdentifier": "openalgo"
         }
 
-        # Place the order to close the position
-        res, response, orderid =   place_order_api(place_order_payload,auth)
+        place_order_payloads.append(place_order_payload)
 
-        # print(res)
-        # print(response)
-        # print(orderid)
-
-
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+    # Place the orders to close the positions concurrently
+    place_orders('compositedge', place_order_payloads, lambda payload: place_order_api(payload, auth))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -347,18 +343,6 @@ def cancel_all_orders_api(data,auth):
         if order["OrderStatus"] in ["New", "Trigger Pending"]
     ]
     print(f"Orders to cancel: {orders_to_cancel}")
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['AppOrderID']
-        cancel_response, status_code = cancel_order(orderid,auth)
-        if status_code == 200:
-            print(f"Canceled order {orderid}")
-            canceled_orders.append(orderid)
-        else:
-            print(f"Failed to cancel order {orderid}")
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['AppOrderID'] for order in orders_to_cancel]
+    return cancel_orders('compositedge', order_ids, lambda orderid: cancel_order(orderid, auth))
@@ -1,10 +1,15 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection, CircuitOpenError
 import json
 import os
 from datetime import datetime, timedelta
 import pandas as pd
 from database.token_db import get_br_symbol, get_oa_symbol, get_token
 from broker.dhan.mapping.transform_data import map_exchange_type
+from utils.concurrency import chunked, map_concurrent
+from utils.history_chunks import plan_windows, fetch_windows
+from utils.token_bucket import get_bucket
+from utils.candle_normalizer import from_columns, concat_candles, normalize_candles, IST_OFFSET_SECONDS
 import urllib.parse
 import logging
 import jwt
@@ -21,7 +26,7 @@ def get_api_response(endpoint, auth, method="POST", payload=''):
     if not client_id:
         raise Exception("Could not extract client ID from auth token")
     
-    conn = http.client.HTTPSConnection("api.dhan.co")
+    conn = GuardedHTTPSConnection("api.dhan.co")
     headers = {
         'access-token': AUTH_TOKEN,
         'client-id': client_id,
@@ -62,6 +67,13 @@ def get_api_response(endpoint, auth, method="POST", payload=''):
     return response
 
 class BrokerData:
+    # Dhan's market feed API accepts up to 1000 instruments per call (1 request/second)
+    MAX_QUOTE_INSTRUMENTS = 1000
+    MAX_QUOTE_CONCURRENCY = 1
+    # Intraday charts: 5 days per request; data APIs allow 5 requests/second
+    HISTORY_CHUNK_DAYS = 5
+    HISTORY_RATE_LIMIT = 5
+
     def __init__(self, auth_token):
         """Initialize Dhan data handler with authentication token"""
         self.auth_token = auth_token
@@ -111,21 +123,20 @@ class BrokerData:
         # Return new timestamp
         return int(ist_dt.timestamp())
 
+    def _ist_shift_seconds(self) -> int:
+        """Offset applied by _convert_timestamp_to_ist, for shifting whole columns at once"""
+        # The IST wall-clock time is re-read in the server's local timezone
+        local_offset = datetime.now().astimezone().utcoffset().total_seconds()
+        return int(IST_OFFSET_SECONDS - local_offset)
+
     def _get_intraday_chunks(self, start_date: str, end_date: str) -> list:
         """Split date range into 5-day chunks for intraday data"""
         start = datetime.strptime(start_date, "%Y-%m-%d")
         end = datetime.strptime(end_date, "%Y-%m-%d")
-        chunks = []
-        
-        while start < end:
-            chunk_end = min(start + timedelta(days=5), end)
-            chunks.append((
-                start.strftime("%Y-%m-%d"),
-                chunk_end.strftime("%Y-%m-%d")
-            ))
-            start = chunk_end
-            
-        return chunks
+        return [
+            (chunk_start.strftime("%Y-%m-%d"), chunk_end.strftime("%Y-%m-%d"))
+            for chunk_start, chunk_end in plan_windows(start, end, self.HISTORY_CHUNK_DAYS, exclusive_end=True)
+        ]
 
     def _get_exchange_segment(self, exchange: str) -> str:
         """Get exchange segment based on exchange"""
@@ -271,7 +282,8 @@ class BrokerData:
             print(f'exchange segment: {exchange_segment}')
             instrument_type = self._get_instrument_type(exchange, symbol)
             
-            all_candles = []
+            frames = []
+            ist_shift = self._ist_shift_seconds()
 
             # Choose endpoint and prepare request data
             if interval == 'D':
@@ -301,25 +313,8 @@ class BrokerData:
                 
                 response = get_api_response(endpoint, self.auth_token, "POST", json.dumps(request_data))
                 
-                # Process response
-                timestamps = response.get('timestamp', [])
-                opens = response.get('open', [])
-                highs = response.get('high', [])
-                lows = response.get('low', [])
-                closes = response.get('close', [])
-                volumes = response.get('volume', [])
-
-                for i in range(len(timestamps)):
-                    # Convert UTC timestamp to IST
-                    ist_timestamp = self._convert_timestamp_to_ist(timestamps[i])
-                    all_candles.append({
-                        'timestamp': ist_timestamp,
-                        'open': float(opens[i]) if opens[i] else 0,
-                        'high': float(highs[i]) if highs[i] else 0,
-                        'low': float(lows[i]) if lows[i] else 0,
-                        'close': float(closes[i]) if closes[i] else 0,
-                        'volume': int(float(volumes[i])) if volumes[i] else 0
-                    })
+                # Process columnar response, converting UTC timestamps to IST
+                frames.append(from_columns(response, tz_shift_seconds=ist_shift, dedupe=False))
             else:
                 # For intraday data
                 endpoint = "/v2/charts/intraday"
@@ -344,35 +339,20 @@ class BrokerData:
                     try:
                         response = get_api_response(endpoint, self.auth_token, "POST", json.dumps(request_data))
                         
-                        # Process response
-                        timestamps = response.get('timestamp', [])
-                        opens = response.get('open', [])
-                        highs = response.get('high', [])
-                        lows = response.get('low', [])
-                        closes = response.get('close', [])
-                        volumes = response.get('volume', [])
-
-                        for i in range(len(timestamps)):
-                            # Convert UTC timestamp to IST
-                            ist_timestamp = self._convert_timestamp_to_ist(timestamps[i])
-                            all_candles.append({
-                                'timestamp': ist_timestamp,
-                                'open': float(opens[i]) if opens[i] else 0,
-                                'high': float(highs[i]) if highs[i] else 0,
-                                'low': float(lows[i]) if lows[i] else 0,
-                                'close': float(closes[i]) if closes[i] else 0,
-                                'volume': int(float(volumes[i])) if volumes[i] else 0
-                            })
+                        # Process columnar response, converting UTC timestamps to IST
+                        frames.append(from_columns(response, tz_shift_seconds=ist_shift, dedupe=False))
+                    except CircuitOpenError:
+                        raise
                     except Exception as e:
                         logger.error(f"Error fetching intraday data: {str(e)}")
                 else:
-                    # For multiple days, split into chunks
+                    # For multiple days, split into chunks fetched concurrently under the rate limit
                     date_chunks = self._get_intraday_chunks(start_date, end_date)
-                    
-                    for chunk_start, chunk_end in date_chunks:
+
+                    def fetch_chunk(chunk_start, chunk_end):
                         # Skip if both dates are non-trading days
                         if not self._is_trading_day(chunk_start) and not self._is_trading_day(chunk_end):
-                            continue
+                            return None
 
                         # Get time range for each day
                         from_time, _ = self._get_intraday_time_range(chunk_start)
@@ -390,31 +370,13 @@ class BrokerData:
                         logger.info(f"Making intraday history request to {endpoint}")
                         logger.info(f"Request data: {json.dumps(request_data, indent=2)}")
                         
-                        try:
-                            response = get_api_response(endpoint, self.auth_token, "POST", json.dumps(request_data))
-                            
-                            # Process response
-                            timestamps = response.get('timestamp', [])
-                            opens = response.get('open', [])
-                            highs = response.get('high', [])
-                            lows = response.get('low', [])
-                            closes = response.get('close', [])
-                            volumes = response.get('volume', [])
-
-                            for i in range(len(timestamps)):
-                                # Convert UTC timestamp to IST
-                                ist_timestamp = self._convert_timestamp_to_ist(timestamps[i])
-                                all_candles.append({
-                                    'timestamp': ist_timestamp,
-                                    'open': float(opens[i]) if opens[i] else 0,
-                                    'high': float(highs[i]) if highs[i] else 0,
-                                    'low': float(lows[i]) if lows[i] else 0,
-                                    'close': float(closes[i]) if closes[i] else 0,
-                                    'volume': int(float(volumes[i])) if volumes[i] else 0
-                                })
-                        except Exception as e:
-                            logger.error(f"Error fetching chunk {chunk_start} to {chunk_end}: {str(e)}")
-                            continue
+                        response = get_api_response(endpoint, self.auth_token, "POST", json.dumps(request_data))
+                        
+                        # Process columnar response, converting UTC timestamps to IST
+                        return from_columns(response, tz_shift_seconds=ist_shift, dedupe=False)
+
+                    frames.extend(fetch_windows(fetch_chunk, date_chunks,
+                                                rate_limiter=get_bucket('dhan:history', self.HISTORY_RATE_LIMIT)))
 
             # For daily timeframe, check if today's date is within the range
             if interval == 'D':
@@ -425,28 +387,24 @@ class BrokerData:
                         # Get today's data from quotes API
                         quotes = self.get_quotes(symbol, exchange)
                         if quotes and quotes.get('ltp', 0) > 0:  # Only add if we got valid data
-                            today_candle = {
-                                'timestamp': int(datetime.strptime(today + " 15:30:00", "%Y-%m-%d %H:%M:%S").timestamp()),
-                                'open': float(quotes.get('open', 0)),
-                                'high': float(quotes.get('high', 0)),
-                                'low': float(quotes.get('low', 0)),
-                                'close': float(quotes.get('ltp', 0)),  # Use LTP as current close
-                                'volume': int(quotes.get('volume', 0))
-                            }
-                            all_candles.append(today_candle)
+                            frames.append(normalize_candles(
+                                [int(datetime.strptime(today + " 15:30:00", "%Y-%m-%d %H:%M:%S").timestamp())],
+                                [quotes.get('open', 0)],
+                                [quotes.get('high', 0)],
+                                [quotes.get('low', 0)],
+                                [quotes.get('ltp', 0)],  # Use LTP as current close
+                                [quotes.get('volume', 0)]
+                            ))
+                    except CircuitOpenError:
+                        raise
                     except Exception as e:
                         logger.error(f"Error fetching today's data from quotes: {str(e)}")
 
-            # Create DataFrame from all candles
-            df = pd.DataFrame(all_candles)
-            if df.empty:
-                df = pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            else:
-                # Sort by timestamp and remove duplicates
-                df = df.sort_values('timestamp').drop_duplicates(subset=['timestamp']).reset_index(drop=True)
-
-            return df
+            # Combine all candles, sorted by timestamp without duplicates
+            return concat_candles(frames)
 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error fetching historical data: {str(e)}")
             raise Exception(f"Error fetching historical data: {str(e)}")
@@ -488,29 +446,7 @@ class BrokerData:
                     }
                 
                 # Transform to expected format
-                result = {
-                    'ltp': float(quote_data.get('last_price', 0)),
-                    'open': float(quote_data.get('ohlc', {}).get('open', 0)),
-                    'high': float(quote_data.get('ohlc', {}).get('high', 0)),
-                    'low': float(quote_data.get('ohlc', {}).get('low', 0)),
-                    'volume': int(quote_data.get('volume', 0)),
-                    'bid': 0,  # Will be updated from depth
-                    'ask': 0,  # Will be updated from depth
-                    'prev_close': float(quote_data.get('ohlc', {}).get('close', 0))
-                }
-                
-                # Update bid/ask from depth if available
-                depth = quote_data.get('depth', {})
-                if depth:
-                    buy_orders = depth.get('buy', [])
-                    sell_orders = depth.get('sell', [])
-                    
-                    if buy_orders:
-                        result['bid'] = float(buy_orders[0].get('price', 0))
-                    if sell_orders:
-                        result['ask'] = float(sell_orders[0].get('price', 0))
-                
-                return result
+                return self._format_quote(quote_data)
                 
             except Exception as e:
                 if "not subscribed" in str(e).lower():
@@ -528,10 +464,98 @@ class BrokerData:
                     }
                 raise
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error in get_quotes: {str(e)}", exc_info=True)
             raise Exception(f"Error fetching quotes: {str(e)}")
 
+    @staticmethod
+    def _format_quote(quote_data: dict) -> dict:
+        """Convert a Dhan market feed quote to the common quote format"""
+        result = {
+            'ltp': float(quote_data.get('last_price', 0)),
+            'open': float(quote_data.get('ohlc', {}).get('open', 0)),
+            'high': float(quote_data.get('ohlc', {}).get('high', 0)),
+            'low': float(quote_data.get('ohlc', {}).get('low', 0)),
+            'volume': int(quote_data.get('volume', 0)),
+            'bid': 0,  # Will be updated from depth
+            'ask': 0,  # Will be updated from depth
+            'prev_close': float(quote_data.get('ohlc', {}).get('close', 0))
+        }
+        
+        # Update bid/ask from depth if available
+        depth = quote_data.get('depth', {})
+        if depth:
+            buy_orders = depth.get('buy', [])
+            sell_orders = depth.get('sell', [])
+            
+            if buy_orders:
+                result['bid'] = float(buy_orders[0].get('price', 0))
+            if sell_orders:
+                result['ask'] = float(sell_orders[0].get('price', 0))
+        
+        return result
+
+    def get_multi_quotes(self, symbols: list) -> list:
+        """
+        Get real-time quotes for many symbols using Dhan's batch market feed API
+        Args:
+            symbols: List of dicts with 'symbol' and 'exchange' keys
+        Returns:
+            list: One entry per requested symbol (same order) with 'symbol',
+                  'exchange' and either 'data' or 'error'
+        """
+        # Resolve every symbol to its (exchange segment, security id) pair
+        instruments = []
+        for item in symbols:
+            security_id = get_token(item['symbol'], item['exchange'])
+            if not security_id:
+                instruments.append(None)
+                continue
+            instruments.append((map_exchange_type(item['exchange']), str(security_id)))
+
+        unique_instruments = list(dict.fromkeys(inst for inst in instruments if inst))
+
+        def fetch_chunk(chunk):
+            payload = {}
+            for exchange_type, security_id in chunk:
+                payload.setdefault(exchange_type, []).append(int(security_id))
+            response = get_api_response("/v2/marketfeed/quote", self.auth_token, "POST", json.dumps(payload))
+            data = response.get('data', {}) or {}
+            return {
+                (exchange_type, str(security_id)): quote
+                for exchange_type, segment_quotes in data.items() if isinstance(segment_quotes, dict)
+                for security_id, quote in segment_quotes.items()
+            }
+
+        chunks = chunked(unique_instruments, self.MAX_QUOTE_INSTRUMENTS)
+        chunk_results = map_concurrent(fetch_chunk, chunks,
+                                       max_workers=self.MAX_QUOTE_CONCURRENCY,
+                                       return_exceptions=True)
+
+        # Merge chunk responses, remembering the error for instruments of failed chunks
+        quotes = {}
+        errors = {}
+        for chunk, result in zip(chunks, chunk_results):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching quotes for {len(chunk)} instruments: {result}")
+                errors.update({inst: str(result) for inst in chunk})
+            else:
+                quotes.update(result)
+
+        results = []
+        for item, inst in zip(symbols, instruments):
+            entry = {'symbol': item['symbol'], 'exchange': item['exchange']}
+            if inst is None:
+                entry['error'] = 'Symbol not found'
+            elif inst in quotes:
+                entry['data'] = self._format_quote(quotes[inst])
+            else:
+                entry['error'] = errors.get(inst, 'No quote data found')
+            results.append(entry)
+        return results
+
     def get_depth(self, symbol: str, exchange: str) -> dict:
         """
         Get market depth for given symbol
@@ -638,6 +662,8 @@ class BrokerData:
                     }
                 raise
                 
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Error in get_depth: {str(e)}", exc_info=True)
             raise Exception(f"Error fetching market depth: {str(e)}")
\ No newline at end of file
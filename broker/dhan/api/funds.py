@@ -2,6 +2,7 @@
 
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 from broker.dhan.api.order_api import get_positions
 from broker.dhan.mapping.order_data import map_position_data
@@ -10,7 +11,7 @@ def get_margin_data(auth_token):
     print(auth_token)
     """Fetch margin data from Dhan API using the provided auth token."""
     api_key = os.getenv('BROKER_API_KEY')
-    conn = http.client.HTTPSConnection("api.dhan.co")
+    conn = GuardedHTTPSConnection("api.dhan.co")
     headers = {
         'access-token': auth_token,
         'Content-Type': 'application/json',
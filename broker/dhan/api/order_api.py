@@ -1,7 +1,9 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token
 from database.token_db import get_br_symbol , get_oa_symbol, get_symbol
 from broker.dhan.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data
@@ -13,7 +15,7 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
     AUTH_TOKEN = auth
     api_key = os.getenv('BROKER_API_KEY')
 
-    conn = http.client.HTTPSConnection("api.dhan.co")
+    conn = GuardedHTTPSConnection("api.dhan.co")
     headers = {
         'access-token': AUTH_TOKEN,
         'Content-Type': 'application/json',
@@ -66,7 +68,7 @@ def place_order_api(data,auth):
 
     print(payload)
 
-    conn = http.client.HTTPSConnection("api.dhan.co")
+    conn = GuardedHTTPSConnection("api.dhan.co")
     conn.request("POST", "/v2/orders", payload, headers)
     res = conn.getresponse()
     response_data = json.loads(res.read().decode("utf-8"))
@@ -176,6 +178,7 @@ def close_all_positions(current_api_key,auth):
         return {"message": "No Open Positions Found"}, 200
 
     if positions_response:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response:
             # Skip if net quantity is zero
@@ -207,12 +210,10 @@ def close_all_positions(current_api_key,auth):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            _, api_response, _ =   place_order_api(place_order_payload,AUTH_TOKEN)
+            place_order_payloads.append(place_order_payload)
 
-            #print(api_response)
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('dhan', place_order_payloads, lambda payload: place_order_api(payload, AUTH_TOKEN))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -230,7 +231,7 @@ def cancel_order(orderid,auth):
     
     
     # Establish the connection and send the request
-    conn = http.client.HTTPSConnection("api.dhan.co")
+    conn = GuardedHTTPSConnection("api.dhan.co")
     conn.request("DELETE", f"/v2/orders/{orderid}", headers=headers)  # Append the order ID to the URL
     
     res = conn.getresponse()
@@ -269,7 +270,7 @@ def modify_order(data,auth):
 
     print(payload)
 
-    conn = http.client.HTTPSConnection("api.dhan.co")
+    conn = GuardedHTTPSConnection("api.dhan.co")
     conn.request("PUT", f"/v2/orders/{orderid}", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -294,16 +295,6 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response
                         if order['orderStatus'] in ['PENDING']]
     print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['orderId']
-        cancel_response, status_code = cancel_order(orderid,AUTH_TOKEN)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['orderId'] for order in orders_to_cancel]
+    return cancel_orders('dhan', order_ids, lambda orderid: cancel_order(orderid, AUTH_TOKEN))
@@ -1,4 +1,5 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 import pandas as pd
@@ -26,7 +27,7 @@ def get_api_response(endpoint, auth, method="POST", payload=None):
         print(f"Endpoint: {endpoint}")
         print(f"Payload: {json.dumps(data, indent=2)}")
 
-        conn = http.client.HTTPSConnection("connect.thefirstock.com")
+        conn = GuardedHTTPSConnection("connect.thefirstock.com")
         headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json'
@@ -1,7 +1,9 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token, get_br_symbol, get_symbol
 from broker.firstock.mapping.transform_data import transform_data, map_product_type, reverse_map_product_type, transform_modify_order_data
 
@@ -10,7 +12,7 @@ def get_api_response(endpoint, auth, method="POST", payload=None):
     """
     Generic API response handler for Firstock API
     """
-    conn = http.client.HTTPSConnection("connect.thefirstock.com")
+    conn = GuardedHTTPSConnection("connect.thefirstock.com")
     
     api_key = os.getenv('BROKER_API_KEY')
     api_key = api_key[:-4]  # Remove last 4 characters
@@ -152,7 +154,7 @@ def place_order_api(data, auth):
 
     print(transformed_data)
     
-    conn = http.client.HTTPSConnection("connect.thefirstock.com")
+    conn = GuardedHTTPSConnection("connect.thefirstock.com")
     headers = {'Content-Type': 'application/json'}
     
     try:
@@ -298,6 +300,7 @@ def close_all_positions(current_api_key, auth):
         positions = [positions]
 
     # Loop through each position to close
+    place_order_payloads = []
     for position in positions:
         try:
             net_qty = position.get('netQuantity', '0')
@@ -330,20 +333,27 @@ def close_all_positions(current_api_key, auth):
                 "disclosed_quantity": "0"
             }
 
-            # Place the order to close the position
-            res, response, orderid = place_order_api(place_order_payload, auth)
-            
-            if response and response.get('status') == 'success':
-                positions_closed += 1
-            else:
-                positions_failed += 1
-                error_msg = response.get('error', {}).get('message') if response else 'Unknown error'
-                error_messages.append(f"Failed to close position for {symbol}: {error_msg}")
+            place_order_payloads.append(place_order_payload)
 
         except Exception as e:
             positions_failed += 1
             error_messages.append(f"Error processing position: {str(e)}")
 
+    # Place the orders to close the positions concurrently
+    for result in place_orders('firstock', place_order_payloads, lambda payload: place_order_api(payload, auth)):
+        symbol = result.item['symbol']
+        if not result.ok:
+            positions_failed += 1
+            error_messages.append(f"Error processing position: {str(result.error)}")
+            continue
+        res, response, orderid = result.value
+        if response and response.get('status') == 'success':
+            positions_closed += 1
+        else:
+            positions_failed += 1
+            error_msg = response.get('error', {}).get('message') if response else 'Unknown error'
+            error_messages.append(f"Failed to close position for {symbol}: {error_msg}")
+
     # Prepare response message
     response = {
         "status": "success" if positions_failed == 0 else "partial",
@@ -399,7 +409,7 @@ def cancel_order(orderid, auth):
         "orderNumber": str(orderid)  # Ensure orderid is string
     }
     
-    conn = http.client.HTTPSConnection("connect.thefirstock.com")
+    conn = GuardedHTTPSConnection("connect.thefirstock.com")
     headers = {'Content-Type': 'application/json'}
     
     try:
@@ -465,7 +475,7 @@ def modify_order(data, auth):
     })
 
     # Set up the request
-    conn = http.client.HTTPSConnection("connect.thefirstock.com")
+    conn = GuardedHTTPSConnection("connect.thefirstock.com")
     headers = {'Content-Type': 'application/json'}
     
     try:
@@ -515,19 +525,9 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response.get('data', [])
                         if order['status'] in ['OPEN', 'TRIGGER_PENDING']]
     #print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['orderNumber']
-        cancel_response, status_code = cancel_order(orderid,auth)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['orderNumber'] for order in orders_to_cancel]
+    return cancel_orders('firstock', order_ids, lambda orderid: cancel_order(orderid, auth))
 
 
 def placeorder(data, auth):
@@ -1,4 +1,5 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 from datetime import datetime
 import os
@@ -14,7 +15,7 @@ api_key, user_id, client_id = broker_api_key.split(':::')
 def get_api_response(endpoint, auth, method="GET", payload=''):
     """Generic function to make API calls to 5Paisa"""
     AUTH_TOKEN = auth
-    conn = http.client.HTTPSConnection("Openapi.5paisa.com")
+    conn = GuardedHTTPSConnection("Openapi.5paisa.com")
     headers = {
         'Authorization': f'bearer {AUTH_TOKEN}',
         'Content-Type': 'application/json'
@@ -1,5 +1,6 @@
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 from broker.fivepaisa.api.order_api import get_positions
 
@@ -18,7 +19,7 @@ def get_margin_data(auth_token):
     except ValueError:
         raise ValueError("BROKER_API_KEY format is incorrect. Expected format: 'api_key:::client_id'")
 
-    conn = http.client.HTTPSConnection("Openapi.5paisa.com")
+    conn = GuardedHTTPSConnection("Openapi.5paisa.com")
 
     json_data = {
         "head": {
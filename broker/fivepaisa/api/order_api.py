@@ -1,7 +1,9 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token , get_br_symbol, get_symbol, get_oa_symbol
 from broker.fivepaisa.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data
 from broker.fivepaisa.mapping.transform_data import map_exchange, map_exchange_type, reverse_map_exchange
@@ -26,7 +28,7 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
 
 
  
-    conn = http.client.HTTPSConnection("Openapi.5paisa.com")
+    conn = GuardedHTTPSConnection("Openapi.5paisa.com")
     headers = {
       'Authorization': f'bearer {AUTH_TOKEN}',
       'Content-Type': 'application/json',
@@ -99,7 +101,7 @@ def place_order_api(data,auth):
 
 
     print(payload)
-    conn = http.client.HTTPSConnection("Openapi.5paisa.com")
+    conn = GuardedHTTPSConnection("Openapi.5paisa.com")
     conn.request("POST", "/VendorsAPI/Service1.svc/V1/PlaceOrderRequest", payload, headers)
     res = conn.getresponse()
 
@@ -214,6 +216,7 @@ def close_all_positions(current_api_key,auth):
         return {"message": "No Open Positions Found"}, 200
 
     if positions_response['body']['NetPositionDetail']:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response['body']['NetPositionDetail']:
             # Skip if net quantity is zero
@@ -243,16 +246,10 @@ def close_all_positions(current_api_key,auth):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            res, response, orderid =   place_order_api(place_order_payload,auth)
+            place_order_payloads.append(place_order_payload)
 
-            # print(res)
-            # print(response)
-            # print(orderid)
-
-
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('fivepaisa', place_order_payloads, lambda payload: place_order_api(payload, auth))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -297,7 +294,7 @@ def cancel_order(orderid,auth):
     print(payload)
     
     # Establish the connection and send the request
-    conn = http.client.HTTPSConnection("Openapi.5paisa.com")  # Adjust the URL as necessary
+    conn = GuardedHTTPSConnection("Openapi.5paisa.com")  # Adjust the URL as necessary
     conn.request("POST", "/VendorsAPI/Service1.svc/V1/CancelOrderRequest", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -335,7 +332,7 @@ def modify_order(data,auth):
     payload = json.dumps(json_data)
     print(payload)
 
-    conn = http.client.HTTPSConnection("Openapi.5paisa.com")
+    conn = GuardedHTTPSConnection("Openapi.5paisa.com")
     conn.request("POST", "/VendorsAPI/Service1.svc/V1/ModifyOrderRequest", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -363,16 +360,6 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response['body']['OrderBookDetail']
                         if order['OrderStatus'] in ['Pending','Modified']]
     #print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['BrokerOrderId']
-        cancel_response, status_code = cancel_order(orderid,auth)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['BrokerOrderId'] for order in orders_to_cancel]
+    return cancel_orders('fivepaisa', order_ids, lambda orderid: cancel_order(orderid, auth))
@@ -1,4 +1,5 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 import pandas as pd
@@ -26,7 +27,7 @@ def get_api_response(endpoint, auth, method="POST", payload=None):
 
     payload_str = "jData=" + json.dumps(data) + "&jKey=" + AUTH_TOKEN
 
-    conn = http.client.HTTPSConnection("piconnect.flattrade.in")
+    conn = GuardedHTTPSConnection("piconnect.flattrade.in")
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
 
     conn.request(method, endpoint, payload_str, headers)
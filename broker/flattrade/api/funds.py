@@ -1,5 +1,6 @@
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 
 def calculate_pnl(entry):
@@ -27,7 +28,7 @@ def get_margin_data(auth_token):
     headers = {'Content-Type': 'application/json'}
 
     # Initialize HTTP connection
-    conn = http.client.HTTPSConnection(url)
+    conn = GuardedHTTPSConnection(url)
 
     # Fetch margin data
     margin_data = fetch_data("/PiConnectTP/Limits", payload, headers, conn)
@@ -1,7 +1,9 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token , get_br_symbol, get_symbol
 from broker.flattrade.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data
 
@@ -20,7 +22,7 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
 
     payload = "jData=" + data + "&jKey=" + AUTH_TOKEN
 
-    conn = http.client.HTTPSConnection("piconnect.flattrade.in")
+    conn = GuardedHTTPSConnection("piconnect.flattrade.in")
     headers = {'Content-Type': 'application/json'}
 
     conn.request(method, endpoint, payload, headers)
@@ -76,7 +78,7 @@ def place_order_api(data,auth):
     payload = "jData=" + json.dumps(newdata) + "&jKey=" + AUTH_TOKEN
 
     print(payload)
-    conn = http.client.HTTPSConnection("piconnect.flattrade.in")
+    conn = GuardedHTTPSConnection("piconnect.flattrade.in")
     conn.request("POST", "/PiConnectTP/PlaceOrder", payload, headers)
     res = conn.getresponse()
     response_data = json.loads(res.read().decode("utf-8"))
@@ -186,6 +188,7 @@ def close_all_positions(current_api_key,auth):
         return {"message": "No Open Positions Found"}, 200
 
     if positions_response:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response:
             # Skip if net quantity is zero
@@ -215,16 +218,10 @@ def close_all_positions(current_api_key,auth):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            res, response, orderid =   place_order_api(place_order_payload,auth)
+            place_order_payloads.append(place_order_payload)
 
-            # print(res)
-            # print(response)
-            # print(orderid)
-
-
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('flattrade', place_order_payloads, lambda payload: place_order_api(payload, auth))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -245,7 +242,7 @@ def cancel_order(orderid,auth):
 
     
     # Establish the connection and send the request
-    conn = http.client.HTTPSConnection("piconnect.flattrade.in")  # Adjust the URL as necessary
+    conn = GuardedHTTPSConnection("piconnect.flattrade.in")  # Adjust the URL as necessary
     conn.request("POST", "/PiConnectTP/CancelOrder", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -277,7 +274,7 @@ def modify_order(data,auth):
     payload = "jData=" + json.dumps(transformed_data) + "&jKey=" + AUTH_TOKEN
 
 
-    conn = http.client.HTTPSConnection("piconnect.flattrade.in")
+    conn = GuardedHTTPSConnection("piconnect.flattrade.in")
     conn.request("POST", "/PiConnectTP/ModifyOrder", payload, headers)
     res = conn.getresponse()
     response = json.loads(res.read().decode("utf-8"))
@@ -304,17 +301,7 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response
                         if order['status'] in ['OPEN', 'TRIGGER_PENDING']]
     #print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['norenordno']
-        cancel_response, status_code = cancel_order(orderid,auth)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['norenordno'] for order in orders_to_cancel]
+    return cancel_orders('flattrade', order_ids, lambda orderid: cancel_order(orderid, auth))
 
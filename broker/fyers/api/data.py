@@ -1,4 +1,5 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 from database.token_db import get_br_symbol, get_oa_symbol
@@ -6,12 +7,13 @@ import pandas as pd
 from datetime import datetime
 import urllib.parse
 import time
+from utils.candle_normalizer import from_rows, concat_candles
 
 def get_api_response(endpoint, auth, method="GET", payload=''):
     AUTH_TOKEN = auth
     api_key = os.getenv('BROKER_API_KEY')
 
-    conn = http.client.HTTPSConnection("api-t1.fyers.in")
+    conn = GuardedHTTPSConnection("api-t1.fyers.in")
     headers = {
         'Authorization': f'{api_key}:{AUTH_TOKEN}',
         'Content-Type': 'application/json'
@@ -197,9 +199,8 @@ class BrokerData:
                     # Get candles from response
                     candles = response.get('candles', [])
                     if candles:
-                        # Convert list of lists to DataFrame with epoch timestamp
-                        df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                        dfs.append(df)
+                        # Convert list of lists to typed columns with epoch timestamp
+                        dfs.append(from_rows(candles, dedupe=False))
                         print(f"Got {len(candles)} candles for period {chunk_start} to {chunk_end}")
                     else:
                         print(f"No data available for period {chunk_start} to {chunk_end}")
@@ -229,11 +230,8 @@ class BrokerData:
                 print("No data was collected for the entire period")
                 return pd.DataFrame(columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             
-            # Combine all chunks
-            final_df = pd.concat(dfs, ignore_index=True)
-            
-            # Sort by timestamp and remove duplicates
-            final_df = final_df.sort_values('timestamp').drop_duplicates(subset=['timestamp'], keep='first')
+            # Combine all chunks, sorted by timestamp without duplicates
+            final_df = concat_candles(dfs)
             
             print(f"Successfully collected data: {len(final_df)} total candles")
             return final_df
@@ -2,6 +2,7 @@
 
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 
 def get_margin_data(auth_token):
@@ -9,7 +10,7 @@ def get_margin_data(auth_token):
     api_key = os.getenv('BROKER_API_KEY')
     api_secret = os.getenv('BROKER_API_SECRET')
     """Fetch funds data from Fyers' API using the provided authentication token."""
-    conn = http.client.HTTPSConnection("api-t1.fyers.in")
+    conn = GuardedHTTPSConnection("api-t1.fyers.in")
     headers = {
         'Authorization': f'{api_key}:{auth_token}',  # 'app_id:access_token' format expected in auth_token
     }
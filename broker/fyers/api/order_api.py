@@ -1,4 +1,6 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
+from utils.fanout import cancel_orders
 import json
 import os
 from database.token_db import get_br_symbol, get_oa_symbol
@@ -11,7 +13,7 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
     AUTH_TOKEN = auth
     api_key = os.getenv('BROKER_API_KEY')
 
-    conn = http.client.HTTPSConnection("api-t1.fyers.in")
+    conn = GuardedHTTPSConnection("api-t1.fyers.in")
     headers = {
         'Authorization': f'{api_key}:{AUTH_TOKEN}',
         'Content-Type': 'application/json'  # Added if payloads are JSON
@@ -74,7 +76,7 @@ def place_order_api(data,auth):
     # Convert payload to JSON and then encode to bytes
     payload_bytes = json.dumps(payload).encode('utf-8')
 
-    conn = http.client.HTTPSConnection("api-t1.fyers.in")
+    conn = GuardedHTTPSConnection("api-t1.fyers.in")
     conn.request("POST", "/api/v3/orders/sync", payload_bytes, headers)
     res = conn.getresponse()
     response_data = json.loads(res.read().decode("utf-8"))
@@ -197,7 +199,7 @@ def close_all_positions(current_api_key,auth):
     payload = json.dumps({"exit_all": 1})  # Match the API expected payload
     
     # Establish the connection and send the request to the positions endpoint
-    conn = http.client.HTTPSConnection("api-t1.fyers.in")
+    conn = GuardedHTTPSConnection("api-t1.fyers.in")
     conn.request("DELETE", "/api/v3/positions", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -228,7 +230,7 @@ def cancel_order(orderid,auth):
     
     
     # Establish the connection and send the request
-    conn = http.client.HTTPSConnection("api-t1.fyers.in")
+    conn = GuardedHTTPSConnection("api-t1.fyers.in")
     conn.request("DELETE", "/api/v3/orders/sync", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -265,7 +267,7 @@ def modify_order(data,auth):
     # Convert payload to JSON and then encode to bytes
     payload_bytes = json.dumps(payload).encode('utf-8')
 
-    conn = http.client.HTTPSConnection("api-t1.fyers.in")
+    conn = GuardedHTTPSConnection("api-t1.fyers.in")
     conn.request("PATCH", "/api/v3/orders/sync", payload_bytes, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -291,17 +293,7 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response.get('orderBook', [])
                         if order['status'] in [4, 6]]
     print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['id']
-        cancel_response, status_code = cancel_order(orderid,AUTH_TOKEN)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['id'] for order in orders_to_cancel]
+    return cancel_orders('fyers', order_ids, lambda orderid: cancel_order(orderid, AUTH_TOKEN))
 
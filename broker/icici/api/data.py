@@ -1,4 +1,5 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import hashlib
 import json
 from datetime import datetime, timedelta
@@ -80,7 +81,7 @@ class BrokerData:
             payload = json.dumps(payload_data, separators=(',', ':'))
 
             # Make API request
-            conn = http.client.HTTPSConnection("api.icicidirect.com")
+            conn = GuardedHTTPSConnection("api.icicidirect.com")
             headers = self._generate_headers(payload)
             
             conn.request("GET", "/breezeapi/api/v1/quotes", payload, headers)
@@ -194,7 +195,7 @@ class BrokerData:
             logger.info(f"Query string: {query_string}")
             
             # Make API request
-            conn = http.client.HTTPSConnection("breezeapi.icicidirect.com")
+            conn = GuardedHTTPSConnection("breezeapi.icicidirect.com")
             headers = {
                 'X-SessionToken': self.auth_token,
                 'apikey': self.api_key
@@ -306,7 +307,7 @@ class BrokerData:
             payload = json.dumps(payload_data, separators=(',', ':'))
 
             # Make API request
-            conn = http.client.HTTPSConnection("api.icicidirect.com")
+            conn = GuardedHTTPSConnection("api.icicidirect.com")
             headers = self._generate_headers(payload)
             
             conn.request("GET", "/breezeapi/api/v1/quotes", payload, headers)
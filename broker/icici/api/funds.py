@@ -2,6 +2,7 @@
 
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import hashlib
 import json
 from datetime import datetime
@@ -12,7 +13,7 @@ def get_margin_data(auth_token):
     """Fetch margin data from ICICI Direct's API using the provided Session token."""
     api_key = os.getenv('BROKER_API_KEY')
     api_secret = os.getenv('BROKER_API_SECRET')
-    conn = http.client.HTTPSConnection("api.icicidirect.com")
+    conn = GuardedHTTPSConnection("api.icicidirect.com")
     payload = json.dumps({})
 
     #checksum computation
@@ -1,9 +1,11 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import hashlib
 import json
 from datetime import datetime, timedelta
 import os
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token
 from database.token_db import get_br_symbol , get_oa_symbol, get_symbol
 from broker.icici.mapping.transform_data import transform_data , map_symbol, reverse_map_product_type, transform_modify_order_data
@@ -14,7 +16,7 @@ from broker.icici.mapping.transform_data import transform_data , map_symbol, rev
 def get_orders(auth,exchange_code):
     api_key = os.getenv('BROKER_API_KEY')
     api_secret = os.getenv('BROKER_API_SECRET')
-    conn = http.client.HTTPSConnection("api.icicidirect.com")
+    conn = GuardedHTTPSConnection("api.icicidirect.com")
 
     # Get today's date in UTC
     today = datetime.utcnow().date()
@@ -79,7 +81,7 @@ def get_order_book(auth):
 def get_trades(auth,exchange_code):
     api_key = os.getenv('BROKER_API_KEY')
     api_secret = os.getenv('BROKER_API_SECRET')
-    conn = http.client.HTTPSConnection("api.icicidirect.com")
+    conn = GuardedHTTPSConnection("api.icicidirect.com")
 
     # Get today's date in UTC
     today = datetime.utcnow().date()
@@ -146,7 +148,7 @@ def get_positions(auth):
 
     api_key = os.getenv('BROKER_API_KEY')
     api_secret = os.getenv('BROKER_API_SECRET')
-    conn = http.client.HTTPSConnection("api.icicidirect.com")
+    conn = GuardedHTTPSConnection("api.icicidirect.com")
 
 
     payload = json.dumps({})
@@ -177,7 +179,7 @@ def get_positions(auth):
 def get_demat(auth,exchange_code):
     api_key = os.getenv('BROKER_API_KEY')
     api_secret = os.getenv('BROKER_API_SECRET')
-    conn = http.client.HTTPSConnection("api.icicidirect.com")
+    conn = GuardedHTTPSConnection("api.icicidirect.com")
 
     # Get today's date in UTC
     today = datetime.utcnow().date()
@@ -318,7 +320,7 @@ def place_order_api(data,auth):
         'X-SessionToken': auth
     }
 
-    conn = http.client.HTTPSConnection("api.icicidirect.com")
+    conn = GuardedHTTPSConnection("api.icicidirect.com")
     conn.request("POST", "/breezeapi/api/v1/order", payload, headers)
     res = conn.getresponse()
 
@@ -427,6 +429,7 @@ def close_all_positions(current_api_key,auth):
         return {"message": "No Open Positions Found"}, 200
 
     if positions_response['Status']==200:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response['Success']:
             # Skip if net quantity is zero
@@ -474,12 +477,10 @@ def close_all_positions(current_api_key,auth):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            _, api_response, _ =   place_order_api(place_order_payload,AUTH_TOKEN)
+            place_order_payloads.append(place_order_payload)
 
-            print(api_response)
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('icici', place_order_payloads, lambda payload: place_order_api(payload, AUTH_TOKEN))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -524,7 +525,7 @@ def cancel_order(orderid,auth):
             'X-SessionToken': auth
         }
 
-        conn = http.client.HTTPSConnection("api.icicidirect.com")
+        conn = GuardedHTTPSConnection("api.icicidirect.com")
         conn.request("DELETE", "/breezeapi/api/v1/order", payload, headers)
         res = conn.getresponse()
 
@@ -574,7 +575,7 @@ def modify_order(data,auth):
         'X-SessionToken': auth
     }
 
-    conn = http.client.HTTPSConnection("api.icicidirect.com")
+    conn = GuardedHTTPSConnection("api.icicidirect.com")
     conn.request("PUT", "/breezeapi/api/v1/order", payload, headers)
     res = conn.getresponse()
 
@@ -602,17 +603,7 @@ def cancel_all_orders_api(data,auth):
                         if order['status'] in ['Ordered']]
     print(orders_to_cancel)
     print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['order_id']
-        cancel_response, status_code = cancel_order(orderid,AUTH_TOKEN)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['order_id'] for order in orders_to_cancel]
+    return cancel_orders('icici', order_ids, lambda orderid: cancel_order(orderid, AUTH_TOKEN))
 
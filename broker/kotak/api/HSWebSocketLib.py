@@ -1105,7 +1105,9 @@ class StartServer:
 
         if ws:
             # print("WS is a array buffer ")
-            self.hsWrapper = HSWrapper()
+            # memoryview/struct based decoder, same output as HSWrapper
+            from .hs_decoder import HSDecoder
+            self.hsWrapper = HSDecoder()
             # print("HS WRAPPER IS DONE ")
         else:
             print("WebSocket not initialized!")
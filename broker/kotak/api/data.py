@@ -1,202 +1,303 @@
 from .HSWebSocketLib import HSWebSocket
 import json
-import time
 import threading
 import logging
 import pandas as pd
 from database.token_db import get_token
+from services.market_data_gateway import market_data_gateway, account_key
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class KotakWebSocket:
-    def __init__(self):
-        self.ws = HSWebSocket()
-        self.last_quote = None
-        self.last_depth = None  # Add depth data storage
+EXCHANGE_MAP = {'NSE': 'nse_cm', 'BSE': 'bse_cm', 'NFO': 'nse_fo',
+                "BFO": "bse_fo", "CDS": "cde_fo", "MCX": "mcx_fo",
+                "NSE_INDEX": "nse_cm", "BSE_INDEX": "bse_cm"
+                }
 
-    def _send_messages(self, token, sid, exchange, scrip, message_type):
+# Seconds a quote/depth request waits for the first tick of a new subscription
+TICK_TIMEOUT = 1.0
+
+# Seconds between reconnect attempts after the stream drops
+RECONNECT_DELAY = 2.0
+
+# Subscribe / unsubscribe request types per mode
+SUBSCRIBE_TYPES = {'quote': ('mws', 'mwu'), 'depth': ('dps', 'dpu')}
+
+DEFAULT_QUOTE = {
+    'bid': 0, 'ask': 0, 'open': 0,
+    'high': 0, 'low': 0, 'ltp': 0,
+    'prev_close': 0, 'volume': 0
+}
+
+
+def _default_depth():
+    return {
+        'bids': [{'price': 0, 'quantity': 0} for _ in range(5)],
+        'asks': [{'price': 0, 'quantity': 0} for _ in range(5)],
+        'totalbuyqty': 0,
+        'totalsellqty': 0,
+        'ltp': 0,
+        'ltq': 0,
+        'volume': 0,
+        'open': 0,
+        'high': 0,
+        'low': 0,
+        'prev_close': 0,
+        'oi': 0
+    }
+
+
+def format_quote(msg):
+    """Quote dict from accumulated scrip ('sf') or index ('if') fields"""
+    if msg.get('name') == 'if':
+        return {
+            'bid': 0, 'ask': 0,
+            'open': float(msg.get('openingPrice', 0)),
+            'high': float(msg.get('highPrice', 0)),
+            'low': float(msg.get('lowPrice', 0)),
+            'ltp': float(msg.get('iv', 0)),
+            'prev_close': float(msg.get('ic', 0)),
+            'volume': 0
+        }
+    return {
+        'bid': float(msg.get('bp', 0)),
+        'ask': float(msg.get('sp', 0)),
+        'open': float(msg.get('op', 0)),
+        'high': float(msg.get('h', 0)),
+        'low': float(msg.get('lo', 0)),
+        'ltp': float(msg.get('ltp', 0)),
+        'prev_close': float(msg.get('c', 0)),
+        'volume': float(msg.get('v', 0))
+    }
+
+
+def format_depth(msg):
+    """Depth dict from accumulated depth ('dp') fields"""
+    bids = []
+    asks = []
+
+    # Process best 5 bids
+    for i in range(5):
+        price_key = f'bp{i}' if i > 0 else 'bp'
+        qty_key = f'bq{i}' if i > 0 else 'bq'
+        bids.append({
+            'price': float(msg.get(price_key, 0)),
+            'quantity': int(msg.get(qty_key, 0))
+        })
+
+    # Process best 5 asks
+    for i in range(5):
+        price_key = f'sp{i}' if i > 0 else 'sp'
+        qty_key = f'bs{i}' if i > 0 else 'bs'
+        asks.append({
+            'price': float(msg.get(price_key, 0)),
+            'quantity': int(msg.get(qty_key, 0))
+        })
+
+    depth = _default_depth()
+    depth.update({
+        'bids': bids,
+        'asks': asks,
+        'totalbuyqty': sum(bid['quantity'] for bid in bids),
+        'totalsellqty': sum(ask['quantity'] for ask in asks)
+    })
+    return depth
+
+
+class KotakStream:
+    """
+    Persistent HSWebSocket feed for one Kotak account, used as the market
+    data gateway's upstream stream.
+
+    HSWebSocketLib keeps its socket in a module-level global and blocks in
+    run_forever(), so the connection runs on its own daemon thread and only
+    one stream can be live per process. Updates from the feed carry only
+    the fields that changed; they are merged into the last known state of
+    the topic before a tick is published.
+    """
+
+    def __init__(self, ws_url, auth_token, sid, publish):
+        self.ws_url = ws_url
+        self.auth_token = auth_token
+        self.sid = sid
+        self.publish = publish
+        self._lock = threading.Lock()
+        self._scrips = {}   # (kotak_exchange, token, mode) -> {(symbol, exchange)}
+        self._state = {}    # (topic name, kotak_exchange, token) -> merged fields
+        self._ws = None
+        self._connected = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._closed.clear()
+            self._thread = threading.Thread(target=self._run, name='kotak-market-data', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._ws = HSWebSocket()
+            try:
+                # Blocks until the connection closes
+                self._ws.open_connection(
+                    url=self.ws_url,
+                    token=self.auth_token,
+                    sid=self.sid,
+                    on_open=self._on_open,
+                    on_message=self._on_message,
+                    on_error=lambda error: logger.error(f"WebSocket error: {error}"),
+                    on_close=lambda: logger.info("WebSocket connection closed")
+                )
+            except Exception as e:
+                logger.error(f"Kotak market data stream failed: {e}")
+            self._connected.clear()
+            self._closed.wait(RECONNECT_DELAY)
+
+    def _on_open(self):
+        threading.Thread(target=self._handshake, daemon=True).start()
+
+    def _handshake(self):
         try:
-            # Send connection request
-            self.ws.hs_send(json.dumps({
+            self._ws.hs_send(json.dumps({
                 "type": "cn",
-                "Authorization": token,
-                "Sid": sid
+                "Authorization": self.auth_token,
+                "Sid": self.sid
             }))
             logger.info("Sent connection request")
-
-            # Send depth subscription request
-            self.ws.hs_send(json.dumps({
-                "type": message_type,  # Use message_type for flexibility
-                "scrips": f"{exchange}|{scrip}",
-                "channelnum": "1"
-            }))
-            logger.info(f"Sent {message_type} subscription request")
+            with self._lock:
+                self._state.clear()
+                scrips = list(self._scrips)
+            self._connected.set()
+            # Restore every active subscription after a (re)connect
+            for kotak_exchange, token, mode in scrips:
+                self._send(mode, f"{kotak_exchange}|{token}", subscribe=True)
         except Exception as e:
-            logger.error(f"Error in _send_messages: {e}")
+            logger.error(f"Error in Kotak stream handshake: {e}")
+
+    def _send(self, mode, scrip, subscribe):
+        request_type = SUBSCRIBE_TYPES[mode][0 if subscribe else 1]
+        self._ws.hs_send(json.dumps({
+            "type": request_type,
+            "scrips": scrip,
+            "channelnum": "1"
+        }))
+        logger.info(f"Sent {request_type} request for {scrip}")
+
+    def _resolve(self, symbol, exchange):
+        token = get_token(symbol, exchange)
+        if not token:
+            raise ValueError(f"Token not found for {symbol} on {exchange}")
+        kotak_exchange = EXCHANGE_MAP.get(exchange)
+        if not kotak_exchange:
+            raise ValueError(f"Unsupported exchange: {exchange}")
+        return kotak_exchange, str(token)
+
+    def subscribe(self, symbol, exchange, mode):
+        kotak_exchange, token = self._resolve(symbol, exchange)
+        key = (kotak_exchange, token, mode)
+        with self._lock:
+            first = key not in self._scrips
+            self._scrips.setdefault(key, set()).add((symbol, exchange))
+        self._ensure_running()
+        if first and self._connected.is_set():
+            self._send(mode, f"{kotak_exchange}|{token}", subscribe=True)
 
-    def on_message(self, message):
+    def unsubscribe(self, symbol, exchange, mode):
+        kotak_exchange, token = self._resolve(symbol, exchange)
+        key = (kotak_exchange, token, mode)
+        with self._lock:
+            targets = self._scrips.get(key)
+            if not targets:
+                return
+            targets.discard((symbol, exchange))
+            last = not targets
+            if last:
+                del self._scrips[key]
+        if last and self._connected.is_set():
+            self._send(mode, f"{kotak_exchange}|{token}", subscribe=False)
+
+    def _on_message(self, message):
         try:
             data = json.loads(message) if isinstance(message, str) else message
-            if data and isinstance(data, list) and len(data) > 0:
-                msg = data[0]
-                if isinstance(msg, dict):
-                    if 'name' in msg and msg['name'] == 'dp':  # Check for depth data
-                        # Process depth data
-                        bids = []
-                        asks = []
-
-                        # Process best 5 bids
-                        for i in range(5):
-                            price_key = f'bp{i}' if i > 0 else 'bp'
-                            qty_key = f'bq{i}' if i > 0 else 'bq'
-                            
-                            price = float(msg.get(price_key, 0))
-                            bids.append({
-                                'price': price,
-                                'quantity': int(msg.get(qty_key, 0))
-                            })
-
-                        # Process best 5 asks
-                        for i in range(5):
-                            price_key = f'sp{i}' if i > 0 else 'sp'
-                            qty_key = f'bs{i}' if i > 0 else 'bs'
-                            
-                            price = float(msg.get(price_key, 0))
-                            asks.append({
-                                'price': price,
-                                'quantity': int(msg.get(qty_key, 0))
-                            })
-
-                        self.last_depth = {
-                            'bids': bids,
-                            'asks': asks,
-                            'totalbuyqty': sum(bid['quantity'] for bid in bids),
-                            'totalsellqty': sum(ask['quantity'] for ask in asks)
-                        }
-                        self.ws.close()
-                    elif 'ltp' in msg:
-                        self.last_quote = {
-                            'bid': float(msg.get('bp', 0)),
-                            'ask': float(msg.get('sp', 0)),
-                            'open': float(msg.get('op', 0)),
-                            'high': float(msg.get('h', 0)),
-                            'low': float(msg.get('lo', 0)),
-                            'ltp': float(msg.get('ltp', 0)),
-                            'prev_close': float(msg.get('c', 0)),
-                            'volume': float(msg.get('v', 0))
-                        }
-                        self.ws.close()
+            if not isinstance(data, list):
+                return
+            for msg in data:
+                if not isinstance(msg, dict) or 'tk' not in msg:
+                    continue
+                mode = 'depth' if msg.get('name') == 'dp' else 'quote'
+                topic = (msg.get('name'), msg.get('e'), msg.get('tk'))
+                with self._lock:
+                    state = self._state.setdefault(topic, {})
+                    state.update(msg)
+                    targets = list(self._scrips.get((msg.get('e'), msg.get('tk'), mode), ()))
+                    tick = format_depth(state) if mode == 'depth' else format_quote(state)
+                for symbol, exchange in targets:
+                    self.publish(symbol, exchange, mode, tick)
         except Exception as e:
             logger.error(f"Error processing message: {e}")
-            self.ws.close()
-
-    def on_open(self, token, sid, exchange, scrip, message_type):  # Add message_type parameter
-        threading.Thread(target=self._send_messages, 
-                       args=(token, sid, exchange, scrip, message_type)).start()
-
-    def connect(self, url, token, sid, exchange, scrip, message_type):  # Add message_type parameter
-        self.ws.open_connection(
-            url=url,
-            token=token,
-            sid=sid,
-            on_open=lambda: self.on_open(token, sid, exchange, scrip, message_type),
-            on_message=self.on_message,
-            on_error=lambda error: logger.error(f"WebSocket error: {error}"),
-            on_close=lambda: logger.info("WebSocket connection closed")
-        )
+
+    def close(self):
+        self._closed.set()
+        self._connected.clear()
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+
+
+# HSWebSocketLib supports a single live socket per process
+_active_stream = None
+_active_stream_lock = threading.Lock()
+
 
 class BrokerData:
     def __init__(self, auth_token):
         self.auth_token, self.sid, _, _ = auth_token.split(":::")
         self.ws_url = "wss://mlhsm.kotaksecurities.com"
+        self.account = account_key(auth_token)
         # Define empty timeframe map since Kotak Neo doesn't support historical data
         self.timeframe_map = {
             # Empty mapping to maintain compatibility
         }
         logger.warning("Kotak Neo does not support historical data intervals")
 
+    def create_stream(self, publish):
+        """Upstream feed for the market data gateway (replaces any previous session's stream)"""
+        global _active_stream
+        with _active_stream_lock:
+            if _active_stream is not None:
+                _active_stream.close()
+            _active_stream = KotakStream(self.ws_url, self.auth_token, self.sid, publish)
+            return _active_stream
+
     def get_quotes(self, symbol, exchange):
         try:
-            token = get_token(symbol, exchange)
-            if not token:
-                raise ValueError(f"Token not found for {symbol} on {exchange}")
-
-            exchange_map = {'NSE': 'nse_cm', 'BSE': 'bse_cm', 'NFO': 'nse_fo',
-                            "BFO": "bse_fo", "CDS": "cde_fo", "MCX": "mcx_fo", 
-                            "NSE_INDEX": "nse_cm", "BSE_INDEX": "bse_cm"
-                            }
-            kotak_exchange = exchange_map.get(exchange)
-            if not kotak_exchange:
+            if exchange not in EXCHANGE_MAP:
                 raise ValueError(f"Unsupported exchange: {exchange}")
 
-            ws = KotakWebSocket()
-            ws.connect(self.ws_url, self.auth_token, self.sid, kotak_exchange, token, "mws")  # Changed to "mws"
-            time.sleep(0.2)
-
-            return ws.last_quote or {
-                'bid': 0, 'ask': 0, 'open': 0,
-                'high': 0, 'low': 0, 'ltp': 0,
-                'prev_close': 0, 'volume': 0
-            }
+            # Served from the shared persistent stream instead of a socket per call
+            quote = market_data_gateway.snapshot('kotak', self.account, self, symbol, exchange,
+                                                 'quote', timeout=TICK_TIMEOUT)
+            return quote or dict(DEFAULT_QUOTE)
         except Exception as e:
             logger.error(f"Error in get_quotes: {e}")
-            return {
-                'bid': 0, 'ask': 0, 'open': 0,
-                'high': 0, 'low': 0, 'ltp': 0,
-                'prev_close': 0, 'volume': 0
-            }
+            return dict(DEFAULT_QUOTE)
 
     def get_depth(self, symbol: str, exchange: str) -> dict:
         """Get market depth for given symbol"""
         try:
-            token = get_token(symbol, exchange)
-            if not token:
-                raise ValueError(f"Token not found for {symbol} on {exchange}")
-
-            exchange_map = {'NSE': 'nse_cm', 'BSE': 'bse_cm', 'NFO': 'nse_fo'}
-            kotak_exchange = exchange_map.get(exchange)
-            if not kotak_exchange:
+            if exchange not in ('NSE', 'BSE', 'NFO'):
                 raise ValueError(f"Unsupported exchange: {exchange}")
 
-            ws = KotakWebSocket()
-            ws.connect(self.ws_url, self.auth_token, self.sid, kotak_exchange, token, "dpsp")
-            time.sleep(0.2)
-
-            # Return depth data or default structure
-            default_depth = {
-                'bids': [{'price': 0, 'quantity': 0} for _ in range(5)],
-                'asks': [{'price': 0, 'quantity': 0} for _ in range(5)],
-                'totalbuyqty': 0,
-                'totalsellqty': 0,
-                'ltp': 0,
-                'ltq': 0,
-                'volume': 0,
-                'open': 0,
-                'high': 0,
-                'low': 0,
-                'prev_close': 0,
-                'oi': 0
-            }
-
-            return ws.last_depth or default_depth
+            depth = market_data_gateway.snapshot('kotak', self.account, self, symbol, exchange,
+                                                 'depth', timeout=TICK_TIMEOUT)
+            return depth or _default_depth()
 
         except Exception as e:
             logger.error(f"Error in get_depth: {e}")
-            return {
-                'bids': [{'price': 0, 'quantity': 0} for _ in range(5)],
-                'asks': [{'price': 0, 'quantity': 0} for _ in range(5)],
-                'totalbuyqty': 0,
-                'totalsellqty': 0,
-                'ltp': 0,
-                'ltq': 0,
-                'volume': 0,
-                'open': 0,
-                'high': 0,
-                'low': 0,
-                'prev_close': 0,
-                'oi': 0
-            }
+            return _default_depth()
 
     def get_history(self, symbol: str, exchange: str, interval: str, start_date: str, end_date: str) -> pd.DataFrame:
         """Placeholder for historical data - not supported by Kotak Neo"""
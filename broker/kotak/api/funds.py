@@ -1,6 +1,7 @@
 # api/funds.py
 import urllib.parse
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 
 def get_margin_data(auth_token):
@@ -11,7 +12,7 @@ def get_margin_data(auth_token):
     hsServerId = access_token_parts[2]
     access_token = access_token_parts[3]
     
-    conn = http.client.HTTPSConnection("gw-napi.kotaksecurities.com")
+    conn = GuardedHTTPSConnection("gw-napi.kotaksecurities.com")
     payload = 'jData=%7B%22seg%22%3A%22ALL%22%2C%22exch%22%3A%22ALL%22%2C%22prod%22%3A%22ALL%22%7D'
     query_params = {"sId": hsServerId}
     headers = {
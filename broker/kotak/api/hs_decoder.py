@@ -0,0 +1,269 @@
+"""
+Zero-copy decoder for Kotak HSM binary market data frames.
+
+`HSDecoder.parseData` is a drop-in replacement for `HSWrapper.parseData`
+that returns the same list of dicts for data frames, but reads the frame
+through a `memoryview` with precompiled `struct.Struct` unpackers (all long
+fields of a record in one call) instead of slicing and `int.from_bytes` per
+field, and keeps one reusable `__slots__` topic object per topic id instead
+of rebuilding 100-element field arrays for every snapshot.
+
+Control frames (connection, subscribe, snapshot acks, ...) are rare and are
+delegated to the original `HSWrapper` implementation.
+
+Differences from HSWrapper on malformed input: an update for an unknown
+topic id is skipped instead of raising KeyError, and a zero close price
+leaves the percentage change unset instead of raising ZeroDivisionError.
+"""
+import struct
+import logging
+
+from . import HSWebSocketLib as hs
+
+logger = logging.getLogger(__name__)
+
+_U16 = struct.Struct('>H')
+_U32 = struct.Struct('>I')
+_LONGS = {}  # field count -> Struct('>nI')
+
+_DATA_TYPE = hs.BinRespTypes["DATA_TYPE"]
+_SNAP = hs.ResponseTypes["SNAP"]
+_UPDATE = hs.ResponseTypes["UPDATE"]
+_FLOAT32 = hs.FieldTypes["FLOAT32"]
+_DATE = hs.FieldTypes["DATE"]
+_TRASH_VAL = hs.TRASH_VAL
+_FIELD_SLOTS = 100
+
+_NAME = hs.STRING_INDEX["NAME"]
+_SYMBOL = hs.STRING_INDEX["SYMBOL"]
+_EXCHG = hs.STRING_INDEX["EXCHG"]
+_TSYMBOL = hs.STRING_INDEX["TSYMBOL"]
+
+_SCRIP, _INDEX, _DEPTH = 0, 1, 2
+
+
+def _longs(count):
+    unpacker = _LONGS.get(count)
+    if unpacker is None:
+        unpacker = _LONGS[count] = struct.Struct(f'>{count}I')
+    return unpacker
+
+
+class _TopicSpec:
+    """Per feed type constants: field index -> (name, type) and scaling fields"""
+    __slots__ = ('kind', 'feed_type', 'fields', 'multiplier_index', 'precision_index')
+
+    def __init__(self, kind, feed_type, mapping, multiplier_index, precision_index):
+        self.kind = kind
+        self.feed_type = feed_type
+        self.fields = [None] * _FIELD_SLOTS
+        for index, data_type in enumerate(mapping):
+            if data_type:
+                self.fields[index] = (data_type["name"], data_type["type"])
+        self.multiplier_index = multiplier_index
+        self.precision_index = precision_index
+
+
+_SPECS = {
+    hs.TopicTypes["SCRIP"]: _TopicSpec(_SCRIP, hs.TopicTypes["SCRIP"], hs.SCRIP_MAPPING,
+                                       hs.SCRIP_INDEX["MULTIPLIER"], hs.SCRIP_INDEX["PRECISION"]),
+    hs.TopicTypes["INDEX"]: _TopicSpec(_INDEX, hs.TopicTypes["INDEX"], hs.INDEX_MAPPING,
+                                       hs.INDEX_INDEX["MULTIPLIER"], hs.INDEX_INDEX["PRECISION"]),
+    hs.TopicTypes["DEPTH"]: _TopicSpec(_DEPTH, hs.TopicTypes["DEPTH"], hs.DEPTH_MAPPING,
+                                       hs.DEPTH_INDEX["MULTIPLIER"], hs.DEPTH_INDEX["PRECISION"]),
+}
+
+
+class Topic:
+    """Reusable field store for one subscribed topic (scrip, index or depth)"""
+    __slots__ = ('spec', 'values', 'updated', 'touched', 'multiplier', 'precision', 'precision_value')
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.values = [None] * _FIELD_SLOTS
+        self.updated = bytearray(_FIELD_SLOTS)
+        self.touched = []
+        self.reset()
+
+    def reset(self):
+        values = self.values
+        for index in range(_FIELD_SLOTS):
+            values[index] = None
+        values[_NAME] = self.spec.feed_type
+        for index in self.touched:
+            self.updated[index] = 0
+        self.touched.clear()
+        self.multiplier = None
+        self.precision = None
+        self.precision_value = None
+
+    def _mark(self, index):
+        if not self.updated[index]:
+            self.updated[index] = 1
+            self.touched.append(index)
+
+    def set_longs(self, longs):
+        values, updated, touched = self.values, self.updated, self.touched
+        for index, value in enumerate(longs):
+            if values[index] != value and value != _TRASH_VAL:
+                values[index] = value
+                if not updated[index]:
+                    updated[index] = 1
+                    touched.append(index)
+
+    def set_string(self, field_id, value):
+        if field_id == _SYMBOL or field_id == _EXCHG:
+            self.values[field_id] = value
+        elif field_id == _TSYMBOL:
+            self.values[field_id] = value
+            self._mark(field_id)
+
+    def set_multiplier_and_precision(self):
+        spec = self.spec
+        if self.updated[spec.precision_index]:
+            self.precision = self.values[spec.precision_index]
+            self.precision_value = 10 ** self.precision
+        if self.updated[spec.multiplier_index]:
+            self.multiplier = self.values[spec.multiplier_index]
+
+    def _derive(self):
+        """Change / percent change (and turnover for scrips) like the *TopicData classes"""
+        values, updated, kind = self.values, self.updated, self.spec.kind
+        if kind == _SCRIP:
+            ltp_index, close_index = hs.SCRIP_INDEX["LTP"], hs.SCRIP_INDEX["CLOSE"]
+            change_index, percent_index = hs.SCRIP_INDEX["CHANGE"], hs.SCRIP_INDEX["PERCHANGE"]
+        elif kind == _INDEX:
+            ltp_index, close_index = hs.INDEX_INDEX["LTP"], hs.INDEX_INDEX["CLOSE"]
+            change_index, percent_index = hs.INDEX_INDEX["CHANGE"], hs.INDEX_INDEX["PERCHANGE"]
+        else:
+            return
+
+        if updated[ltp_index] or updated[close_index]:
+            ltp, close = values[ltp_index], values[close_index]
+            if ltp is not None and close is not None:
+                change = ltp - close
+                values[change_index] = change
+                self._mark(change_index)
+                if close:
+                    if kind == _SCRIP:
+                        values[percent_index] = "{:.2f}".format(change / close * 100)
+                    else:
+                        values[percent_index] = round(change / close * 100, self.precision)
+                    self._mark(percent_index)
+
+        if kind == _SCRIP:
+            volume_index, vwap_index = hs.SCRIP_INDEX["VOLUME"], hs.SCRIP_INDEX["VWAP"]
+            if updated[volume_index] or updated[vwap_index]:
+                volume, vwap = values[volume_index], values[vwap_index]
+                if volume is not None and vwap is not None:
+                    values[hs.SCRIP_INDEX["TURNOVER"]] = volume * vwap
+                    self._mark(hs.SCRIP_INDEX["TURNOVER"])
+
+    def prepare(self):
+        """Dict of the fields updated since the last call, in field order"""
+        self._mark(_NAME)
+        self._mark(_EXCHG)
+        self._mark(_SYMBOL)
+        self._derive()
+
+        spec_fields, values, kind = self.spec.fields, self.values, self.spec.kind
+        updated, touched = self.updated, self.touched
+        touched.sort()
+        result = {}
+        for index in touched:
+            updated[index] = 0
+            field = spec_fields[index]
+            value = values[index]
+            if field is None or value is None:
+                continue
+            name, field_type = field
+            if field_type == _FLOAT32:
+                scaled = value / (self.multiplier * self.precision_value)
+                value = "{:.2f}".format(scaled) if kind == _SCRIP else round(scaled, self.precision)
+            elif field_type == _DATE:
+                value = hs.getFormatDate(value)
+            result[name] = str(value)
+        touched.clear()
+        return result
+
+
+class HSDecoder(hs.HSWrapper):
+    """HSWrapper with a fast path for data frames"""
+
+    def __init__(self):
+        super().__init__()
+        self.topics = {}  # topic id -> Topic
+
+    def parseData(self, e):
+        view = memoryview(e)
+        if len(view) < 3 or view[2] != _DATA_TYPE:
+            return super().parseData(bytes(e))
+        return self._parse_data_frame(view, 3)
+
+    def _parse_data_frame(self, view, pos):
+        if self.ack_num > 0:
+            self.counter += 1
+            msg_num = _U32.unpack_from(view, pos)[0]
+            pos += 4
+            if self.counter == self.ack_num:
+                ws = getattr(hs, 'ws', None)
+                if ws:
+                    ws.send(hs.get_acknowledgement_req(msg_num), 0x2)
+                    self.counter = 0
+
+        topics = self.topics
+        result = []
+        record_count = _U16.unpack_from(view, pos)[0]
+        pos += 2
+        for _ in range(record_count):
+            pos += 2
+            response_type = view[pos]
+            pos += 1
+            if response_type == _SNAP:
+                topic_id = _U32.unpack_from(view, pos)[0]
+                pos += 4
+                name_len = view[pos]
+                pos += 1
+                topic_name = bytes(view[pos:pos + name_len]).decode('latin-1')
+                pos += name_len
+                spec = _SPECS.get(topic_name.split('|', 1)[0])
+                if spec is None:
+                    logger.warning(f"Invalid topic feed type: {topic_name}")
+                    continue
+                topic = topics.get(topic_id)
+                if topic is None or topic.spec is not spec:
+                    topic = topics[topic_id] = Topic(spec)
+                else:
+                    topic.reset()
+
+                field_count = view[pos]
+                pos += 1
+                topic.set_longs(_longs(field_count).unpack_from(view, pos))
+                pos += 4 * field_count
+                topic.set_multiplier_and_precision()
+
+                field_count = view[pos]
+                pos += 1
+                for _ in range(field_count):
+                    field_id = view[pos]
+                    data_len = view[pos + 1]
+                    pos += 2
+                    topic.set_string(field_id, bytes(view[pos:pos + data_len]).decode('latin-1'))
+                    pos += data_len
+                result.append(topic.prepare())
+            elif response_type == _UPDATE:
+                topic_id = _U32.unpack_from(view, pos)[0]
+                pos += 4
+                field_count = view[pos]
+                pos += 1
+                topic = topics.get(topic_id)
+                if topic is None:
+                    logger.debug(f"Update for unknown topic id {topic_id}")
+                    pos += 4 * field_count
+                    continue
+                topic.set_longs(_longs(field_count).unpack_from(view, pos))
+                pos += 4 * field_count
+                result.append(topic.prepare())
+            else:
+                raise ValueError(f"Invalid ResponseType: {response_type}")
+        return result
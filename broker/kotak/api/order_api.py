@@ -1,9 +1,11 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import urllib.parse
 import os
 import logging
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_token , get_br_symbol, get_symbol
 from broker.kotak.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data, reverse_map_exchange,map_exchange
 
@@ -14,7 +16,7 @@ def get_api_response(endpoint, auth_token, method="GET", payload=''):
 
     token, sid, hsServerId, access_token = auth_token.split(":::")
 
-    conn = http.client.HTTPSConnection("gw-napi.kotaksecurities.com")
+    conn = GuardedHTTPSConnection("gw-napi.kotaksecurities.com")
     payload = ''
     query_params = {"sId": hsServerId}
     headers = {
@@ -63,7 +65,7 @@ def get_open_position(tradingsymbol, exchange, producttype, auth_token):
 def place_order_api(data, auth_token):
     token, sid, hsServerId, access_token = auth_token.split(":::")
     
-    conn = http.client.HTTPSConnection("gw-napi.kotaksecurities.com")
+    conn = GuardedHTTPSConnection("gw-napi.kotaksecurities.com")
     token_id = get_token(data['symbol'], data['exchange'])
     newdata = transform_data(data, token_id)
     
@@ -176,6 +178,7 @@ def close_all_positions(current_api_key, auth_token):
         return {"message": "No Open Positions Found"}, 200
 
     if positions_response['data']:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response['data']:
             # Skip if net quantity is zero
@@ -212,21 +215,17 @@ def close_all_positions(current_api_key, auth_token):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            res, response, orderid =   place_order_api(place_order_payload, auth_token)
+            place_order_payloads.append(place_order_payload)
 
-            print(res)
-            print(response)
-            print(orderid)
-
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('kotak', place_order_payloads, lambda payload: place_order_api(payload, auth_token))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
 def cancel_order(orderid, auth_token):
     token, sid, hsServerId, access_token = auth_token.split(":::")
     
-    conn = http.client.HTTPSConnection("gw-napi.kotaksecurities.com")
+    conn = GuardedHTTPSConnection("gw-napi.kotaksecurities.com")
     payload = f'jData={urllib.parse.quote(json.dumps({"on": orderid}))}'
     query_params = {"sId": hsServerId}
 
@@ -255,7 +254,7 @@ def cancel_order(orderid, auth_token):
 def modify_order(data, auth_token):
     token, sid, hsServerId, access_token = auth_token.split(":::")
     
-    conn = http.client.HTTPSConnection("gw-napi.kotaksecurities.com")
+    conn = GuardedHTTPSConnection("gw-napi.kotaksecurities.com")
     token_id = get_token(data['symbol'], data['exchange'])
     newdata = transform_modify_order_data(data, token_id)
     
@@ -295,17 +294,8 @@ def cancel_all_orders_api(data, auth_token):
     orders_to_cancel = [order for order in order_book_response.get('data', [])
                         if order['ordSt'] in ['open', 'trigger pending']]
     #print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
     print(orders_to_cancel)
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['nOrdNo']
-        cancel_response, status_code = cancel_order(orderid, auth_token)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['nOrdNo'] for order in orders_to_cancel]
+    return cancel_orders('kotak', order_ids, lambda orderid: cancel_order(orderid, auth_token))
 
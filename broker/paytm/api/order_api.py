@@ -5,6 +5,7 @@ import httpx
 import logging
 from utils.httpx_client import get_httpx_client
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_br_symbol, get_oa_symbol, get_token
 from broker.paytm.mapping.transform_data import (
     transform_data,
@@ -390,6 +391,7 @@ def close_all_positions(current_api_key, auth):
         print(f"Found {total_positions} positions")
         
         # Loop through each position to close
+        order_payloads = []
         for position in positions_response['data']:
             # Get quantity - handle different field names
             net_qty = position.get('net_qty', position.get('netQty', '0'))
@@ -452,7 +454,9 @@ def close_all_positions(current_api_key, auth):
             }
             
             print(f"Placing Order: {order_payload}")
-            
+            order_payloads.append(order_payload)
+
+        def place_squareoff_order(order_payload):
             # Place the order directly without transform
             response = get_api_response(
                 endpoint="/orders/v1/place/regular",
@@ -460,14 +464,19 @@ def close_all_positions(current_api_key, auth):
                 method="POST",
                 payload=json.dumps(order_payload)
             )
-            
             print(f"Order Response: {response}")
-            
-            if response.get('status') == 'success':
-                print(f"Successfully closed position for {pos_security_id} ({pos_display_name})")
+            orderid = response['data'][0].get('order_no') if response.get('status') == 'success' and response.get('data') else None
+            return None, response, orderid
+
+        # Place the orders to close the positions concurrently
+        for result in place_orders('paytm', order_payloads, place_squareoff_order):
+            pos_security_id = result.item['security_id']
+            if result.ok and result.value[1].get('status') == 'success':
+                print(f"Successfully closed position for {pos_security_id}")
                 successful_closes += 1
             else:
-                print(f"Failed to close position for {pos_security_id} ({pos_display_name}): {response.get('message')}")
+                message = result.value[1].get('message') if result.ok else str(result.error)
+                print(f"Failed to close position for {pos_security_id}: {message}")
                 failed_closes += 1
 
     # Report on success/failures
@@ -598,16 +607,6 @@ def cancel_all_orders_api(data, auth):
     orders_to_cancel = [order for order in order_book_response.get('data', [])
                         if order['status'] in ['Pending']]
     print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['order_no']
-        cancel_response, status_code = cancel_order(orderid, auth)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['order_no'] for order in orders_to_cancel]
+    return cancel_orders('paytm', order_ids, lambda orderid: cancel_order(orderid, auth))
@@ -1,5 +1,6 @@
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 
 def get_margin_data(auth_token):
@@ -23,7 +24,7 @@ def get_margin_data(auth_token):
     payload = "jData=" + json.dumps(data) + "&jKey=" + auth_token
 
     # Initialize HTTP connection
-    conn = http.client.HTTPSConnection(url)
+    conn = GuardedHTTPSConnection(url)
 
     # Set headers
     headers = {
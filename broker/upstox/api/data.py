@@ -1,4 +1,5 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 from database.token_db import get_token, get_br_symbol, get_oa_symbol
@@ -11,7 +12,7 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
     """Common function to make API calls to Upstox"""
     AUTH_TOKEN = auth
     
-    conn = http.client.HTTPSConnection("api.upstox.com")
+    conn = GuardedHTTPSConnection("api.upstox.com")
     headers = {
         'Authorization': f'Bearer {AUTH_TOKEN}',
         'Accept': 'application/json',
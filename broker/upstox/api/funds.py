@@ -2,6 +2,7 @@
 
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 from broker.upstox.api.order_api import get_positions
 from broker.upstox.mapping.order_data import map_order_data
@@ -9,7 +10,7 @@ from broker.upstox.mapping.order_data import map_order_data
 def get_margin_data(auth_token):
     """Fetch margin data from Upstox's API using the provided auth token."""
     api_key = os.getenv('BROKER_API_KEY')
-    conn = http.client.HTTPSConnection("api.upstox.com")
+    conn = GuardedHTTPSConnection("api.upstox.com")
     headers = {
         'Authorization': f'Bearer {auth_token}',
         'Content-Type': 'application/json',
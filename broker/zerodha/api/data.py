@@ -1,9 +1,13 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection, CircuitOpenError
 import json
 import os
 import urllib.parse
 from database.token_db import get_br_symbol, get_oa_symbol
 from broker.zerodha.database.master_contract_db import SymToken, db_session
+from utils.concurrency import chunked, map_concurrent
+from utils.history_chunks import plan_windows, fetch_windows
+from utils.token_bucket import get_bucket
 import logging
 import pandas as pd
 from datetime import datetime, timedelta
@@ -22,7 +26,7 @@ class ZerodhaAPIError(Exception):
 
 def get_api_response(endpoint, auth, method="GET", payload=''):
     AUTH_TOKEN = auth
-    conn = http.client.HTTPSConnection("api.kite.trade")
+    conn = GuardedHTTPSConnection("api.kite.trade")
     headers = {
         'X-Kite-Version': '3',
         'Authorization': f'token {AUTH_TOKEN}',
@@ -64,11 +68,20 @@ def get_api_response(endpoint, auth, method="GET", payload=''):
         raise
     except ZerodhaAPIError:
         raise
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error(f"API request failed: {str(e)}")
         raise ZerodhaAPIError(f"API request failed: {str(e)}")
 
 class BrokerData:
+    # Kite accepts up to 500 instruments per /quote call and allows ~1 quote request/second
+    MAX_QUOTE_INSTRUMENTS = 500
+    MAX_QUOTE_CONCURRENCY = 1
+    # Historical candles: up to 60 days per intraday request, 3 requests/second
+    HISTORY_CHUNK_DAYS = 60
+    HISTORY_RATE_LIMIT = 3
+
     def __init__(self, auth_token):
         """Initialize Zerodha data handler with authentication token"""
         self.auth_token = auth_token
@@ -168,24 +181,88 @@ class BrokerData:
                 raise ZerodhaAPIError("No quote data found")
             
             # Return quote data
-            return {
-                'ask': quote.get('depth', {}).get('sell', [{}])[0].get('price', 0),
-                'bid': quote.get('depth', {}).get('buy', [{}])[0].get('price', 0),
-                'high': quote.get('ohlc', {}).get('high', 0),
-                'low': quote.get('ohlc', {}).get('low', 0),
-                'ltp': quote.get('last_price', 0),
-                'open': quote.get('ohlc', {}).get('open', 0),
-                'prev_close': quote.get('ohlc', {}).get('close', 0),
-                'volume': quote.get('volume', 0)
-            }
+            return self._format_quote(quote)
             
         except ZerodhaPermissionError as e:
             logger.error(f"Permission error fetching quotes: {str(e)}")
             raise
+        except CircuitOpenError:
+            raise
         except (ZerodhaAPIError, Exception) as e:
             logger.error(f"Error fetching quotes: {str(e)}")
             raise ZerodhaAPIError(f"Error fetching quotes: {str(e)}")
 
+    @staticmethod
+    def _format_quote(quote: dict) -> dict:
+        """Convert a Kite quote object to the common quote format"""
+        return {
+            'ask': quote.get('depth', {}).get('sell', [{}])[0].get('price', 0),
+            'bid': quote.get('depth', {}).get('buy', [{}])[0].get('price', 0),
+            'high': quote.get('ohlc', {}).get('high', 0),
+            'low': quote.get('ohlc', {}).get('low', 0),
+            'ltp': quote.get('last_price', 0),
+            'open': quote.get('ohlc', {}).get('open', 0),
+            'prev_close': quote.get('ohlc', {}).get('close', 0),
+            'volume': quote.get('volume', 0)
+        }
+
+    def get_multi_quotes(self, symbols: list) -> list:
+        """
+        Get real-time quotes for many symbols using Kite's batch /quote API
+        Args:
+            symbols: List of dicts with 'symbol' and 'exchange' keys
+        Returns:
+            list: One entry per requested symbol (same order) with 'symbol',
+                  'exchange' and either 'data' or 'error'
+        """
+        # Resolve every symbol to its Kite instrument key (EXCHANGE:TRADINGSYMBOL)
+        instrument_keys = []
+        for item in symbols:
+            br_symbol = get_br_symbol(item['symbol'], item['exchange'])
+            if not br_symbol:
+                instrument_keys.append(None)
+                continue
+            exchange = item['exchange']
+            if exchange == "NSE_INDEX":
+                exchange = "NSE"
+            elif exchange == "BSE_INDEX":
+                exchange = "BSE"
+            instrument_keys.append(f"{exchange}:{br_symbol}")
+
+        unique_keys = list(dict.fromkeys(key for key in instrument_keys if key))
+
+        def fetch_chunk(keys):
+            query = urllib.parse.urlencode([('i', key) for key in keys])
+            response = get_api_response(f"/quote?{query}", self.auth_token)
+            return response.get('data', {}) or {}
+
+        chunks = chunked(unique_keys, self.MAX_QUOTE_INSTRUMENTS)
+        chunk_results = map_concurrent(fetch_chunk, chunks,
+                                       max_workers=self.MAX_QUOTE_CONCURRENCY,
+                                       return_exceptions=True)
+
+        # Merge chunk responses, remembering the error for instruments of failed chunks
+        quotes = {}
+        errors = {}
+        for keys, result in zip(chunks, chunk_results):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching quotes for {len(keys)} instruments: {result}")
+                errors.update({key: str(result) for key in keys})
+            else:
+                quotes.update(result)
+
+        results = []
+        for item, key in zip(symbols, instrument_keys):
+            entry = {'symbol': item['symbol'], 'exchange': item['exchange']}
+            if key is None:
+                entry['error'] = 'Symbol not found'
+            elif key in quotes:
+                entry['data'] = self._format_quote(quotes[key])
+            else:
+                entry['error'] = errors.get(key, 'No quote data found')
+            results.append(entry)
+        return results
+
     def get_history(self, symbol: str, exchange: str, timeframe: str, from_date: str, to_date: str) -> pd.DataFrame:
         """
         Get historical data for given symbol and timeframe
@@ -234,15 +311,7 @@ class BrokerData:
             start_date = pd.to_datetime(from_date)
             end_date = pd.to_datetime(to_date)
             
-            # Initialize empty list to store DataFrames
-            dfs = []
-            
-            # Process data in 60-day chunks
-            current_start = start_date
-            while current_start <= end_date:
-                # Calculate chunk end date (60 days or remaining period)
-                current_end = min(current_start + timedelta(days=59), end_date)
-                
+            def fetch_chunk(current_start, current_end):
                 # Format dates for API call
                 from_str = current_start.strftime('%Y-%m-%d+00:00:00')
                 to_str = current_end.strftime('%Y-%m-%d+23:59:59')
@@ -264,11 +333,15 @@ class BrokerData:
                 # Convert to DataFrame
                 candles = response.get('data', {}).get('candles', [])
                 if candles:
-                    df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                    dfs.append(df)
-                
-                # Move to next chunk
-                current_start = current_end + timedelta(days=1)
+                    return pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                return None
+
+            # Process data in 60-day chunks, fetched concurrently under the rate limit
+            windows = plan_windows(start_date, end_date, self.HISTORY_CHUNK_DAYS)
+            results = fetch_windows(fetch_chunk, windows,
+                                    rate_limiter=get_bucket('zerodha:history', self.HISTORY_RATE_LIMIT),
+                                    no_retry=(ZerodhaPermissionError,))
+            dfs = [df for df in results if df is not None]
                 
             # If no data was found, return empty DataFrame
             if not dfs:
@@ -292,6 +365,8 @@ class BrokerData:
         except ZerodhaPermissionError as e:
             logger.error(f"Permission error fetching historical data: {str(e)}")
             raise
+        except CircuitOpenError:
+            raise
         except (ZerodhaAPIError, Exception) as e:
             logger.error(f"Error fetching historical data: {str(e)}")
             raise ZerodhaAPIError(f"Error fetching historical data: {str(e)}")
@@ -385,6 +460,8 @@ class BrokerData:
         except ZerodhaPermissionError as e:
             logger.error(f"Permission error fetching market depth: {str(e)}")
             raise
+        except CircuitOpenError:
+            raise
         except (ZerodhaAPIError, Exception) as e:
             logger.error(f"Error fetching market depth: {str(e)}")
             raise ZerodhaAPIError(f"Error fetching market depth: {str(e)}")
@@ -2,6 +2,7 @@
 
 import os
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 
 
@@ -9,7 +10,7 @@ def get_margin_data(auth_token):
     """Fetch margin data from Zerodha's API using the provided auth token."""
     api_key = os.getenv('BROKER_API_KEY')
     api_secret = os.getenv('BROKER_API_SECRET')
-    conn = http.client.HTTPSConnection("api.kite.trade")
+    conn = GuardedHTTPSConnection("api.kite.trade")
     headers = {
         'X-Kite-Version': '3',
         'Authorization': f'token {auth_token}',
@@ -1,8 +1,10 @@
 import http.client
+from utils.circuit_breaker import GuardedHTTPSConnection
 import json
 import os
 import urllib.parse
 from database.auth_db import get_auth_token
+from utils.fanout import cancel_orders, place_orders
 from database.token_db import get_br_symbol, get_oa_symbol
 from broker.zerodha.mapping.transform_data import transform_data , map_product_type, reverse_map_product_type, transform_modify_order_data
 
@@ -11,7 +13,7 @@ from broker.zerodha.mapping.transform_data import transform_data , map_product_t
 def get_api_response(endpoint, auth, method="GET", payload=''):
     
     AUTH_TOKEN = auth
-    conn = http.client.HTTPSConnection("api.kite.trade")
+    conn = GuardedHTTPSConnection("api.kite.trade")
     headers = {
         'X-Kite-Version': '3',
         'Authorization': f'token {AUTH_TOKEN}',
@@ -85,7 +87,7 @@ def place_order_api(data,auth):
 
     payload =  urllib.parse.urlencode(payload)
 
-    conn = http.client.HTTPSConnection("api.kite.trade")
+    conn = GuardedHTTPSConnection("api.kite.trade")
     conn.request("POST", "/orders/regular", payload, headers)
     res = conn.getresponse()
     response_data = json.loads(res.read().decode("utf-8"))
@@ -182,6 +184,7 @@ def close_all_positions(current_api_key,auth):
         return {"message": "No Open Positions Found"}, 200
 
     if positions_response['status']:
+        place_order_payloads = []
         # Loop through each position to close
         for position in positions_response['data']['net']:
             # Skip if net quantity is zero
@@ -208,12 +211,10 @@ def close_all_positions(current_api_key,auth):
 
             print(place_order_payload)
 
-            # Place the order to close the position
-            _, api_response, _ =   place_order_api(place_order_payload,AUTH_TOKEN)
+            place_order_payloads.append(place_order_payload)
 
-            print(api_response)
-            
-            # Note: Ensure place_order_api handles any errors and logs accordingly
+        # Place the orders to close the positions concurrently
+        place_orders('zerodha', place_order_payloads, lambda payload: place_order_api(payload, AUTH_TOKEN))
 
     return {'status': 'success', "message": "All Open Positions SquaredOff"}, 200
 
@@ -232,7 +233,7 @@ def cancel_order(orderid,auth):
     payload = ''
     
     # Establish the connection and send the request
-    conn = http.client.HTTPSConnection("api.kite.trade")  # Adjust the URL as necessary
+    conn = GuardedHTTPSConnection("api.kite.trade")  # Adjust the URL as necessary
     conn.request("DELETE", f"/orders/regular/{orderid}", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -275,7 +276,7 @@ def modify_order(data,auth):
 
     payload =  urllib.parse.urlencode(payload)
 
-    conn = http.client.HTTPSConnection("api.kite.trade")
+    conn = GuardedHTTPSConnection("api.kite.trade")
     conn.request("PUT", f"/orders/regular/{data['orderid']}", payload, headers)
     res = conn.getresponse()
     data = json.loads(res.read().decode("utf-8"))
@@ -300,17 +301,7 @@ def cancel_all_orders_api(data,auth):
     orders_to_cancel = [order for order in order_book_response.get('data', [])
                         if order['status'] in ['OPEN', 'TRIGGER PENDING']]
     print(orders_to_cancel)
-    canceled_orders = []
-    failed_cancellations = []
-
-    # Cancel the filtered orders
-    for order in orders_to_cancel:
-        orderid = order['order_id']
-        cancel_response, status_code = cancel_order(orderid,AUTH_TOKEN)
-        if status_code == 200:
-            canceled_orders.append(orderid)
-        else:
-            failed_cancellations.append(orderid)
-    
-    return canceled_orders, failed_cancellations
+    # Cancel the filtered orders concurrently
+    order_ids = [order['order_id'] for order in orders_to_cancel]
+    return cancel_orders('zerodha', order_ids, lambda orderid: cancel_order(orderid, AUTH_TOKEN))
 
@@ -165,6 +165,15 @@ def get_feed_token_dbquery(name):
         print("Error while querying the database for feed token:", e)
         return None
 
+def get_active_auths():
+    """(name, broker, decrypted auth token) of every session that is not revoked"""
+    try:
+        return [(auth_obj.name, auth_obj.broker, decrypt_token(auth_obj.auth))
+                for auth_obj in Auth.query.filter_by(is_revoked=False).all()]
+    except Exception as e:
+        print("Error while querying the database for active sessions:", e)
+        return []
+
 def upsert_api_key(user_id, api_key):
     """Store both hashed and encrypted API key"""
     # Hash with Argon2 for verification
@@ -0,0 +1,213 @@
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Float, Date, Index, select, delete, insert, and_
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime, date, timedelta
+import pandas as pd
+import pytz
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Use a separate database for the local candle store
+HISTORY_DATABASE_URL = os.getenv('HISTORY_DATABASE_URL', 'sqlite:///db/history.db')
+
+history_engine = create_engine(
+    HISTORY_DATABASE_URL,
+    pool_size=50,
+    max_overflow=100,
+    pool_timeout=10
+)
+
+history_session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=history_engine))
+HistoryBase = declarative_base()
+HistoryBase.query = history_session.query_property()
+
+IST = pytz.timezone('Asia/Kolkata')
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+class Candle(HistoryBase):
+    """Completed OHLCV bar downloaded from the broker"""
+    __tablename__ = 'candles'
+
+    broker = Column(String(20), primary_key=True)  # Brokers differ in bar timestamp conventions
+    symbol = Column(String(50), primary_key=True)
+    exchange = Column(String(20), primary_key=True)
+    interval = Column(String(10), primary_key=True)
+    timestamp = Column(BigInteger, primary_key=True)  # Epoch seconds
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(BigInteger)
+    oi = Column(BigInteger)
+
+class CandleCoverage(HistoryBase):
+    """Date ranges (IST, inclusive) already downloaded for a symbol and interval"""
+    __tablename__ = 'candle_coverage'
+
+    id = Column(Integer, primary_key=True)
+    broker = Column(String(20), nullable=False)
+    symbol = Column(String(50), nullable=False)
+    exchange = Column(String(20), nullable=False)
+    interval = Column(String(10), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index('idx_coverage_key', 'broker', 'symbol', 'exchange', 'interval'),
+    )
+
+def init_history_db():
+    """Initialize the candle store database"""
+    os.makedirs('db', exist_ok=True)
+    print("Initializing History DB")
+    HistoryBase.metadata.create_all(bind=history_engine)
+
+def parse_date(value):
+    """Accept a date, datetime or YYYY-MM-DD string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+def _day_start_epoch(day):
+    """Epoch seconds of IST midnight for a date"""
+    return int(IST.localize(datetime(day.year, day.month, day.day)).timestamp())
+
+def today_ist():
+    return datetime.now(IST).date()
+
+def get_missing_ranges(broker, symbol, exchange, interval, start_date, end_date):
+    """
+    Return the (start, end) date ranges within [start_date, end_date] that are
+    not yet in the store. Today is never considered covered because its bars
+    are still forming.
+    """
+    start, end = parse_date(start_date), parse_date(end_date)
+    try:
+        coverage = history_session.query(CandleCoverage.start_date, CandleCoverage.end_date).filter_by(
+            broker=broker, symbol=symbol, exchange=exchange, interval=interval
+        ).order_by(CandleCoverage.start_date).all()
+    except Exception as e:
+        logger.error(f"Error reading candle coverage: {e}")
+        coverage = []
+    finally:
+        history_session.remove()
+
+    missing = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start - timedelta(days=1)))
+        cursor = max(cursor, covered_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+def store_candles(broker, symbol, exchange, interval, df, start_date, end_date):
+    """
+    Persist the completed bars of a freshly downloaded range and mark the
+    range as covered. Bars from today (IST) are not stored. An empty
+    response covers the range only if it ends before today (holidays,
+    weekends, before listing); one reaching today may just be early.
+    """
+    start, end = parse_date(start_date), parse_date(end_date)
+    covered_end = min(end, today_ist() - timedelta(days=1))
+    if covered_end < start or df is None:
+        return
+    if df.empty and covered_end < end:
+        return
+
+    cutoff = _day_start_epoch(covered_end + timedelta(days=1))
+    completed = df[df['timestamp'] < cutoff] if not df.empty else df
+    has_oi = 'oi' in completed.columns
+    rows = []
+    for record in completed.to_dict(orient='records'):
+        rows.append({
+            'broker': broker,
+            'symbol': symbol,
+            'exchange': exchange,
+            'interval': interval,
+            'timestamp': int(record['timestamp']),
+            'open': float(record['open']),
+            'high': float(record['high']),
+            'low': float(record['low']),
+            'close': float(record['close']),
+            'volume': int(record['volume']),
+            'oi': int(record['oi']) if has_oi and pd.notna(record['oi']) else None
+        })
+
+    try:
+        with history_engine.begin() as conn:
+            if rows:
+                conn.execute(insert(Candle.__table__).prefix_with('OR REPLACE'), rows)
+            _add_coverage(conn, broker, symbol, exchange, interval, start, covered_end)
+    except Exception as e:
+        logger.error(f"Error storing candles for {exchange}:{symbol} {interval}: {e}")
+
+def _add_coverage(conn, broker, symbol, exchange, interval, start, end):
+    """Insert a covered range, merging it with overlapping or adjacent ranges"""
+    table = CandleCoverage.__table__
+    key = and_(table.c.broker == broker, table.c.symbol == symbol,
+               table.c.exchange == exchange, table.c.interval == interval)
+    ranges = [(row.start_date, row.end_date) for row in conn.execute(select(table.c.start_date, table.c.end_date).where(key))]
+    ranges.append((start, end))
+    ranges.sort()
+
+    merged = [list(ranges[0])]
+    for range_start, range_end in ranges[1:]:
+        if range_start <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+
+    conn.execute(delete(table).where(key))
+    conn.execute(insert(table), [
+        {'broker': broker, 'symbol': symbol, 'exchange': exchange, 'interval': interval,
+         'start_date': range_start, 'end_date': range_end}
+        for range_start, range_end in merged
+    ])
+
+def load_candles(broker, symbol, exchange, interval, start_date, end_date):
+    """Load stored bars for [start_date, end_date] (IST dates, inclusive)"""
+    start, end = parse_date(start_date), parse_date(end_date)
+    table = Candle.__table__
+    query = select(table.c.timestamp, table.c.open, table.c.high, table.c.low,
+                   table.c.close, table.c.volume, table.c.oi).where(and_(
+        table.c.broker == broker, table.c.symbol == symbol,
+        table.c.exchange == exchange, table.c.interval == interval,
+        table.c.timestamp >= _day_start_epoch(start),
+        table.c.timestamp < _day_start_epoch(end + timedelta(days=1))
+    )).order_by(table.c.timestamp)
+    try:
+        with history_engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+    except Exception as e:
+        logger.error(f"Error loading candles for {exchange}:{symbol} {interval}: {e}")
+        rows = []
+
+    df = pd.DataFrame.from_records(rows, columns=CANDLE_COLUMNS + ['oi'])
+    if df['oi'].isna().all():
+        df = df.drop(columns=['oi'])
+    return df
+
+def purge_candles(before_date):
+    """Delete stored bars and coverage older than a date (retention)"""
+    cutoff = parse_date(before_date)
+    try:
+        with history_engine.begin() as conn:
+            conn.execute(delete(Candle.__table__).where(Candle.__table__.c.timestamp < _day_start_epoch(cutoff)))
+            conn.execute(delete(CandleCoverage.__table__).where(CandleCoverage.__table__.c.end_date < cutoff))
+            conn.execute(CandleCoverage.__table__.update()
+                         .where(CandleCoverage.__table__.c.start_date < cutoff)
+                         .values(start_date=cutoff))
+    except Exception as e:
+        logger.error(f"Error purging candles: {e}")
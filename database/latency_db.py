@@ -4,7 +4,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -152,6 +152,19 @@ class OrderLatency(LatencyBase):
                 'broker_stats': {}
             }
 
+def purge_logs(older_than_days):
+    """Delete latency logs older than the given number of days; returns the number deleted"""
+    try:
+        # Timestamps are stored by the database in UTC
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        deleted = OrderLatency.query.filter(OrderLatency.timestamp < cutoff).delete(synchronize_session=False)
+        latency_session.commit()
+        return deleted
+    except Exception as e:
+        logger.error(f"Error purging latency logs: {str(e)}")
+        latency_session.rollback()
+        return 0
+
 def init_latency_db():
     """Initialize the latency database"""
     # Create db directory if it doesn't exist
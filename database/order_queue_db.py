@@ -0,0 +1,226 @@
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Text, Index, select, update, insert, delete, func
+from sqlalchemy.ext.declarative import declarative_base
+import json
+import os
+import time
+import logging
+
+from database.auth_db import encrypt_token, decrypt_token
+
+logger = logging.getLogger(__name__)
+
+# Durable queue for webhook orders, in its own SQLite database
+ORDER_QUEUE_DATABASE_URL = os.getenv('ORDER_QUEUE_DATABASE_URL', 'sqlite:///db/order_queue.db')
+
+order_queue_engine = create_engine(
+    ORDER_QUEUE_DATABASE_URL,
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=10
+)
+
+OrderQueueBase = declarative_base()
+
+# Order states
+PENDING = 'pending'          # waiting to be claimed
+CLAIMED = 'claimed'          # claimed by a worker, not sent to the broker yet
+DISPATCHING = 'dispatching'  # being sent to the broker
+DONE = 'done'
+FAILED = 'failed'
+UNKNOWN = 'unknown'          # the worker died while sending, the order may or may not be placed
+EXPIRED = 'expired'          # waited longer than the maximum age, never sent
+
+@event.listens_for(order_queue_engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets several worker processes read while one writes"""
+    if not ORDER_QUEUE_DATABASE_URL.startswith('sqlite'):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+class QueuedOrder(OrderQueueBase):
+    """A webhook order waiting for, or handed to, a worker"""
+    __tablename__ = 'webhook_order_queue'
+
+    id = Column(Integer, primary_key=True)
+    endpoint = Column(String(20), nullable=False)      # placeorder / placesmartorder
+    payload = Column(Text, nullable=False)             # JSON order payload, Fernet-encrypted (holds the API key)
+    strategy = Column(String(255), nullable=False)
+    order_key = Column(String(255), nullable=False)    # strategy|symbol|exchange, placed in queue order
+    status = Column(String(20), nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_by = Column(String(100))
+    visible_at = Column(Float, nullable=False)         # epoch seconds; a claim expires at this time
+    created_at = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+    response = Column(Text)
+
+    __table_args__ = (
+        Index('idx_order_queue_status', 'status', 'visible_at'),
+        Index('idx_order_queue_key', 'order_key', 'status'),
+    )
+
+def init_db():
+    """Initialize the webhook order queue database"""
+    os.makedirs('db', exist_ok=True)
+    print("Initializing Order Queue DB")
+    OrderQueueBase.metadata.create_all(bind=order_queue_engine)
+
+def order_key(payload):
+    return f"{payload.get('strategy', '')}|{payload.get('symbol', '')}|{payload.get('exchange', '')}"
+
+def enqueue_order(endpoint, payload):
+    """
+    Persist a webhook order before it is acknowledged to the caller.
+
+    Returns:
+        int: Queue id of the order
+    """
+    now = time.time()
+    with order_queue_engine.begin() as conn:
+        result = conn.execute(insert(QueuedOrder.__table__).values(
+            endpoint=endpoint,
+            payload=encrypt_token(json.dumps(payload)),
+            strategy=str(payload.get('strategy', '')),
+            order_key=order_key(payload),
+            status=PENDING,
+            attempts=0,
+            visible_at=now,
+            created_at=now,
+            updated_at=now
+        ))
+        return result.inserted_primary_key[0]
+
+def _release_expired(conn, now, max_age):
+    """
+    Return expired claims to the queue. An order whose worker died while
+    sending it to the broker is not retried (it may have been placed), it is
+    marked unknown instead. Pending orders older than `max_age` seconds, e.g.
+    left over from before a restart, are marked expired and never placed.
+    """
+    table = QueuedOrder.__table__
+    conn.execute(update(table).where(table.c.status == CLAIMED, table.c.visible_at <= now)
+                 .values(status=PENDING, claimed_by=None, updated_at=now))
+    expired = conn.execute(update(table).where(table.c.status == DISPATCHING, table.c.visible_at <= now)
+                           .values(status=UNKNOWN, updated_at=now)
+                           .returning(table.c.id, table.c.order_key)).fetchall()
+    for row in expired:
+        logger.error(f"Webhook order {row.id} ({row.order_key}) was being placed when its worker stopped; "
+                     f"marked unknown instead of placing it again")
+    if max_age > 0:
+        stale = conn.execute(update(table).where(table.c.status == PENDING, table.c.created_at <= now - max_age)
+                             .values(status=EXPIRED, updated_at=now)
+                             .returning(table.c.id, table.c.order_key)).fetchall()
+        for row in stale:
+            logger.error(f"Webhook order {row.id} ({row.order_key}) waited more than {max_age:g}s; "
+                         f"marked expired instead of placing it")
+
+def claim_orders(worker_id, limit, visibility_timeout, max_age=0):
+    """
+    Atomically claim up to `limit` pending orders for a worker.
+
+    Only the oldest pending order of each order key is claimable, and only
+    while no other order with that key is claimed or being placed, so orders
+    for the same strategy and symbol are placed in queue order even when
+    several processes consume the queue. Orders older than `max_age` seconds
+    (0 for no limit) are expired instead of claimed.
+
+    Returns:
+        list: Dicts with id, endpoint, payload (decoded), attempts and created_at, oldest first
+    """
+    if limit <= 0:
+        return []
+    table = QueuedOrder.__table__
+    now = time.time()
+    other = table.alias('other')
+    in_progress = select(other.c.order_key).where(other.c.status.in_((CLAIMED, DISPATCHING)))
+    oldest = select(func.min(other.c.id)).where(other.c.status == PENDING).group_by(other.c.order_key)
+    candidates = (select(table.c.id)
+                  .where(table.c.status == PENDING, table.c.visible_at <= now,
+                         table.c.id.in_(oldest), table.c.order_key.not_in(in_progress))
+                  .order_by(table.c.id).limit(limit))
+
+    with order_queue_engine.begin() as conn:
+        _release_expired(conn, now, max_age)
+        # One UPDATE ... RETURNING statement: two workers can never claim the same row
+        rows = conn.execute(update(table)
+                            .where(table.c.id.in_(candidates), table.c.status == PENDING)
+                            .values(status=CLAIMED, claimed_by=worker_id, attempts=table.c.attempts + 1,
+                                    visible_at=now + visibility_timeout, updated_at=now)
+                            .returning(table.c.id, table.c.endpoint, table.c.payload, table.c.attempts,
+                                       table.c.created_at)).fetchall()
+
+    orders = []
+    for row in rows:
+        payload = decrypt_token(row.payload)
+        if not payload:
+            # Written with another API_KEY_PEPPER; it cannot be placed
+            logger.error(f"Webhook order {row.id} could not be decrypted; marked failed")
+            ack_order(row.id, worker_id, False, {'status': 'error', 'message': 'Order payload could not be decrypted'})
+            continue
+        orders.append({'id': row.id, 'endpoint': row.endpoint, 'payload': json.loads(payload),
+                       'attempts': row.attempts, 'created_at': row.created_at})
+    orders.sort(key=lambda order: order['id'])
+    return orders
+
+def start_dispatch(order_id, worker_id, dispatch_timeout):
+    """
+    Mark a claimed order as being sent to the broker.
+
+    Returns:
+        bool: False if the claim expired and the order now belongs to another
+            worker; the caller must not place it
+    """
+    table = QueuedOrder.__table__
+    now = time.time()
+    with order_queue_engine.begin() as conn:
+        result = conn.execute(update(table)
+                              .where(table.c.id == order_id, table.c.status == CLAIMED,
+                                     table.c.claimed_by == worker_id)
+                              .values(status=DISPATCHING, visible_at=now + dispatch_timeout, updated_at=now))
+        return result.rowcount == 1
+
+def ack_order(order_id, worker_id, success, response=None):
+    """Record the outcome of a placed order"""
+    table = QueuedOrder.__table__
+    now = time.time()
+    with order_queue_engine.begin() as conn:
+        conn.execute(update(table)
+                     .where(table.c.id == order_id, table.c.claimed_by == worker_id,
+                            table.c.status.in_((CLAIMED, DISPATCHING, UNKNOWN)))
+                     .values(status=DONE if success else FAILED, updated_at=now,
+                             response=json.dumps(response, default=str) if response is not None else None))
+
+def release_orders(order_ids, worker_id):
+    """Give claimed orders that were not sent back to the queue (e.g. on shutdown)"""
+    if not order_ids:
+        return
+    table = QueuedOrder.__table__
+    now = time.time()
+    with order_queue_engine.begin() as conn:
+        conn.execute(update(table)
+                     .where(table.c.id.in_(order_ids), table.c.status == CLAIMED, table.c.claimed_by == worker_id)
+                     .values(status=PENDING, claimed_by=None, visible_at=now, updated_at=now))
+
+def queue_counts():
+    """Number of orders per status"""
+    table = QueuedOrder.__table__
+    try:
+        with order_queue_engine.connect() as conn:
+            rows = conn.execute(select(table.c.status, func.count()).group_by(table.c.status)).fetchall()
+        return {status: count for status, count in rows}
+    except Exception as e:
+        logger.error(f"Error reading webhook order queue: {e}")
+        return {}
+
+def purge_orders(older_than_seconds):
+    """Delete finished orders older than the given age (retention)"""
+    table = QueuedOrder.__table__
+    cutoff = time.time() - older_than_seconds
+    with order_queue_engine.begin() as conn:
+        result = conn.execute(delete(table).where(table.c.status.in_((DONE, FAILED, UNKNOWN, EXPIRED)),
+                                                  table.c.updated_at < cutoff))
+        return result.rowcount
@@ -2,13 +2,23 @@ from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignK
 from sqlalchemy.orm import scoped_session, sessionmaker, relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
+from cachetools import TTLCache
+from dataclasses import dataclass, field
+from database.auth_db import get_api_key_for_tradingview
 import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Seconds a webhook's strategy snapshot is served before it is reloaded.
+# Edits made through this module invalidate it immediately. Every hit re-reads
+# is_active, so a strategy toggled or deleted by another process stops at
+# once; the TTL bounds staleness of its other edits.
+STRATEGY_CACHE_TTL = int(os.getenv('STRATEGY_CACHE_TTL', '5'))
+
 engine = create_engine(
     DATABASE_URL,
     pool_size=50,
@@ -57,6 +67,117 @@ class StrategySymbolMapping(Base):
     # Relationships
     strategy = relationship("Strategy", back_populates="symbol_mappings")
 
+@dataclass(frozen=True)
+class SymbolMappingSnapshot:
+    """Detached copy of a StrategySymbolMapping"""
+    symbol: str
+    exchange: str
+    quantity: int
+    product_type: str
+
+@dataclass(frozen=True)
+class StrategySnapshot:
+    """
+    Everything the webhook needs about a strategy, detached from the session:
+    symbol mappings keyed by symbol, the user's decrypted API key and the
+    trading times as minutes since midnight
+    """
+    id: int
+    name: str
+    user_id: str
+    is_active: bool
+    is_intraday: bool
+    trading_mode: str
+    start_minute: int = None
+    end_minute: int = None
+    squareoff_minute: int = None
+    api_key: str = None
+    mappings: dict = field(default_factory=dict)
+
+# webhook_id -> StrategySnapshot
+strategy_snapshot_cache = TTLCache(maxsize=1024, ttl=STRATEGY_CACHE_TTL)
+strategy_snapshot_lock = threading.Lock()
+
+def parse_minute(hhmm):
+    """'HH:MM' to minutes since midnight, None if not set"""
+    if not hhmm:
+        return None
+    hour, minute = hhmm.split(':')
+    return int(hour) * 60 + int(minute)
+
+def _current_is_active(strategy_id):
+    """is_active as stored in the database, None if the strategy was deleted"""
+    row = db_session.query(Strategy.is_active).filter(Strategy.id == strategy_id).first()
+    return None if row is None else bool(row[0])
+
+def get_strategy_snapshot(webhook_id):
+    """
+    Cached snapshot of the strategy behind a webhook, None if there is no
+    such strategy. A hit costs one primary key read of is_active and no
+    decryption.
+    """
+    with strategy_snapshot_lock:
+        snapshot = strategy_snapshot_cache.get(webhook_id)
+    if snapshot is not None:
+        # Another process may have toggled or deleted the strategy
+        try:
+            is_active = _current_is_active(snapshot.id)
+        except Exception as e:
+            logger.error(f"Error checking strategy {snapshot.id} status: {str(e)}")
+            return snapshot
+        if is_active == snapshot.is_active:
+            return snapshot
+        invalidate_strategy_snapshot(snapshot.id)
+
+    strategy = get_strategy_by_webhook_id(webhook_id)
+    if not strategy:
+        return None
+    try:
+        # The session may hold this strategy from an earlier request; reload
+        # it and its mappings so edits from other processes are picked up
+        db_session.refresh(strategy)
+        mappings = {}
+        for mapping in strategy.symbol_mappings:
+            # First mapping wins, as the webhook's lookup always did
+            mappings.setdefault(mapping.symbol, SymbolMappingSnapshot(
+                symbol=mapping.symbol,
+                exchange=mapping.exchange,
+                quantity=mapping.quantity,
+                product_type=mapping.product_type
+            ))
+        snapshot = StrategySnapshot(
+            id=strategy.id,
+            name=strategy.name,
+            user_id=strategy.user_id,
+            is_active=bool(strategy.is_active),
+            is_intraday=bool(strategy.is_intraday),
+            trading_mode=strategy.trading_mode,
+            start_minute=parse_minute(strategy.start_time),
+            end_minute=parse_minute(strategy.end_time),
+            squareoff_minute=parse_minute(strategy.squareoff_time),
+            api_key=get_api_key_for_tradingview(strategy.user_id),
+            mappings=mappings
+        )
+    except Exception as e:
+        logger.error(f"Error building snapshot for webhook ID {webhook_id}: {str(e)}")
+        return None
+
+    # A missing API key may be generated any moment; look it up again next time
+    if snapshot.api_key:
+        with strategy_snapshot_lock:
+            strategy_snapshot_cache[webhook_id] = snapshot
+    return snapshot
+
+def invalidate_strategy_snapshot(strategy_id=None, user_id=None):
+    """Drop cached snapshots of one strategy, of all a user's strategies, or all of them"""
+    with strategy_snapshot_lock:
+        if strategy_id is None and user_id is None:
+            strategy_snapshot_cache.clear()
+            return
+        for webhook_id, snapshot in list(strategy_snapshot_cache.items()):
+            if snapshot.id == strategy_id or snapshot.user_id == user_id:
+                strategy_snapshot_cache.pop(webhook_id, None)
+
 def init_db():
     """Initialize the database"""
     print("Initializing Strategy DB")
@@ -128,6 +249,7 @@ def delete_strategy(strategy_id):
         
         db_session.delete(strategy)
         db_session.commit()
+        invalidate_strategy_snapshot(strategy_id)
         return True
     except Exception as e:
         logger.error(f"Error deleting strategy {strategy_id}: {str(e)}")
@@ -139,15 +261,16 @@ def toggle_strategy(strategy_id):
     try:
         strategy = get_strategy(strategy_id)
         if not strategy:
-            return False
+            return None
         
         strategy.is_active = not strategy.is_active
         db_session.commit()
-        return True
+        invalidate_strategy_snapshot(strategy_id)
+        return strategy
     except Exception as e:
         logger.error(f"Error toggling strategy {strategy_id}: {str(e)}")
         db_session.rollback()
-        return False
+        return None
 
 def update_strategy_times(strategy_id, start_time=None, end_time=None, squareoff_time=None):
     """Update strategy trading times"""
@@ -161,6 +284,7 @@ def update_strategy_times(strategy_id, start_time=None, end_time=None, squareoff
             if squareoff_time is not None:
                 strategy.squareoff_time = squareoff_time
             db_session.commit()
+            invalidate_strategy_snapshot(strategy_id)
             return True
         return False
     except Exception as e:
@@ -180,6 +304,7 @@ def add_symbol_mapping(strategy_id, symbol, exchange, quantity, product_type):
         )
         db_session.add(mapping)
         db_session.commit()
+        invalidate_strategy_snapshot(strategy_id)
         return mapping
     except Exception as e:
         logger.error(f"Error adding symbol mapping: {str(e)}")
@@ -196,6 +321,7 @@ def bulk_add_symbol_mappings(strategy_id, mappings):
             )
             db_session.add(mapping)
         db_session.commit()
+        invalidate_strategy_snapshot(strategy_id)
         return True
     except Exception as e:
         logger.error(f"Error bulk adding symbol mappings: {str(e)}")
@@ -215,8 +341,10 @@ def delete_symbol_mapping(mapping_id):
     try:
         mapping = StrategySymbolMapping.query.get(mapping_id)
         if mapping:
+            strategy_id = mapping.strategy_id
             db_session.delete(mapping)
             db_session.commit()
+            invalidate_strategy_snapshot(strategy_id)
             return True
         return False
     except Exception as e:
@@ -4,7 +4,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -91,6 +91,19 @@ class TrafficLog(LogBase):
                 'avg_duration': 0
             }
 
+def purge_logs(older_than_days):
+    """Delete traffic logs older than the given number of days; returns the number deleted"""
+    try:
+        # Timestamps are stored by the database in UTC
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        deleted = TrafficLog.query.filter(TrafficLog.timestamp < cutoff).delete(synchronize_session=False)
+        logs_session.commit()
+        return deleted
+    except Exception as e:
+        logger.error(f"Error purging traffic logs: {str(e)}")
+        logs_session.rollback()
+        return 0
+
 def init_logs_db():
     """Initialize the logs database"""
     # Create db directory if it doesn't exist
@@ -4,6 +4,15 @@ from flask import Blueprint
 api_v1_bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
 api = Api(api_v1_bp, version='1.0', title='OpenAlgo API', description='API for OpenAlgo Trading Platform')
 
+@api_v1_bp.after_request
+def add_retry_after(response):
+    """Tell clients when to retry a call rejected by an open broker circuit (503)"""
+    if response.status_code == 503 and response.is_json and 'Retry-After' not in response.headers:
+        retry_after = (response.get_json(silent=True) or {}).get('retry_after')
+        if retry_after:
+            response.headers['Retry-After'] = str(retry_after)
+    return response
+
 # Import namespaces
 from .place_order import api as place_order_ns
 from .place_smart_order import api as place_smart_order_ns
@@ -12,6 +21,7 @@ from .cancel_order import api as cancel_order_ns
 from .close_position import api as close_position_ns
 from .cancel_all_order import api as cancel_all_order_ns
 from .quotes import api as quotes_ns
+from .multiquotes import api as multiquotes_ns
 from .history import api as history_ns
 from .depth import api as depth_ns
 from .intervals import api as intervals_ns
@@ -35,6 +45,7 @@ api.add_namespace(cancel_order_ns, path='/cancelorder')
 api.add_namespace(close_position_ns, path='/closeposition')
 api.add_namespace(cancel_all_order_ns, path='/cancelallorder')
 api.add_namespace(quotes_ns, path='/quotes')
+api.add_namespace(multiquotes_ns, path='/multiquotes')
 api.add_namespace(history_ns, path='/history')
 api.add_namespace(depth_ns, path='/depth')
 api.add_namespace(intervals_ns, path='/intervals')
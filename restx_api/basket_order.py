@@ -1,26 +1,20 @@
 from flask_restx import Namespace, Resource
 from flask import request, jsonify, make_response
-from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
 from database.apilog_db import async_log_order, executor as log_executor
 from database.settings_db import get_analyze_mode
 from database.analyzer_db import async_log_analyzer
 from extensions import socketio
 from limiter import limiter
+from utils.broker_registry import get_broker_module, ORDER_API
 from utils.api_analyzer import analyze_request, generate_order_id
-from utils.constants import (
-    VALID_EXCHANGES,
-    VALID_ACTIONS,
-    VALID_PRICE_TYPES,
-    VALID_PRODUCT_TYPES,
-    REQUIRED_ORDER_FIELDS
-)
+from utils.order_validator import basket_leg_validator, validate_basket, OrderValidationError
+from utils.circuit_breaker import CircuitOpenError
+from services.order_dispatcher import order_dispatcher, action_priority
+from services.position_cache import position_cache
 import os
-import importlib
 import traceback
 import logging
-import copy
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 API_RATE_LIMIT = os.getenv("API_RATE_LIMIT", "10 per second")
 api = Namespace('basket_order', description='Basket Order API')
@@ -29,11 +23,6 @@ api = Namespace('basket_order', description='Basket Order API')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Marshmallow schema
-from restx_api.schemas import BasketOrderSchema, OrderSchema
-basket_schema = BasketOrderSchema()
-order_schema = OrderSchema()
-
 def emit_analyzer_error(request_data, error_message):
     """Helper function to emit analyzer error events"""
     error_response = {
@@ -59,39 +48,19 @@ def emit_analyzer_error(request_data, error_message):
     
     return error_response
 
-def import_broker_module(broker_name):
+def validate_order(order_data, api_key, strategy):
+    """Validate one basket leg; returns (OrderRequest, None) or (None, error message)"""
     try:
-        module_path = f'broker.{broker_name}.api.order_api'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
-def validate_order(order_data):
-    """Validate individual order data"""
-    # Check for missing mandatory fields
-    missing_fields = [field for field in REQUIRED_ORDER_FIELDS if field not in order_data]
-    if missing_fields:
-        return False, f'Missing mandatory field(s): {", ".join(missing_fields)}'
-
-    # Validate exchange
-    if order_data.get('exchange') not in VALID_EXCHANGES:
-        return False, f'Invalid exchange. Must be one of: {", ".join(VALID_EXCHANGES)}'
-
-    # Validate action
-    if order_data.get('action') not in VALID_ACTIONS:
-        return False, f'Invalid action. Must be one of: {", ".join(VALID_ACTIONS)}'
-
-    # Validate price type
-    if 'pricetype' in order_data and order_data['pricetype'] not in VALID_PRICE_TYPES:
-        return False, f'Invalid price type. Must be one of: {", ".join(VALID_PRICE_TYPES)}'
-
-    # Validate product type
-    if 'product' in order_data and order_data['product'] not in VALID_PRODUCT_TYPES:
-        return False, f'Invalid product type. Must be one of: {", ".join(VALID_PRODUCT_TYPES)}'
+        return basket_leg_validator.validate(order_data, apikey=api_key, strategy=strategy), None
+    except OrderValidationError as err:
+        return None, str(err)
 
-    return True, None
+def invalid_order_result(order_data, error_message):
+    return {
+        'symbol': order_data.get('symbol', 'Unknown'),
+        'status': 'error',
+        'message': error_message
+    }
 
 def place_single_order(order_data, broker_module, AUTH_TOKEN, total_orders, order_index):
     """Place a single order and emit event"""
@@ -126,6 +95,13 @@ def place_single_order(order_data, broker_module, AUTH_TOKEN, total_orders, orde
                 'message': message
             }
 
+    except CircuitOpenError as e:
+        return {
+            'symbol': order_data.get('symbol', 'Unknown'),
+            'status': 'error',
+            'message': str(e),
+            'retry_after': e.retry_seconds
+        }
     except Exception as e:
         logger.error(f"Error placing order for {order_data.get('symbol', 'Unknown')}: {e}")
         return {
@@ -141,21 +117,19 @@ class BasketOrder(Resource):
         """Place multiple orders in a basket"""
         try:
             data = request.json
-            basket_request_data = copy.deepcopy(data)
-            basket_request_data.pop('apikey', None)
+            basket_request_data = {key: value for key, value in data.items() if key != 'apikey'}
 
-            # Validate and deserialize input
+            # Validate the basket envelope, legs are validated one by one below
             try:
-                basket_data = basket_schema.load(data)
-            except ValidationError as err:
-                error_message = str(err.messages)
+                api_key, strategy, orders = validate_basket(data)
+            except OrderValidationError as err:
+                error_message = str(err)
                 if get_analyze_mode():
                     return make_response(jsonify(emit_analyzer_error(data, error_message)), 400)
                 error_response = {'status': 'error', 'message': error_message}
                 log_executor.submit(async_log_order, 'basketorder', data, error_response)
                 return make_response(jsonify(error_response), 400)
 
-            api_key = basket_data['apikey']
             AUTH_TOKEN, broker = get_auth_token_broker(api_key)
             if AUTH_TOKEN is None:
                 error_response = {
@@ -169,29 +143,21 @@ class BasketOrder(Resource):
             # If in analyze mode, analyze each order and return
             if get_analyze_mode():
                 analyze_results = []
-                total_orders = len(basket_data['orders'])
+                total_orders = len(orders)
                 
-                for i, order in enumerate(basket_data['orders']):
-                    # Add common fields from basket order
-                    order['apikey'] = api_key
-                    order['strategy'] = basket_data['strategy']
-                    
-                    # Validate order
-                    is_valid, error_message = validate_order(order)
-                    if not is_valid:
-                        analyze_results.append({
-                            'symbol': order.get('symbol', 'Unknown'),
-                            'status': 'error',
-                            'message': error_message
-                        })
+                for i, raw_order in enumerate(orders):
+                    # Validate order, apikey and strategy come from the basket
+                    order, error_message = validate_order(raw_order, api_key, strategy)
+                    if order is None:
+                        analyze_results.append(invalid_order_result(raw_order, error_message))
                         continue
 
                     # Analyze the order
-                    _, analysis = analyze_request(order, 'basketorder', True)
+                    _, analysis = analyze_request(order.to_dict(), 'basketorder', True, validated=True)
                     
                     if analysis.get('status') == 'success':
                         analyze_results.append({
-                            'symbol': order.get('symbol', 'Unknown'),
+                            'symbol': order.symbol,
                             'status': 'success',
                             'orderid': generate_order_id(),
                             'batch_order': True,
@@ -199,7 +165,7 @@ class BasketOrder(Resource):
                         })
                     else:
                         analyze_results.append({
-                            'symbol': order.get('symbol', 'Unknown'),
+                            'symbol': order.symbol,
                             'status': 'error',
                             'message': analysis.get('message', 'Analysis failed')
                         })
@@ -226,7 +192,7 @@ class BasketOrder(Resource):
                 return make_response(jsonify(response_data), 200)
 
             # Live mode - process actual orders
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, ORDER_API)
             if broker_module is None:
                 error_response = {
                     'status': 'error',
@@ -235,60 +201,30 @@ class BasketOrder(Resource):
                 log_executor.submit(async_log_order, 'basketorder', data, error_response)
                 return make_response(jsonify(error_response), 404)
 
-            # Sort orders to prioritize BUY orders before SELL orders
-            buy_orders = [order for order in basket_data['orders'] if order.get('action', '').upper() == 'BUY']
-            sell_orders = [order for order in basket_data['orders'] if order.get('action', '').upper() == 'SELL']
-            sorted_orders = buy_orders + sell_orders
-            
-            results = []
-            total_orders = len(sorted_orders)
-            
-            # Process BUY orders first
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                # Process all BUY orders first
-                buy_futures = []
-                for i, order in enumerate(buy_orders):
-                    order['strategy'] = basket_data['strategy']
-                    buy_futures.append(
-                        executor.submit(
-                            place_single_order,
-                            {**order, 'apikey': api_key},
-                            broker_module,
-                            AUTH_TOKEN,
-                            total_orders,
-                            i
-                        )
-                    )
-                
-                # Wait for all BUY orders to complete
-                for future in as_completed(buy_futures):
-                    result = future.result()
-                    if result:
-                        results.append(result)
-                
-                # Then process SELL orders
-                sell_futures = []
-                for i, order in enumerate(sell_orders, start=len(buy_orders)):
-                    order['strategy'] = basket_data['strategy']
-                    sell_futures.append(
-                        executor.submit(
-                            place_single_order,
-                            {**order, 'apikey': api_key},
-                            broker_module,
-                            AUTH_TOKEN,
-                            total_orders,
-                            i
-                        )
-                    )
-                
-                # Wait for all SELL orders to complete
-                for future in as_completed(sell_futures):
-                    result = future.result()
-                    if result:
-                        results.append(result)
-
-            # Sort results to maintain order consistency
-            results.sort(key=lambda x: 0 if x.get('action', '').upper() == 'BUY' else 1)
+            # Validate every leg up front, invalid legs are reported without a broker call
+            results = [None] * len(orders)
+            valid_legs = []
+            for position, raw_order in enumerate(orders):
+                order, error_message = validate_order(raw_order, api_key, strategy)
+                if order is None:
+                    results[position] = invalid_order_result(raw_order, error_message)
+                else:
+                    valid_legs.append((position, order))
+
+            # BUY legs are dispatched ahead of SELL legs, without waiting for them to finish
+            valid_legs.sort(key=lambda leg: action_priority(leg[1].action))
+            total_orders = len(valid_legs)
+            futures = order_dispatcher.dispatch(broker, [
+                (action_priority(order.action), place_single_order,
+                 (order.to_dict(), broker_module, AUTH_TOKEN, total_orders, index))
+                for index, (_, order) in enumerate(valid_legs)
+            ])
+
+            # Results are reported in the order of the basket legs
+            for (position, _), future in zip(valid_legs, futures):
+                results[position] = future.result()
+            if any(result.get('status') == 'success' for result in results):
+                position_cache.expire(broker, AUTH_TOKEN)
 
             # Log the basket order results
             response_data = {
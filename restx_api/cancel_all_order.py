@@ -7,9 +7,11 @@ from database.settings_db import get_analyze_mode
 from database.analyzer_db import async_log_analyzer
 from extensions import socketio
 from limiter import limiter
+from utils.broker_registry import get_broker_module, ORDER_API
 from utils.api_analyzer import analyze_request, generate_order_id
+from utils.fanout import collect_timings
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import logging
 import traceback
 import copy
@@ -25,15 +27,6 @@ logger = logging.getLogger(__name__)
 from restx_api.schemas import CancelAllOrderSchema
 cancel_all_order_schema = CancelAllOrderSchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.order_api'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 def emit_analyzer_error(request_data, error_message):
     """Helper function to emit analyzer error events"""
     error_response = {
@@ -124,7 +117,7 @@ class CancelAllOrder(Resource):
                 
                 return make_response(jsonify(response_data), 200)
 
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, ORDER_API)
             if broker_module is None:
                 error_response = {
                     'status': 'error',
@@ -135,7 +128,13 @@ class CancelAllOrder(Resource):
 
             try:
                 # Use the dynamically imported module's function to cancel all orders
-                canceled_orders, failed_cancellations = broker_module.cancel_all_orders_api(order_data, AUTH_TOKEN)
+                with collect_timings() as timings:
+                    canceled_orders, failed_cancellations = broker_module.cancel_all_orders_api(order_data, AUTH_TOKEN)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open, cancelallorder rejected: {e}")
+                error_response = e.to_response()
+                executor.submit(async_log_order, 'cancelallorder', data, error_response)
+                return make_response(jsonify(error_response), 503)
             except Exception as e:
                 logger.error(f"Error in broker_module.cancel_all_orders_api: {e}")
                 traceback.print_exc()
@@ -159,7 +158,8 @@ class CancelAllOrder(Resource):
                 'status': 'success',
                 'canceled_orders': canceled_orders,
                 'failed_cancellations': failed_cancellations,
-                'message': f'Canceled {len(canceled_orders)} orders. Failed to cancel {len(failed_cancellations)} orders.'
+                'message': f'Canceled {len(canceled_orders)} orders. Failed to cancel {len(failed_cancellations)} orders.',
+                'timings': timings
             }
 
             # Log the action asynchronously
@@ -7,9 +7,12 @@ from database.settings_db import get_analyze_mode
 from database.analyzer_db import async_log_analyzer
 from extensions import socketio
 from limiter import limiter
+from utils.broker_registry import get_broker_module, ORDER_API
 from utils.api_analyzer import analyze_request
+from services.position_cache import position_cache
+from utils.fanout import collect_timings
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import logging
 import traceback
 import copy
@@ -25,15 +28,6 @@ logger = logging.getLogger(__name__)
 from restx_api.schemas import ClosePositionSchema
 close_position_schema = ClosePositionSchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.order_api'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 def emit_analyzer_error(request_data, error_message):
     """Helper function to emit analyzer error events"""
     error_response = {
@@ -122,7 +116,7 @@ class ClosePosition(Resource):
                 
                 return make_response(jsonify(response_data), 200)
 
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, ORDER_API)
             if broker_module is None:
                 error_response = {
                     'status': 'error',
@@ -133,7 +127,15 @@ class ClosePosition(Resource):
 
             try:
                 # Use the dynamically imported module's function to close all positions
-                response_code, status_code = broker_module.close_all_positions(api_key, AUTH_TOKEN)
+                with collect_timings() as timings:
+                    response_code, status_code = broker_module.close_all_positions(api_key, AUTH_TOKEN)
+                # Square-off orders change positions behind the smart order cache
+                position_cache.invalidate(broker)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open, closeposition rejected: {e}")
+                error_response = e.to_response()
+                executor.submit(async_log_order, 'closeposition', data, error_response)
+                return make_response(jsonify(error_response), 503)
             except Exception as e:
                 logger.error(f"Error in broker_module.close_all_positions: {e}")
                 traceback.print_exc()
@@ -147,7 +149,8 @@ class ClosePosition(Resource):
             if status_code == 200:
                 response_data = {
                     'status': 'success',
-                    'message': 'All Open Positions Squared Off'
+                    'message': 'All Open Positions Squared Off',
+                    'timings': timings
                 }
                 socketio.emit('close_position_event', {
                     'status': 'success',
@@ -160,7 +163,8 @@ class ClosePosition(Resource):
                 message = response_code.get('message', 'Failed to close positions') if isinstance(response_code, dict) else 'Failed to close positions'
                 error_response = {
                     'status': 'error',
-                    'message': message
+                    'message': message,
+                    'timings': timings
                 }
                 executor.submit(async_log_order, 'closeposition', data, error_response)
                 return make_response(jsonify(error_response), status_code)
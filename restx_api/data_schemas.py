@@ -1,10 +1,20 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
+from utils.history_encoders import HISTORY_FORMATS
 
 class QuotesSchema(Schema):
     apikey = fields.Str(required=True)
     symbol = fields.Str(required=True)  # Single symbol
     exchange = fields.Str(required=True)  # Exchange (e.g., NSE, BSE)
 
+class SymbolExchangeSchema(Schema):
+    symbol = fields.Str(required=True)
+    exchange = fields.Str(required=True)  # Exchange (e.g., NSE, BSE)
+
+class MultiQuotesSchema(Schema):
+    apikey = fields.Str(required=True)
+    symbols = fields.List(fields.Nested(SymbolExchangeSchema), required=True,
+                          validate=validate.Length(min=1, max=500))  # Up to 500 symbols per call
+
 class HistorySchema(Schema):
     apikey = fields.Str(required=True)
     symbol = fields.Str(required=True)
@@ -12,6 +22,7 @@ class HistorySchema(Schema):
     interval = fields.Str(required=True)  # 1m, 5m, 15m, 30m, 1h, 1d
     start_date = fields.Str(required=True)  # YYYY-MM-DD
     end_date = fields.Str(required=True)    # YYYY-MM-DD
+    format = fields.Str(missing='json', validate=validate.OneOf(HISTORY_FORMATS))  # json, columnar, csv, arrow, npy
 
 class DepthSchema(Schema):
     apikey = fields.Str(required=True)
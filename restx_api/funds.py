@@ -3,8 +3,9 @@ from flask import request, jsonify, make_response
 from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
 from limiter import limiter
+from utils.broker_registry import get_broker_module, FUNDS_API
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import traceback
 import logging
 
@@ -20,15 +21,6 @@ logger = logging.getLogger(__name__)
 # Initialize schema
 funds_schema = FundsSchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.funds'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 @api.route('/', strict_slashes=False)
 class Funds(Resource):
     @limiter.limit(API_RATE_LIMIT)
@@ -46,7 +38,7 @@ class Funds(Resource):
                     'message': 'Invalid openalgo apikey'
                 }), 403)
 
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, FUNDS_API)
             if broker_module is None:
                 return make_response(jsonify({
                     'status': 'error',
@@ -61,6 +53,9 @@ class Funds(Resource):
                     'status': 'success',
                     'data': funds
                 }), 200)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open: {e}")
+                return make_response(jsonify(e.to_response()), 503)
             except Exception as e:
                 logger.error(f"Error in broker_module.get_margin_data: {e}")
                 traceback.print_exc()
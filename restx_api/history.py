@@ -2,9 +2,12 @@ from flask_restx import Namespace, Resource
 from flask import request, jsonify, make_response
 from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
+from services.history_service import get_history
+from utils.history_encoders import encode_history, UnsupportedFormatError
 from limiter import limiter
+from utils.broker_registry import get_broker_module, get_data_handler, DATA_API
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import traceback
 import logging
 import pandas as pd
@@ -21,15 +24,6 @@ logger = logging.getLogger(__name__)
 # Initialize schema
 history_schema = HistorySchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.data'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 @api.route('/', strict_slashes=False)
 class History(Resource):
     @limiter.limit(API_RATE_LIMIT)
@@ -47,7 +41,7 @@ class History(Resource):
                     'message': 'Invalid openalgo apikey'
                 }), 403)
 
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, DATA_API)
             if broker_module is None:
                 return make_response(jsonify({
                     'status': 'error',
@@ -55,19 +49,12 @@ class History(Resource):
                 }), 404)
 
             try:
-                # Initialize broker's data handler based on broker's requirements
-                if hasattr(broker_module.BrokerData.__init__, '__code__'):
-                    # Check number of parameters the broker's __init__ accepts
-                    param_count = broker_module.BrokerData.__init__.__code__.co_argcount
-                    if param_count > 2:  # More than self and auth_token
-                        data_handler = broker_module.BrokerData(AUTH_TOKEN, FEED_TOKEN)
-                    else:
-                        data_handler = broker_module.BrokerData(AUTH_TOKEN)
-                else:
-                    # Fallback to just auth token if we can't inspect
-                    data_handler = broker_module.BrokerData(AUTH_TOKEN)
+                # Long-lived data handler for this broker session
+                data_handler = get_data_handler(broker, AUTH_TOKEN, FEED_TOKEN)
 
-                df = data_handler.get_history(
+                df = get_history(
+                    data_handler,
+                    broker,
                     history_data['symbol'],
                     history_data['exchange'],
                     history_data['interval'],
@@ -78,10 +65,23 @@ class History(Resource):
                 if not isinstance(df, pd.DataFrame):
                     raise ValueError("Invalid data format returned from broker")
 
+                # Columnar, CSV and binary formats skip the per-candle dicts
+                if history_data['format'] != 'json':
+                    return encode_history(df, history_data['format'],
+                                          request_id=f"history_{history_data['symbol']}_{history_data['interval']}")
+
                 return make_response(jsonify({
                     'status': 'success',
                     'data': df.to_dict(orient='records')
                 }), 200)
+            except UnsupportedFormatError as e:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open: {e}")
+                return make_response(jsonify(e.to_response()), 503)
             except Exception as e:
                 logger.error(f"Error in broker_module.get_history: {e}")
                 traceback.print_exc()
@@ -3,8 +3,9 @@ from flask import request, jsonify, make_response
 from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
 from limiter import limiter
+from utils.broker_registry import get_broker_module, get_data_handler, DATA_API
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import traceback
 import logging
 
@@ -20,15 +21,6 @@ logger = logging.getLogger(__name__)
 # Initialize schema
 intervals_schema = IntervalsSchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.data'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 @api.route('/', strict_slashes=False)
 class Intervals(Resource):
     @limiter.limit(API_RATE_LIMIT)
@@ -46,7 +38,7 @@ class Intervals(Resource):
                     'message': 'Invalid openalgo apikey'
                 }), 403)
 
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, DATA_API)
             if broker_module is None:
                 return make_response(jsonify({
                     'status': 'error',
@@ -54,8 +46,8 @@ class Intervals(Resource):
                 }), 404)
 
             try:
-                # Initialize broker's data handler
-                data_handler = broker_module.BrokerData(AUTH_TOKEN)
+                # Long-lived data handler for this broker session
+                data_handler = get_data_handler(broker, AUTH_TOKEN)
                 
                 # Get supported intervals from the timeframe map
                 intervals = {
@@ -71,6 +63,9 @@ class Intervals(Resource):
                     'status': 'success',
                     'data': intervals
                 }), 200)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open: {e}")
+                return make_response(jsonify(e.to_response()), 503)
             except Exception as e:
                 logger.error(f"Error getting supported intervals: {e}")
                 traceback.print_exc()
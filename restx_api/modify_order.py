@@ -7,9 +7,10 @@ from database.settings_db import get_analyze_mode
 from database.analyzer_db import async_log_analyzer
 from extensions import socketio
 from limiter import limiter
+from utils.broker_registry import get_broker_module, ORDER_API
 from utils.api_analyzer import analyze_request
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import logging
 import traceback
 import copy
@@ -25,15 +26,6 @@ logger = logging.getLogger(__name__)
 from restx_api.schemas import ModifyOrderSchema
 modify_order_schema = ModifyOrderSchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.order_api'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 def emit_analyzer_error(request_data, error_message):
     """Helper function to emit analyzer error events"""
     error_response = {
@@ -122,7 +114,7 @@ class ModifyOrder(Resource):
                 
                 return make_response(jsonify(response_data), 200)
 
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, ORDER_API)
             if broker_module is None:
                 error_response = {
                     'status': 'error',
@@ -134,6 +126,11 @@ class ModifyOrder(Resource):
             try:
                 # Use the dynamically imported module's function to modify the order
                 response_message, status_code = broker_module.modify_order(order_data, AUTH_TOKEN)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open, modifyorder rejected: {e}")
+                error_response = e.to_response()
+                executor.submit(async_log_order, 'modifyorder', data, error_response)
+                return make_response(jsonify(error_response), 503)
             except Exception as e:
                 logger.error(f"Error in broker_module.modify_order: {e}")
                 traceback.print_exc()
@@ -0,0 +1,109 @@
+from flask_restx import Namespace, Resource
+from flask import request, jsonify, make_response
+from marshmallow import ValidationError
+from database.auth_db import get_auth_token_broker
+from limiter import limiter
+from utils.broker_registry import get_broker_module, get_data_handler, DATA_API
+from utils.concurrency import map_concurrent
+from utils.circuit_breaker import CircuitOpenError
+import os
+import traceback
+import logging
+
+from .data_schemas import MultiQuotesSchema
+
+API_RATE_LIMIT = os.getenv("API_RATE_LIMIT", "10 per second")
+api = Namespace('multiquotes', description='Multi-Symbol Quotes API')
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Initialize schema
+multiquotes_schema = MultiQuotesSchema()
+
+# Parallel single-symbol calls used for brokers without a batch quote API
+FALLBACK_QUOTE_CONCURRENCY = 4
+
+def get_quotes_individually(data_handler, symbols):
+    """Fetch quotes one symbol per call for brokers without get_multi_quotes"""
+    def fetch(item):
+        entry = {'symbol': item['symbol'], 'exchange': item['exchange']}
+        try:
+            quote = data_handler.get_quotes(item['symbol'], item['exchange'])
+            if quote is None:
+                entry['error'] = 'Failed to fetch quotes'
+            else:
+                entry['data'] = quote
+        except CircuitOpenError as e:
+            entry['error'] = str(e)
+            entry['retry_after'] = e.retry_seconds
+        except Exception as e:
+            entry['error'] = str(e)
+        return entry
+
+    return map_concurrent(fetch, symbols, max_workers=FALLBACK_QUOTE_CONCURRENCY)
+
+@api.route('/', strict_slashes=False)
+class MultiQuotes(Resource):
+    @limiter.limit(API_RATE_LIMIT)
+    def post(self):
+        """Get real-time quotes for multiple symbols"""
+        try:
+            # Validate request data
+            multiquotes_data = multiquotes_schema.load(request.json)
+
+            api_key = multiquotes_data['apikey']
+            AUTH_TOKEN, FEED_TOKEN, broker = get_auth_token_broker(api_key, include_feed_token=True)
+            if AUTH_TOKEN is None:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': 'Invalid openalgo apikey'
+                }), 403)
+
+            broker_module = get_broker_module(broker, DATA_API)
+            if broker_module is None:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': 'Broker-specific module not found'
+                }), 404)
+
+            try:
+                # Long-lived data handler for this broker session
+                data_handler = get_data_handler(broker, AUTH_TOKEN, FEED_TOKEN)
+
+                symbols = multiquotes_data['symbols']
+
+                # Prefer the broker's batch quote API, chunked to its per-call limit
+                if hasattr(data_handler, 'get_multi_quotes'):
+                    results = data_handler.get_multi_quotes(symbols)
+                else:
+                    results = get_quotes_individually(data_handler, symbols)
+
+                return make_response(jsonify({
+                    'status': 'success',
+                    'results': results
+                }), 200)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open: {e}")
+                return make_response(jsonify(e.to_response()), 503)
+            except Exception as e:
+                logger.error(f"Error in broker_module.get_multi_quotes: {e}")
+                traceback.print_exc()
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 500)
+
+        except ValidationError as err:
+            return make_response(jsonify({
+                'status': 'error',
+                'message': err.messages
+            }), 400)
+        except Exception as e:
+            logger.error(f"Unexpected error in multiquotes endpoint: {e}")
+            traceback.print_exc()
+            return make_response(jsonify({
+                'status': 'error',
+                'message': 'An unexpected error occurred'
+            }), 500)
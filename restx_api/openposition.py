@@ -1,19 +1,16 @@
 from flask_restx import Namespace, Resource
 from flask import request, jsonify, make_response
 from marshmallow import ValidationError
-from database.auth_db import get_auth_token_broker
 from database.apilog_db import async_log_order, executor as log_executor
 from database.settings_db import get_analyze_mode
 from database.analyzer_db import async_log_analyzer
 from extensions import socketio
 from limiter import limiter
+from services.positionbook_service import find_position
 import os
-from dotenv import load_dotenv
-import importlib
 import traceback
 import logging
 import copy
-import requests
 
 API_RATE_LIMIT = os.getenv("API_RATE_LIMIT", "10 per second")
 api = Namespace('openposition', description='Open Position API')
@@ -23,9 +20,8 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Marshmallow schema
-from restx_api.account_schema import OpenPositionSchema, PositionbookSchema
+from restx_api.account_schema import OpenPositionSchema
 openposition_schema = OpenPositionSchema()
-positionbook_schema = PositionbookSchema()
 
 def emit_analyzer_error(request_data, error_message):
     """Helper function to emit analyzer error events"""
@@ -95,78 +91,11 @@ class OpenPosition(Resource):
                 
                 return make_response(jsonify(response_data), 200)
 
-            # Live mode - get position from positionbook
-            try:
-                # Prepare positionbook request with just apikey
-                positionbook_request = {'apikey': position_data['apikey']}
-                
-                # Validate positionbook request
-                try:
-                    positionbook_data = positionbook_schema.load(positionbook_request)
-                except ValidationError as err:
-                    error_response = {
-                        'status': 'error',
-                        'message': 'Invalid positionbook request'
-                    }
-                    log_executor.submit(async_log_order, 'openposition', data, error_response)
-                    return make_response(jsonify(error_response), 400)
-
-                # Make request to positionbook API
-                positionbook_response = requests.post('http://127.0.0.1:5000/api/v1/positionbook', json=positionbook_data)
-                
-                if positionbook_response.status_code != 200:
-                    error_response = {
-                        'status': 'error',
-                        'message': 'Failed to fetch positionbook'
-                    }
-                    log_executor.submit(async_log_order, 'openposition', data, error_response)
-                    return make_response(jsonify(error_response), positionbook_response.status_code)
-
-                positionbook_data = positionbook_response.json()
-                if positionbook_data.get('status') != 'success':
-                    error_response = {
-                        'status': 'error',
-                        'message': positionbook_data.get('message', 'Error fetching positionbook')
-                    }
-                    log_executor.submit(async_log_order, 'openposition', data, error_response)
-                    return make_response(jsonify(error_response), 500)
-
-                # Find the specific position
-                position_found = None
-                for position in positionbook_data['data']:
-                    if (position.get('symbol') == position_data['symbol'] and
-                        position.get('exchange') == position_data['exchange'] and
-                        position.get('product') == position_data['product']):
-                        position_found = position
-                        break
-
-                # Return 0 quantity if position not found
-                if not position_found:
-                    response_data = {
-                        'quantity': 0,
-                        'status': 'success'
-                    }
-                    log_executor.submit(async_log_order, 'openposition', request_data, response_data)
-                    return make_response(jsonify(response_data), 200)
-
-                # Return the position quantity
-                response_data = {
-                    'quantity': position_found['quantity'],
-                    'status': 'success'
-                }
-                log_executor.submit(async_log_order, 'openposition', request_data, response_data)
-
-                return make_response(jsonify(response_data), 200)
-
-            except Exception as e:
-                logger.error(f"Error processing open position: {e}")
-                traceback.print_exc()
-                error_response = {
-                    'status': 'error',
-                    'message': str(e)
-                }
-                log_executor.submit(async_log_order, 'openposition', data, error_response)
-                return make_response(jsonify(error_response), 500)
+            # Live mode - look the position up in the broker's positionbook, in process
+            success, response_data, status_code = find_position(
+                position_data['symbol'], position_data['exchange'], position_data['product'], position_data['apikey'])
+            log_executor.submit(async_log_order, 'openposition', request_data if success else data, response_data)
+            return make_response(jsonify(response_data), status_code)
 
         except Exception as e:
             logger.error("An unexpected error occurred in OpenPosition endpoint.")
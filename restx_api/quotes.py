@@ -3,8 +3,11 @@ from flask import request, jsonify, make_response
 from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
 from limiter import limiter
+from utils.broker_registry import get_broker_module, get_data_handler, DATA_API
+from utils.request_coalescer import market_data_coalescer
+from utils.circuit_breaker import CircuitOpenError
+from services.market_data_gateway import market_data_gateway
 import os
-import importlib
 import traceback
 import logging
 
@@ -20,15 +23,6 @@ logger = logging.getLogger(__name__)
 # Initialize schema
 quotes_schema = QuotesSchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.data'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 @api.route('/', strict_slashes=False)
 class Quotes(Resource):
     @limiter.limit(API_RATE_LIMIT)
@@ -46,7 +40,15 @@ class Quotes(Resource):
                     'message': 'Invalid openalgo apikey'
                 }), 403)
 
-            broker_module = import_broker_module(broker)
+            # A fresh tick from the shared market data feed needs no broker call
+            tick = market_data_gateway.get_latest(broker, quotes_data['symbol'], quotes_data['exchange'], 'quote')
+            if tick is not None:
+                return make_response(jsonify({
+                    'data': tick,
+                    'status': 'success'
+                }), 200)
+
+            broker_module = get_broker_module(broker, DATA_API)
             if broker_module is None:
                 return make_response(jsonify({
                     'status': 'error',
@@ -54,21 +56,16 @@ class Quotes(Resource):
                 }), 404)
 
             try:
-                # Initialize broker's data handler based on broker's requirements
-                if hasattr(broker_module.BrokerData.__init__, '__code__'):
-                    # Check number of parameters the broker's __init__ accepts
-                    param_count = broker_module.BrokerData.__init__.__code__.co_argcount
-                    if param_count > 2:  # More than self and auth_token
-                        data_handler = broker_module.BrokerData(AUTH_TOKEN, FEED_TOKEN)
-                    else:
-                        data_handler = broker_module.BrokerData(AUTH_TOKEN)
-                else:
-                    # Fallback to just auth token if we can't inspect
-                    data_handler = broker_module.BrokerData(AUTH_TOKEN)
+                # Long-lived data handler for this broker session
+                data_handler = get_data_handler(broker, AUTH_TOKEN, FEED_TOKEN)
                     
-                quotes = data_handler.get_quotes(
-                    quotes_data['symbol'],
-                    quotes_data['exchange']
+                # Identical concurrent requests share one broker call
+                quotes = market_data_coalescer.get(
+                    (broker, quotes_data['symbol'], quotes_data['exchange'], 'quotes'),
+                    lambda: data_handler.get_quotes(
+                        quotes_data['symbol'],
+                        quotes_data['exchange']
+                    )
                 )
                 
                 if quotes is None:
@@ -81,6 +78,9 @@ class Quotes(Resource):
                     'data': quotes,
                     'status': 'success'
                 }), 200)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open: {e}")
+                return make_response(jsonify(e.to_response()), 503)
             except Exception as e:
                 logger.error(f"Error in broker_module.get_quotes: {e}")
                 traceback.print_exc()
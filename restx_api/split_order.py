@@ -1,26 +1,20 @@
 from flask_restx import Namespace, Resource
 from flask import request, jsonify, make_response
-from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
 from database.apilog_db import async_log_order, executor as log_executor
 from database.settings_db import get_analyze_mode
 from database.analyzer_db import async_log_analyzer
 from extensions import socketio
 from limiter import limiter
+from utils.broker_registry import get_broker_module, ORDER_API
 from utils.api_analyzer import analyze_request, generate_order_id
-from utils.constants import (
-    VALID_EXCHANGES,
-    VALID_ACTIONS,
-    VALID_PRICE_TYPES,
-    VALID_PRODUCT_TYPES,
-    REQUIRED_ORDER_FIELDS
-)
+from utils.order_validator import split_order_validator, OrderValidationError
+from utils.circuit_breaker import CircuitOpenError
+from services.order_dispatcher import order_dispatcher, action_priority
+from services.position_cache import position_cache
 import os
-import importlib
 import traceback
 import logging
-import copy
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 API_RATE_LIMIT = os.getenv("API_RATE_LIMIT", "10 per second")
 api = Namespace('split_order', description='Split Order API')
@@ -29,10 +23,6 @@ api = Namespace('split_order', description='Split Order API')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Marshmallow schema
-from restx_api.schemas import SplitOrderSchema
-split_schema = SplitOrderSchema()
-
 MAX_ORDERS = 100  # Maximum number of orders allowed
 
 def emit_analyzer_error(request_data, error_message):
@@ -60,15 +50,6 @@ def emit_analyzer_error(request_data, error_message):
     
     return error_response
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.order_api'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 def place_single_order(order_data, broker_module, AUTH_TOKEN, order_num, total_orders):
     """Place a single order and emit event"""
     try:
@@ -107,6 +88,14 @@ def place_single_order(order_data, broker_module, AUTH_TOKEN, order_num, total_o
                 'message': message
             }
 
+    except CircuitOpenError as e:
+        return {
+            'order_num': order_num,
+            'quantity': int(order_data['quantity']),
+            'status': 'error',
+            'message': str(e),
+            'retry_after': e.retry_seconds
+        }
     except Exception as e:
         logger.error(f"Error placing order {order_num}: {e}")
         return {
@@ -123,14 +112,13 @@ class SplitOrder(Resource):
         """Split a large order into multiple orders of specified size"""
         try:
             data = request.json
-            split_request_data = copy.deepcopy(data)
-            split_request_data.pop('apikey', None)
+            split_request_data = {key: value for key, value in data.items() if key != 'apikey'}
 
-            # Validate and deserialize input
+            # Validate and deserialize input in one pass
             try:
-                split_data = split_schema.load(data)
-            except ValidationError as err:
-                error_message = str(err.messages)
+                split_order = split_order_validator.validate(data)
+            except OrderValidationError as err:
+                error_message = str(err)
                 if get_analyze_mode():
                     return make_response(jsonify(emit_analyzer_error(data, error_message)), 400)
                 error_response = {'status': 'error', 'message': error_message}
@@ -139,8 +127,8 @@ class SplitOrder(Resource):
 
             # Validate quantities
             try:
-                split_size = int(split_data['splitsize'])
-                total_quantity = int(split_data['quantity'])
+                split_size = int(split_order.splitsize)
+                total_quantity = int(split_order.quantity)
                 if split_size <= 0:
                     error_message = 'Split size must be greater than 0'
                     if get_analyze_mode():
@@ -171,7 +159,7 @@ class SplitOrder(Resource):
                 log_executor.submit(async_log_order, 'splitorder', data, error_response)
                 return make_response(jsonify(error_response), 400)
 
-            api_key = split_data['apikey']
+            api_key = split_order.apikey
             AUTH_TOKEN, broker = get_auth_token_broker(api_key)
             if AUTH_TOKEN is None:
                 error_response = {
@@ -188,11 +176,10 @@ class SplitOrder(Resource):
                 
                 # Analyze full-size orders
                 for i in range(num_full_orders):
-                    order_data = copy.deepcopy(split_data)
-                    order_data['quantity'] = str(split_size)
+                    order_data = split_order.with_quantity(split_size).to_dict()
                     
                     # Analyze the order
-                    _, analysis = analyze_request(order_data, 'splitorder', True)
+                    _, analysis = analyze_request(order_data, 'splitorder', True, validated=True)
                     
                     if analysis.get('status') == 'success':
                         analyze_results.append({
@@ -211,10 +198,9 @@ class SplitOrder(Resource):
 
                 # Analyze remaining quantity if any
                 if remaining_qty > 0:
-                    order_data = copy.deepcopy(split_data)
-                    order_data['quantity'] = str(remaining_qty)
+                    order_data = split_order.with_quantity(remaining_qty).to_dict()
                     
-                    _, analysis = analyze_request(order_data, 'splitorder', True)
+                    _, analysis = analyze_request(order_data, 'splitorder', True, validated=True)
                     
                     if analysis.get('status') == 'success':
                         analyze_results.append({
@@ -255,7 +241,7 @@ class SplitOrder(Resource):
                 return make_response(jsonify(response_data), 200)
 
             # Live mode - process actual orders
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, ORDER_API)
             if broker_module is None:
                 error_response = {
                     'status': 'error',
@@ -264,62 +250,32 @@ class SplitOrder(Resource):
                 log_executor.submit(async_log_order, 'splitorder', data, error_response)
                 return make_response(jsonify(error_response), 404)
 
-            # Process orders concurrently
-            results = []
-            
-            # Create a ThreadPoolExecutor for concurrent order placement
-            with ThreadPoolExecutor(max_workers=10) as order_executor:
-                # Prepare orders for concurrent execution
-                futures = []
-                
-                # Submit full-size orders
-                for i in range(num_full_orders):
-                    order_data = copy.deepcopy(split_data)
-                    order_data['quantity'] = str(split_size)
-                    futures.append(
-                        order_executor.submit(
-                            place_single_order,
-                            order_data,
-                            broker_module,
-                            AUTH_TOKEN,
-                            i + 1,
-                            total_orders
-                        )
-                    )
+            # Child orders go through the shared per-broker dispatcher
+            quantities = [split_size] * num_full_orders
+            if remaining_qty > 0:
+                quantities.append(remaining_qty)
+            priority = action_priority(split_order.action)
+            futures = order_dispatcher.dispatch(broker, [
+                (priority, place_single_order,
+                 (split_order.with_quantity(quantity).to_dict(), broker_module, AUTH_TOKEN, order_num, total_orders))
+                for order_num, quantity in enumerate(quantities, start=1)
+            ])
 
-                # Submit remaining quantity order if any
-                if remaining_qty > 0:
-                    order_data = copy.deepcopy(split_data)
-                    order_data['quantity'] = str(remaining_qty)
-                    futures.append(
-                        order_executor.submit(
-                            place_single_order,
-                            order_data,
-                            broker_module,
-                            AUTH_TOKEN,
-                            total_orders,
-                            total_orders
-                        )
-                    )
+            # Results in order_num order
+            results = [future.result() for future in futures]
+            if any(result.get('status') == 'success' for result in results):
+                position_cache.expire(broker, AUTH_TOKEN)
 
-                # Collect results as they complete
-                for future in as_completed(futures):
-                    result = future.result()
-                    results.append(result)
-
-                # Sort results by order_num to maintain order in response
-                results.sort(key=lambda x: x['order_num'])
-
-                # Log the split order results
-                response_data = {
-                    'status': 'success',
-                    'total_quantity': total_quantity,
-                    'split_size': split_size,
-                    'results': results
-                }
-                log_executor.submit(async_log_order, 'splitorder', split_request_data, response_data)
+            # Log the split order results
+            response_data = {
+                'status': 'success',
+                'total_quantity': total_quantity,
+                'split_size': split_size,
+                'results': results
+            }
+            log_executor.submit(async_log_order, 'splitorder', split_request_data, response_data)
 
-                return make_response(jsonify(response_data), 200)
+            return make_response(jsonify(response_data), 200)
 
         except Exception as e:
             logger.error("An unexpected error occurred in SplitOrder endpoint.")
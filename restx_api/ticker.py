@@ -2,14 +2,15 @@ from flask_restx import Namespace, Resource, fields
 from flask import request, jsonify, make_response, Response
 from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
+from services.history_service import get_history
+from utils.history_encoders import HISTORY_FORMATS, encode_history, iter_ticker_text, UnsupportedFormatError
 from limiter import limiter
+from utils.broker_registry import get_broker_module, get_data_handler, DATA_API
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import traceback
 import logging
 import pandas as pd
-from datetime import datetime, timezone
-import pytz
 
 from .data_schemas import TickerSchema
 
@@ -23,15 +24,6 @@ logger = logging.getLogger(__name__)
 # Initialize schema
 ticker_schema = TickerSchema()
 
-def import_broker_module(broker_name):
-    try:
-        module_path = f'broker.{broker_name}.api.data'
-        broker_module = importlib.import_module(module_path)
-        return broker_module
-    except ImportError as error:
-        logger.error(f"Error importing broker module '{module_path}': {error}")
-        return None
-
 class TextResponse(Response):
     """Custom Response class that supports both text and JSON properties"""
     @property
@@ -42,22 +34,6 @@ class TextResponse(Response):
     def json(self, value):
         self._json = value
 
-def convert_timestamp(timestamp, interval):
-    """Convert timestamp to appropriate format based on interval"""
-    # Convert timestamp to datetime in UTC
-    dt = datetime.fromtimestamp(timestamp, tz=timezone.utc)
-    
-    # Convert to IST
-    ist = pytz.timezone('Asia/Kolkata')
-    dt_ist = dt.astimezone(ist)
-    
-    # For daily data: just return the date
-    if interval.upper() == 'D':
-        return dt_ist.strftime('%Y-%m-%d')
-    
-    # For intraday: return date and time separately
-    return dt_ist.strftime('%Y-%m-%d'), dt_ist.strftime('%H:%M:%S')
-
 @api.route('/<string:symbol>')
 @api.doc(params={
     'symbol': 'Stock symbol with exchange (e.g., NSE:ZOMATO)',
@@ -67,7 +43,7 @@ def convert_timestamp(timestamp, interval):
     'adjusted': 'Adjust for splits (true/false)',
     'sort': 'Sort order (asc/desc)',
     'apikey': 'API Key for authentication',
-    'format': 'Response format (json/txt). Default: json'
+    'format': 'Response format (json/txt/columnar/csv/arrow/npy). Default: json'
 })
 class Ticker(Resource):
     @limiter.limit(API_RATE_LIMIT)
@@ -117,7 +93,7 @@ class Ticker(Resource):
                     'message': 'Invalid openalgo apikey'
                 }), 403)
 
-            broker_module = import_broker_module(broker)
+            broker_module = get_broker_module(broker, DATA_API)
             if broker_module is None:
                 if response_format == 'txt':
                     response = TextResponse('Broker-specific module not found\n')
@@ -130,9 +106,11 @@ class Ticker(Resource):
                 }), 404)
 
             try:
-                # Initialize broker's data handler
-                data_handler = broker_module.BrokerData(AUTH_TOKEN)
-                df = data_handler.get_history(
+                # Long-lived data handler for this broker session
+                data_handler = get_data_handler(broker, AUTH_TOKEN)
+                df = get_history(
+                    data_handler,
+                    broker,
                     history_data['symbol'],
                     history_data['exchange'],
                     history_data['interval'],
@@ -145,29 +123,19 @@ class Ticker(Resource):
 
                 # Format the response based on the format parameter
                 if response_format == 'txt':
-                    # Convert timestamps to datetime format
-                    text_output = []
-                    interval = history_data['interval']
+                    # Render lines with vectorized timestamp conversion, streamed in chunks
                     symbol_with_exchange = f"{history_data['exchange']}:{history_data['symbol']}"
-                    
-                    for _, row in df.iterrows():
-                        # Convert timestamp based on interval
-                        timestamp = convert_timestamp(row['timestamp'], interval)
-                        # Convert volume to integer by removing decimal point
-                        volume = int(row['volume'])
-                        if interval.upper() == 'D':
-                            # Daily format: Ticker,Date_YMD,Open,High,Low,Close,Volume
-                            text_output.append(f"{symbol_with_exchange},{timestamp},{row['open']},{row['high']},{row['low']},{row['close']},{volume}")
-                        else:
-                            # Intraday format: Ticker,Date_YMD,Time,Open,High,Low,Close,Volume
-                            date, time = timestamp
-                            text_output.append(f"{symbol_with_exchange},{date},{time},{row['open']},{row['high']},{row['low']},{row['close']},{volume}")
+                    text_output = iter_ticker_text(df, symbol_with_exchange, history_data['interval'])
                     
                     # Create plain text response
-                    response = TextResponse('\n'.join(text_output))
+                    response = TextResponse(text_output)
                     response.content_type = 'text/plain'
                     response.json = {'request_id': f"ticker_{symbol}_{history_data['interval']}"}
                     return response
+                elif response_format in HISTORY_FORMATS and response_format != 'json':
+                    # Columnar JSON, CSV, Arrow or NumPy
+                    return encode_history(df, response_format,
+                                          request_id=f"ticker_{symbol}_{history_data['interval']}")
                 else:
                     # Return JSON format
                     return make_response(jsonify({
@@ -175,6 +143,19 @@ class Ticker(Resource):
                         'data': df.to_dict(orient='records')
                     }), 200)
 
+            except UnsupportedFormatError as e:
+                return make_response(jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open: {e}")
+                if response_format == 'txt':
+                    response = TextResponse(str(e))
+                    response.content_type = 'text/plain'
+                    response.json = {'request_id': f"ticker_{symbol}_{history_data['interval']}"}
+                    return response, 503, {'Retry-After': str(e.retry_seconds)}
+                return make_response(jsonify(e.to_response()), 503)
             except Exception as e:
                 logger.error(f"Error in broker_module.get_history: {e}")
                 traceback.print_exc()
@@ -3,8 +3,9 @@ from flask import request, jsonify, make_response
 from marshmallow import ValidationError
 from database.auth_db import get_auth_token_broker
 from limiter import limiter
+from utils.broker_registry import get_broker_functions, ORDER_API, ORDER_MAPPING
+from utils.circuit_breaker import CircuitOpenError
 import os
-import importlib
 import traceback
 import logging
 
@@ -38,20 +39,15 @@ def format_trade_data(trade_data):
         ]
     return trade_data
 
-def import_broker_module(broker_name):
-    try:
-        # Import API module
-        api_module = importlib.import_module(f'broker.{broker_name}.api.order_api')
-        # Import mapping module
-        mapping_module = importlib.import_module(f'broker.{broker_name}.mapping.order_data')
-        return {
-            'get_trade_book': getattr(api_module, 'get_trade_book'),
-            'map_trade_data': getattr(mapping_module, 'map_trade_data'),
-            'transform_tradebook_data': getattr(mapping_module, 'transform_tradebook_data')
-        }
-    except (ImportError, AttributeError) as error:
-        logger.error(f"Error importing broker modules: {error}")
+def get_broker_funcs(broker_name):
+    api_functions = get_broker_functions(broker_name, ORDER_API, ['get_trade_book'])
+    mapping_functions = get_broker_functions(broker_name, ORDER_MAPPING, [
+        'map_trade_data',
+        'transform_tradebook_data'
+    ])
+    if api_functions is None or mapping_functions is None:
         return None
+    return {**api_functions, **mapping_functions}
 
 @api.route('/', strict_slashes=False)
 class Tradebook(Resource):
@@ -70,7 +66,7 @@ class Tradebook(Resource):
                     'message': 'Invalid openalgo apikey'
                 }), 403)
 
-            broker_funcs = import_broker_module(broker)
+            broker_funcs = get_broker_funcs(broker)
             if broker_funcs is None:
                 return make_response(jsonify({
                     'status': 'error',
@@ -98,6 +94,9 @@ class Tradebook(Resource):
                     'status': 'success',
                     'data': formatted_trades
                 }), 200)
+            except CircuitOpenError as e:
+                logger.warning(f"Broker circuit open: {e}")
+                return make_response(jsonify(e.to_response()), 503)
             except Exception as e:
                 logger.error(f"Error processing trade data: {e}")
                 traceback.print_exc()
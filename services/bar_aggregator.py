@@ -0,0 +1,335 @@
+"""
+In-memory tick-to-bar aggregation for today's intraday candles.
+
+Strategies poll /api/v1/history every few seconds for the latest 1m/5m bars.
+Instead of re-downloading the whole day from the broker on every poll, the
+history service tracks each requested (symbol, interval) here:
+
+    * Today's bars are downloaded from the broker once (the seed) and copied
+      into a fixed-size NumPy ring buffer per (broker, symbol, exchange,
+      interval).
+    * The symbol is then subscribed on the market data gateway and every
+      quote tick updates the forming bar (open/high/low/close, volume from
+      the change in cumulative day volume) or opens the next one.
+    * If the feed goes quiet for longer than BAR_GAP_SECONDS the buffer can
+      no longer be trusted and the next request re-seeds it from the broker.
+
+Only brokers with a true tick stream (BrokerData.create_stream) are
+aggregated; bars rebuilt from polled LTPs would miss the trades between
+polls, so other brokers keep downloading today's bars.
+
+A background sweeper drops series that are not requested for
+BAR_TRACK_IDLE_SECONDS and symbols whose exchange session is closed,
+releasing their gateway subscriptions. Outside the session today's bars are
+downloaded from the broker without subscribing.
+"""
+import os
+import time
+import threading
+import logging
+import numpy as np
+import pandas as pd
+
+from services.market_data_gateway import market_data_gateway, account_key
+from utils.bar_resampler import (
+    interval_seconds, SESSION_OPEN_SECONDS, DEFAULT_SESSION_OPEN_SECONDS,
+    SESSION_CLOSE_SECONDS, DEFAULT_SESSION_CLOSE_SECONDS, TIMESTAMP_SHIFTS
+)
+
+logger = logging.getLogger(__name__)
+
+BAR_AGGREGATOR_ENABLED = os.getenv('BAR_AGGREGATOR_ENABLED', 'TRUE').upper() == 'TRUE'
+
+# Bars kept per series (a full NSE session of 1m bars is 375)
+BAR_RING_SIZE = int(os.getenv('BAR_RING_SIZE', '1024'))
+
+# A feed silent for longer than this (seconds) is re-seeded from the broker
+BAR_GAP_SECONDS = float(os.getenv('BAR_GAP_SECONDS', '10'))
+
+# Series not requested for this long (seconds) are dropped
+BAR_TRACK_IDLE_SECONDS = float(os.getenv('BAR_TRACK_IDLE_SECONDS', '300'))
+
+# Seconds between sweeps of idle and out-of-session series
+BAR_SWEEP_SECONDS = float(os.getenv('BAR_SWEEP_SECONDS', '30'))
+
+IST_OFFSET_SECONDS = 19800
+DAY_SECONDS = 86400
+
+
+class BarRing:
+    """Fixed-capacity ring buffer of OHLCV bars in time order"""
+    __slots__ = ('capacity', 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'oi', 'has_oi',
+                 'head', 'count')
+
+    def __init__(self, capacity=BAR_RING_SIZE):
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity, dtype=np.int64)
+        self.open = np.zeros(capacity, dtype=np.float64)
+        self.high = np.zeros(capacity, dtype=np.float64)
+        self.low = np.zeros(capacity, dtype=np.float64)
+        self.close = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.int64)
+        self.oi = np.zeros(capacity, dtype=np.int64)
+        self.has_oi = False
+        self.head = -1   # slot of the latest bar
+        self.count = 0
+
+    def clear(self):
+        self.head = -1
+        self.count = 0
+        self.has_oi = False
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamp[self.head]) if self.count else None
+
+    def load(self, df):
+        """Replace the contents with the last `capacity` bars of a DataFrame"""
+        df = df.tail(self.capacity)
+        count = len(df)
+        self.timestamp[:count] = df['timestamp'].to_numpy(dtype=np.int64)
+        for name in ('open', 'high', 'low', 'close'):
+            getattr(self, name)[:count] = df[name].to_numpy(dtype=np.float64)
+        self.volume[:count] = df['volume'].to_numpy(dtype=np.float64).astype(np.int64)
+        self.has_oi = 'oi' in df.columns
+        if self.has_oi:
+            self.oi[:count] = np.nan_to_num(pd.to_numeric(df['oi'], errors='coerce').to_numpy(dtype=np.float64)).astype(np.int64)
+        self.count = count
+        self.head = count - 1
+
+    def update(self, bar_timestamp, price, volume, oi=None):
+        """
+        Apply a trade to the bar starting at `bar_timestamp`. Returns False
+        for ticks older than the latest bar.
+        """
+        head = self.head
+        if self.count and self.timestamp[head] == bar_timestamp:
+            if price > self.high[head]:
+                self.high[head] = price
+            if price < self.low[head]:
+                self.low[head] = price
+            self.close[head] = price
+            self.volume[head] += volume
+            if oi is not None:
+                self.oi[head] = oi
+            return True
+        if self.count and bar_timestamp < self.timestamp[head]:
+            return False
+
+        head = (head + 1) % self.capacity
+        self.timestamp[head] = bar_timestamp
+        self.open[head] = self.high[head] = self.low[head] = self.close[head] = price
+        self.volume[head] = volume
+        self.oi[head] = oi if oi is not None else (self.oi[self.head] if self.count else 0)
+        self.head = head
+        self.count = min(self.count + 1, self.capacity)
+        return True
+
+    def to_frame(self):
+        """Bars oldest first as a candle DataFrame"""
+        order = (np.arange(self.count) + self.head - self.count + 1) % self.capacity
+        columns = {
+            'timestamp': self.timestamp[order],
+            'open': self.open[order],
+            'high': self.high[order],
+            'low': self.low[order],
+            'close': self.close[order],
+            'volume': self.volume[order]
+        }
+        if self.has_oi:
+            columns['oi'] = self.oi[order]
+        return pd.DataFrame(columns)
+
+
+class BarSeries:
+    """Today's bars of one (symbol, interval), fed by quote ticks"""
+
+    def __init__(self, exchange, interval, capacity=BAR_RING_SIZE):
+        self.interval_seconds = interval_seconds(interval)
+        self.session_open = SESSION_OPEN_SECONDS.get(exchange, DEFAULT_SESSION_OPEN_SECONDS)
+        self.session_close = SESSION_CLOSE_SECONDS.get(exchange, DEFAULT_SESSION_CLOSE_SECONDS)
+        self.ring = BarRing(capacity)
+        self.lock = threading.Lock()
+        self.day = None              # IST day number the ring holds
+        self.shift = 0               # broker timestamp convention, learned at seed time
+        self.last_tick_at = 0.0
+        self.last_access = time.monotonic()
+
+    def seed(self, df, day, now):
+        """Load today's bars downloaded from the broker"""
+        with self.lock:
+            self.ring.clear()
+            self.day = day
+            if not df.empty:
+                df = df.sort_values('timestamp')
+                self.shift = _timestamp_shift(int(df['timestamp'].iloc[0]), day, self.session_open)
+                self.ring.load(df)
+            self.last_tick_at = now
+
+    def is_live(self, day, now):
+        return self.day == day and now - self.last_tick_at <= BAR_GAP_SECONDS
+
+    def on_tick(self, price, volume, traded, oi, now):
+        """
+        Fold a tick at epoch `now` into the forming bar. Ticks without a trade
+        (`traded` False) update the forming bar but never open a new one, so
+        quiet minutes stay without bars like the broker's.
+        """
+        ist = int(now) + IST_OFFSET_SECONDS
+        day, second = divmod(ist, DAY_SECONDS)
+        with self.lock:
+            self.last_tick_at = now
+            if day != self.day or not self.session_open <= second < self.session_close:
+                return
+            offset = (second - self.session_open) // self.interval_seconds * self.interval_seconds
+            bar_timestamp = day * DAY_SECONDS + self.session_open + offset - IST_OFFSET_SECONDS + self.shift
+            if traded or self.ring.last_timestamp == bar_timestamp:
+                self.ring.update(bar_timestamp, price, volume, oi)
+
+    def to_frame(self):
+        with self.lock:
+            return self.ring.to_frame()
+
+
+def _timestamp_shift(first_timestamp, day, session_open):
+    """
+    Offset of the broker's bar labels from true epoch seconds, inferred from
+    the day's first bar (which cannot start before the session opens).
+    """
+    true_open = day * DAY_SECONDS + session_open - IST_OFFSET_SECONDS
+    difference = first_timestamp - true_open
+    candidates = [shift for shift in TIMESTAMP_SHIFTS if shift <= difference]
+    return max(candidates) if candidates else 0
+
+
+def _in_session(exchange, now):
+    second = (int(now) + IST_OFFSET_SECONDS) % DAY_SECONDS
+    return (SESSION_OPEN_SECONDS.get(exchange, DEFAULT_SESSION_OPEN_SECONDS) <= second <
+            SESSION_CLOSE_SECONDS.get(exchange, DEFAULT_SESSION_CLOSE_SECONDS))
+
+
+class _SymbolFeed:
+    """One gateway quote subscription shared by every interval of a symbol"""
+
+    def __init__(self):
+        self.series = {}           # interval -> BarSeries
+        self.subscription = None
+        self.last_volume = None    # cumulative day volume of the previous tick
+
+
+class BarAggregator:
+    """Tracks today's bars per (broker, symbol, exchange, interval)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._feeds = {}  # (broker, symbol, exchange) -> _SymbolFeed
+        self._sweeper = None
+
+    @staticmethod
+    def supports(interval, data_handler):
+        """Native intraday intervals of brokers that stream ticks"""
+        return interval_seconds(interval) is not None and hasattr(data_handler, 'create_stream')
+
+    def _on_tick(self, feed, data):
+        try:
+            price = float(data.get('ltp') or 0)
+        except (TypeError, ValueError):
+            return
+        if price <= 0:
+            return
+        now = time.time()
+        cumulative = int(float(data.get('volume') or 0))
+        volume = 0
+        if feed.last_volume is not None and cumulative >= feed.last_volume:
+            volume = cumulative - feed.last_volume
+        feed.last_volume = cumulative
+        # Indices carry no volume, every tick counts as a trade
+        traded = volume > 0 or cumulative == 0
+        oi = data.get('oi')
+        oi = int(float(oi)) if oi not in (None, '') else None
+        for series in list(feed.series.values()):
+            series.on_tick(price, volume, traded, oi, now)
+
+    def _get_series(self, broker, data_handler, symbol, exchange, interval):
+        key = (broker, symbol, exchange)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is None:
+                feed = self._feeds[key] = _SymbolFeed()
+            series = feed.series.get(interval)
+            if series is None:
+                series = feed.series[interval] = BarSeries(exchange, interval)
+            series.last_access = time.monotonic()
+            subscribe = feed.subscription is None
+            if subscribe:
+                feed.subscription = False  # reserved, set below
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._run_sweeper, name='bar-aggregator-sweeper', daemon=True)
+                self._sweeper.start()
+
+        if subscribe:
+            feed.subscription = market_data_gateway.subscribe(
+                broker, getattr(data_handler, 'account', None) or account_key(broker), data_handler,
+                symbol, exchange, 'quote', callback=lambda _s, _e, _m, data: self._on_tick(feed, data))
+        return series
+
+    def _run_sweeper(self):
+        while True:
+            time.sleep(BAR_SWEEP_SECONDS)
+            with self._lock:
+                self._sweep()
+                if not self._feeds:
+                    self._sweeper = None
+                    return
+
+    def _sweep(self):
+        """Drop idle series and release subscriptions of symbols nobody asks for or whose session closed"""
+        cutoff = time.monotonic() - BAR_TRACK_IDLE_SECONDS
+        now = time.time()
+        for key, feed in list(self._feeds.items()):
+            if not _in_session(key[2], now):
+                feed.series.clear()
+            for interval, series in list(feed.series.items()):
+                if series.last_access < cutoff:
+                    del feed.series[interval]
+            if not feed.series:
+                del self._feeds[key]
+                if feed.subscription:
+                    market_data_gateway.unsubscribe(feed.subscription)
+
+    def today_bars(self, broker, data_handler, symbol, exchange, interval, fetch_today):
+        """
+        Today's bars for a native intraday interval.
+
+        Args:
+            fetch_today: Callable returning today's bars from the broker, used
+                to seed the buffer and whenever the live feed has a gap
+
+        Returns:
+            pd.DataFrame: Bars sorted by timestamp
+        """
+        now = time.time()
+        if not _in_session(exchange, now):
+            return fetch_today()
+
+        series = self._get_series(broker, data_handler, symbol, exchange, interval)
+        day = (int(now) + IST_OFFSET_SECONDS) // DAY_SECONDS
+        if series.is_live(day, now):
+            return series.to_frame()
+
+        df = fetch_today()
+        series.seed(df, day, now)
+        logger.debug(f"Seeded {exchange}:{symbol} {interval} with {len(df)} bars from the broker")
+        return series.to_frame()
+
+    def clear(self):
+        with self._lock:
+            feeds = list(self._feeds.values())
+            self._feeds.clear()
+        for feed in feeds:
+            if feed.subscription:
+                market_data_gateway.unsubscribe(feed.subscription)
+
+
+# Shared process-wide aggregator
+bar_aggregator = BarAggregator()
@@ -0,0 +1,115 @@
+"""
+Historical data served through the local candle store.
+
+Completed bars are kept in database/history_db.py. A request only asks the
+broker for the date ranges that are not stored yet (plus today, whose bars
+are still forming) and serves the rest from disk, so repeated backtests over
+the same multi-year range stop re-downloading it.
+
+Intervals the broker does not serve natively (e.g. 2m, 45m, 2h, W, M) are
+built from the coarsest native interval that divides them and resampled
+on the server with session-aware boundaries.
+
+Today's intraday bars on brokers with a tick stream come from
+services/bar_aggregator.py, which builds them from live ticks after a single
+download, so strategies polling the latest bars do not re-download the whole
+day on every request.
+"""
+import os
+import logging
+from datetime import timedelta
+import pandas as pd
+
+from database.history_db import get_missing_ranges, store_candles, load_candles, parse_date, today_ist, CANDLE_COLUMNS
+from services.bar_aggregator import bar_aggregator, BAR_AGGREGATOR_ENABLED
+from utils.bar_resampler import choose_base_interval, expand_start_date, resample_bars
+
+logger = logging.getLogger(__name__)
+
+HISTORY_STORE_ENABLED = os.getenv('HISTORY_STORE_ENABLED', 'TRUE').upper() == 'TRUE'
+
+
+def _fetch(data_handler, symbol, exchange, interval, start, end):
+    df = data_handler.get_history(symbol, exchange, interval, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    if not isinstance(df, pd.DataFrame):
+        raise ValueError("Invalid data format returned from broker")
+    return df
+
+
+def get_history(data_handler, broker, symbol, exchange, interval, start_date, end_date):
+    """
+    Drop-in replacement for data_handler.get_history() that serves completed
+    bars from the local store and derives non-native intervals by resampling.
+
+    Returns:
+        pd.DataFrame: Bars sorted by timestamp (epoch seconds)
+    """
+    supported = getattr(data_handler, 'timeframe_map', None)
+    if not supported or interval in supported:
+        return _get_native_history(data_handler, broker, symbol, exchange, interval, start_date, end_date)
+
+    base_interval = choose_base_interval(interval, supported.keys())
+    if base_interval is None:
+        raise ValueError(f"Interval '{interval}' is not supported by {broker} and cannot be derived "
+                         f"from its intervals: {', '.join(supported.keys())}")
+
+    logger.info(f"Resampling {exchange}:{symbol} {base_interval} bars to {interval}")
+    df = _get_native_history(data_handler, broker, symbol, exchange, base_interval,
+                             expand_start_date(interval, start_date), end_date)
+    if not isinstance(df, pd.DataFrame):
+        raise ValueError("Invalid data format returned from broker")
+    return resample_bars(df, interval, exchange).reset_index(drop=True)
+
+
+def _merge_frames(frames):
+    """Concatenate bar frames, keeping the latest copy of each timestamp"""
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset='timestamp', keep='last').sort_values('timestamp').reset_index(drop=True)
+    columns = CANDLE_COLUMNS + (['oi'] if 'oi' in df.columns else [])
+    return df[columns]
+
+
+def _get_native_history(data_handler, broker, symbol, exchange, interval, start_date, end_date):
+    """Fetch a broker-native interval; today's intraday bars come from the live aggregator"""
+    start, end = parse_date(start_date), parse_date(end_date)
+    today = today_ist()
+    if not BAR_AGGREGATOR_ENABLED or not bar_aggregator.supports(interval, data_handler) or not start <= today <= end:
+        return _get_stored_history(data_handler, broker, symbol, exchange, interval, start_date, end_date)
+
+    frames = []
+    if start < today:
+        yesterday = today - timedelta(days=1)
+        frames.append(_get_stored_history(data_handler, broker, symbol, exchange, interval,
+                                          start.strftime('%Y-%m-%d'), yesterday.strftime('%Y-%m-%d')))
+    frames.append(bar_aggregator.today_bars(
+        broker, data_handler, symbol, exchange, interval,
+        lambda: _fetch(data_handler, symbol, exchange, interval, today, today)
+    ))
+    frames = [frame for frame in frames if not frame.empty]
+    return _merge_frames(frames) if frames else pd.DataFrame(columns=CANDLE_COLUMNS)
+
+
+def _get_stored_history(data_handler, broker, symbol, exchange, interval, start_date, end_date):
+    """Fetch a broker-native interval, filling gaps in the local store"""
+    if not HISTORY_STORE_ENABLED:
+        return data_handler.get_history(symbol, exchange, interval, start_date, end_date)
+
+    missing = get_missing_ranges(broker, symbol, exchange, interval, start_date, end_date)
+
+    fetched = []
+    for range_start, range_end in missing:
+        df = _fetch(data_handler, symbol, exchange, interval, range_start, range_end)
+        store_candles(broker, symbol, exchange, interval, df, range_start, range_end)
+        fetched.append(df)
+
+    # Nothing was stored for this range before, the broker response is complete
+    if missing == [(parse_date(start_date), parse_date(end_date))]:
+        return fetched[0]
+
+    stored = load_candles(broker, symbol, exchange, interval, start_date, end_date)
+    frames = [frame for frame in [stored] + fetched if not frame.empty]
+    if not frames:
+        return stored
+
+    logger.debug(f"History {exchange}:{symbol} {interval}: {len(stored)} stored bars, {len(missing)} ranges fetched")
+    return _merge_frames(frames)
@@ -0,0 +1,373 @@
+"""
+Shared real-time market data gateway.
+
+One upstream feed is kept per broker account and every consumer (REST
+endpoints, strategies, the UI) shares it:
+
+    * Subscriptions are reference-counted per (broker, symbol, exchange, mode),
+      so a symbol is subscribed upstream once no matter how many consumers
+      watch it, and unsubscribed when the last one leaves.
+    * The latest tick per key is kept in memory while the key is subscribed,
+      so quote and depth requests can be answered without a network call
+      while the feed is fresh.
+    * Ticks fan out to in-process callbacks and to Socket.IO clients through
+      the shared `extensions.socketio` instance ('market_data' event).
+
+Brokers with a streaming API expose `BrokerData.create_stream(publish)`
+(see broker/kotak/api/data.py). Every other broker is served by
+`PollingStream`, which polls the REST quote/depth APIs for the subscribed
+symbols on a single background thread.
+
+Streams are kept per (broker, account), where the account is the data
+handler's `account` (see account_key()). When a broker's session changes
+the old stream is closed and its subscriptions move to the new one.
+
+Modes are 'quote' (the get_quotes() dict) and 'depth' (the get_depth() dict).
+"""
+import os
+import time
+import hashlib
+import threading
+import logging
+
+from extensions import socketio
+
+logger = logging.getLogger(__name__)
+
+# A tick older than this (seconds) is not served in place of a broker call
+MARKET_DATA_MAX_AGE = float(os.getenv('MARKET_DATA_MAX_AGE', '2'))
+
+# Seconds between REST polls for brokers without a streaming API
+MARKET_DATA_POLL_INTERVAL = float(os.getenv('MARKET_DATA_POLL_INTERVAL', '1'))
+
+# Seconds a one-off snapshot subscription stays open for follow-up requests
+MARKET_DATA_SNAPSHOT_LINGER = float(os.getenv('MARKET_DATA_SNAPSHOT_LINGER', '60'))
+
+# Broadcast every tick to Socket.IO clients
+MARKET_DATA_SOCKETIO = os.getenv('MARKET_DATA_SOCKETIO', 'TRUE').upper() == 'TRUE'
+
+MODES = ('quote', 'depth')
+
+
+def account_key(auth_token):
+    """Stable, non-reversible identifier for a broker session"""
+    return hashlib.sha256(str(auth_token).encode('utf-8')).hexdigest()[:16]
+
+
+class Subscription:
+    """Handle returned by subscribe(); pass it to unsubscribe()"""
+    __slots__ = ('key', 'account', 'callback', 'active')
+
+    def __init__(self, key, account, callback):
+        self.key = key
+        self.account = account
+        self.callback = callback
+        self.active = True
+
+
+class PollingStream:
+    """
+    Upstream feed for brokers without a streaming API: polls get_quotes /
+    get_depth for every subscribed symbol once per interval. Quotes use the
+    broker's batch API (get_multi_quotes) when it has one.
+    """
+
+    def __init__(self, data_handler, publish, interval=MARKET_DATA_POLL_INTERVAL):
+        self.data_handler = data_handler
+        self.publish = publish
+        self.interval = interval
+        self._symbols = set()  # (symbol, exchange, mode)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, symbol, exchange, mode):
+        with self._lock:
+            self._symbols.add((symbol, exchange, mode))
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='market-data-poller', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, symbol, exchange, mode):
+        with self._lock:
+            self._symbols.discard((symbol, exchange, mode))
+
+    def close(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            with self._lock:
+                symbols = list(self._symbols)
+            if symbols:
+                self._poll(symbols)
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _poll(self, symbols):
+        quotes = [(symbol, exchange) for symbol, exchange, mode in symbols if mode == 'quote']
+        depths = [(symbol, exchange) for symbol, exchange, mode in symbols if mode == 'depth']
+
+        if quotes and hasattr(self.data_handler, 'get_multi_quotes'):
+            try:
+                results = self.data_handler.get_multi_quotes(
+                    [{'symbol': symbol, 'exchange': exchange} for symbol, exchange in quotes])
+                for result in results:
+                    if result.get('data'):
+                        self.publish(result['symbol'], result['exchange'], 'quote', result['data'])
+            except Exception as e:
+                logger.error(f"Error polling batch quotes: {e}")
+        else:
+            for symbol, exchange in quotes:
+                self._poll_one(self.data_handler.get_quotes, symbol, exchange, 'quote')
+
+        for symbol, exchange in depths:
+            self._poll_one(self.data_handler.get_depth, symbol, exchange, 'depth')
+
+    def _poll_one(self, fetch, symbol, exchange, mode):
+        try:
+            data = fetch(symbol, exchange)
+            if data:
+                self.publish(symbol, exchange, mode, data)
+        except Exception as e:
+            logger.error(f"Error polling {mode} for {exchange}:{symbol}: {e}")
+
+
+class MarketDataGateway:
+    """Reference-counted subscriptions, latest-tick store and tick fan-out"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tick_ready = threading.Condition(self._lock)
+        self._refcounts = {}   # (broker, symbol, exchange, mode) -> consumers
+        self._callbacks = {}   # key -> [Subscription]
+        self._ticks = {}       # key -> (received_at, data)
+        self._streams = {}     # (broker, account) -> stream adapter
+        self._key_account = {} # key -> account whose stream carries it
+        self._lingers = {}     # key -> [snapshot Subscription, monotonic expiry]
+        self._linger_sweeper = None
+
+    def _get_stream(self, broker, account, data_handler):
+        """
+        Called with the lock held. A new session of a broker (re-login or
+        token change) replaces the previous session's stream: the old stream
+        is evicted and every key it carried moves to the new one.
+
+        Returns:
+            tuple: (stream, keys moved to it, replaced streams to close)
+        """
+        stream = self._streams.get((broker, account))
+        if stream is not None:
+            return stream, [], []
+
+        replaced = [self._streams.pop(stream_key) for stream_key in list(self._streams) if stream_key[0] == broker]
+        moved = [key for key in self._key_account if key[0] == broker]
+        for key in moved:
+            self._key_account[key] = account
+
+        def publish(symbol, exchange, mode, data):
+            self.publish(broker, symbol, exchange, mode, data)
+
+        if hasattr(data_handler, 'create_stream'):
+            stream = data_handler.create_stream(publish)
+        else:
+            stream = PollingStream(data_handler, publish)
+        self._streams[(broker, account)] = stream
+        if replaced:
+            logger.info(f"Market data session changed for {broker}; moving {len(moved)} subscriptions to the new stream")
+        return stream, moved, replaced
+
+    def subscribe(self, broker, account, data_handler, symbol, exchange, mode='quote', callback=None):
+        """
+        Start watching a symbol. The upstream subscription is made only for
+        the first consumer of a key.
+
+        Args:
+            broker: Broker name
+            account: Account identifier (see account_key())
+            data_handler: BrokerData instance used to open the upstream feed
+            callback: Optional callable(symbol, exchange, mode, data) per tick
+
+        Returns:
+            Subscription: Handle for unsubscribe()
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unsupported market data mode: {mode}")
+        key = (broker, symbol, exchange, mode)
+        subscription = Subscription(key, account, callback)
+        with self._lock:
+            count = self._refcounts.get(key, 0)
+            self._refcounts[key] = count + 1
+            if callback is not None:
+                self._callbacks.setdefault(key, []).append(subscription)
+            stream, keys, replaced = self._get_stream(broker, account, data_handler)
+            if count == 0:
+                self._key_account[key] = account
+                keys.append(key)
+
+        for old_stream in replaced:
+            try:
+                old_stream.close()
+            except Exception as e:
+                logger.error(f"Error closing market data stream: {e}")
+        for _, key_symbol, key_exchange, key_mode in keys:
+            try:
+                stream.subscribe(key_symbol, key_exchange, key_mode)
+            except Exception as e:
+                logger.error(f"Error subscribing {key_mode} for {key_exchange}:{key_symbol}: {e}")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Release a subscription; the last consumer of a key ends the upstream subscription"""
+        key = subscription.key
+        with self._lock:
+            if not subscription.active:
+                return
+            subscription.active = False
+            if subscription.callback is not None:
+                callbacks = self._callbacks.get(key, [])
+                if subscription in callbacks:
+                    callbacks.remove(subscription)
+                if not callbacks:
+                    self._callbacks.pop(key, None)
+            count = self._refcounts.get(key, 0) - 1
+            stream = None
+            if count > 0:
+                self._refcounts[key] = count
+            else:
+                self._refcounts.pop(key, None)
+                self._ticks.pop(key, None)
+                account = self._key_account.pop(key, subscription.account)
+                stream = self._streams.get((key[0], account))
+
+        if stream is not None:
+            broker, symbol, exchange, mode = key
+            try:
+                stream.unsubscribe(symbol, exchange, mode)
+            except Exception as e:
+                logger.error(f"Error unsubscribing {mode} for {exchange}:{symbol}: {e}")
+
+    def subscriber_count(self, broker, symbol, exchange, mode='quote'):
+        return self._refcounts.get((broker, symbol, exchange, mode), 0)
+
+    def publish(self, broker, symbol, exchange, mode, data):
+        """Store a tick and fan it out to callbacks and Socket.IO clients"""
+        key = (broker, symbol, exchange, mode)
+        with self._lock:
+            self._ticks[key] = (time.monotonic(), data)
+            callbacks = list(self._callbacks.get(key, ()))
+            self._tick_ready.notify_all()
+
+        for subscription in callbacks:
+            try:
+                subscription.callback(symbol, exchange, mode, data)
+            except Exception as e:
+                logger.error(f"Error in market data callback for {exchange}:{symbol}: {e}")
+
+        if MARKET_DATA_SOCKETIO:
+            try:
+                socketio.emit('market_data', {
+                    'broker': broker,
+                    'symbol': symbol,
+                    'exchange': exchange,
+                    'mode': mode,
+                    'data': data
+                })
+            except Exception as e:
+                logger.error(f"Error emitting market data for {exchange}:{symbol}: {e}")
+
+    def get_latest(self, broker, symbol, exchange, mode='quote', max_age=MARKET_DATA_MAX_AGE):
+        """Latest tick if it is at most `max_age` seconds old, else None"""
+        entry = self._ticks.get((broker, symbol, exchange, mode))
+        if entry is None or time.monotonic() - entry[0] > max_age:
+            return None
+        return entry[1]
+
+    def wait_for_tick(self, broker, symbol, exchange, mode='quote', timeout=1.0, max_age=MARKET_DATA_MAX_AGE):
+        """Block until a fresh tick is available or the timeout expires"""
+        key = (broker, symbol, exchange, mode)
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                entry = self._ticks.get(key)
+                now = time.monotonic()
+                if entry is not None and now - entry[0] <= max_age:
+                    return entry[1]
+                if now >= deadline:
+                    return None
+                self._tick_ready.wait(deadline - now)
+
+    def snapshot(self, broker, account, data_handler, symbol, exchange, mode='quote',
+                 timeout=1.0, linger=MARKET_DATA_SNAPSHOT_LINGER):
+        """
+        One-off read for request/response callers: return the fresh tick or
+        subscribe and wait for one. The key keeps one snapshot subscription
+        until `linger` seconds after the last snapshot of it, so follow-up
+        requests are served from the stream.
+        """
+        key = (broker, symbol, exchange, mode)
+        tick = self.get_latest(broker, symbol, exchange, mode)
+        if not self._extend_linger(key, linger) and tick is None:
+            subscription = self.subscribe(broker, account, data_handler, symbol, exchange, mode)
+            with self._lock:
+                if key in self._lingers:
+                    self._lingers[key][1] = time.monotonic() + linger
+                else:
+                    self._lingers[key] = [subscription, time.monotonic() + linger]
+                    subscription = None
+                    if self._linger_sweeper is None:
+                        self._linger_sweeper = threading.Thread(
+                            target=self._run_linger_sweeper, name='market-data-linger', daemon=True)
+                        self._linger_sweeper.start()
+            if subscription is not None:
+                # Another snapshot of the key subscribed first
+                self.unsubscribe(subscription)
+
+        if tick is not None:
+            return tick
+        return self.wait_for_tick(broker, symbol, exchange, mode, timeout=timeout)
+
+    def _extend_linger(self, key, linger):
+        with self._lock:
+            entry = self._lingers.get(key)
+            if entry is None:
+                return False
+            entry[1] = max(entry[1], time.monotonic() + linger)
+            return True
+
+    def _run_linger_sweeper(self):
+        """Release snapshot subscriptions whose linger expired; one thread for all keys"""
+        while True:
+            time.sleep(1.0)
+            now = time.monotonic()
+            with self._lock:
+                expired = [key for key, (_, expires_at) in self._lingers.items() if expires_at <= now]
+                subscriptions = [self._lingers.pop(key)[0] for key in expired]
+                done = not self._lingers
+                if done:
+                    self._linger_sweeper = None
+            for subscription in subscriptions:
+                self.unsubscribe(subscription)
+            if done:
+                return
+
+    def close(self):
+        """Stop every upstream feed (shutdown)"""
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+            self._refcounts.clear()
+            self._callbacks.clear()
+            self._key_account.clear()
+            self._lingers.clear()
+            self._ticks.clear()
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception as e:
+                logger.error(f"Error closing market data stream: {e}")
+
+
+# Shared process-wide gateway
+market_data_gateway = MarketDataGateway()
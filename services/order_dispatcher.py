@@ -0,0 +1,174 @@
+"""
+Process-wide order dispatcher for multi-leg requests (basket and split orders).
+
+Basket and split orders used to create a new ThreadPoolExecutor per request
+and, for baskets, wait for every BUY leg to finish before submitting any
+SELL. Orders now go through one long-lived dispatcher:
+
+    * Each broker has its own lane with a fixed number of persistent worker
+      threads (ORDER_DISPATCH_CONCURRENCY, overridable per broker with
+      ORDER_DISPATCH_CONCURRENCY_<BROKER>), so bursts of baskets reuse the
+      same threads and one broker cannot starve another.
+    * Jobs wait in a priority queue: BUY legs are taken before SELL legs
+      (margin benefit) but a SELL starts as soon as a worker is free, there is
+      no barrier between the two groups. Equal priorities run in submission
+      order.
+    * Orders per second are capped per broker with the shared token bucket
+      (the same bucket cancel-all and close-all fan-outs use, with per-broker
+      defaults and ORDER_DISPATCH_RATE overrides, see utils/fanout.py).
+
+`dispatch()` returns futures in the order the calls were given, so callers
+report results in a stable order regardless of completion order.
+"""
+import os
+import queue
+import itertools
+import threading
+import logging
+from concurrent.futures import Future
+
+from utils.fanout import order_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Concurrent orders per broker (default matches the old per-request pool size)
+ORDER_DISPATCH_CONCURRENCY = int(os.getenv('ORDER_DISPATCH_CONCURRENCY', '10'))
+
+PRIORITY_BUY = 0
+PRIORITY_SELL = 1
+PRIORITY_DEFAULT = PRIORITY_BUY
+
+
+def action_priority(action):
+    return PRIORITY_SELL if str(action).upper() == 'SELL' else PRIORITY_BUY
+
+
+def broker_concurrency(broker):
+    value = os.getenv(f'ORDER_DISPATCH_CONCURRENCY_{broker.upper()}')
+    try:
+        return max(1, int(value)) if value else ORDER_DISPATCH_CONCURRENCY
+    except ValueError:
+        logger.error(f"Invalid ORDER_DISPATCH_CONCURRENCY_{broker.upper()}: {value}")
+        return ORDER_DISPATCH_CONCURRENCY
+
+
+class _Job:
+    __slots__ = ('future', 'fn', 'args', 'kwargs')
+
+    def __init__(self, fn, args, kwargs):
+        self.future = Future()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            self.future.set_result(self.fn(*self.args, **self.kwargs))
+        except BaseException as e:
+            self.future.set_exception(e)
+
+
+class BrokerLane:
+    """Priority queue and persistent workers for one broker"""
+
+    def __init__(self, broker, workers):
+        self.broker = broker
+        self.workers = workers
+        self.bucket = order_rate_limiter(broker)
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, priority, job):
+        self._queue.put((priority, next(self._sequence), job))
+        self._ensure_workers()
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, daemon=True,
+                                          name=f'order-dispatch-{self.broker}-{len(self._threads)}')
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                job.run()
+            except Exception as e:
+                logger.error(f"Order dispatch worker error for {self.broker}: {e}")
+
+    def stop(self):
+        with self._lock:
+            for _ in self._threads:
+                # Stop markers sort after every queued order
+                self._queue.put((float('inf'), next(self._sequence), None))
+            self._threads = []
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+
+class OrderDispatcher:
+    """Long-lived per-broker order lanes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lanes = {}  # broker -> BrokerLane
+
+    def _lane(self, broker):
+        lane = self._lanes.get(broker)
+        if lane is None:
+            with self._lock:
+                lane = self._lanes.get(broker)
+                if lane is None:
+                    lane = self._lanes[broker] = BrokerLane(broker, broker_concurrency(broker))
+        return lane
+
+    def submit(self, broker, fn, *args, priority=PRIORITY_DEFAULT, **kwargs):
+        """
+        Queue fn(*args, **kwargs) on the broker's lane.
+
+        Returns:
+            concurrent.futures.Future
+        """
+        job = _Job(fn, args, kwargs)
+        self._lane(broker).submit(priority, job)
+        return job.future
+
+    def dispatch(self, broker, calls):
+        """
+        Queue several calls at once.
+
+        Args:
+            calls: Iterable of (priority, fn, args) tuples
+
+        Returns:
+            list: Futures in the order of `calls`
+        """
+        return [self.submit(broker, fn, *args, priority=priority) for priority, fn, args in calls]
+
+    def pending(self, broker):
+        lane = self._lanes.get(broker)
+        return lane.pending if lane else 0
+
+    def shutdown(self):
+        with self._lock:
+            lanes = list(self._lanes.values())
+            self._lanes.clear()
+        for lane in lanes:
+            lane.stop()
+
+
+# Shared process-wide dispatcher
+order_dispatcher = OrderDispatcher()
@@ -0,0 +1,170 @@
+"""
+Order book, in process.
+
+/api/v1/orderbook and /api/v1/orderstatus share these functions. Before,
+orderstatus posted to http://127.0.0.1:5000/api/v1/orderbook: every status
+check was a second HTTP request into the same server, verified the API key
+with Argon2 again, went through traffic and latency logging and waited for a
+free worker (deadlocking once all of them were busy with status checks).
+
+Functions return (success, response_data, status_code) so the endpoints can
+hand the result to make_response(jsonify(...)) unchanged.
+"""
+import logging
+import traceback
+
+from database.auth_db import get_auth_token_broker
+from utils.broker_registry import get_broker_functions, ORDER_API, ORDER_MAPPING
+from utils.circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+def format_decimal(value):
+    """Format numeric value to 2 decimal places"""
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    return value
+
+
+def format_order(order):
+    """Format all numeric values of one order to 2 decimal places"""
+    return {
+        key: format_decimal(value) if isinstance(value, (int, float)) else value
+        for key, value in order.items()
+    }
+
+
+def format_order_data(order_data):
+    """Format all numeric values in order data to 2 decimal places"""
+    if isinstance(order_data, list):
+        return [format_order(item) for item in order_data]
+    return order_data
+
+
+def format_statistics(stats):
+    """Format all numeric values in statistics to 2 decimal places"""
+    if isinstance(stats, dict):
+        return {
+            key: format_decimal(value) if isinstance(value, (int, float)) else value
+            for key, value in stats.items()
+        }
+    return stats
+
+
+def get_broker_funcs(broker_name):
+    api_functions = get_broker_functions(broker_name, ORDER_API, ['get_order_book'])
+    mapping_functions = get_broker_functions(broker_name, ORDER_MAPPING, [
+        'map_order_data',
+        'calculate_order_statistics',
+        'transform_order_data'
+    ])
+    if api_functions is None or mapping_functions is None:
+        return None
+    return {**api_functions, **mapping_functions}
+
+
+def _fetch_orders(broker_funcs, auth_token):
+    """
+    Fetch the broker's order book mapped to OpenAlgo orders.
+
+    Returns:
+        tuple: (mapped order data for calculate_order_statistics, transformed orders),
+            or (None, error message) if the broker returned an error
+    """
+    order_data = broker_funcs['get_order_book'](auth_token)
+    if 'status' in order_data and order_data['status'] == 'error':
+        return None, order_data.get('message', 'Error fetching order data')
+
+    order_data = broker_funcs['map_order_data'](order_data=order_data)
+    return order_data, broker_funcs['transform_order_data'](order_data)
+
+
+def get_orderbook_with_auth(auth_token, broker):
+    """
+    Order book and statistics of a broker session.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    broker_funcs = get_broker_funcs(broker)
+    if broker_funcs is None:
+        return False, {'status': 'error', 'message': 'Broker-specific module not found'}, 404
+
+    try:
+        order_data, orders = _fetch_orders(broker_funcs, auth_token)
+        if order_data is None:
+            return False, {'status': 'error', 'message': orders}, 500
+
+        order_stats = broker_funcs['calculate_order_statistics'](order_data)
+        return True, {
+            'status': 'success',
+            'data': {
+                'orders': format_order_data(orders),
+                'statistics': format_statistics(order_stats)
+            }
+        }, 200
+    except CircuitOpenError as e:
+        return False, e.to_response(), 503
+    except Exception as e:
+        logger.error(f"Error processing order data: {e}")
+        traceback.print_exc()
+        return False, {'status': 'error', 'message': str(e)}, 500
+
+
+def get_orderbook(api_key):
+    """
+    Order book for an OpenAlgo API key.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    auth_token, broker = get_auth_token_broker(api_key)
+    if auth_token is None:
+        return False, {'status': 'error', 'message': 'Invalid openalgo apikey'}, 403
+    return get_orderbook_with_auth(auth_token, broker)
+
+
+def find_order_with_auth(orderid, auth_token, broker):
+    """
+    Look up one order by its broker order id.
+
+    Skips the order statistics and only formats the order that matches,
+    instead of building and serialising the whole order book.
+
+    Returns:
+        tuple: (success, response_data, status_code) with the order under 'data'
+    """
+    broker_funcs = get_broker_funcs(broker)
+    if broker_funcs is None:
+        return False, {'status': 'error', 'message': 'Broker-specific module not found'}, 404
+
+    try:
+        order_data, orders = _fetch_orders(broker_funcs, auth_token)
+        if order_data is None:
+            return False, {'status': 'error', 'message': orders}, 500
+
+        orderid = str(orderid)
+        for order in orders if isinstance(orders, list) else []:
+            if str(order.get('orderid')) == orderid:
+                return True, {'status': 'success', 'data': format_order(order)}, 200
+        return False, {'status': 'error', 'message': f'Order {orderid} not found'}, 404
+    except CircuitOpenError as e:
+        return False, e.to_response(), 503
+    except Exception as e:
+        logger.error(f"Error processing order status: {e}")
+        traceback.print_exc()
+        return False, {'status': 'error', 'message': str(e)}, 500
+
+
+def find_order(orderid, api_key):
+    """
+    Look up one order for an OpenAlgo API key.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    auth_token, broker = get_auth_token_broker(api_key)
+    if auth_token is None:
+        return False, {'status': 'error', 'message': 'Invalid openalgo apikey'}, 403
+    return find_order_with_auth(orderid, auth_token, broker)
@@ -0,0 +1,205 @@
+"""
+Order placement, shared by /api/v1/placeorder and the webhook order queues.
+
+The TradingView and Chartink webhooks used to drain their queues by posting
+each order to our own /api/v1/placeorder over HTTP, paying for the loopback
+request, a second API key check and a second validation per order.
+`place_order` runs the endpoint's logic directly: validation, analyze mode,
+the broker call, socket events and order/analyzer logging are exactly what
+the endpoint does, so an order is logged once whichever way it came in.
+
+Returns (success, response_data, status_code) like the other services.
+"""
+import logging
+import traceback
+
+from database.auth_db import get_auth_token_broker
+from database.apilog_db import async_log_order, executor
+from database.settings_db import get_analyze_mode
+from database.analyzer_db import async_log_analyzer
+from extensions import socketio
+from utils.broker_registry import get_broker_module, ORDER_API
+from utils.circuit_breaker import CircuitOpenError
+from utils.api_analyzer import analyze_request, generate_order_id
+from utils.order_validator import order_validator, OrderValidationError
+from services.position_cache import position_cache
+
+logger = logging.getLogger(__name__)
+
+
+def emit_analyzer_error(request_data, error_message, api_type='placeorder'):
+    """Helper function to emit analyzer error events"""
+    error_response = {
+        'mode': 'analyze',
+        'status': 'error',
+        'message': error_message
+    }
+
+    # Store complete request data without apikey
+    analyzer_request = request_data.copy()
+    if 'apikey' in analyzer_request:
+        del analyzer_request['apikey']
+    analyzer_request['api_type'] = api_type
+
+    # Log to analyzer database
+    executor.submit(async_log_analyzer, analyzer_request, error_response, api_type)
+
+    # Emit socket event
+    socketio.emit('analyzer_update', {
+        'request': analyzer_request,
+        'response': error_response
+    })
+
+    return error_response
+
+
+def analyze_order(order_data, order_request_data, api_type='placeorder'):
+    """
+    Analyze mode: validate against the analyzer rules, log and notify
+    instead of placing the order.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    _, analysis = analyze_request(order_data, api_type, True, validated=True)
+
+    # Store complete request data without apikey
+    analyzer_request = order_request_data.copy()
+    analyzer_request['api_type'] = api_type
+
+    if analysis.get('status') == 'success':
+        response_data = {
+            'mode': 'analyze',
+            'orderid': generate_order_id(),
+            'status': 'success'
+        }
+    else:
+        response_data = {
+            'mode': 'analyze',
+            'status': 'error',
+            'message': analysis.get('message', 'Analysis failed')
+        }
+
+    # Log to analyzer database with complete request and response
+    executor.submit(async_log_analyzer, analyzer_request, response_data, api_type)
+
+    # Emit socket event for toast notification
+    socketio.emit('analyzer_update', {
+        'request': analyzer_request,
+        'response': response_data
+    })
+
+    return response_data['status'] == 'success', response_data, 200
+
+
+def place_order(data):
+    """
+    Validate and place one order.
+
+    Args:
+        data: Raw order payload including the apikey (the /api/v1/placeorder body)
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    try:
+        order_request_data = {key: value for key, value in data.items() if key != 'apikey'}
+
+        # Validate and deserialize input in one pass
+        try:
+            order = order_validator.validate(data)
+        except OrderValidationError as err:
+            error_message = str(err)
+            if get_analyze_mode():
+                return False, emit_analyzer_error(data, error_message), 400
+            error_response = {'status': 'error', 'message': error_message}
+            executor.submit(async_log_order, 'placeorder', data, error_response)
+            return False, error_response, 400
+        order_data = order.to_dict()
+
+        api_key = order_data['apikey']
+        AUTH_TOKEN, broker = get_auth_token_broker(api_key)
+        if AUTH_TOKEN is None:
+            error_response = {
+                'status': 'error',
+                'message': 'Invalid openalgo apikey'
+            }
+            if not get_analyze_mode():
+                executor.submit(async_log_order, 'placeorder', data, error_response)
+            return False, error_response, 403
+
+        # If in analyze mode, analyze the request and return
+        if get_analyze_mode():
+            return analyze_order(order_data, order_request_data)
+
+        # If not in analyze mode, proceed with actual order placement
+        broker_module = get_broker_module(broker, ORDER_API)
+        if broker_module is None:
+            error_response = {
+                'status': 'error',
+                'message': 'Broker-specific module not found'
+            }
+            executor.submit(async_log_order, 'placeorder', data, error_response)
+            return False, error_response, 404
+
+        try:
+            # Call the broker's place_order_api function
+            res, response_data, order_id = broker_module.place_order_api(order_data, AUTH_TOKEN)
+        except CircuitOpenError as e:
+            logger.warning(f"Order rejected, broker circuit open: {e}")
+            error_response = e.to_response()
+            executor.submit(async_log_order, 'placeorder', data, error_response)
+            return False, error_response, 503
+        except Exception as e:
+            logger.error(f"Error in broker_module.place_order_api: {e}")
+            traceback.print_exc()
+            error_response = {
+                'status': 'error',
+                'message': 'Failed to place order due to internal error'
+            }
+            executor.submit(async_log_order, 'placeorder', data, error_response)
+            return False, error_response, 500
+
+        if res.status == 200:
+            # Smart orders must not size against positions from before this order
+            position_cache.expire(broker, AUTH_TOKEN)
+            socketio.emit('order_event', {
+                'symbol': order.symbol,
+                'action': order.action,
+                'orderid': order_id,
+                'exchange': order.exchange,
+                'price_type': order.pricetype,
+                'product_type': order.product,
+                'mode': 'live'
+            })
+            order_response_data = {'status': 'success', 'orderid': order_id}
+            executor.submit(async_log_order, 'placeorder', order_request_data, order_response_data)
+            return True, order_response_data, 200
+
+        message = response_data.get('message', 'Failed to place order') if isinstance(response_data, dict) else 'Failed to place order'
+        error_response = {
+            'status': 'error',
+            'message': message
+        }
+        executor.submit(async_log_order, 'placeorder', data, error_response)
+        return False, error_response, res.status if res.status != 200 else 500
+
+    except KeyError as e:
+        missing_field = str(e)
+        logger.error(f"KeyError: Missing field {missing_field}")
+        error_message = f"A required field is missing: {missing_field}"
+        if get_analyze_mode():
+            return False, emit_analyzer_error(data, error_message), 400
+        error_response = {'status': 'error', 'message': error_message}
+        executor.submit(async_log_order, 'placeorder', data, error_response)
+        return False, error_response, 400
+
+    except Exception as e:
+        logger.error("An unexpected error occurred in PlaceOrder endpoint.")
+        traceback.print_exc()
+        error_message = 'An unexpected error occurred'
+        if get_analyze_mode():
+            return False, emit_analyzer_error(data, error_message), 500
+        error_response = {'status': 'error', 'message': error_message}
+        executor.submit(async_log_order, 'placeorder', data, error_response)
+        return False, error_response, 500
@@ -0,0 +1,229 @@
+"""
+Smart order placement, shared by /api/v1/placesmartorder, the webhook order
+queues and strategy square-off (see services/place_order_service.py).
+
+The current position comes from services/position_cache.py when the broker
+supports it, otherwise from the broker's own place_smartorder_api.
+
+Returns (success, response_data, status_code).
+"""
+import os
+import time
+import logging
+import traceback
+
+from database.auth_db import get_auth_token_broker
+from database.apilog_db import async_log_order, executor
+from database.settings_db import get_analyze_mode
+from extensions import socketio
+from utils.broker_registry import get_broker_module, ORDER_API
+from utils.circuit_breaker import CircuitOpenError
+from utils.order_validator import smart_order_validator, OrderValidationError
+from services.place_order_service import emit_analyzer_error, analyze_order
+from services.position_cache import position_cache, PositionFetchError, POSITION_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+SMART_ORDER_DELAY = os.getenv("SMART_ORDER_DELAY", "0.5")
+
+
+def smart_order_action(order_data, current_position):
+    """
+    Order needed to take current_position to position_size, with the same
+    rules as the brokers' place_smartorder_api.
+
+    Returns:
+        tuple: (action, quantity), or (None, response) when no order is needed
+    """
+    position_size = int(order_data.get('position_size', '0'))
+    if position_size == 0 and current_position == 0 and int(order_data['quantity']) != 0:
+        return order_data['action'], int(order_data['quantity'])
+    if position_size == current_position:
+        if int(order_data['quantity']) == 0:
+            return None, {"status": "success", "message": "No OpenPosition Found. Not placing Exit order."}
+        return None, {"status": "success", "message": "No action needed. Position size matches current position"}
+    if position_size > current_position:
+        return 'BUY', position_size - current_position
+    return 'SELL', current_position - position_size
+
+
+def place_smart_order_cached(broker, broker_module, order_data, auth_token):
+    """
+    place_smartorder_api with the current position read from the shared
+    position cache instead of a positionbook download per order. Orders for
+    the same position are serialised so each sees the previous one's fill.
+
+    Only MARKET orders are counted as filled once accepted; any other price
+    type may rest on the book, so the cache is expired and refetched instead.
+    """
+    symbol, exchange, product = order_data['symbol'], order_data['exchange'], order_data['product']
+    with position_cache.position_lock(broker, auth_token, symbol, exchange, product):
+        current_position = position_cache.get_position(broker, auth_token, symbol, exchange, product)
+        action, quantity = smart_order_action(order_data, current_position)
+        logger.info(f"Smart order {exchange}:{symbol} position_size {order_data['position_size']}, open position {current_position}")
+        if action is None:
+            return None, quantity, None
+
+        res, response, order_id = broker_module.place_order_api(
+            {**order_data, 'action': action, 'quantity': str(quantity)}, auth_token)
+        if res is not None and res.status == 200:
+            if order_data.get('pricetype') == 'MARKET':
+                position_cache.apply_fill(broker, auth_token, symbol, exchange, product, action, quantity)
+            else:
+                position_cache.expire(broker, auth_token)
+        return res, response, order_id
+
+
+def place_smart_order(data, delay=True):
+    """
+    Validate and place one smart order.
+
+    Args:
+        data: Raw order payload including the apikey (the /api/v1/placesmartorder body)
+        delay: Wait SMART_ORDER_DELAY after the order, so a following smart
+            order for the same position sees this one's fill. None waits
+            only when the position is not read from the position cache.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    try:
+        order_request_data = {key: value for key, value in data.items() if key != 'apikey'}
+
+        # Validate and deserialize input in one pass
+        try:
+            order = smart_order_validator.validate(data)
+        except OrderValidationError as err:
+            error_message = str(err)
+            if get_analyze_mode():
+                return False, emit_analyzer_error(data, error_message, 'placesmartorder'), 400
+            error_response = {'status': 'error', 'message': error_message}
+            executor.submit(async_log_order, 'placesmartorder', data, error_response)
+            return False, error_response, 400
+        order_data = order.to_dict()
+
+        api_key = order_data['apikey']
+        AUTH_TOKEN, broker = get_auth_token_broker(api_key)
+        if AUTH_TOKEN is None:
+            error_response = {
+                'status': 'error',
+                'message': 'Invalid openalgo apikey'
+            }
+            if not get_analyze_mode():
+                executor.submit(async_log_order, 'placesmartorder', data, error_response)
+            return False, error_response, 403
+
+        # If in analyze mode, analyze the request and return
+        if get_analyze_mode():
+            return analyze_order(order_data, order_request_data, 'placesmartorder')
+
+        # Live Mode - Proceed with actual order placement
+        broker_module = get_broker_module(broker, ORDER_API)
+        if broker_module is None:
+            error_response = {
+                'status': 'error',
+                'message': 'Broker-specific module not found'
+            }
+            executor.submit(async_log_order, 'placesmartorder', data, error_response)
+            return False, error_response, 404
+
+        cached = POSITION_CACHE_ENABLED and position_cache.supports(broker)
+        if delay is None:
+            delay = not cached
+
+        try:
+            if cached:
+                res, response_data, order_id = place_smart_order_cached(broker, broker_module, order_data, AUTH_TOKEN)
+            else:
+                res, response_data, order_id = broker_module.place_smartorder_api(order_data, AUTH_TOKEN)
+
+            # Handle case where position size matches current position
+            if res is None and response_data.get('status') == 'success' and 'No action needed' in response_data.get('message', ''):
+                # Log the no-action-needed case
+                order_response_data = {
+                    'status': 'success',
+                    'message': 'Positions Already Matched. No Action needed.'
+                }
+                executor.submit(async_log_order, 'placesmartorder', order_request_data, order_response_data)
+
+                # Emit notification for matched positions
+                socketio.emit('order_notification', {
+                    'symbol': order_data.get('symbol'),
+                    'status': 'info',
+                    'message': ' Positions Already Matched. No Action needed.'
+                })
+                return True, order_response_data, 200
+
+            # Log successful order immediately after placement
+            if res and res.status == 200:
+                order_response_data = {'status': 'success', 'orderid': order_id}
+                executor.submit(async_log_order, 'placesmartorder', order_request_data, order_response_data)
+                socketio.emit('order_event', {
+                    'symbol': order_data.get('symbol'),
+                    'action': order_data.get('action'),
+                    'orderid': order_id,
+                    'mode': 'live'
+                })
+
+        except PositionFetchError as e:
+            logger.error(f"Error fetching positions for smart order: {e}")
+            error_response = {
+                'status': 'error',
+                'message': f'Failed to fetch open positions: {e}'
+            }
+            executor.submit(async_log_order, 'placesmartorder', data, error_response)
+            return False, error_response, 500
+        except CircuitOpenError as e:
+            logger.warning(f"Smart order rejected, broker circuit open: {e}")
+            error_response = e.to_response()
+            executor.submit(async_log_order, 'placesmartorder', data, error_response)
+            return False, error_response, 503
+        except Exception as e:
+            logger.error(f"Error in broker_module.place_smartorder_api: {e}")
+            traceback.print_exc()
+            error_response = {
+                'status': 'error',
+                'message': 'Failed to place smart order due to internal error'
+            }
+            executor.submit(async_log_order, 'placesmartorder', data, error_response)
+            return False, error_response, 500
+
+        # Add delay if needed
+        if delay:
+            try:
+                time.sleep(float(SMART_ORDER_DELAY))
+            except Exception as e:
+                logger.error(f"Invalid SMART_ORDER_DELAY value: {SMART_ORDER_DELAY}")
+                traceback.print_exc()
+
+        if res and res.status == 200:
+            return True, order_response_data, 200
+
+        message = response_data.get('message', 'Failed to place smart order') if isinstance(response_data, dict) else 'Failed to place smart order'
+        error_response = {
+            'status': 'error',
+            'message': message
+        }
+        executor.submit(async_log_order, 'placesmartorder', data, error_response)
+        status_code = res.status if res and hasattr(res, 'status') else 500
+        return False, error_response, status_code
+
+    except KeyError as e:
+        missing_field = str(e)
+        logger.error(f"KeyError: Missing field {missing_field}")
+        error_message = f"A required field is missing: {missing_field}"
+        if get_analyze_mode():
+            return False, emit_analyzer_error(data, error_message, 'placesmartorder'), 400
+        error_response = {'status': 'error', 'message': error_message}
+        executor.submit(async_log_order, 'placesmartorder', data, error_response)
+        return False, error_response, 400
+
+    except Exception as e:
+        logger.error("An unexpected error occurred in PlaceSmartOrder endpoint.")
+        traceback.print_exc()
+        error_message = 'An unexpected error occurred'
+        if get_analyze_mode():
+            return False, emit_analyzer_error(data, error_message, 'placesmartorder'), 500
+        error_response = {'status': 'error', 'message': error_message}
+        executor.submit(async_log_order, 'placesmartorder', data, error_response)
+        return False, error_response, 500
@@ -0,0 +1,211 @@
+"""
+Per-account open position cache for smart orders.
+
+Every broker's place_smartorder_api looked up the current position by
+downloading the whole positionbook and scanning it for one symbol, so a
+strategy firing smart orders on 20 symbols at once pulled the positionbook
+20 times within a second. Smart orders now read the position from here:
+
+    * One positionbook fetch (mapped to OpenAlgo symbols/exchanges/products
+      with the broker's mapping.order_data functions, like /api/v1/positionbook)
+      hydrates an index keyed by (symbol, exchange, product). Concurrent
+      callers wait for that single fetch instead of each calling the broker.
+    * MARKET smart orders we place update the cached quantity optimistically.
+      Any other order placed on the account (limit smart orders, regular,
+      basket and split orders) expires the index so the next read refetches.
+    * The index is re-fetched once it is older than POSITION_CACHE_TTL. A
+      fill placed within POSITION_FILL_GRACE seconds that the broker does not
+      report yet is kept on top of the fetched positions; any other mismatch
+      is resolved in favour of the broker.
+"""
+import os
+import time
+import threading
+import logging
+
+from services.market_data_gateway import account_key
+from utils.broker_registry import get_broker_functions, ORDER_API, ORDER_MAPPING
+
+logger = logging.getLogger(__name__)
+
+POSITION_CACHE_ENABLED = os.getenv('POSITION_CACHE_ENABLED', 'TRUE').upper() == 'TRUE'
+
+# Seconds a fetched positionbook is trusted before it is fetched again
+POSITION_CACHE_TTL = float(os.getenv('POSITION_CACHE_TTL', '2'))
+
+# Seconds our own fills are kept while the broker's positionbook catches up
+POSITION_FILL_GRACE = float(os.getenv('POSITION_FILL_GRACE', '5'))
+
+
+class PositionFetchError(Exception):
+    """The broker's positionbook could not be fetched"""
+
+
+def _to_quantity(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _PendingFill:
+    __slots__ = ('expected', 'delta', 'at')
+
+    def __init__(self, expected, delta, at):
+        self.expected = expected   # quantity once the broker reports the fill
+        self.delta = delta
+        self.at = at
+
+
+class AccountPositions:
+    """Positions of one broker account"""
+
+    def __init__(self):
+        self.positions = {}        # (symbol, exchange, product) -> net quantity
+        self.pending = {}          # key -> _PendingFill not yet seen in a fetch
+        self.fetched_at = None     # monotonic time of the last fetch
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.key_locks = {}
+
+    def is_fresh(self, ttl):
+        return self.fetched_at is not None and time.monotonic() - self.fetched_at <= ttl
+
+    def load(self, positions):
+        """Replace the index with a fetched positionbook, keeping fills it does not show yet"""
+        now = time.monotonic()
+        with self.lock:
+            for key, fill in list(self.pending.items()):
+                reported = positions.get(key, 0)
+                if now - fill.at <= POSITION_FILL_GRACE and reported == fill.expected - fill.delta:
+                    positions[key] = fill.expected   # broker still lagging behind our fill
+                else:
+                    del self.pending[key]
+            self.positions = positions
+            self.fetched_at = now
+
+    def apply_fill(self, key, delta):
+        with self.lock:
+            expected = self.positions.get(key, 0) + delta
+            self.positions[key] = expected
+            fill = self.pending.get(key)
+            # Consecutive fills fold into one pending entry against the last fetch
+            total = delta + (fill.delta if fill else 0)
+            self.pending[key] = _PendingFill(expected, total, time.monotonic())
+
+    def expire(self):
+        with self.lock:
+            self.fetched_at = None
+
+    def key_lock(self, key):
+        with self.lock:
+            lock = self.key_locks.get(key)
+            if lock is None:
+                lock = self.key_locks[key] = threading.Lock()
+            return lock
+
+
+class PositionCache:
+    """Open positions per (broker, account), indexed by (symbol, exchange, product)"""
+
+    def __init__(self, ttl=POSITION_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._accounts = {}  # (broker, account) -> AccountPositions
+
+    @staticmethod
+    def supports(broker):
+        """Whether the broker has the positionbook functions the cache is built from"""
+        return (get_broker_functions(broker, ORDER_API, ['get_positions']) is not None and
+                get_broker_functions(broker, ORDER_MAPPING, ['map_position_data', 'transform_positions_data']) is not None)
+
+    def _account(self, broker, auth_token):
+        key = (broker, account_key(auth_token))
+        account = self._accounts.get(key)
+        if account is None:
+            with self._lock:
+                account = self._accounts.setdefault(key, AccountPositions())
+        return account
+
+    def _fetch(self, broker, auth_token):
+        api_functions = get_broker_functions(broker, ORDER_API, ['get_positions'])
+        mapping_functions = get_broker_functions(broker, ORDER_MAPPING, ['map_position_data', 'transform_positions_data'])
+        if api_functions is None or mapping_functions is None:
+            raise PositionFetchError(f"Broker {broker} has no positionbook functions")
+
+        positions_data = api_functions['get_positions'](auth_token)
+        if isinstance(positions_data, dict) and positions_data.get('status') == 'error':
+            raise PositionFetchError(positions_data.get('message', 'Error fetching positions data'))
+        positions_data = mapping_functions['map_position_data'](positions_data)
+        positions_data = mapping_functions['transform_positions_data'](positions_data)
+
+        positions = {}
+        for position in positions_data or []:
+            key = (position.get('symbol'), position.get('exchange'), position.get('product'))
+            # First match wins, as in /api/v1/openposition
+            if key not in positions:
+                positions[key] = _to_quantity(position.get('quantity', 0))
+        return positions
+
+    def _fresh_account(self, broker, auth_token):
+        account = self._account(broker, auth_token)
+        if not account.is_fresh(self.ttl):
+            with account.refresh_lock:
+                # Whoever waited on the lock reuses the fetch that just completed
+                if not account.is_fresh(self.ttl):
+                    started = time.monotonic()
+                    account.load(self._fetch(broker, auth_token))
+                    logger.debug(f"Fetched {broker} positions in {(time.monotonic() - started) * 1000:.0f} ms")
+        return account
+
+    def refresh(self, broker, auth_token):
+        """
+        Fetch the positionbook now; reads within POSITION_CACHE_TTL reuse it.
+
+        Raises:
+            PositionFetchError: If the fetch failed
+        """
+        account = self._account(broker, auth_token)
+        with account.refresh_lock:
+            account.load(self._fetch(broker, auth_token))
+
+    def get_position(self, broker, auth_token, symbol, exchange, product):
+        """
+        Net quantity of an open position (0 if there is none).
+
+        Raises:
+            PositionFetchError: If the positionbook had to be fetched and failed
+        """
+        account = self._fresh_account(broker, auth_token)
+        return account.positions.get((symbol, exchange, product), 0)
+
+    def apply_fill(self, broker, auth_token, symbol, exchange, product, action, quantity):
+        """Record an order we placed so the next read reflects it before the broker does"""
+        delta = _to_quantity(quantity)
+        if action == 'SELL':
+            delta = -delta
+        if delta:
+            self._account(broker, auth_token).apply_fill((symbol, exchange, product), delta)
+
+    def position_lock(self, broker, auth_token, symbol, exchange, product):
+        """Lock serialising read-decide-place for one position"""
+        return self._account(broker, auth_token).key_lock((symbol, exchange, product))
+
+    def expire(self, broker, auth_token):
+        """Make the next read refetch the account's positionbook, keeping our pending fills"""
+        account = self._accounts.get((broker, account_key(auth_token)))
+        if account is not None:
+            account.expire()
+
+    def invalidate(self, broker=None):
+        """Forget cached positions (all brokers when broker is None)"""
+        with self._lock:
+            if broker is None:
+                self._accounts.clear()
+            else:
+                for key in [key for key in self._accounts if key[0] == broker]:
+                    del self._accounts[key]
+
+
+# Shared process-wide cache
+position_cache = PositionCache()
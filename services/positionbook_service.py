@@ -0,0 +1,139 @@
+"""
+Position book, in process.
+
+/api/v1/positionbook and /api/v1/openposition share these functions instead
+of openposition posting to http://127.0.0.1:5000/api/v1/positionbook (see
+services/orderbook_service.py for why the loopback request had to go).
+
+Functions return (success, response_data, status_code).
+"""
+import logging
+import traceback
+
+from database.auth_db import get_auth_token_broker
+from services.orderbook_service import format_decimal
+from utils.broker_registry import get_broker_functions, ORDER_API, ORDER_MAPPING
+from utils.circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+def format_position(position):
+    """Format all numeric values of one position to 2 decimal places"""
+    return {
+        key: format_decimal(value) if isinstance(value, (int, float)) else value
+        for key, value in position.items()
+    }
+
+
+def format_position_data(position_data):
+    """Format all numeric values in position data to 2 decimal places"""
+    if isinstance(position_data, list):
+        return [format_position(item) for item in position_data]
+    return position_data
+
+
+def get_broker_funcs(broker_name):
+    api_functions = get_broker_functions(broker_name, ORDER_API, ['get_positions'])
+    mapping_functions = get_broker_functions(broker_name, ORDER_MAPPING, [
+        'map_position_data',
+        'transform_positions_data'
+    ])
+    if api_functions is None or mapping_functions is None:
+        return None
+    return {**api_functions, **mapping_functions}
+
+
+def _fetch_positions(broker_funcs, auth_token):
+    """
+    Fetch the broker's positions mapped to OpenAlgo positions.
+
+    Returns:
+        tuple: (positions, None), or (None, error message) if the broker returned an error
+    """
+    positions_data = broker_funcs['get_positions'](auth_token)
+    if 'status' in positions_data and positions_data['status'] == 'error':
+        return None, positions_data.get('message', 'Error fetching positions data')
+
+    positions_data = broker_funcs['map_position_data'](positions_data)
+    return broker_funcs['transform_positions_data'](positions_data), None
+
+
+def get_positionbook_with_auth(auth_token, broker):
+    """
+    Position book of a broker session.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    broker_funcs = get_broker_funcs(broker)
+    if broker_funcs is None:
+        return False, {'status': 'error', 'message': 'Broker-specific module not found'}, 404
+
+    try:
+        positions, error = _fetch_positions(broker_funcs, auth_token)
+        if error is not None:
+            return False, {'status': 'error', 'message': error}, 500
+        return True, {'status': 'success', 'data': format_position_data(positions)}, 200
+    except CircuitOpenError as e:
+        return False, e.to_response(), 503
+    except Exception as e:
+        logger.error(f"Error processing positions data: {e}")
+        traceback.print_exc()
+        return False, {'status': 'error', 'message': str(e)}, 500
+
+
+def get_positionbook(api_key):
+    """
+    Position book for an OpenAlgo API key.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    auth_token, broker = get_auth_token_broker(api_key)
+    if auth_token is None:
+        return False, {'status': 'error', 'message': 'Invalid openalgo apikey'}, 403
+    return get_positionbook_with_auth(auth_token, broker)
+
+
+def find_position_with_auth(symbol, exchange, product, auth_token, broker):
+    """
+    Net quantity of one position (0 if there is none).
+
+    Returns:
+        tuple: (success, response_data, status_code) with 'quantity' in response_data
+    """
+    broker_funcs = get_broker_funcs(broker)
+    if broker_funcs is None:
+        return False, {'status': 'error', 'message': 'Broker-specific module not found'}, 404
+
+    try:
+        positions, error = _fetch_positions(broker_funcs, auth_token)
+        if error is not None:
+            return False, {'status': 'error', 'message': error}, 500
+
+        for position in positions if isinstance(positions, list) else []:
+            if (position.get('symbol') == symbol and
+                position.get('exchange') == exchange and
+                position.get('product') == product):
+                return True, {'quantity': format_decimal(position['quantity']), 'status': 'success'}, 200
+        return True, {'quantity': 0, 'status': 'success'}, 200
+    except CircuitOpenError as e:
+        return False, e.to_response(), 503
+    except Exception as e:
+        logger.error(f"Error processing open position: {e}")
+        traceback.print_exc()
+        return False, {'status': 'error', 'message': str(e)}, 500
+
+
+def find_position(symbol, exchange, product, api_key):
+    """
+    Net quantity of one position for an OpenAlgo API key.
+
+    Returns:
+        tuple: (success, response_data, status_code)
+    """
+    auth_token, broker = get_auth_token_broker(api_key)
+    if auth_token is None:
+        return False, {'status': 'error', 'message': 'Invalid openalgo apikey'}, 403
+    return find_position_with_auth(symbol, exchange, product, auth_token, broker)
@@ -0,0 +1,100 @@
+"""
+Built-in jobs of the scheduler service (services/scheduler_service.py).
+
+Each job is a module-level function so the persistent job store can refer to
+it. `register_default_jobs()` (re)creates them in the leader process from
+the environment; an empty time or a retention of 0 leaves a job out:
+
+    * MASTER_CONTRACT_REFRESH_TIME: daily master contract download for every
+      logged-in broker (HH:MM IST, weekdays; off by default).
+    * WARMUP_TIME: weekday warm-up before the open. Preloads the broker
+      modules of every logged-in session in the leader process. Position and
+      strategy caches are per process and fill on first use, so they are not
+      warmed here.
+    * Order queue retention: hourly purge of finished webhook orders older
+      than ORDER_QUEUE_RETENTION_HOURS.
+    * TRAFFIC_LOG_RETENTION_DAYS / LATENCY_LOG_RETENTION_DAYS: nightly purge
+      of old traffic and latency logs.
+"""
+import os
+import logging
+
+from database.auth_db import get_active_auths
+from database.order_queue_db import purge_orders
+from database.traffic_db import purge_logs as purge_traffic_logs
+from database.latency_db import purge_logs as purge_latency_logs
+from utils.auth_utils import async_master_contract_download
+from utils.broker_registry import get_broker_module, ORDER_API
+from services.webhook_order_scheduler import ORDER_QUEUE_RETENTION_HOURS
+from services.scheduler_service import scheduler_service
+
+logger = logging.getLogger(__name__)
+
+# Daily master contract refresh, HH:MM IST (empty disables)
+MASTER_CONTRACT_REFRESH_TIME = os.getenv('MASTER_CONTRACT_REFRESH_TIME', '')
+
+# Pre-open warm-up, HH:MM IST (empty disables)
+WARMUP_TIME = os.getenv('WARMUP_TIME', '09:00')
+
+# Days of traffic and latency logs to keep (0 keeps everything)
+TRAFFIC_LOG_RETENTION_DAYS = int(os.getenv('TRAFFIC_LOG_RETENTION_DAYS', '0'))
+LATENCY_LOG_RETENTION_DAYS = int(os.getenv('LATENCY_LOG_RETENTION_DAYS', '0'))
+
+WEEKDAYS = 'mon-fri'
+
+
+def refresh_master_contracts():
+    """Download the master contract of every broker with a live session"""
+    for broker in sorted({broker for _, broker, _ in get_active_auths()}):
+        logger.info(f"Scheduled master contract refresh for {broker}")
+        async_master_contract_download(broker)
+
+
+def warm_up():
+    """Preload the broker modules of logged-in sessions before the open"""
+    brokers = sorted({broker for _, broker, _ in get_active_auths()})
+    for broker in brokers:
+        get_broker_module(broker, ORDER_API)
+    logger.info(f"Warm-up loaded broker modules for {', '.join(brokers) or 'no sessions'}")
+
+
+def purge_order_queue():
+    """Delete finished webhook orders past their retention"""
+    purged = purge_orders(ORDER_QUEUE_RETENTION_HOURS * 3600)
+    if purged:
+        logger.info(f"Purged {purged} finished orders from the durable webhook order queue")
+
+
+def purge_request_logs():
+    """Delete traffic and latency logs past their retention"""
+    if TRAFFIC_LOG_RETENTION_DAYS > 0:
+        logger.info(f"Purged {purge_traffic_logs(TRAFFIC_LOG_RETENTION_DAYS)} traffic logs")
+    if LATENCY_LOG_RETENTION_DAYS > 0:
+        logger.info(f"Purged {purge_latency_logs(LATENCY_LOG_RETENTION_DAYS)} latency logs")
+
+
+def _cron_at(func, job_id, hhmm, **trigger_args):
+    if not hhmm:
+        scheduler_service.remove_job(job_id)
+        return
+    try:
+        hour, minute = map(int, hhmm.split(':'))
+    except ValueError:
+        logger.error(f"Invalid time for scheduled job {job_id}: {hhmm}")
+        return
+    scheduler_service.add_job(func, 'cron', job_id, hour=hour, minute=minute, **trigger_args)
+
+
+def _create_default_jobs():
+    _cron_at(refresh_master_contracts, 'master_contract_refresh', MASTER_CONTRACT_REFRESH_TIME, day_of_week=WEEKDAYS)
+    _cron_at(warm_up, 'warm_up', WARMUP_TIME, day_of_week=WEEKDAYS)
+    scheduler_service.add_job(purge_order_queue, 'interval', 'order_queue_retention', hours=1)
+    if TRAFFIC_LOG_RETENTION_DAYS > 0 or LATENCY_LOG_RETENTION_DAYS > 0:
+        _cron_at(purge_request_logs, 'request_log_retention', '02:00')
+    else:
+        scheduler_service.remove_job('request_log_retention')
+
+
+def register_default_jobs():
+    """Create the built-in jobs in whichever process becomes scheduler leader"""
+    scheduler_service.on_leader(_create_default_jobs)
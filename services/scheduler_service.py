@@ -0,0 +1,302 @@
+"""
+Single scheduler for every timed job (square-offs, master contract refresh,
+warm-up, retention).
+
+The TradingView and Chartink blueprints each started their own
+BackgroundScheduler at import, with square-off jobs kept in memory only, so
+jobs were lost on restart and every gunicorn worker ran every job. Now:
+
+    * One APScheduler instance per process with a persistent SQLAlchemy job
+      store (SCHEDULER_DATABASE_URL), shared by all workers.
+    * Only the process holding the leader lock (an exclusive lock on
+      SCHEDULER_LOCK_FILE) runs jobs. The others start paused: they can add
+      and remove jobs in the shared store, and retry the lock every
+      SCHEDULER_POLL_INTERVAL seconds to take over if the leader goes away.
+    * The leader re-reads the job store at least every SCHEDULER_POLL_INTERVAL
+      seconds, so jobs added by another worker are picked up.
+    * Runtime, lateness, errors and misfires are recorded per job; see
+      `metrics()` and /latency/api/scheduler.
+
+Job functions must be module-level functions (the store pickles a reference
+to them) and are registered with `add_job`.
+"""
+import os
+import time
+import threading
+import logging
+from collections import deque
+
+import pytz
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.events import (
+    EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'TRUE').upper() == 'TRUE'
+
+# Persistent job store shared by all workers
+SCHEDULER_DATABASE_URL = os.getenv('SCHEDULER_DATABASE_URL', 'sqlite:///db/scheduler.db')
+
+# Only the process holding a lock on this file runs jobs
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', 'db/scheduler.lock')
+
+# Seconds between job store re-reads by the leader and lock attempts by the others
+SCHEDULER_POLL_INTERVAL = float(os.getenv('SCHEDULER_POLL_INTERVAL', '30'))
+
+# Jobs running at the same time
+SCHEDULER_MAX_WORKERS = int(os.getenv('SCHEDULER_MAX_WORKERS', '10'))
+
+SCHEDULER_TIMEZONE = pytz.timezone('Asia/Kolkata')
+
+# Runtimes kept per job for the metrics
+RUNTIME_WINDOW = 100
+
+HEARTBEAT_JOB_ID = 'scheduler_heartbeat'
+
+
+class _JobStats:
+    __slots__ = ('runs', 'errors', 'misfires', 'skipped', 'runtimes', 'last_run_at',
+                 'last_runtime_ms', 'last_lateness_ms', 'last_error')
+
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        self.misfires = 0
+        self.skipped = 0
+        self.runtimes = deque(maxlen=RUNTIME_WINDOW)
+        self.last_run_at = None
+        self.last_runtime_ms = None
+        self.last_lateness_ms = None
+        self.last_error = None
+
+    def to_dict(self):
+        runtimes = self.runtimes
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'misfires': self.misfires,
+            'skipped': self.skipped,
+            'last_run_at': self.last_run_at,
+            'last_runtime_ms': self.last_runtime_ms,
+            'avg_runtime_ms': round(sum(runtimes) / len(runtimes), 1) if runtimes else None,
+            'max_runtime_ms': max(runtimes) if runtimes else None,
+            'last_lateness_ms': self.last_lateness_ms,
+            'last_error': self.last_error
+        }
+
+
+def _heartbeat():
+    """Runs in the leader so it re-reads the shared job store regularly"""
+
+
+class SchedulerService:
+    """Process-wide scheduler, running jobs only in the leader process"""
+
+    def __init__(self):
+        self.scheduler = None
+        self.is_leader = False
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._leader_callbacks = []
+        self._stats = {}       # job id -> _JobStats
+        self._submitted = {}   # (job id, scheduled run time) -> (monotonic, wall clock) at submission
+
+    def start(self):
+        """Start the scheduler once; idempotent. Does nothing when SCHEDULER_ENABLED is off"""
+        if not SCHEDULER_ENABLED:
+            return
+        with self._lock:
+            if self.scheduler is not None:
+                return
+            os.makedirs('db', exist_ok=True)
+            self.scheduler = BackgroundScheduler(
+                jobstores={
+                    'default': SQLAlchemyJobStore(url=SCHEDULER_DATABASE_URL),
+                    'local': MemoryJobStore()
+                },
+                executors={'default': {'type': 'threadpool', 'max_workers': SCHEDULER_MAX_WORKERS}},
+                job_defaults={
+                    'coalesce': True,
+                    'misfire_grace_time': 300,
+                    'max_instances': 1
+                },
+                timezone=SCHEDULER_TIMEZONE
+            )
+            self.scheduler.add_listener(
+                self._on_event,
+                EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+            )
+            leader = self._try_lock()
+            # Followers start paused so they can still write to the shared job store
+            self.scheduler.start(paused=not leader)
+        if leader:
+            self._become_leader()
+        else:
+            logger.info("Scheduler started as follower; another process runs the jobs")
+            threading.Thread(target=self._follow, daemon=True, name='scheduler-follower').start()
+
+    def _try_lock(self):
+        try:
+            lock_file = open(SCHEDULER_LOCK_FILE, 'a+')
+        except OSError as e:
+            logger.error(f"Cannot open scheduler lock file {SCHEDULER_LOCK_FILE}: {e}")
+            return False
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held open for the life of the process; the OS releases it if we die
+        self._lock_file = lock_file
+        return True
+
+    def _follow(self):
+        while not self.is_leader:
+            time.sleep(SCHEDULER_POLL_INTERVAL)
+            if self._try_lock():
+                self._become_leader()
+
+    def _become_leader(self):
+        self.is_leader = True
+        self.scheduler.add_job(_heartbeat, 'interval', seconds=SCHEDULER_POLL_INTERVAL, id=HEARTBEAT_JOB_ID,
+                               jobstore='local', replace_existing=True)
+        self.scheduler.resume()
+        logger.info(f"Scheduler leader in process {os.getpid()}")
+        for callback in list(self._leader_callbacks):
+            self._run_leader_callback(callback)
+
+    def _run_leader_callback(self, callback):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in scheduler leader callback {getattr(callback, '__name__', callback)}: {e}")
+
+    def on_leader(self, callback):
+        """
+        Call `callback` in the process that becomes leader, e.g. to (re)create
+        jobs from configuration. Called at once if this process already leads.
+        """
+        self._leader_callbacks.append(callback)
+        if self.is_leader:
+            self._run_leader_callback(callback)
+
+    def add_job(self, func, trigger, job_id, **trigger_args):
+        """
+        Add or replace a job in the shared store.
+
+        Args:
+            func: Module-level function to run
+            trigger: APScheduler trigger name ('cron', 'interval', 'date')
+            job_id: Unique id; an existing job with this id is replaced
+            trigger_args: Trigger fields, plus `args`/`kwargs` for the function
+        """
+        if not self._started():
+            return None
+        args = trigger_args.pop('args', None)
+        kwargs = trigger_args.pop('kwargs', None)
+        return self.scheduler.add_job(func, trigger, args=args, kwargs=kwargs, id=job_id,
+                                      replace_existing=True, **trigger_args)
+
+    def remove_job(self, job_id):
+        """Remove a job if it exists"""
+        if not self._started():
+            return False
+        try:
+            self.scheduler.remove_job(job_id)
+            return True
+        except JobLookupError:
+            return False
+
+    def job_ids(self, prefix=''):
+        """Ids of the jobs in the shared store that start with `prefix`"""
+        if not self._started():
+            return []
+        return [job.id for job in self.scheduler.get_jobs(jobstore='default') if job.id.startswith(prefix)]
+
+    def get_job(self, job_id):
+        if not self._started():
+            return None
+        return self.scheduler.get_job(job_id)
+
+    def _started(self):
+        if self.scheduler is None:
+            self.start()
+        return self.scheduler is not None
+
+    def _on_event(self, event):
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(event.job_id, _JobStats())
+            if event.code == EVENT_JOB_SUBMITTED:
+                for run_time in event.scheduled_run_times:
+                    self._submitted[(event.job_id, run_time)] = (now, time.time())
+            elif event.code in (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR):
+                started, started_wall = self._submitted.pop((event.job_id, event.scheduled_run_time), (now, time.time()))
+                stats.runs += 1
+                stats.last_run_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_wall))
+                stats.last_runtime_ms = round((now - started) * 1000, 1)
+                stats.last_lateness_ms = round((started_wall - event.scheduled_run_time.timestamp()) * 1000, 1)
+                stats.runtimes.append(stats.last_runtime_ms)
+                if event.code == EVENT_JOB_ERROR:
+                    stats.errors += 1
+                    stats.last_error = str(event.exception)
+            elif event.code == EVENT_JOB_MISSED:
+                stats.misfires += 1
+                logger.warning(f"Scheduled job {event.job_id} missed its run at {event.scheduled_run_time}")
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                stats.skipped += 1
+
+    def metrics(self):
+        """Leadership, and per job its next run and runtime/misfire statistics"""
+        if self.scheduler is None:
+            return {'enabled': SCHEDULER_ENABLED, 'running': False, 'leader': False, 'jobs': {}}
+        jobs = {}
+        try:
+            for job in self.scheduler.get_jobs():
+                if job.id == HEARTBEAT_JOB_ID:
+                    continue
+                jobs[job.id] = {
+                    'trigger': str(job.trigger),
+                    'next_run_time': job.next_run_time.isoformat() if job.next_run_time else None
+                }
+        except Exception as e:
+            logger.error(f"Error reading scheduled jobs: {e}")
+        with self._lock:
+            for job_id, stats in self._stats.items():
+                if job_id != HEARTBEAT_JOB_ID:
+                    jobs.setdefault(job_id, {}).update(stats.to_dict())
+        return {
+            'enabled': SCHEDULER_ENABLED,
+            'running': True,
+            'leader': self.is_leader,
+            'pid': os.getpid(),
+            'jobs': jobs
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self.scheduler is not None:
+                self.scheduler.shutdown(wait=False)
+                self.scheduler = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self.is_leader = False
+
+
+# Shared process-wide scheduler
+scheduler_service = SchedulerService()
@@ -0,0 +1,158 @@
+"""
+Square-off engine for scheduled intraday strategy exits.
+
+At a strategy's square-off time the TradingView and Chartink blueprints used
+to queue one placesmartorder per mapped symbol. The webhook scheduler ran
+them at WEBHOOK_SMART_ORDER_RATE (1/s), and each smart order looked up its
+own position, so fifty symbols took close to a minute to flatten. Now:
+
+    * The positionbook is fetched once per square-off (services/position_cache.py).
+    * The closing order of every mapped position is worked out from that one
+      snapshot. Flat positions need no order.
+    * Closing orders go out concurrently on the broker's order_dispatcher
+      lane, under its orders/sec bucket, and each is placed with
+      place_order so order logs and events are unchanged. Every leg holds the
+      position's lock from the cache, so a webhook smart order for the same
+      position cannot interleave with the exit.
+
+Brokers the position cache does not support, analyze mode, and a failed
+positionbook fetch fall back to one smart order per symbol on the same
+concurrent lane.
+
+Each run's per-strategy completion time and leg results are logged and kept
+for `reports()`.
+"""
+import time
+import threading
+import logging
+
+from database.auth_db import get_auth_token_broker
+from database.settings_db import get_analyze_mode
+from services.order_dispatcher import order_dispatcher, action_priority
+from services.place_order_service import place_order
+from services.webhook_basket_service import place_leg
+from services.position_cache import position_cache, PositionFetchError, POSITION_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+
+def close_payload(api_key, strategy, symbol, exchange, product, action='SELL', quantity=0, smart=False):
+    payload = {
+        'apikey': api_key,
+        'strategy': strategy,
+        'symbol': symbol,
+        'exchange': exchange,
+        'product': product,
+        'action': action,
+        'pricetype': 'MARKET',
+        'quantity': str(quantity),
+        'price': '0',
+        'trigger_price': '0',
+        'disclosed_quantity': '0'
+    }
+    if smart:
+        # position_size 0 closes whatever is open
+        payload['position_size'] = '0'
+    return payload
+
+
+class SquareOffEngine:
+    """Flattens all mapped positions of a strategy with one positionbook fetch"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reports = {}   # strategy name -> report of the last square-off
+
+    def square_off(self, strategy, api_key, positions):
+        """
+        Close every open position among `positions`.
+
+        Args:
+            strategy: Strategy name, used in the order payloads and the report
+            api_key: OpenAlgo API key of the strategy's owner
+            positions: Iterable of (symbol, exchange, product)
+
+        Returns:
+            dict: Report with per-symbol results and elapsed_ms
+        """
+        started = time.monotonic()
+        legs = list(dict.fromkeys(positions))  # drop duplicate mappings, keep order
+        report = {
+            'strategy': strategy,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'positions': len(legs),
+            'mode': None,
+            'results': []
+        }
+
+        auth_token, broker = get_auth_token_broker(api_key)
+        if broker is None:
+            report['mode'] = 'error'
+            report['results'] = [{'symbol': symbol, 'status': 'error', 'message': 'Invalid openalgo apikey'}
+                                 for symbol, _, _ in legs]
+            return self._finish(report, started)
+
+        futures = None
+        if legs and not get_analyze_mode() and POSITION_CACHE_ENABLED and position_cache.supports(broker):
+            try:
+                position_cache.refresh(broker, auth_token)
+                report['mode'] = 'positionbook'
+                futures = order_dispatcher.dispatch(broker, [
+                    (action_priority('SELL'), self._close_position,
+                     (broker, auth_token, api_key, strategy, symbol, exchange, product))
+                    for symbol, exchange, product in legs
+                ])
+            except PositionFetchError as e:
+                logger.error(f"Square-off of {strategy}: positionbook fetch failed ({e}), placing smart orders")
+
+        if futures is None:
+            report['mode'] = 'smartorder'
+            futures = order_dispatcher.dispatch(broker, [
+                (action_priority('SELL'), place_leg,
+                 ('placesmartorder', close_payload(api_key, strategy, symbol, exchange, product, smart=True)))
+                for symbol, exchange, product in legs
+            ])
+
+        report['results'] = [future.result() for future in futures]
+        return self._finish(report, started)
+
+    def _close_position(self, broker, auth_token, api_key, strategy, symbol, exchange, product):
+        """Place the order that takes one position to zero, under the position's lock"""
+        try:
+            with position_cache.position_lock(broker, auth_token, symbol, exchange, product):
+                # Read from the positionbook fetched for this square-off
+                quantity = position_cache.get_position(broker, auth_token, symbol, exchange, product)
+                if quantity == 0:
+                    return {'symbol': symbol, 'status': 'success', 'message': 'No open position'}
+
+                action = 'SELL' if quantity > 0 else 'BUY'
+                success, response_data, _ = place_order(
+                    close_payload(api_key, strategy, symbol, exchange, product, action, abs(quantity)))
+                if success:
+                    position_cache.apply_fill(broker, auth_token, symbol, exchange, product, action, abs(quantity))
+                    return {'symbol': symbol, 'status': 'success', 'orderid': response_data.get('orderid'),
+                            'action': action, 'quantity': abs(quantity)}
+                return {'symbol': symbol, 'status': 'error',
+                        'message': response_data.get('message', 'Failed to place order')}
+        except Exception as e:
+            logger.error(f"Error squaring off {exchange}:{symbol} for strategy {strategy}: {e}")
+            return {'symbol': symbol, 'status': 'error', 'message': 'Failed to square off position'}
+
+    def _finish(self, report, started):
+        report['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        report['failed'] = sum(1 for result in report['results'] if result['status'] != 'success')
+        logger.info(f"Square-off of {report['strategy']} finished in {report['elapsed_ms']} ms: "
+                    f"{report['positions'] - report['failed']} of {report['positions']} positions handled, "
+                    f"{report['failed']} failed")
+        with self._lock:
+            self._reports[report['strategy']] = report
+        return report
+
+    def reports(self):
+        """Last square-off report per strategy"""
+        with self._lock:
+            return dict(self._reports)
+
+
+# Shared by the TradingView and Chartink strategy schedulers
+squareoff_engine = SquareOffEngine()
@@ -0,0 +1,83 @@
+"""
+Basket placement for webhook alerts that name several symbols at once.
+
+A Chartink scan alert carries 20-50 comma-separated stocks. The webhook used
+to queue one order per stock, and the webhook order scheduler placed them
+one at a time at WEBHOOK_ORDER_RATE, sleeping SMART_ORDER_DELAY after every
+smart exit, so a large scan took several seconds to fill. The whole alert is
+now one scheduler job whose legs go through the per-broker lanes of
+services/order_dispatcher.py, like /api/v1/basketorder:
+
+    * Legs run concurrently, BUY legs ahead of SELL legs.
+    * Legs are paced by the broker's orders/sec bucket, which has a default
+      rate for every broker (see utils/fanout.py; ORDER_DISPATCH_RATE and
+      ORDER_DISPATCH_RATE_<BROKER> override it). The bucket is shared by
+      baskets, split orders, square-offs and the cancel/close fan-outs, so a
+      50-stock scan fills at the broker's order limit and never above it.
+    * Each leg is placed by place_order / place_smart_order, so validation,
+      analyze mode, events and order logs are the same as for a single order.
+      Legs are for different symbols, so smart exits skip SMART_ORDER_DELAY.
+
+Returns (success, response_data, status_code) with one result per leg.
+"""
+import logging
+
+from database.auth_db import get_auth_token_broker
+from services.order_dispatcher import order_dispatcher, action_priority
+from services.place_order_service import place_order
+from services.place_smart_order_service import place_smart_order
+
+logger = logging.getLogger(__name__)
+
+
+def place_leg(endpoint, payload):
+    """Place one basket leg and summarise the outcome for the basket result"""
+    try:
+        if endpoint == 'placesmartorder':
+            success, response_data, _ = place_smart_order(payload, delay=False)
+        else:
+            success, response_data, _ = place_order(payload)
+    except Exception as e:
+        logger.error(f"Error placing {endpoint} basket leg for {payload.get('symbol')}: {e}")
+        success, response_data = False, {'message': 'Failed to place order due to internal error'}
+
+    result = {'symbol': payload.get('symbol'), 'status': 'success' if success else 'error'}
+    if success:
+        if 'orderid' in response_data:
+            result['orderid'] = response_data['orderid']
+        elif 'message' in response_data:
+            result['message'] = response_data['message']
+    else:
+        result['message'] = response_data.get('message', 'Failed to place order') if isinstance(response_data, dict) else 'Failed to place order'
+    return result
+
+
+def place_webhook_basket(data):
+    """
+    Place every leg of a webhook basket concurrently.
+
+    Args:
+        data: {'strategy': name, 'orders': [{'endpoint': 'placeorder' or
+            'placesmartorder', 'payload': order payload with apikey}, ...]}
+
+    Returns:
+        tuple: (success, response_data, status_code); success only if every leg succeeded
+    """
+    legs = data.get('orders') or []
+    if not legs:
+        return False, {'status': 'error', 'message': 'No orders in basket'}, 400
+
+    # Every leg of an alert uses the strategy owner's key
+    _, broker = get_auth_token_broker(legs[0]['payload'].get('apikey'))
+    if broker is None:
+        return False, {'status': 'error', 'message': 'Invalid openalgo apikey'}, 403
+
+    futures = order_dispatcher.dispatch(broker, [
+        (action_priority(leg['payload'].get('action')), place_leg, (leg['endpoint'], leg['payload']))
+        for leg in legs
+    ])
+    results = [future.result() for future in futures]
+
+    failed = sum(1 for result in results if result['status'] != 'success')
+    logger.info(f"Basket for strategy {data.get('strategy')}: {len(results) - failed} of {len(results)} legs placed")
+    return failed == 0, {'status': 'success' if failed == 0 else 'error', 'results': results}, 200
@@ -0,0 +1,392 @@
+"""
+Scheduler for orders queued by the TradingView and Chartink webhooks.
+
+Each webhook blueprint used to run one daemon thread that polled two
+queue.Queues with get_nowait() and sleep(0.1), and slept a full second after
+every smart order, so a burst of smart square-offs held up every regular
+entry behind it. Webhook orders now go through one shared scheduler:
+
+    * Workers block on a condition variable and wake when an order is queued
+      or a rate limit frees up; nothing polls.
+    * Each endpoint class has its own token bucket (WEBHOOK_ORDER_RATE for
+      placeorder, WEBHOOK_SMART_ORDER_RATE for placesmartorder, 10/s each by
+      default). A throttled class never delays the other.
+    * Smart orders skip SMART_ORDER_DELAY when the broker's positions come
+      from the position cache. The delay only kept a smart order from reading
+      a position before the previous order for it landed; with the cache, the
+      same-symbol ordering below, the per-position lock and the cache expiring
+      on every order placement cover that. Brokers on their own
+      place_smartorder_api still wait the delay.
+    * WEBHOOK_ORDER_WORKERS orders can be at the broker at the same time.
+    * Orders wait in one FIFO per strategy. Strategies are served round
+      robin, and so are the two endpoint classes, so one busy strategy or a
+      burst of smart orders cannot starve the rest. Within a strategy
+      orders stay in arrival order: an order does not start while an earlier
+      order of the same strategy for the same symbol is still running.
+
+A multi-symbol Chartink alert is queued as one 'basketorder' job
+(WEBHOOK_BASKET_RATE) whose legs are placed concurrently, see
+services/webhook_basket_service.py.
+
+`metrics()` reports queue depth, wait times and throughput per class.
+
+With ORDER_QUEUE_DURABLE (the default) a webhook order is written to the
+SQLite queue in database/order_queue_db.py before the webhook returns, and a
+feeder thread claims batches of orders from that table into the in-memory
+queues above. Orders survive a restart, and several processes can drain the
+same queue file: a claim is atomic, expires after
+ORDER_QUEUE_VISIBILITY_TIMEOUT if the process goes away before placing the
+order, and is re-checked just before the broker call. An order whose process
+died during the broker call is marked unknown rather than placed twice.
+An order still waiting ORDER_QUEUE_MAX_AGE seconds after its webhook (e.g.
+one left over from before a crash) is marked expired and never placed.
+Payloads are stored Fernet-encrypted, since they carry the API key.
+"""
+import os
+import time
+import socket
+import threading
+import logging
+from collections import OrderedDict, deque
+
+from utils.token_bucket import TokenBucket
+from database.order_queue_db import (
+    enqueue_order, claim_orders, start_dispatch, ack_order, release_orders, queue_counts
+)
+from services.place_order_service import place_order
+from services.place_smart_order_service import place_smart_order
+from services.webhook_basket_service import place_webhook_basket
+
+logger = logging.getLogger(__name__)
+
+# Orders that can be in flight at the broker at the same time
+WEBHOOK_ORDER_WORKERS = int(os.getenv('WEBHOOK_ORDER_WORKERS', '4'))
+
+# Regular webhook orders per second
+WEBHOOK_ORDER_RATE = float(os.getenv('WEBHOOK_ORDER_RATE', '10'))
+
+# Smart webhook orders per second
+WEBHOOK_SMART_ORDER_RATE = float(os.getenv('WEBHOOK_SMART_ORDER_RATE', '10'))
+
+# Multi-symbol webhook baskets per second (each basket's legs are rate limited per broker)
+WEBHOOK_BASKET_RATE = float(os.getenv('WEBHOOK_BASKET_RATE', '10'))
+
+# Persist webhook orders in the SQLite order queue before placing them
+ORDER_QUEUE_DURABLE = os.getenv('ORDER_QUEUE_DURABLE', 'TRUE').upper() == 'TRUE'
+
+# Orders claimed from the durable queue per batch, and held locally at most
+ORDER_QUEUE_BATCH_SIZE = int(os.getenv('ORDER_QUEUE_BATCH_SIZE', '20'))
+
+# Seconds a claimed order stays invisible to other processes before it is placed
+ORDER_QUEUE_VISIBILITY_TIMEOUT = float(os.getenv('ORDER_QUEUE_VISIBILITY_TIMEOUT', '120'))
+
+# Seconds a broker call may take before a stalled order is marked unknown
+ORDER_QUEUE_DISPATCH_TIMEOUT = float(os.getenv('ORDER_QUEUE_DISPATCH_TIMEOUT', '300'))
+
+# Seconds a queued order may wait before it is expired instead of placed (0 for no limit)
+ORDER_QUEUE_MAX_AGE = float(os.getenv('ORDER_QUEUE_MAX_AGE', '60'))
+
+# Seconds between polls for orders queued by other processes
+ORDER_QUEUE_POLL_INTERVAL = float(os.getenv('ORDER_QUEUE_POLL_INTERVAL', '0.5'))
+
+# Hours finished orders are kept in the durable queue (purged by services/scheduled_jobs.py)
+ORDER_QUEUE_RETENTION_HOURS = float(os.getenv('ORDER_QUEUE_RETENTION_HOURS', '24'))
+
+# Completed orders kept for the wait time and throughput metrics
+METRICS_WINDOW = 500
+THROUGHPUT_WINDOW = 60
+
+
+class _Order:
+    __slots__ = ('endpoint', 'payload', 'strategy', 'key', 'queued_at', 'queue_id')
+
+    def __init__(self, endpoint, payload, queue_id=None, queued_at=None):
+        self.endpoint = endpoint
+        self.payload = payload
+        self.strategy = str(payload.get('strategy', ''))
+        self.key = (self.strategy, payload.get('symbol'), payload.get('exchange'))
+        self.queued_at = time.monotonic() if queued_at is None else queued_at
+        self.queue_id = queue_id    # row id in the durable queue
+
+
+class _EndpointQueue:
+    """Per-strategy FIFOs, rate limit and metrics of one endpoint class"""
+
+    def __init__(self, endpoint, rate):
+        self.endpoint = endpoint
+        self.bucket = TokenBucket(rate) if rate > 0 else None
+        self.strategies = OrderedDict()   # strategy -> deque of _Order, in round robin order
+        self.depth = 0
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.waits = deque(maxlen=METRICS_WINDOW)        # seconds from queueing to start
+        self.finished = deque(maxlen=METRICS_WINDOW)     # monotonic completion times
+
+    def put(self, order):
+        self.strategies.setdefault(order.strategy, deque()).append(order)
+        self.depth += 1
+        self.submitted += 1
+
+    def drain(self):
+        """Remove and return every waiting order"""
+        orders = [order for strategy_orders in self.strategies.values() for order in strategy_orders]
+        self.strategies.clear()
+        self.depth = 0
+        return orders
+
+    def take(self, busy):
+        """
+        Next order in round robin order whose key is not in `busy`, or None.
+        The strategy served moves to the back of the rotation.
+        """
+        for strategy, orders in self.strategies.items():
+            if orders[0].key in busy:
+                continue
+            order = orders.popleft()
+            if orders:
+                self.strategies.move_to_end(strategy)
+            else:
+                del self.strategies[strategy]
+            self.depth -= 1
+            return order
+        return None
+
+    def has_ready(self, busy):
+        return any(orders[0].key not in busy for orders in self.strategies.values())
+
+    def metrics(self):
+        now = time.monotonic()
+        waits = sorted(self.waits)
+        recent = sum(1 for finished in self.finished if now - finished <= THROUGHPUT_WINDOW)
+        oldest_wait = max((now - orders[0].queued_at for orders in self.strategies.values()), default=0.0)
+        return {
+            'queue_depth': self.depth,
+            'strategies_waiting': len(self.strategies),
+            'in_flight': self.in_flight,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'oldest_wait_ms': round(oldest_wait * 1000, 1),
+            'avg_wait_ms': round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            'p95_wait_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+            'max_wait_ms': round(waits[-1] * 1000, 1) if waits else 0.0,
+            'throughput_per_min': round(recent * 60 / THROUGHPUT_WINDOW, 1),
+            'rate_limit_per_sec': self.bucket.rate if self.bucket else None
+        }
+
+
+class WebhookOrderScheduler:
+    """Shared worker pool draining webhook orders per endpoint class"""
+
+    def __init__(self, handlers, rates, workers=WEBHOOK_ORDER_WORKERS, durable=ORDER_QUEUE_DURABLE):
+        """
+        Args:
+            handlers: {endpoint: fn(payload) -> (success, response_data, status_code)}
+            rates: {endpoint: orders per second, 0 for no limit}. Endpoint
+                classes take turns, starting with the first one listed
+            workers: Number of worker threads
+            durable: Queue orders in the SQLite order queue instead of memory only
+        """
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.durable = durable
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._queues = OrderedDict((endpoint, _EndpointQueue(endpoint, rates.get(endpoint, 0)))
+                                   for endpoint in handlers)
+        self._busy = set()     # keys of orders being placed
+        self._cond = threading.Condition()
+        self._threads = []
+        self._feeder = None
+        self._wake_feeder = threading.Event()
+        self._stopped = False
+
+    def submit(self, endpoint, payload):
+        """Queue a webhook order for `endpoint` ('placeorder', 'placesmartorder' or 'basketorder')"""
+        if endpoint not in self._queues:
+            raise ValueError(f"Unknown webhook order endpoint: {endpoint}")
+        self._ensure_workers()
+        if self.durable:
+            try:
+                enqueue_order(endpoint, payload)
+                self._wake_feeder.set()
+                return
+            except Exception as e:
+                # Still place the order from memory rather than drop it
+                logger.error(f"Error writing {endpoint} order to the durable queue, queueing in memory: {e}")
+        with self._cond:
+            self._queues[endpoint].put(_Order(endpoint, payload))
+            self._cond.notify()
+
+    def start(self):
+        """Start the workers now, so orders left in the durable queue by a restart are placed"""
+        self._ensure_workers()
+        self._wake_feeder.set()
+
+    def _ensure_workers(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._cond:
+            self._stopped = False
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, daemon=True,
+                                          name=f'webhook-orders-{len(self._threads)}')
+                thread.start()
+                self._threads.append(thread)
+            if self.durable and self._feeder is None:
+                self._feeder = threading.Thread(target=self._feed, daemon=True, name='webhook-orders-feeder')
+                self._feeder.start()
+
+    def _feed(self):
+        """Claim batches from the durable queue whenever local capacity frees up"""
+        while True:
+            self._wake_feeder.wait(timeout=ORDER_QUEUE_POLL_INTERVAL)
+            self._wake_feeder.clear()
+            with self._cond:
+                if self._stopped:
+                    return
+                capacity = ORDER_QUEUE_BATCH_SIZE - sum(queue.depth for queue in self._queues.values())
+            try:
+                claimed = claim_orders(self.worker_id, capacity, ORDER_QUEUE_VISIBILITY_TIMEOUT, ORDER_QUEUE_MAX_AGE)
+            except Exception as e:
+                logger.error(f"Error claiming webhook orders from the durable queue: {e}")
+                time.sleep(ORDER_QUEUE_POLL_INTERVAL)
+                continue
+            if not claimed:
+                continue
+            now, monotonic_now = time.time(), time.monotonic()
+            with self._cond:
+                for row in claimed:
+                    # Wait time counts from the webhook, not from the claim
+                    queued_at = monotonic_now - max(0.0, now - row['created_at'])
+                    self._queues[row['endpoint']].put(_Order(row['endpoint'], row['payload'], row['id'], queued_at))
+                self._cond.notify_all()
+            if len(claimed) == capacity:
+                # More may be waiting; claim again as soon as capacity frees up
+                self._wake_feeder.set()
+
+    def _next_order(self):
+        """
+        Called with the condition held.
+
+        Returns:
+            tuple: (order, None) or (None, seconds to wait; None to wait for a submit)
+        """
+        wait = None
+        for endpoint, queue in self._queues.items():
+            if not queue.has_ready(self._busy):
+                continue
+            if queue.bucket is not None and not queue.bucket.try_acquire():
+                bucket_wait = queue.bucket.wait_time()
+                wait = bucket_wait if wait is None else min(wait, bucket_wait)
+                continue
+            # Endpoint classes take turns too
+            self._queues.move_to_end(endpoint)
+            return queue.take(self._busy), None
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    order, wait = self._next_order()
+                    if order is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+                queue = self._queues[order.endpoint]
+                queue.in_flight += 1
+                queue.waits.append(time.monotonic() - order.queued_at)
+                self._busy.add(order.key)
+
+            if order.queue_id is not None and not self._start_dispatch(order):
+                with self._cond:
+                    self._busy.discard(order.key)
+                    queue.in_flight -= 1
+                    self._cond.notify_all()
+                continue
+
+            success, response_data = False, None
+            try:
+                success, response_data, _ = self.handlers[order.endpoint](order.payload)
+                if success:
+                    logger.info(f'{order.endpoint} order placed for {order.payload.get("symbol")} in strategy {order.strategy}')
+                else:
+                    logger.error(f'Error placing {order.endpoint} order for {order.payload.get("symbol")}: {response_data}')
+            except Exception as e:
+                logger.error(f'Error placing {order.endpoint} order: {e}')
+                response_data = {'status': 'error', 'message': str(e)}
+            finally:
+                if order.queue_id is not None:
+                    try:
+                        ack_order(order.queue_id, self.worker_id, success, response_data)
+                    except Exception as e:
+                        logger.error(f'Error acknowledging queued {order.endpoint} order {order.queue_id}: {e}')
+                with self._cond:
+                    self._busy.discard(order.key)
+                    queue.in_flight -= 1
+                    queue.completed += 1
+                    if not success:
+                        queue.failed += 1
+                    queue.finished.append(time.monotonic())
+                    # Orders held back behind this one may start now
+                    self._cond.notify_all()
+                if self.durable:
+                    self._wake_feeder.set()
+
+    def _start_dispatch(self, order):
+        """
+        Move a claimed order to dispatching. False if the claim expired (the
+        order is back in the queue) or the queue could not be updated; the
+        order is then left for the next claim rather than placed.
+        """
+        try:
+            if start_dispatch(order.queue_id, self.worker_id, ORDER_QUEUE_DISPATCH_TIMEOUT):
+                return True
+            logger.warning(f'Claim on queued {order.endpoint} order {order.queue_id} expired; not placing it here')
+        except Exception as e:
+            logger.error(f'Error starting queued {order.endpoint} order {order.queue_id}: {e}')
+        return False
+
+    def metrics(self):
+        """Queue depth, wait times and throughput per endpoint class"""
+        with self._cond:
+            metrics = {
+                'workers': self.workers,
+                'endpoints': {endpoint: queue.metrics() for endpoint, queue in self._queues.items()}
+            }
+        if self.durable:
+            metrics['durable_queue'] = queue_counts()
+        return metrics
+
+    def shutdown(self):
+        """Stop the workers; claimed orders not yet started go back to the durable queue"""
+        with self._cond:
+            self._stopped = True
+            self._threads = []
+            self._feeder = None
+            self._wake_feeder.set()
+            self._cond.notify_all()
+            if not self.durable:
+                return
+            unstarted = [order.queue_id for queue in self._queues.values() for order in queue.drain()
+                         if order.queue_id is not None]
+        try:
+            release_orders(unstarted, self.worker_id)
+        except Exception as e:
+            logger.error(f"Error releasing claimed webhook orders: {e}")
+
+
+def _place_smart_order(payload):
+    # Only delayed when the position is not read from the position cache
+    return place_smart_order(payload, delay=None)
+
+
+# Shared by the TradingView and Chartink webhooks
+webhook_order_scheduler = WebhookOrderScheduler(
+    handlers={'placesmartorder': _place_smart_order, 'placeorder': place_order, 'basketorder': place_webhook_basket},
+    rates={'placesmartorder': WEBHOOK_SMART_ORDER_RATE, 'placeorder': WEBHOOK_ORDER_RATE,
+           'basketorder': WEBHOOK_BASKET_RATE}
+)
@@ -0,0 +1,44 @@
+"""
+Conformance of the memoryview/struct HSDecoder with HSWrapper.parseData on
+recorded Kotak HSM data frames (see benchmarks/bench_kotak_decoder.py for the
+recording and the timings).
+
+Run from the repository root:
+    python -m pytest test/test_kotak_hs_decoder.py
+"""
+import struct
+
+import pytest
+
+pytest.importorskip("websocket")  # HSWebSocketLib needs websocket-client, like the broker
+
+from broker.kotak.api import HSWebSocketLib as hs
+from broker.kotak.api.hs_decoder import HSDecoder
+from benchmarks.bench_kotak_decoder import record_frames, decode_all
+
+
+@pytest.fixture(autouse=True)
+def clear_topics():
+    # HSWrapper keeps its topic state in a module global
+    hs.topic_list.clear()
+    yield
+    hs.topic_list.clear()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_decoder_matches_hswrapper(seed):
+    frames = record_frames(seed=seed, update_frames=200)
+    expected = decode_all(hs.HSWrapper(), frames)
+    actual = decode_all(HSDecoder(), frames)
+
+    assert len(actual) == len(expected)
+    for number, (want, got) in enumerate(zip(expected, actual)):
+        assert got == want, f"frame {number} differs"
+        for want_record, got_record in zip(want, got):
+            assert list(got_record) == list(want_record), f"field order differs in frame {number}"
+
+
+def test_control_frames_use_hswrapper():
+    connection = struct.pack('>HBB', 1, hs.BinRespTypes["CONNECTION_TYPE"], 1)
+    connection += struct.pack('>BH', 1, 1) + b'K'
+    assert HSDecoder().parseData(connection) == hs.HSWrapper().parseData(connection)
@@ -87,14 +87,14 @@ def validate_symbol(symbol: str, exchange: str) -> bool:
         logger.error(f"Error validating symbol: {str(e)}")
         return False
 
-def analyze_api_request(order_data):
+def analyze_api_request(order_data, validated=False):
     """Analyze an API request before processing"""
     try:
         issues = []
         warnings = []
 
         # Check required fields
-        missing_fields = [field for field in REQUIRED_ORDER_FIELDS if field not in order_data]
+        missing_fields = [] if validated else [field for field in REQUIRED_ORDER_FIELDS if field not in order_data]
         if missing_fields:
             issues.append(f"Missing mandatory field(s): {', '.join(missing_fields)}")
 
@@ -113,23 +113,23 @@ def analyze_api_request(order_data):
                 issues.append("Invalid quantity value")
 
         # Validate exchange
-        if 'exchange' in order_data:
+        if 'exchange' in order_data and not validated:
             if order_data['exchange'] not in VALID_EXCHANGES:
                 issues.append(f"Invalid exchange. Must be one of: {', '.join(VALID_EXCHANGES)}")
 
         # Validate action
-        if 'action' in order_data:
+        if 'action' in order_data and not validated:
             if order_data['action'] not in VALID_ACTIONS:
                 issues.append(f"Invalid action. Must be one of: {', '.join(VALID_ACTIONS)}")
 
         # Validate product type (optional with default)
         product_type = order_data.get('product', DEFAULT_PRODUCT_TYPE)
-        if product_type not in VALID_PRODUCT_TYPES:
+        if not validated and product_type not in VALID_PRODUCT_TYPES:
             issues.append(f"Invalid product type. Must be one of: {', '.join(VALID_PRODUCT_TYPES)}")
 
         # Validate price type (optional with default)
         price_type = order_data.get('pricetype', DEFAULT_PRICE_TYPE)
-        if price_type not in VALID_PRICE_TYPES:
+        if not validated and price_type not in VALID_PRICE_TYPES:
             issues.append(f"Invalid price type. Must be one of: {', '.join(VALID_PRICE_TYPES)}")
 
         # Validate price values
@@ -181,14 +181,14 @@ def analyze_api_request(order_data):
             'warnings': []
         }
 
-def analyze_smart_order_request(order_data):
+def analyze_smart_order_request(order_data, validated=False):
     """Analyze a smart order API request"""
     try:
         issues = []
         warnings = []
 
         # Check required fields for smart order
-        missing_fields = [field for field in REQUIRED_SMART_ORDER_FIELDS if field not in order_data]
+        missing_fields = [] if validated else [field for field in REQUIRED_SMART_ORDER_FIELDS if field not in order_data]
         if missing_fields:
             issues.append(f"Missing mandatory field(s): {', '.join(missing_fields)}")
 
@@ -214,23 +214,23 @@ def analyze_smart_order_request(order_data):
                 issues.append("Invalid position size value")
 
         # Validate exchange
-        if 'exchange' in order_data:
+        if 'exchange' in order_data and not validated:
             if order_data['exchange'] not in VALID_EXCHANGES:
                 issues.append(f"Invalid exchange. Must be one of: {', '.join(VALID_EXCHANGES)}")
 
         # Validate action
-        if 'action' in order_data:
+        if 'action' in order_data and not validated:
             if order_data['action'] not in VALID_ACTIONS:
                 issues.append(f"Invalid action. Must be one of: {', '.join(VALID_ACTIONS)}")
 
         # Validate product type (optional with default)
         product_type = order_data.get('product', DEFAULT_PRODUCT_TYPE)
-        if product_type not in VALID_PRODUCT_TYPES:
+        if not validated and product_type not in VALID_PRODUCT_TYPES:
             issues.append(f"Invalid product type. Must be one of: {', '.join(VALID_PRODUCT_TYPES)}")
 
         # Validate price type (optional with default)
         price_type = order_data.get('pricetype', DEFAULT_PRICE_TYPE)
-        if price_type not in VALID_PRICE_TYPES:
+        if not validated and price_type not in VALID_PRICE_TYPES:
             issues.append(f"Invalid price type. Must be one of: {', '.join(VALID_PRICE_TYPES)}")
 
         # Validate price values
@@ -488,12 +488,15 @@ def analyze_modify_order_request(order_data):
             'warnings': []
         }
 
-def analyze_request(request_data, api_type='placeorder', should_log=False):
-    """Analyze a request - logging is now handled by API endpoints"""
+def analyze_request(request_data, api_type='placeorder', should_log=False, validated=False):
+    """
+    Analyze a request - logging is now handled by API endpoints.
+    Pass validated=True for orders already checked by utils.order_validator.
+    """
     try:
         # Choose appropriate analyzer based on API type
         if api_type == 'placesmartorder':
-            analysis = analyze_smart_order_request(request_data)
+            analysis = analyze_smart_order_request(request_data, validated)
         elif api_type == 'cancelorder':
             analysis = analyze_cancel_order_request(request_data)
         elif api_type == 'cancelallorder':
@@ -503,7 +506,7 @@ def analyze_request(request_data, api_type='placeorder', should_log=False):
         elif api_type == 'modifyorder':
             analysis = analyze_modify_order_request(request_data)
         else:
-            analysis = analyze_api_request(request_data)
+            analysis = analyze_api_request(request_data, validated)
         
         # Return analysis results without logging
         return True, analysis
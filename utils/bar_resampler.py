@@ -0,0 +1,184 @@
+"""
+Server-side resampling of OHLCV bars to intervals a broker does not serve
+natively (e.g. 2m, 45m, 2h, W, M).
+
+Intraday buckets are aligned to the exchange session open (09:15 for NSE/BSE
+segments, 09:00 for MCX and currency), so a 45m series starts 09:15, 10:00,
+10:45, ... exactly like broker-native bars. Weekly bars run Monday-Friday and
+monthly bars follow the calendar month; both are labelled with the timestamp
+of their first trading bar.
+
+Some brokers (e.g. Dhan) label bars with IST wall-clock time read as UTC.
+The shift is inferred from the bars themselves, as the aggregator does for
+today's bars, so buckets stay aligned to the session open either way.
+"""
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+IST_OFFSET_SECONDS = 19800
+DAY_SECONDS = 86400
+
+# Session open (IST, seconds after midnight) by exchange; default NSE/BSE 09:15
+SESSION_OPEN_SECONDS = {
+    'MCX': 9 * 3600,
+    'CDS': 9 * 3600,
+    'BCD': 9 * 3600,
+}
+DEFAULT_SESSION_OPEN_SECONDS = 9 * 3600 + 15 * 60
+
+# Session close (IST, seconds after midnight) by exchange; default NSE/BSE 15:30
+SESSION_CLOSE_SECONDS = {
+    'MCX': 23 * 3600 + 55 * 60,
+    'CDS': 17 * 3600,
+    'BCD': 17 * 3600,
+}
+DEFAULT_SESSION_CLOSE_SECONDS = 15 * 3600 + 30 * 60
+
+# Shifts brokers are known to apply to bar timestamps (IST wall clock read as UTC)
+TIMESTAMP_SHIFTS = (-IST_OFFSET_SECONDS, 0, IST_OFFSET_SECONDS)
+
+_INTERVAL_PATTERN = re.compile(r'^(\d*)([smhDWM])$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+def parse_interval(interval):
+    """
+    Split an interval into (count, unit), e.g. '45m' -> (45, 'm'), 'W' -> (1, 'W').
+    Returns None for strings that are not intervals.
+    """
+    match = _INTERVAL_PATTERN.match(interval or '')
+    if not match:
+        return None
+    count = int(match.group(1) or 1)
+    if count <= 0:
+        return None
+    return count, match.group(2)
+
+
+def interval_seconds(interval):
+    """Length of an intraday interval in seconds, None for D/W/M"""
+    parsed = parse_interval(interval)
+    if parsed is None or parsed[1] not in _UNIT_SECONDS:
+        return None
+    return parsed[0] * _UNIT_SECONDS[parsed[1]]
+
+
+def choose_base_interval(interval, supported):
+    """
+    Pick the broker-native interval to resample `interval` from: the coarsest
+    supported interval that evenly divides it. Returns None if the interval
+    cannot be derived.
+    """
+    parsed = parse_interval(interval)
+    if parsed is None:
+        return None
+    count, unit = parsed
+    if unit in ('W', 'M') and count == 1:
+        return 'D' if 'D' in supported else None
+
+    target = interval_seconds(interval)
+    if target is None:
+        return None
+    candidates = []
+    for key in supported:
+        seconds = interval_seconds(key)
+        if seconds and seconds < target and target % seconds == 0:
+            candidates.append((seconds, key))
+    return max(candidates)[1] if candidates else None
+
+
+def expand_start_date(interval, start_date):
+    """Move the start date back to the first day of its week/month so the first bar is complete"""
+    parsed = parse_interval(interval)
+    if parsed is None or parsed[1] not in ('W', 'M'):
+        return start_date
+    day = datetime.strptime(str(start_date)[:10], '%Y-%m-%d')
+    if parsed[1] == 'W':
+        day -= timedelta(days=day.weekday())
+    else:
+        day = day.replace(day=1)
+    return day.strftime('%Y-%m-%d')
+
+
+def infer_timestamp_shift(timestamps, exchange):
+    """
+    Offset of a broker's bar labels from true epoch seconds: the shift that
+    puts the most bars inside the exchange session (ties go to no shift).
+    """
+    session_open = SESSION_OPEN_SECONDS.get(exchange, DEFAULT_SESSION_OPEN_SECONDS)
+    session_close = SESSION_CLOSE_SECONDS.get(exchange, DEFAULT_SESSION_CLOSE_SECONDS)
+
+    def outside(shift):
+        second = (timestamps + IST_OFFSET_SECONDS - shift) % DAY_SECONDS
+        return int(np.count_nonzero((second < session_open) | (second > session_close)))
+
+    return min(sorted(TIMESTAMP_SHIFTS, key=abs), key=outside)
+
+
+def _bucket_keys(timestamps, interval, exchange, shift):
+    """Group key per bar, and whether the bucket is labelled by its grid start"""
+    count, unit = parse_interval(interval)
+    ist = timestamps + IST_OFFSET_SECONDS
+    days = ist // DAY_SECONDS
+
+    if unit == 'W':
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return (days + 3) // 7, False
+    if unit == 'M':
+        return ist.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64), False
+
+    size = interval_seconds(interval)
+    session_open = SESSION_OPEN_SECONDS.get(exchange, DEFAULT_SESSION_OPEN_SECONDS)
+    if shift is None:
+        shift = infer_timestamp_shift(timestamps, exchange)
+    ist -= shift
+    days = ist // DAY_SECONDS
+    offset = (ist % DAY_SECONDS) - session_open
+    bucket_start = days * DAY_SECONDS + session_open + (offset // size) * size
+    return bucket_start - IST_OFFSET_SECONDS + shift, True
+
+
+def resample_bars(df, interval, exchange=None, shift=None):
+    """
+    Aggregate bars to `interval`: open first, high max, low min, close last,
+    volume summed, oi last.
+
+    Args:
+        df: Bars with epoch-second 'timestamp' and OHLCV columns
+        interval: Target interval (e.g. '2m', '45m', '2h', 'W', 'M')
+        exchange: Used for the session open of intraday buckets
+        shift: Offset of the bar timestamps from true epoch seconds (see
+            TIMESTAMP_SHIFTS); inferred from the bars when None
+
+    Returns:
+        pd.DataFrame: Resampled bars in the same column order
+    """
+    if df.empty:
+        return df
+    df = df.sort_values('timestamp', kind='stable')
+    timestamps = df['timestamp'].to_numpy(dtype=np.int64)
+    keys, label_by_bucket = _bucket_keys(timestamps, interval, exchange, shift)
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    out = {}
+    for name in df.columns:
+        column = df[name].to_numpy()
+        if name == 'timestamp':
+            out[name] = keys[starts] if label_by_bucket else timestamps[starts]
+        elif name == 'open':
+            out[name] = column[starts]
+        elif name == 'high':
+            out[name] = np.maximum.reduceat(column, starts)
+        elif name == 'low':
+            out[name] = np.minimum.reduceat(column, starts)
+        elif name == 'volume':
+            out[name] = np.add.reduceat(column, starts)
+        else:
+            # close, oi and anything else: last value in the bucket
+            out[name] = column[ends]
+    return pd.DataFrame(out, columns=df.columns)
@@ -0,0 +1,148 @@
+"""
+Central registry of broker adapter modules and data handlers.
+
+Broker modules (`broker.<name>.api.order_api`, `api.data`, `api.funds`,
+`mapping.order_data`) are resolved once per broker and cached, instead of
+every REST resource running its own `importlib.import_module` per request.
+
+`get_data_handler` keeps one long-lived `BrokerData` per broker session, so
+its constructor (timeframe maps, market timings, tokens) runs once rather
+than on every quotes/depth/history call. The cached handler is replaced as
+soon as a request arrives with a different auth or feed token (re-login or
+token rotation).
+"""
+import hashlib
+import importlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+ORDER_API = 'api.order_api'
+DATA_API = 'api.data'
+FUNDS_API = 'api.funds'
+ORDER_MAPPING = 'mapping.order_data'
+
+_modules = {}     # (broker, module name) -> module, or None if the import failed
+_functions = {}   # (broker, module name, function names) -> {name: function}
+_handlers = {}    # broker -> _HandlerEntry
+_lock = threading.Lock()
+
+
+class _HandlerEntry:
+    __slots__ = ('auth', 'feed', 'user_id', 'handler')
+
+    def __init__(self, auth, feed, user_id, handler):
+        self.auth = auth          # fingerprint of the auth token
+        self.feed = feed          # fingerprint of the feed token, None if built without one
+        self.user_id = user_id
+        self.handler = handler
+
+    def matches(self, auth, feed, user_id):
+        """
+        Same session, and the handler was built with at least the details the
+        caller has (a handler built without a feed token or user_id is
+        rebuilt once a caller supplies them)
+        """
+        return (self.auth == auth
+                and (feed is None or self.feed == feed)
+                and (user_id is None or self.user_id is not None))
+
+
+def _fingerprint(value):
+    return hashlib.sha256(str(value).encode('utf-8')).hexdigest()
+
+
+def get_broker_module(broker_name, module_name):
+    """
+    Return `broker.<broker_name>.<module_name>` (e.g. ORDER_API), importing it
+    on first use. Returns None if the broker has no such module.
+    """
+    key = (broker_name, module_name)
+    try:
+        return _modules[key]
+    except KeyError:
+        pass
+
+    module_path = f'broker.{broker_name}.{module_name}'
+    try:
+        module = importlib.import_module(module_path)
+    except ImportError as error:
+        logger.error(f"Error importing broker module '{module_path}': {error}")
+        module = None
+    _modules[key] = module
+    return module
+
+
+def get_broker_functions(broker_name, module_name, function_names):
+    """
+    Return {name: function} for functions of a broker module, or None if the
+    module or any function is missing.
+    """
+    key = (broker_name, module_name, tuple(function_names))
+    functions = _functions.get(key)
+    if functions is not None:
+        return functions
+
+    module = get_broker_module(broker_name, module_name)
+    if module is None:
+        return None
+    try:
+        functions = {name: getattr(module, name) for name in function_names}
+    except AttributeError as error:
+        logger.error(f"Error importing functions {function_names} from {module_name} for broker {broker_name}: {error}")
+        return None
+    _functions[key] = functions
+    return functions
+
+
+def _create_data_handler(broker_module, auth_token, feed_token, user_id):
+    """Call BrokerData with as many of (auth_token, feed_token, user_id) as it accepts"""
+    init = broker_module.BrokerData.__init__
+    param_count = init.__code__.co_argcount if hasattr(init, '__code__') else 2
+    if param_count > 3 and user_id is not None:  # self, auth_token, feed_token, user_id
+        return broker_module.BrokerData(auth_token, feed_token, user_id)
+    if param_count > 2:  # self, auth_token, feed_token
+        return broker_module.BrokerData(auth_token, feed_token)
+    return broker_module.BrokerData(auth_token)
+
+
+def get_data_handler(broker_name, auth_token, feed_token=None, user_id=None):
+    """
+    Return the cached BrokerData for a broker session, creating it on first
+    use or when the tokens changed. Returns None if the broker has no data module.
+
+    Raises:
+        Exception: Whatever the broker's BrokerData constructor raises
+    """
+    broker_module = get_broker_module(broker_name, DATA_API)
+    if broker_module is None:
+        return None
+
+    auth = _fingerprint(auth_token)
+    feed = _fingerprint(feed_token) if feed_token is not None else None
+    entry = _handlers.get(broker_name)
+    if entry is not None and entry.matches(auth, feed, user_id):
+        return entry.handler
+
+    with _lock:
+        entry = _handlers.get(broker_name)
+        if entry is not None and entry.matches(auth, feed, user_id):
+            return entry.handler
+        if entry is not None and entry.auth != auth:
+            logger.info(f"Broker session changed for {broker_name}, replacing cached data handler")
+        handler = _create_data_handler(broker_module, auth_token, feed_token, user_id)
+        if getattr(handler, 'account', None) is None:
+            # Session id on the market data gateway, same as market_data_gateway.account_key(auth_token)
+            handler.account = auth[:16]
+        _handlers[broker_name] = _HandlerEntry(auth, feed, user_id, handler)
+        return handler
+
+
+def invalidate_data_handler(broker_name=None):
+    """Drop cached data handlers (all brokers when broker_name is None), e.g. on logout"""
+    with _lock:
+        if broker_name is None:
+            _handlers.clear()
+        else:
+            _handlers.pop(broker_name, None)
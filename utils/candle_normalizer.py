@@ -0,0 +1,181 @@
+"""
+Vectorized normalization of broker candle payloads.
+
+Brokers return candles either as parallel arrays (Dhan: {'timestamp': [...],
+'open': [...], ...}), as row lists (Angel, Fyers: [[ts, o, h, l, c, v], ...])
+or as delimited strings (XTS: "ts|o|h|l|c|v|oi,..."). These helpers turn any
+of them straight into typed NumPy columns (int64 epoch seconds, float64
+prices, int64 volume) with a vectorized timezone shift, null handling and a
+stable sort/dedupe on timestamp, instead of building a dict per candle.
+"""
+import io
+import numpy as np
+import pandas as pd
+
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+IST_OFFSET_SECONDS = 19800  # +05:30
+
+
+def empty_candles(columns=None):
+    """Empty frame with the standard candle columns"""
+    return pd.DataFrame(columns=columns or CANDLE_COLUMNS)
+
+
+def to_epoch_seconds(values):
+    """
+    Convert epoch numbers or ISO-8601 strings to an int64 array of epoch
+    seconds. Unparseable values become -1 and are dropped by normalize_candles.
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in 'iu':
+        return array.astype(np.int64, copy=False)
+    if array.dtype.kind == 'f':
+        return np.where(np.isnan(array), -1, array).astype(np.int64)
+    numeric = pd.to_numeric(pd.Series(array), errors='coerce')
+    if numeric.notna().all():
+        return numeric.to_numpy(dtype=np.int64)
+    parsed = pd.to_datetime(pd.Series(array), format='ISO8601', utc=True, errors='coerce')
+    seconds = (parsed - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    return seconds.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def _to_float(values):
+    """Numeric float64 column with nulls/blanks as 0, like `float(x) if x else 0`"""
+    try:
+        column = np.asarray(values, dtype=np.float64)  # None becomes NaN
+    except (ValueError, TypeError):
+        column = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    return np.nan_to_num(column, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def _to_int(values):
+    return _to_float(values).astype(np.int64)
+
+
+def normalize_candles(timestamp, open, high, low, close, volume, oi=None,
+                      tz_shift_seconds=0, dedupe=True):
+    """
+    Build a candle DataFrame from parallel columns.
+
+    Args:
+        timestamp: Epoch seconds or ISO-8601 strings
+        open, high, low, close, volume: Array-likes of equal length
+        oi: Optional open interest column
+        tz_shift_seconds: Seconds added to every timestamp (e.g. IST offset)
+        dedupe: Sort by timestamp and keep the first candle per timestamp
+
+    Returns:
+        pd.DataFrame: timestamp (int64), open/high/low/close (float64),
+        volume (int64) and oi (int64) when given
+    """
+    timestamps = to_epoch_seconds(timestamp)
+    columns = {
+        'open': _to_float(open),
+        'high': _to_float(high),
+        'low': _to_float(low),
+        'close': _to_float(close),
+        'volume': _to_int(volume)
+    }
+    if oi is not None:
+        columns['oi'] = _to_int(oi)
+
+    valid = timestamps >= 0
+    if not valid.all():
+        timestamps = timestamps[valid]
+        columns = {name: column[valid] for name, column in columns.items()}
+    if tz_shift_seconds:
+        timestamps = timestamps + np.int64(tz_shift_seconds)
+
+    if dedupe and len(timestamps):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        keep = np.empty(len(timestamps), dtype=bool)
+        keep[0] = True
+        np.not_equal(timestamps[1:], timestamps[:-1], out=keep[1:])
+        timestamps = timestamps[keep]
+        columns = {name: column[order][keep] for name, column in columns.items()}
+
+    return pd.DataFrame({'timestamp': timestamps, **columns})
+
+
+def from_columns(payload, tz_shift_seconds=0, oi_key=None, dedupe=True):
+    """Normalize a columnar payload: {'timestamp': [...], 'open': [...], ...}"""
+    timestamps = payload.get('timestamp') or []
+    if len(timestamps) == 0:
+        return empty_candles()
+    size = len(timestamps)
+
+    def column(key):
+        values = payload.get(key)
+        return values if values is not None and len(values) == size else np.zeros(size)
+
+    oi = column(oi_key) if oi_key and payload.get(oi_key) is not None else None
+    return normalize_candles(timestamps, column('open'), column('high'), column('low'),
+                             column('close'), column('volume'), oi=oi,
+                             tz_shift_seconds=tz_shift_seconds, dedupe=dedupe)
+
+
+def from_rows(rows, columns=None, tz_shift_seconds=0, dedupe=True):
+    """
+    Normalize row lists: [[timestamp, open, high, low, close, volume(, oi)], ...].
+    `columns` names the row fields when they differ from the standard order.
+    """
+    if not rows:
+        return empty_candles()
+    columns = columns or CANDLE_COLUMNS + (['oi'] if len(rows[0]) > len(CANDLE_COLUMNS) else [])
+    try:
+        # All-numeric rows (epoch timestamps) convert in a single pass
+        table = np.array(rows, dtype=np.float64)
+        fields = {name: table[:, i] for i, name in enumerate(columns) if i < table.shape[1]}
+        fields['timestamp'] = fields['timestamp'].astype(np.int64)
+    except (ValueError, TypeError):
+        # String timestamps, nulls or ragged rows: let pandas infer per column
+        table = pd.DataFrame(rows)
+        fields = {name: table[i].to_numpy() for i, name in enumerate(columns) if i < table.shape[1]}
+    return normalize_candles(fields['timestamp'], fields['open'], fields['high'], fields['low'],
+                             fields['close'], fields['volume'], oi=fields.get('oi'),
+                             tz_shift_seconds=tz_shift_seconds, dedupe=dedupe)
+
+
+def from_delimited(raw, row_separator=',', field_separator='|', tz_shift_seconds=0, dedupe=True):
+    """Normalize a delimited string payload: "ts|o|h|l|c|v,ts|o|h|l|c|v,..." """
+    raw = (raw or '').strip()
+    if not raw:
+        return empty_candles()
+    if row_separator != '\n':
+        raw = raw.replace(row_separator, '\n')
+    table = pd.read_csv(io.StringIO(raw), sep=field_separator, header=None,
+                        usecols=range(len(CANDLE_COLUMNS)), names=CANDLE_COLUMNS,
+                        on_bad_lines='skip', engine='c')
+    # Rows with fewer than six fields are dropped
+    table = table[table['volume'].notna()]
+    return normalize_candles(table['timestamp'].to_numpy(), table['open'].to_numpy(),
+                             table['high'].to_numpy(), table['low'].to_numpy(),
+                             table['close'].to_numpy(), table['volume'].to_numpy(),
+                             tz_shift_seconds=tz_shift_seconds, dedupe=dedupe)
+
+
+def concat_candles(frames):
+    """Concatenate normalized chunks and apply the stable sort/dedupe across them"""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return empty_candles()
+    combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    columns = {name: combined[name].to_numpy() for name in combined.columns if name != 'timestamp'}
+    return normalize_candles(combined['timestamp'].to_numpy(dtype=np.int64),
+                             columns['open'], columns['high'], columns['low'],
+                             columns['close'], columns['volume'], oi=columns.get('oi'))
+
+
+def align_timestamps(timestamps, interval_seconds, offset_seconds=0, mode='floor'):
+    """
+    Snap epoch seconds onto an interval grid that starts at `offset_seconds`
+    (e.g. 09:15 session alignment), rounding down ('floor') or up ('ceil').
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64) - offset_seconds
+    if mode == 'ceil':
+        timestamps = -((-timestamps) // interval_seconds) * interval_seconds
+    else:
+        timestamps = (timestamps // interval_seconds) * interval_seconds
+    return timestamps + offset_seconds
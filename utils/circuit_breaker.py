@@ -0,0 +1,245 @@
+"""
+Per-broker-endpoint circuit breaker for outbound broker API calls.
+
+Every broker call is tracked in a rolling window keyed by (broker host,
+endpoint). When the error rate or the share of slow calls in that window
+crosses its threshold the circuit OPENS and further calls fail fast with
+CircuitOpenError instead of tying up a worker until the HTTP timeout.
+After a cool-down a single HALF_OPEN probe is let through: if it succeeds
+the circuit closes again, otherwise it re-opens for another cool-down.
+"""
+import http.client
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Configuration (all optional, sensible defaults)
+CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'TRUE').upper() == 'TRUE'
+WINDOW_SIZE = int(os.getenv('CIRCUIT_BREAKER_WINDOW', '20'))                      # calls kept per endpoint
+MIN_CALLS = int(os.getenv('CIRCUIT_BREAKER_MIN_CALLS', '5'))                       # calls needed before tripping
+FAILURE_RATE_THRESHOLD = float(os.getenv('CIRCUIT_BREAKER_FAILURE_RATE', '0.5'))   # 50% errors
+SLOW_CALL_MS = float(os.getenv('CIRCUIT_BREAKER_SLOW_CALL_MS', '5000'))            # a call slower than this is "slow"
+SLOW_CALL_RATE_THRESHOLD = float(os.getenv('CIRCUIT_BREAKER_SLOW_CALL_RATE', '0.8'))  # 80% slow calls
+OPEN_SECONDS = float(os.getenv('CIRCUIT_BREAKER_OPEN_SECONDS', '30'))              # cool-down before half-open probe
+BROKER_HTTP_TIMEOUT = float(os.getenv('BROKER_HTTP_TIMEOUT', '30'))                # http.client socket timeout
+
+STATE_CLOSED = 'CLOSED'
+STATE_OPEN = 'OPEN'
+STATE_HALF_OPEN = 'HALF_OPEN'
+
+# Path segments that look like ids (order ids, instrument tokens) are collapsed
+# so that /orders/240101000123 and /orders/240101000124 share one breaker.
+_ID_SEGMENT = re.compile(r'^(?=(?:[^\d]*\d){4})[A-Za-z0-9\-_.:|]+$')
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the endpoint's circuit is open"""
+
+    def __init__(self, broker, endpoint, retry_after):
+        self.broker = broker
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(
+            f"Broker endpoint {broker}{endpoint} is temporarily unavailable "
+            f"(circuit open after repeated failures/timeouts). Retry after {self.retry_seconds}s"
+        )
+
+    @property
+    def retry_seconds(self):
+        """Whole seconds until a retry can succeed, for Retry-After"""
+        return max(1, math.ceil(self.retry_after))
+
+    def to_response(self):
+        """Error body for API clients, served with HTTP 503 and a Retry-After header"""
+        return {
+            'status': 'error',
+            'message': str(self),
+            'circuit': f'{self.broker}{self.endpoint}',
+            'retry_after': self.retry_seconds
+        }
+
+
+def normalize_endpoint(path):
+    """Strip the query string and collapse id-like path segments"""
+    path = (path or '/').split('?', 1)[0]
+    segments = [':id' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/')]
+    return '/'.join(segments) or '/'
+
+
+class CircuitBreaker:
+    """Error-rate and latency driven circuit breaker for one broker endpoint"""
+
+    def __init__(self, broker, endpoint):
+        self.broker = broker
+        self.endpoint = endpoint
+        self.state = STATE_CLOSED
+        self.window = deque(maxlen=WINDOW_SIZE)  # (failed, slow) per call
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self.last_latency_ms = 0.0
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must fail fast"""
+        if not CIRCUIT_BREAKER_ENABLED:
+            return
+        with self.lock:
+            if self.state == STATE_OPEN:
+                remaining = self.opened_at + OPEN_SECONDS - time.monotonic()
+                if remaining > 0:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(self.broker, self.endpoint, remaining)
+                # Cool-down elapsed, let exactly one probe through
+                self.state = STATE_HALF_OPEN
+                self.probe_in_flight = True
+                logger.info(f"Circuit half-open for {self.broker}{self.endpoint}, sending probe")
+            elif self.state == STATE_HALF_OPEN:
+                if self.probe_in_flight:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(self.broker, self.endpoint, OPEN_SECONDS)
+                self.probe_in_flight = True
+
+    def record(self, success, latency_ms, error=None):
+        """Record the outcome of a call and update the circuit state"""
+        if not CIRCUIT_BREAKER_ENABLED:
+            return
+        slow = latency_ms >= SLOW_CALL_MS
+        with self.lock:
+            self.total_calls += 1
+            self.last_latency_ms = latency_ms
+            if not success:
+                self.total_failures += 1
+                self.last_error = error
+            self.window.append((not success, slow))
+
+            if self.state == STATE_HALF_OPEN:
+                self.probe_in_flight = False
+                if success and not slow:
+                    self._close()
+                else:
+                    self._open('half-open probe failed')
+                return
+
+            if self.state == STATE_CLOSED and len(self.window) >= MIN_CALLS:
+                failure_rate = sum(1 for failed, _ in self.window if failed) / len(self.window)
+                slow_rate = sum(1 for _, is_slow in self.window if is_slow) / len(self.window)
+                if failure_rate >= FAILURE_RATE_THRESHOLD:
+                    self._open(f'failure rate {failure_rate:.0%}')
+                elif slow_rate >= SLOW_CALL_RATE_THRESHOLD:
+                    self._open(f'slow call rate {slow_rate:.0%}')
+
+    def _open(self, reason):
+        self.state = STATE_OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        logger.warning(f"Circuit OPEN for {self.broker}{self.endpoint}: {reason}")
+
+    def _close(self):
+        self.state = STATE_CLOSED
+        self.opened_at = None
+        self.window.clear()
+        logger.info(f"Circuit CLOSED for {self.broker}{self.endpoint}")
+
+    def snapshot(self):
+        """Return a JSON-serializable view of the breaker"""
+        with self.lock:
+            calls = len(self.window)
+            failures = sum(1 for failed, _ in self.window if failed)
+            slow = sum(1 for _, is_slow in self.window if is_slow)
+            retry_after = 0
+            if self.state == STATE_OPEN:
+                retry_after = max(0.0, self.opened_at + OPEN_SECONDS - time.monotonic())
+            return {
+                'broker': self.broker,
+                'endpoint': self.endpoint,
+                'state': self.state,
+                'window_calls': calls,
+                'failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'slow_call_rate': round(slow / calls, 3) if calls else 0.0,
+                'total_calls': self.total_calls,
+                'total_failures': self.total_failures,
+                'rejected_calls': self.rejected_calls,
+                'last_latency_ms': round(self.last_latency_ms, 2),
+                'last_error': self.last_error,
+                'retry_after': round(retry_after, 1)
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(broker, endpoint):
+    """Return the breaker for a broker endpoint, creating it on first use"""
+    key = (broker, normalize_endpoint(endpoint))
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(*key)
+                _breakers[key] = breaker
+    return breaker
+
+
+def get_circuit_states():
+    """Snapshots of every known breaker, open circuits first"""
+    order = {STATE_OPEN: 0, STATE_HALF_OPEN: 1, STATE_CLOSED: 2}
+    snapshots = [breaker.snapshot() for breaker in list(_breakers.values())]
+    return sorted(snapshots, key=lambda s: (order[s['state']], s['broker'], s['endpoint']))
+
+
+def is_failure_status(status_code):
+    """Server errors and throttling count against the circuit, client errors do not"""
+    return status_code >= 500 or status_code == 429
+
+
+class GuardedHTTPSConnection(http.client.HTTPSConnection):
+    """
+    Drop-in replacement for http.client.HTTPSConnection used by broker modules.
+    Adds a default socket timeout and routes every request through the
+    circuit breaker of its (host, endpoint).
+    """
+
+    def __init__(self, host, *args, **kwargs):
+        if len(args) < 2:  # (port, timeout) were not passed positionally
+            kwargs.setdefault('timeout', BROKER_HTTP_TIMEOUT)
+        super().__init__(host, *args, **kwargs)
+        self._breaker = None
+        self._call_started = None
+
+    def request(self, method, url, *args, **kwargs):
+        breaker = get_breaker(self.host, url)
+        breaker.before_call()
+        self._breaker = breaker
+        self._call_started = time.monotonic()
+        try:
+            return super().request(method, url, *args, **kwargs)
+        except Exception as e:
+            self._finish(False, str(e))
+            raise
+
+    def getresponse(self):
+        try:
+            response = super().getresponse()
+        except Exception as e:
+            self._finish(False, str(e))
+            raise
+        failed = is_failure_status(response.status)
+        self._finish(not failed, f'HTTP {response.status}' if failed else None)
+        return response
+
+    def _finish(self, success, error):
+        breaker, self._breaker = self._breaker, None
+        if breaker is not None:
+            breaker.record(success, (time.monotonic() - self._call_started) * 1000, error)
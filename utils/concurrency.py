@@ -0,0 +1,70 @@
+"""
+Shared helpers for running independent broker calls concurrently.
+
+A single long-lived thread pool is reused for all fan-out work so that
+request handlers do not create (and tear down) a pool per request. Each
+call bounds its own parallelism, and results are always returned in the
+order of the input items.
+"""
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BROKER_FETCH_WORKERS = int(os.getenv('BROKER_FETCH_WORKERS', '16'))
+_THREAD_PREFIX = 'broker-fetch'
+
+_executor = ThreadPoolExecutor(max_workers=BROKER_FETCH_WORKERS, thread_name_prefix=_THREAD_PREFIX)
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most `size` items"""
+    size = max(1, int(size))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _in_worker_thread():
+    return threading.current_thread().name.startswith(_THREAD_PREFIX)
+
+
+def map_concurrent(func, items, max_workers=4, return_exceptions=False):
+    """
+    Call func(item) for every item with at most `max_workers` calls in flight.
+
+    Args:
+        func: Callable taking a single item
+        items: Items to process
+        max_workers: Upper bound on concurrent calls for this batch
+        return_exceptions: If True, exceptions are returned in place of results
+            instead of being raised
+
+    Returns:
+        list: Results in the same order as `items`
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return func(item)
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
+
+    # Sequential path for trivial batches, and when already running on the
+    # shared pool (nested fan-out would otherwise wait on its own workers)
+    if len(items) == 1 or max_workers <= 1 or _in_worker_thread():
+        return [call(item) for item in items]
+
+    slots = threading.BoundedSemaphore(max_workers)
+    futures = []
+    for item in items:
+        slots.acquire()
+        future = _executor.submit(call, item)
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+    return [future.result() for future in futures]
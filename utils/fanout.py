@@ -0,0 +1,250 @@
+"""
+Bounded concurrent fan-out for per-order broker calls.
+
+Every broker's `cancel_all_orders_api` and `close_all_positions` used to call
+the broker once per order in a plain loop, so with 60 open orders the last
+cancel went out seconds after the first. They now hand the calls to
+`fan_out`:
+
+    * Calls run on a shared, long-lived thread pool (FANOUT_POOL_SIZE
+      threads), at most FANOUT_MAX_WORKERS at a time for one request.
+    * A token bucket paces the calls. `order_rate_limiter(broker)` returns
+      the same `<broker>:orders` bucket the order dispatcher uses, so a
+      cancel-all and a basket order share the broker's order budget. Every
+      broker has a default orders/sec limit (BROKER_ORDER_RATES), overridable
+      with ORDER_DISPATCH_RATE or ORDER_DISPATCH_RATE_<BROKER>.
+    * Results come back in input order with per-call timing: `started_ms`
+      (offset from the start of the fan-out, including any rate limit wait)
+      and `elapsed_ms` (duration of the broker call).
+
+Broker functions keep their return values. Endpoints that want the timings
+wrap the broker call in `collect_timings()` and receive a record per order.
+"""
+import os
+import time
+import itertools
+import threading
+import contextvars
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from utils.token_bucket import get_bucket
+
+logger = logging.getLogger(__name__)
+
+# Concurrent broker calls for one cancel-all / close-all request
+FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', '10'))
+
+# Threads shared by all fan-outs in the process
+FANOUT_POOL_SIZE = int(os.getenv('FANOUT_POOL_SIZE', '32'))
+
+# Orders per second for every broker, replacing the defaults below (0 for no limit;
+# ORDER_DISPATCH_RATE_<BROKER> overrides it for one broker)
+ORDER_DISPATCH_RATE = os.getenv('ORDER_DISPATCH_RATE', '')
+
+# Default orders per second, kept under each broker's published order API limit
+DEFAULT_ORDER_RATE = 10
+BROKER_ORDER_RATES = {
+    'angel': 10,
+    'dhan': 20,
+    'upstox': 20,
+    'zerodha': 10,
+    'fyers': 10,
+    'icici': 1.5,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_timings = contextvars.ContextVar('fanout_timings', default=None)
+
+
+@dataclass(slots=True)
+class FanOutResult:
+    """Outcome of one call; `error` is set instead of `value` if it raised"""
+    item: object
+    value: object = None
+    error: BaseException = None
+    started_ms: float = 0.0
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FANOUT_POOL_SIZE, thread_name_prefix='fanout')
+    return _executor
+
+
+def broker_order_rate(broker):
+    """Orders per second allowed for a broker, 0 for no limit"""
+    name = f'ORDER_DISPATCH_RATE_{broker.upper()}'
+    value = os.getenv(name)
+    if not value:
+        name, value = 'ORDER_DISPATCH_RATE', ORDER_DISPATCH_RATE
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            logger.error(f"Invalid {name}: {value}")
+    return BROKER_ORDER_RATES.get(broker, DEFAULT_ORDER_RATE)
+
+
+def order_rate_limiter(broker):
+    """The broker's shared order token bucket, or None when its rate is 0"""
+    rate = broker_order_rate(broker)
+    return get_bucket(f'{broker}:orders', rate) if rate > 0 else None
+
+
+def fan_out(items, fn, max_workers=FANOUT_MAX_WORKERS, rate_limiter=None):
+    """
+    Call fn(item) for every item with bounded concurrency.
+
+    Args:
+        items: Iterable of arguments
+        fn: Function of one argument
+        max_workers: Concurrent calls for this fan-out
+        rate_limiter: Optional TokenBucket acquired before each call
+
+    Returns:
+        list: FanOutResult per item, in the order of `items`. Exceptions are
+            captured in the result rather than raised.
+    """
+    items = list(items)
+    results = [FanOutResult(item) for item in items]
+    if not results:
+        return results
+
+    origin = time.perf_counter()
+    indexes = itertools.count()
+
+    def worker():
+        while True:
+            index = next(indexes)
+            if index >= len(results):
+                return
+            result = results[index]
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                result.value = fn(result.item)
+            except Exception as e:
+                logger.error(f"Fan-out call failed for {result.item!r}: {e}")
+                result.error = e
+            finished = time.perf_counter()
+            result.started_ms = round((started - origin) * 1000, 2)
+            result.elapsed_ms = round((finished - started) * 1000, 2)
+
+    workers = min(max(1, max_workers), len(results))
+    if workers == 1:
+        worker()
+    else:
+        executor = _get_executor()
+        futures = [executor.submit(worker) for _ in range(workers)]
+        for future in futures:
+            future.result()
+    return results
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the per-order timing records of the fan-outs run in this context.
+
+    Yields:
+        list: Filled with one dict per order once the broker call returns
+    """
+    timings = []
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def record_timings(records):
+    """Append timing records to the active collect_timings() list, if any"""
+    timings = _timings.get()
+    if timings is not None:
+        timings.extend(records)
+
+
+def cancel_orders(broker, order_ids, cancel):
+    """
+    Cancel orders concurrently.
+
+    Args:
+        broker: Broker name (selects the rate limiter)
+        order_ids: Broker order ids
+        cancel: cancel(orderid) -> (response, status_code), the broker's cancel_order
+
+    Returns:
+        tuple: (canceled_orders, failed_cancellations) in the order of order_ids
+    """
+    results = fan_out(order_ids, cancel, rate_limiter=order_rate_limiter(broker))
+    canceled_orders = []
+    failed_cancellations = []
+    records = []
+    for result in results:
+        success = result.ok and result.value[1] == 200
+        (canceled_orders if success else failed_cancellations).append(result.item)
+        records.append({
+            'orderid': result.item,
+            'status': 'success' if success else 'error',
+            'started_ms': result.started_ms,
+            'elapsed_ms': result.elapsed_ms
+        })
+    record_timings(records)
+    return canceled_orders, failed_cancellations
+
+
+# Square-off payloads are OpenAlgo orders for most brokers and broker-native
+# orders for a few (XTS brokers, Paytm); timing records take the first key present
+SYMBOL_KEYS = ('symbol', 'exchangeInstrumentID', 'security_id')
+EXCHANGE_KEYS = ('exchange', 'exchangeSegment')
+ACTION_KEYS = ('action', 'orderSide', 'txn_type')
+
+
+def _first(payload, keys):
+    for key in keys:
+        if key in payload:
+            return payload[key]
+    return None
+
+
+def place_orders(broker, payloads, place):
+    """
+    Place square-off orders concurrently.
+
+    Args:
+        broker: Broker name (selects the rate limiter)
+        payloads: Order payloads, as the broker's place function takes them
+        place: place(payload) -> (res, response_data, orderid), the broker's place_order_api
+
+    Returns:
+        list: FanOutResult per payload, in order
+    """
+    results = fan_out(payloads, place, rate_limiter=order_rate_limiter(broker))
+    records = []
+    for result in results:
+        orderid = result.value[2] if result.ok else None
+        payload = result.item
+        records.append({
+            'symbol': _first(payload, SYMBOL_KEYS),
+            'exchange': _first(payload, EXCHANGE_KEYS),
+            'action': _first(payload, ACTION_KEYS),
+            'orderid': orderid,
+            'status': 'success' if orderid else 'error',
+            'started_ms': result.started_ms,
+            'elapsed_ms': result.elapsed_ms
+        })
+    record_timings(records)
+    return results
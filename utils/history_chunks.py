@@ -0,0 +1,104 @@
+"""
+Shared chunk planner and executor for long-range historical data requests.
+
+Brokers cap how many days a single candle request may span, so a long range
+is split into windows. Windows are fetched concurrently (bounded, and under
+the broker's rate limit) and returned in chronological order so callers can
+keep their existing concat/dedupe/sort logic. A failed window is retried on
+its own and, if it keeps failing, the whole request fails instead of
+returning data with a silent hole in it.
+"""
+import os
+import time
+import logging
+from datetime import timedelta
+
+from utils.circuit_breaker import CircuitOpenError
+from utils.concurrency import map_concurrent
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FETCH_CONCURRENCY = int(os.getenv('HISTORY_FETCH_CONCURRENCY', '4'))
+HISTORY_FETCH_RETRIES = int(os.getenv('HISTORY_FETCH_RETRIES', '2'))
+HISTORY_RETRY_BACKOFF = float(os.getenv('HISTORY_RETRY_BACKOFF', '0.5'))  # seconds, doubled per attempt
+
+
+class ChunkFetchError(Exception):
+    """Raised when a history window still fails after its retries"""
+
+    def __init__(self, window, cause):
+        self.window = window
+        self.cause = cause
+        super().__init__(f"Failed to fetch window {window[0]} to {window[1]}: {cause}")
+
+
+def plan_windows(start, end, days, exclusive_end=False):
+    """
+    Split [start, end] into consecutive windows spanning at most `days` days.
+
+    Args:
+        start, end: datetime/Timestamp bounds of the request
+        days: Maximum calendar days per window
+        exclusive_end: Windows share their boundary (the broker treats the
+            end as exclusive) instead of starting the day after the
+            previous window
+
+    Returns:
+        list: (window_start, window_end) tuples in chronological order
+    """
+    windows = []
+    current = start
+    if exclusive_end:
+        while current < end:
+            window_end = min(current + timedelta(days=days), end)
+            windows.append((current, window_end))
+            current = window_end
+    else:
+        while current <= end:
+            window_end = min(current + timedelta(days=days - 1), end)
+            windows.append((current, window_end))
+            current = window_end + timedelta(days=1)
+    return windows
+
+
+def fetch_windows(fetch, windows, max_workers=None, rate_limiter=None,
+                  retries=None, no_retry=()):
+    """
+    Call fetch(window_start, window_end) for every window.
+
+    Args:
+        fetch: Callable returning the result for one window; it should raise
+            on a broker error so the window can be retried
+        windows: Output of plan_windows()
+        max_workers: Concurrent windows in flight (HISTORY_FETCH_CONCURRENCY)
+        rate_limiter: Optional TokenBucket acquired before every attempt
+        retries: Extra attempts per failed window (HISTORY_FETCH_RETRIES)
+        no_retry: Exception types that fail immediately (e.g. permission errors)
+
+    Returns:
+        list: Results in window order
+
+    Raises:
+        ChunkFetchError: If any window fails after its retries
+    """
+    max_workers = HISTORY_FETCH_CONCURRENCY if max_workers is None else max_workers
+    retries = HISTORY_FETCH_RETRIES if retries is None else retries
+    fatal = (CircuitOpenError,) + tuple(no_retry)
+
+    def run(window):
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                return fetch(*window)
+            except fatal:
+                raise
+            except Exception as e:
+                if attempt >= retries:
+                    raise ChunkFetchError(window, e) from e
+                attempt += 1
+                logger.warning(f"Retrying window {window[0]} to {window[1]} (attempt {attempt}/{retries}): {e}")
+                time.sleep(HISTORY_RETRY_BACKOFF * (2 ** (attempt - 1)))
+
+    return map_concurrent(run, windows, max_workers=max_workers)
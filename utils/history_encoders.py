@@ -0,0 +1,163 @@
+"""
+Response encoders for historical candle data.
+
+`json` keeps the original shape ({'status': 'success', 'data': [{...}, ...]}).
+The other formats avoid building one dict per candle:
+
+    columnar  {'status': 'success', 'data': {'timestamp': [...], 'open': [...], ...}}
+              encoded with orjson when installed (stdlib json otherwise)
+    csv       text/csv streamed in row chunks
+    arrow     Arrow IPC stream (requires pyarrow)
+    npy       NumPy .npy structured array (np.load(..., allow_pickle=False))
+
+`iter_ticker_text` renders the AmiBroker-style text of /api/v1/ticker?format=txt.
+"""
+import io
+import json
+
+import numpy as np
+import pandas as pd
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HISTORY_FORMATS = ('json', 'columnar', 'csv', 'arrow', 'npy')
+
+# Rows per chunk when streaming CSV and ticker text
+CSV_CHUNK_ROWS = 20000
+
+IST_OFFSET_SECONDS = 19800  # IST has no DST, a fixed +05:30 shift is exact
+
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+NPY_MIMETYPE = 'application/octet-stream'
+
+
+class EncodedResponse(Response):
+    """Response whose `json` is a small summary, so latency/traffic logging never parses the payload"""
+    @property
+    def json(self):
+        return getattr(self, '_json', None) or {}
+
+    @json.setter
+    def json(self, value):
+        self._json = value
+
+
+class UnsupportedFormatError(Exception):
+    """Raised when a format's optional dependency is not installed"""
+    pass
+
+
+def _column_arrays(df):
+    """Columns as NumPy arrays; object columns (e.g. partially missing oi) become float64"""
+    columns = {}
+    for name in df.columns:
+        column = df[name].to_numpy()
+        if column.dtype == object:
+            column = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+        columns[name] = column
+    return columns
+
+
+def _csv_values(column):
+    values = column.tolist()
+    if column.dtype.kind == 'f' and np.isnan(column).any():
+        values = ['' if value != value else value for value in values]  # NaN as an empty field
+    return values
+
+
+def encode_columnar(df):
+    """Compact columnar JSON body as bytes"""
+    if orjson is not None:
+        return orjson.dumps({'status': 'success', 'data': _column_arrays(df)},
+                            option=orjson.OPT_SERIALIZE_NUMPY)
+    data = {name: [None if value != value else value for value in column.tolist()]  # NaN as null
+            for name, column in _column_arrays(df).items()}
+    return json.dumps({'status': 'success', 'data': data}, separators=(',', ':')).encode('utf-8')
+
+
+def iter_csv(df, chunk_rows=CSV_CHUNK_ROWS):
+    """Yield the CSV header and then the rows in chunks"""
+    yield ','.join(df.columns) + '\n'
+    columns = list(_column_arrays(df).values())
+    for start in range(0, len(df), chunk_rows):
+        rows = zip(*(_csv_values(column[start:start + chunk_rows]) for column in columns))
+        yield '\n'.join(','.join(map(str, row)) for row in rows) + '\n'
+
+
+def iter_ticker_text(df, symbol_with_exchange, interval, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Yield ticker text lines in chunks:
+        Daily:    Ticker,Date_YMD,Open,High,Low,Close,Volume
+        Intraday: Ticker,Date_YMD,Time,Open,High,Low,Close,Volume
+    Timestamps are converted to IST once for the whole column.
+    """
+    if df.empty:
+        return
+    ist = (df['timestamp'].to_numpy(dtype=np.int64) + IST_OFFSET_SECONDS).astype('datetime64[s]')
+    stamps = pd.Series(np.datetime_as_string(ist, unit='s'))
+    fields = [stamps.str.slice(0, 10)]  # Date_YMD
+    if interval.upper() != 'D':
+        fields.append(stamps.str.slice(11, 19))  # Time
+    fields += [df[name].astype(np.float64) for name in ('open', 'high', 'low', 'close')]
+    fields.append(df['volume'].astype(np.float64).astype(np.int64))
+    columns = [field.to_numpy() for field in fields]
+    prefix = symbol_with_exchange + ','
+
+    for start in range(0, len(df), chunk_rows):
+        rows = zip(*(column[start:start + chunk_rows].tolist() for column in columns))
+        text = '\n'.join(prefix + ','.join(map(str, row)) for row in rows)
+        # Lines are newline-separated without a trailing newline
+        yield text if start == 0 else '\n' + text
+
+
+def encode_arrow(df):
+    """Arrow IPC stream bytes"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise UnsupportedFormatError("The 'arrow' format requires pyarrow to be installed on the server")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_npy(df):
+    """NumPy .npy bytes of a structured array (no pickled objects)"""
+    columns = _column_arrays(df)
+    dtype = [(name, column.dtype if column.dtype != object else np.float64) for name, column in columns.items()]
+    records = np.empty(len(df), dtype=dtype)
+    for name, column in columns.items():
+        records[name] = column
+    buffer = io.BytesIO()
+    np.save(buffer, records, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def encode_history(df, fmt, request_id=None):
+    """
+    Build the response for a non-default history format.
+
+    Raises:
+        UnsupportedFormatError: If the format's optional dependency is missing
+    """
+    summary = {'status': 'success', 'request_id': request_id, 'format': fmt, 'rows': len(df)}
+
+    if fmt == 'columnar':
+        response = EncodedResponse(encode_columnar(df), mimetype='application/json')
+    elif fmt == 'csv':
+        response = EncodedResponse(iter_csv(df), mimetype='text/csv')
+    elif fmt == 'arrow':
+        response = EncodedResponse(encode_arrow(df), mimetype=ARROW_MIMETYPE)
+    elif fmt == 'npy':
+        response = EncodedResponse(encode_npy(df), mimetype=NPY_MIMETYPE)
+    else:
+        raise ValueError(f"Unsupported history format: {fmt}")
+
+    response.json = summary
+    return response
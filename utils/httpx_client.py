@@ -2,10 +2,38 @@
 Shared httpx client module with connection pooling support for all broker APIs
 """
 import httpx
+import time
+from utils.circuit_breaker import get_breaker, is_failure_status
 
 # Global httpx client for connection pooling
 _httpx_client = None
 
+class CircuitBreakerTransport(httpx.BaseTransport):
+    """
+    Transport wrapper that routes every broker request through the circuit
+    breaker of its (host, endpoint) so degraded endpoints fail fast.
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    def handle_request(self, request):
+        breaker = get_breaker(request.url.host, request.url.path)
+        breaker.before_call()
+        started = time.monotonic()
+        try:
+            response = self._transport.handle_request(request)
+        except Exception as e:
+            breaker.record(False, (time.monotonic() - started) * 1000, str(e))
+            raise
+        failed = is_failure_status(response.status_code)
+        breaker.record(not failed, (time.monotonic() - started) * 1000,
+                       f'HTTP {response.status_code}' if failed else None)
+        return response
+
+    def close(self):
+        self._transport.close()
+
 def get_httpx_client():
     """
     Returns a global httpx client instance with connection pooling.
@@ -18,15 +46,19 @@ def get_httpx_client():
     if _httpx_client is None:
         # Create a client with connection pooling
         # Setting limits to allow connection reuse but prevent resource exhaustion
-        _httpx_client = httpx.Client(
+        # The pooled transport is wrapped with the per-endpoint circuit breaker
+        transport = httpx.HTTPTransport(
             http2=True,
-            timeout=30.0,
             limits=httpx.Limits(
                 max_keepalive_connections=10,
                 max_connections=20,
                 keepalive_expiry=60.0
             )
         )
+        _httpx_client = httpx.Client(
+            timeout=30.0,
+            transport=CircuitBreakerTransport(transport)
+        )
     return _httpx_client
     
 def cleanup_httpx_client():
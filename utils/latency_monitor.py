@@ -184,6 +184,7 @@ def init_latency_monitoring(app):
         'close_position': 'CLOSE',
         'cancel_all_order': 'CANCEL_ALL',
         'quotes': 'QUOTES',
+        'multiquotes': 'MULTIQUOTES',
         'history': 'HISTORY',
         'depth': 'DEPTH',
         'intervals': 'INTERVALS',
@@ -0,0 +1,217 @@
+"""
+Single-pass validation for order payloads.
+
+The place, smart, basket and split order endpoints used to check a payload
+several times: a deep copy, a missing-field scan, membership tests against
+the lists in utils/constants (joining every list into an error message even
+for valid orders), the marshmallow schema load and, in analyze mode, the
+same checks again in utils/api_analyzer.
+
+`OrderValidator` is built once per endpoint with the field layout of its
+schema and turns a raw JSON payload into a frozen `OrderRequest` in one pass,
+using frozensets for the enum checks and error messages prepared at import
+time. Messages match what the endpoints returned before (including the
+marshmallow style `{'field': ['Not a valid string.']}` for type errors).
+"""
+from dataclasses import dataclass, fields as dataclass_fields, replace
+
+from utils.constants import (
+    VALID_EXCHANGES,
+    VALID_ACTIONS,
+    VALID_PRICE_TYPES,
+    VALID_PRODUCT_TYPES,
+    REQUIRED_ORDER_FIELDS,
+    REQUIRED_SMART_ORDER_FIELDS
+)
+
+EXCHANGES = frozenset(VALID_EXCHANGES)
+ACTIONS = frozenset(VALID_ACTIONS)
+PRICE_TYPES = frozenset(VALID_PRICE_TYPES)
+PRODUCT_TYPES = frozenset(VALID_PRODUCT_TYPES)
+
+INVALID_EXCHANGE = f'Invalid exchange. Must be one of: {", ".join(VALID_EXCHANGES)}'
+INVALID_ACTION = f'Invalid action. Must be one of: {", ".join(VALID_ACTIONS)} (case insensitive)'
+INVALID_PRICE_TYPE = f'Invalid price type. Must be one of: {", ".join(VALID_PRICE_TYPES)}'
+INVALID_PRODUCT_TYPE = f'Invalid product type. Must be one of: {", ".join(VALID_PRODUCT_TYPES)}'
+
+# Optional fields and their defaults, as declared in restx_api/schemas.py
+ORDER_DEFAULTS = {
+    'pricetype': 'MARKET',
+    'product': 'MIS',
+    'price': '0.0',
+    'trigger_price': '0.0',
+    'disclosed_quantity': '0'
+}
+
+# Fields clients commonly send as JSON numbers
+NUMERIC_FIELDS = frozenset(['quantity', 'price', 'trigger_price', 'disclosed_quantity',
+                            'position_size', 'splitsize'])
+
+REQUIRED_SPLIT_ORDER_FIELDS = REQUIRED_ORDER_FIELDS + ['splitsize']
+
+# Basket legs inherit apikey and strategy from the basket
+REQUIRED_BASKET_LEG_FIELDS = [field for field in REQUIRED_ORDER_FIELDS if field not in ('apikey', 'strategy')]
+
+
+class OrderValidationError(ValueError):
+    """Invalid order payload; the message is returned to the client as is"""
+
+
+@dataclass(frozen=True, slots=True)
+class OrderRequest:
+    """A validated order. Values stay strings, as the broker adapters expect."""
+    apikey: str
+    strategy: str
+    exchange: str
+    symbol: str
+    action: str
+    quantity: str
+    pricetype: str = 'MARKET'
+    product: str = 'MIS'
+    price: str = '0.0'
+    trigger_price: str = '0.0'
+    disclosed_quantity: str = '0'
+    position_size: str = None
+    splitsize: str = None
+
+    def to_dict(self):
+        """The dict the schema used to produce (what broker place_*_api functions take)"""
+        result = {name: getattr(self, name) for name in _BASE_FIELDS}
+        if self.position_size is not None:
+            result['position_size'] = self.position_size
+        if self.splitsize is not None:
+            result['splitsize'] = self.splitsize
+        return result
+
+    def with_quantity(self, quantity):
+        return replace(self, quantity=str(quantity))
+
+
+_BASE_FIELDS = tuple(field.name for field in dataclass_fields(OrderRequest)
+                     if field.name not in ('position_size', 'splitsize'))
+
+
+class OrderValidator:
+    """
+    Validator for one payload layout, compiled once.
+
+    Args:
+        required: Required field names, in the order they are reported missing
+        strict: Reject unknown fields and non-string values like the marshmallow
+            schemas do. Non-strict validators (basket legs) ignore unknown
+            fields and accept JSON numbers for numeric fields.
+    """
+    __slots__ = ('required', 'required_set', 'declared', 'declared_set', 'strict')
+
+    def __init__(self, required, strict=True):
+        self.required = tuple(required)
+        self.required_set = frozenset(required)
+        self.declared = self.required + tuple(name for name in ORDER_DEFAULTS if name not in self.required_set)
+        self.declared_set = frozenset(self.declared)
+        self.strict = strict
+
+    def validate(self, data, **inherited):
+        """
+        Validate a raw payload.
+
+        Args:
+            data: Decoded JSON body (not modified)
+            inherited: Fields supplied by the caller rather than the payload
+                (apikey and strategy of a basket leg)
+
+        Returns:
+            OrderRequest
+
+        Raises:
+            OrderValidationError: With the client-facing message
+        """
+        if not isinstance(data, dict):
+            raise OrderValidationError('Invalid request payload')
+        if inherited:
+            data = {**data, **inherited}
+
+        if not self.required_set.issubset(data):
+            missing = [field for field in self.required if field not in data]
+            raise OrderValidationError(f'Missing mandatory field(s): {", ".join(missing)}')
+
+        values = {}
+        errors = None
+        for name in self.declared:
+            value = data.get(name)
+            if value is None:
+                if name in data and (self.strict or name in self.required_set):
+                    errors = errors or {}
+                    errors[name] = ['Field may not be null.']
+                continue
+            if type(value) is not str:
+                if not self.strict and name in NUMERIC_FIELDS and type(value) in (int, float):
+                    value = str(value)
+                else:
+                    errors = errors or {}
+                    errors[name] = ['Not a valid string.']
+                    continue
+            values[name] = value
+
+        if self.strict and len(data) != len(values) + (len(errors) if errors else 0):
+            for name in data:
+                if name not in self.declared_set:
+                    errors = errors or {}
+                    errors[name] = ['Unknown field.']
+        if errors:
+            raise OrderValidationError(str(errors))
+
+        if values['exchange'] not in EXCHANGES:
+            raise OrderValidationError(INVALID_EXCHANGE)
+        action = values['action'].upper()
+        if action not in ACTIONS:
+            raise OrderValidationError(INVALID_ACTION)
+        values['action'] = action
+        if values.get('pricetype', 'MARKET') not in PRICE_TYPES:
+            raise OrderValidationError(INVALID_PRICE_TYPE)
+        if values.get('product', 'MIS') not in PRODUCT_TYPES:
+            raise OrderValidationError(INVALID_PRODUCT_TYPE)
+
+        return OrderRequest(**values)
+
+
+def validate_basket(data):
+    """
+    Validate the basket envelope.
+
+    Returns:
+        tuple: (apikey, strategy, orders) with orders the raw leg payloads,
+            to be validated one by one with basket_leg_validator
+
+    Raises:
+        OrderValidationError: With the client-facing message
+    """
+    if not isinstance(data, dict):
+        raise OrderValidationError('Invalid request payload')
+    errors = {}
+    for name in ('apikey', 'strategy', 'orders'):
+        if name not in data:
+            errors[name] = ['Missing data for required field.']
+        elif data[name] is None:
+            errors[name] = ['Field may not be null.']
+    if 'orders' not in errors and not isinstance(data['orders'], list):
+        errors['orders'] = ['Not a valid list.']
+    elif 'orders' not in errors:
+        invalid = {index: ['Not a valid mapping type.'] for index, order in enumerate(data['orders'])
+                   if not isinstance(order, dict)}
+        if invalid:
+            errors['orders'] = invalid
+    for name in ('apikey', 'strategy'):
+        if name not in errors and type(data[name]) is not str:
+            errors[name] = ['Not a valid string.']
+    for name in data:
+        if name not in ('apikey', 'strategy', 'orders'):
+            errors[name] = ['Unknown field.']
+    if errors:
+        raise OrderValidationError(str(errors))
+    return data['apikey'], data['strategy'], data['orders']
+
+
+order_validator = OrderValidator(REQUIRED_ORDER_FIELDS)
+smart_order_validator = OrderValidator(REQUIRED_SMART_ORDER_FIELDS)
+split_order_validator = OrderValidator(REQUIRED_SPLIT_ORDER_FIELDS)
+basket_leg_validator = OrderValidator(REQUIRED_BASKET_LEG_FIELDS + ['apikey', 'strategy'], strict=False)
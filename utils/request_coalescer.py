@@ -0,0 +1,109 @@
+"""
+Single-flight request coalescing with a micro-TTL result cache.
+
+Concurrent identical market data requests (same broker, symbol, exchange and
+kind) share one in-flight broker call, and a successful result is reused for
+a short, configurable TTL. This keeps bursts of identical quote/depth polls
+from multiple strategies and the UI from each counting against the broker's
+rate limit.
+"""
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How long a fetched quote/depth may be served to later callers (milliseconds)
+MARKET_DATA_CACHE_TTL_MS = float(os.getenv('MARKET_DATA_CACHE_TTL_MS', '250'))
+
+# Expired entries are swept once the cache grows beyond this many keys
+_MAX_CACHE_ENTRIES = 4096
+
+
+class _Flight:
+    """An in-progress fetch that other callers can wait on"""
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Share one in-flight call per key and cache its result for `ttl_ms`"""
+
+    def __init__(self, ttl_ms):
+        self.ttl = max(0.0, ttl_ms) / 1000.0
+        self._cache = {}      # key -> (expires_at, value)
+        self._inflight = {}   # key -> _Flight
+        self._lock = threading.Lock()
+        self.hits = 0         # served from the TTL cache
+        self.coalesced = 0    # waited on another caller's in-flight request
+        self.misses = 0       # triggered a broker call
+
+    def get(self, key, fetch):
+        """
+        Return the value for `key`, calling `fetch()` only if no fresh cached
+        value exists and no identical request is already in flight.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self.hits += 1
+                return cached[1]
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = fetch()
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and flight.value is not None and self.ttl > 0:
+                    self._store(key, flight.value)
+            flight.event.set()
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        if len(self._cache) >= _MAX_CACHE_ENTRIES:
+            self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+        self._cache[key] = (now + self.ttl, value)
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            total = self.hits + self.coalesced + self.misses
+            return {
+                'ttl_ms': self.ttl * 1000,
+                'hits': self.hits,
+                'coalesced': self.coalesced,
+                'misses': self.misses,
+                'saved_ratio': round((self.hits + self.coalesced) / total, 3) if total else 0.0,
+                'inflight': len(self._inflight),
+                'cached_keys': len(self._cache)
+            }
+
+
+# Shared coalescer for quotes and depth, keyed by (broker, symbol, exchange, kind)
+market_data_coalescer = RequestCoalescer(MARKET_DATA_CACHE_TTL_MS)